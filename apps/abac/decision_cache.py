@@ -0,0 +1,119 @@
+"""
+ABAC Decision Cache - Memoized results for User.has_permission_for
+
+Two tiers:
+- Request tier: decisions are memoized on the user instance, which lives
+  for exactly one request (request.user). Serializers that check the same
+  permission for every row hit a plain dict.
+- Shared tier: all decisions of one (organization, user) are stored as a
+  single cache entry (Redis in production), keyed by the organization's
+  policy version and the user's generation. Bumping either stamp orphans
+  the old entry, so no explicit deletes are needed.
+
+The policy version is owned by apps/abac/snapshot.py and bumped on every
+policy/role/permission write; the user generation is bumped from
+apps/abac/signals.py when the user, their employee profile or their legacy
+UserRole grants change.
+"""
+
+import logging
+import uuid
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .snapshot import get_policy_version, policy_version_key
+
+logger = logging.getLogger(__name__)
+
+DECISION_CACHE_TTL = getattr(settings, 'ABAC_DECISION_CACHE_TTL', 60)
+USER_GENERATION_PREFIX = 'abac:user_gen:'
+DECISIONS_PREFIX = 'abac:decisions:'
+
+_MEMO_ATTR = '_abac_decision_memo'
+
+
+def _user_generation_key(user_id) -> str:
+    return f"{USER_GENERATION_PREFIX}{user_id}"
+
+
+def bump_user_generation(user_id) -> None:
+    """Invalidate every cached decision of a user across all organizations."""
+
+    if not user_id:
+        return
+    try:
+        cache.set(_user_generation_key(user_id), uuid.uuid4().hex, None)
+    except Exception as exc:
+        logger.error(f"Failed to bump ABAC decision generation for user {user_id}: {exc}")
+
+
+class _DecisionMemo:
+    """Per-request view of a user's decisions within one organization."""
+
+    __slots__ = ('organization_id', 'shared_key', 'decisions')
+
+    def __init__(self, organization_id: str, shared_key: Optional[str], decisions: dict):
+        self.organization_id = organization_id
+        self.shared_key = shared_key
+        self.decisions = decisions
+
+
+def _load_memo(user, organization_id: str) -> _DecisionMemo:
+    """Resolve stamps and shared decisions in at most two cache round trips."""
+
+    version_key = policy_version_key(organization_id)
+    generation_key = _user_generation_key(user.pk)
+    try:
+        stamps = cache.get_many([version_key, generation_key])
+        policy_version = stamps.get(version_key) or get_policy_version(organization_id)
+        generation = stamps.get(generation_key, '0')
+        shared_key = (
+            f"{DECISIONS_PREFIX}{organization_id}:{user.pk}:{policy_version}:{generation}"
+        )
+        decisions = cache.get(shared_key) or {}
+    except Exception as exc:
+        logger.warning(f"ABAC decision cache unavailable: {exc}")
+        shared_key, decisions = None, {}
+    return _DecisionMemo(organization_id, shared_key, dict(decisions))
+
+
+def cached_decision(user, organization_id, permission_code: str, module: Optional[str],
+                    compute: Callable[[], bool]) -> bool:
+    """
+    Return a memoized decision, computing and publishing it on a miss.
+
+    Without an organization there is nothing to key on, so the decision is
+    computed directly.
+    """
+
+    if not organization_id:
+        return compute()
+
+    organization_id = str(organization_id)
+    memo = user.__dict__.get(_MEMO_ATTR)
+    if memo is None or memo.organization_id != organization_id:
+        memo = _load_memo(user, organization_id)
+        user.__dict__[_MEMO_ATTR] = memo
+
+    key = f"{module or ''}:{permission_code}"
+    decision = memo.decisions.get(key)
+    if decision is not None:
+        return decision
+
+    decision = bool(compute())
+    memo.decisions[key] = decision
+    if memo.shared_key:
+        try:
+            cache.set(memo.shared_key, memo.decisions, DECISION_CACHE_TTL)
+        except Exception as exc:
+            logger.warning(f"Failed to publish ABAC decision: {exc}")
+    return decision
+
+
+def reset_request_memo(user) -> None:
+    """Forget request-tier decisions (e.g. after changing the user's roles in-request)."""
+
+    if user is not None:
+        user.__dict__.pop(_MEMO_ATTR, None)
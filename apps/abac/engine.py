@@ -8,13 +8,15 @@ SECURITY GUARANTEES:
 """
 
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 
 from apps.core.context import get_current_organization
-from .models import GroupPolicy, Policy, PolicyLog, RoleAssignment, UserPolicy
+from .log_buffer import policy_log_buffer
+from .models import Policy
+from .snapshot import CompiledPolicy, get_snapshot
 
 
 @dataclass(frozen=True)
@@ -39,6 +41,7 @@ class PolicyEngine:
     def __init__(self, user, log_decisions=True):
         self.user = user
         self.log_decisions = log_decisions
+        self._subject_attrs: Optional[Dict[str, Any]] = None
 
         # 🔒 CRITICAL: Organization context is mandatory
         self.organization = get_current_organization()
@@ -112,7 +115,9 @@ class PolicyEngine:
                 self._log_decision(decision)
             return decision
 
-        policies = self._get_applicable_policies(resource_type, action, resource_id)
+        policies = self._get_applicable_policies(
+            resource_type, action, resource_id, subject_attrs=subject_attrs
+        )
 
         allowed, reason, evaluated_policies = self._evaluate_policies(
             policies,
@@ -139,11 +144,91 @@ class PolicyEngine:
 
         return decision
 
+    def evaluate_many(
+        self,
+        resource_type: str,
+        action: str,
+        resource_attrs_list: Sequence[Optional[Dict[str, Any]]],
+        resource_ids: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[PolicyDecision]:
+        """
+        Evaluate one action against many resources.
+
+        Subject attributes, environment attributes and applicable policies
+        are resolved once; policies whose rules never read resource
+        attributes are evaluated once and reused for every item. Returns
+        one decision per item, in input order.
+        """
+
+        if resource_ids is None:
+            resource_ids = [None] * len(resource_attrs_list)
+        elif len(resource_ids) != len(resource_attrs_list):
+            raise ValueError("resource_ids must align with resource_attrs_list")
+
+        subject_attrs = self._get_subject_attributes()
+        environment_attrs = self._get_environment_attributes()
+
+        if self.user.is_superuser:
+            bypass_reason = 'Superuser bypass'
+        elif subject_attrs.get('is_org_admin'):
+            bypass_reason = 'Org admin bypass'
+        else:
+            bypass_reason = None
+
+        # Resolved without a resource id so that id-targeted policies are
+        # kept here and narrowed per item below.
+        policies = [] if bypass_reason else self._get_applicable_policies(
+            resource_type, action, None, subject_attrs=subject_attrs
+        )
+        id_bound = any(policy.resource_id for policy in policies)
+        shared_results: Dict[str, bool] = {}
+
+        decisions = []
+        for resource_attrs, resource_id in zip(resource_attrs_list, resource_ids):
+            resource_attrs = resource_attrs or {}
+            if bypass_reason:
+                allowed, reason, evaluated_policies = True, bypass_reason, []
+            else:
+                item_policies = policies
+                if id_bound and resource_id:
+                    item_policies = [
+                        policy for policy in policies
+                        if not policy.resource_id or policy.resource_id == resource_id
+                    ]
+                allowed, reason, evaluated_policies = self._evaluate_policies(
+                    item_policies,
+                    subject_attrs,
+                    resource_attrs,
+                    action,
+                    environment_attrs,
+                    shared_results=shared_results,
+                )
+
+            decision = PolicyDecision(
+                allowed=allowed,
+                reason=reason,
+                evaluated_policies=evaluated_policies,
+                subject_attributes=subject_attrs,
+                resource_attributes=resource_attrs,
+                environment_attributes=environment_attrs,
+                resource_type=resource_type,
+                resource_id=resource_id,
+                action=action,
+            )
+            if self.log_decisions:
+                self._log_decision(decision)
+            decisions.append(decision)
+
+        return decisions
+
     # --------------------------------------------------
     # ATTRIBUTE EXTRACTION
     # --------------------------------------------------
     def _get_subject_attributes(self) -> Dict[str, Any]:
-        """Extract subject (user) attributes"""
+        """Extract subject (user) attributes (memoized per engine)"""
+
+        if self._subject_attrs is not None:
+            return self._subject_attrs
 
         attrs = {
             'user_id': str(self.user.id),
@@ -173,6 +258,7 @@ class PolicyEngine:
                 'manager_id': str(emp.reporting_manager.id) if emp.reporting_manager else None,
             })
 
+        self._subject_attrs = attrs
         return attrs
 
     def _get_environment_attributes(self) -> Dict[str, Any]:
@@ -196,143 +282,47 @@ class PolicyEngine:
         self,
         resource_type: str,
         action: str,
-        resource_id: Optional[str] = None
-    ) -> List[Policy]:
+        resource_id: Optional[str] = None,
+        subject_attrs: Optional[Dict[str, Any]] = None,
+    ) -> List[CompiledPolicy]:
         """
-        Fetch policies applicable to this request.
+        Fetch policies applicable to this request from the organization's
+        compiled snapshot (no queries once the snapshot is warm).
         """
 
-        # 🔒 USER POLICIES (TENANT SCOPED)
-        if not self.organization:
-            return []
-
-        tenant_policy_ids = set(
-            Policy.objects.filter(
-                organization=self.organization,
-                is_active=True,
-            ).values_list('id', flat=True)
-        )
-
-        user_policies = UserPolicy.objects.filter(
-            user=self.user,
-            organization=self.organization,
-            is_active=True,
-        ).select_related('policy')
-
-        active_user_policies = [
-            up.policy
-            for up in user_policies
-            if up.is_valid_now()
-            and up.policy.is_active
-            and up.policy.is_valid_now()
-        ]
-
-        # 🔒 GROUP POLICIES (TENANT SCOPED)
-        subject_attrs = self._get_subject_attributes()
-        group_policies = self._get_group_policies(subject_attrs)
-        role_policies = self._get_role_policies()
-
-        policy_map = {}
-        for policy in active_user_policies + group_policies + role_policies:
-            policy_map[str(policy.id)] = policy
-
-        all_policies = [
-            policy
-            for policy in policy_map.values()
-            if not tenant_policy_ids or str(policy.id) in tenant_policy_ids
-        ]
-
-        applicable = []
-        for policy in all_policies:
-            if policy.resource_type and policy.resource_type != resource_type:
-                continue
-
-            if policy.actions and action not in policy.actions:
-                continue
-
-            if policy.resource_id and resource_id and policy.resource_id != resource_id:
-                continue
-
-            applicable.append(policy)
-
-        applicable.sort(key=lambda p: p.priority, reverse=True)
-        return applicable
-
-    def _get_group_policies(self, subject_attrs: Dict[str, Any]) -> List[Policy]:
-        """Resolve group-based policies (tenant scoped)"""
-
+        # 🔒 POLICIES ARE ALWAYS TENANT SCOPED
         if not self.organization:
             return []
 
-        group_policies = []
-
-        active_groups = GroupPolicy.objects.filter(
-            organization=self.organization,
-            is_active=True
-        ).prefetch_related('policies')
+        if subject_attrs is None:
+            subject_attrs = self._get_subject_attributes()
 
-        for group in active_groups:
-            if group.group_type == 'department':
-                if subject_attrs.get('department') == group.group_value:
-                    group_policies.extend(group.policies.filter(is_active=True))
-            elif group.group_type == 'location':
-                if subject_attrs.get('location') == group.group_value:
-                    group_policies.extend(group.policies.filter(is_active=True))
-            elif group.group_type == 'job_level':
-                if subject_attrs.get('job_level') == group.group_value:
-                    group_policies.extend(group.policies.filter(is_active=True))
-            elif group.group_type == 'employment_type':
-                if subject_attrs.get('employment_type') == group.group_value:
-                    group_policies.extend(group.policies.filter(is_active=True))
-
-        return list(group_policies)
-
-    def _get_role_policies(self) -> List[Policy]:
-        """Resolve policies attached to active role assignments."""
-
-        if not self.organization:
-            return []
-
-        policies: List[Policy] = []
-        assignments = (
-            RoleAssignment.objects.filter(
-                organization=self.organization,
-                user=self.user,
-                is_active=True,
-            )
-            .select_related('role')
-            .prefetch_related('role__policies')
+        snapshot = get_snapshot(self.organization)
+        return snapshot.applicable_policies(
+            user_id=str(self.user.id),
+            subject_attrs=subject_attrs,
+            resource_type=resource_type,
+            action=action,
+            resource_id=resource_id,
         )
 
-        for assignment in assignments:
-            if not assignment.is_valid_now():
-                continue
-            role = assignment.role
-            if not role or not role.is_active:
-                continue
-            active_policies = role.policies.filter(
-                is_active=True,
-                organization=self.organization,
-            )
-            for policy in active_policies:
-                if policy.is_valid_now():
-                    policies.append(policy)
-
-        return policies
-
     # --------------------------------------------------
     # POLICY EVALUATION
     # --------------------------------------------------
     def _evaluate_policies(
         self,
-        policies: List[Policy],
+        policies: List[CompiledPolicy],
         subject_attrs: Dict,
         resource_attrs: Dict,
         action: str,
-        environment_attrs: Dict
+        environment_attrs: Dict,
+        shared_results: Optional[Dict[str, bool]] = None,
     ) -> tuple:
         """
         Evaluate policies and return decision.
+
+        ``shared_results`` caches outcomes of resource-independent policies
+        across the items of a batch evaluation.
         """
 
         if not policies:
@@ -345,12 +335,19 @@ class PolicyEngine:
         for policy in policies:
             evaluated_ids.append(str(policy.id))
 
-            if policy.evaluate(
-                subject_attrs,
-                resource_attrs,
-                action,
-                environment_attrs
-            ):
+            if shared_results is not None and not policy.uses_resource_attrs:
+                matched = shared_results.get(policy.id)
+                if matched is None:
+                    matched = policy.evaluate(
+                        subject_attrs, resource_attrs, action, environment_attrs
+                    )
+                    shared_results[policy.id] = matched
+            else:
+                matched = policy.evaluate(
+                    subject_attrs, resource_attrs, action, environment_attrs
+                )
+
+            if matched:
                 if policy.effect == Policy.DENY:
                     deny_policies.append(policy)
                 else:
@@ -376,7 +373,7 @@ class PolicyEngine:
     # AUDIT LOGGING
     # --------------------------------------------------
     def _log_decision(self, decision: PolicyDecision):
-        """Persist policy decision for auditing via Celery."""
+        """Queue policy decision for buffered, sampled bulk persistence."""
 
         if not self.organization or not self.user:
             return
@@ -397,22 +394,4 @@ class PolicyEngine:
             'decision_reason': decision.reason,
         }
 
-        try:
-            from .tasks import log_policy_evaluation
-
-            log_policy_evaluation.delay(payload)
-        except Exception:  # pragma: no cover - fallback to sync logging
-            PolicyLog.objects.create(
-                user=self.user,
-                organization=self.organization,
-                policy_id=policy_id,
-                resource_type=decision.resource_type,
-                resource_id=decision.resource_id or '',
-                action=decision.action,
-                result=decision.allowed,
-                subject_attributes=decision.subject_attributes,
-                resource_attributes=decision.resource_attributes,
-                environment_attributes=decision.environment_attributes,
-                policies_evaluated=decision.evaluated_policies,
-                decision_reason=decision.reason,
-            )
+        policy_log_buffer.record(payload)
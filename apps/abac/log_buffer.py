@@ -0,0 +1,242 @@
+"""
+ABAC Policy Log Buffer - Sampled, de-duplicated bulk writer for PolicyLog
+
+PolicyEngine records every decision here instead of enqueueing one Celery
+task per decision. The buffer:
+
+- is a bounded ring (oldest entries are dropped when it overflows),
+- always keeps DENY decisions and samples ALLOW decisions,
+- suppresses identical decisions seen within a dedup window,
+- flushes with a single bulk_create every N records or T milliseconds,
+  and at the end of each request / process.
+
+Flushes never run inside an open transaction: they are deferred with
+transaction.on_commit so a rolled-back request cannot take other
+requests' audit rows down with it. A rollback discards that callback, so
+any flush requested outside an atomic block (end of request, Celery task,
+shell) writes immediately instead of waiting on a callback that may never
+fire.
+"""
+
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import request_finished
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class PolicyLogBuffer:
+    """Process-wide buffer of pending PolicyLog rows."""
+
+    def __init__(
+        self,
+        capacity: int = 10000,
+        flush_size: int = 500,
+        flush_interval_ms: int = 2000,
+        dedup_window_seconds: float = 60.0,
+        allow_sample_rate: float = 1.0,
+    ):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.dedup_window = dedup_window_seconds
+        self.allow_sample_rate = allow_sample_rate
+
+        self._entries = deque(maxlen=capacity)
+        self._seen: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flush_scheduled = False
+        self._counters = {
+            'recorded': 0,
+            'sampled_out': 0,
+            'deduplicated': 0,
+            'dropped': 0,
+            'flushed': 0,
+            'flush_errors': 0,
+        }
+
+    # --------------------------------------------------
+    # RECORDING
+    # --------------------------------------------------
+    @staticmethod
+    def _dedup_key(payload: Dict[str, Any]) -> tuple:
+        return (
+            payload['user_id'],
+            payload['organization_id'],
+            payload['policy_id'],
+            payload['resource_type'],
+            payload['resource_id'],
+            payload['action'],
+            payload['result'],
+            payload['decision_reason'],
+        )
+
+    def record(self, payload: Dict[str, Any]) -> bool:
+        """Queue a decision payload. Returns False if it was sampled out or deduplicated."""
+
+        sampled_out = (
+            payload['result']
+            and self.allow_sample_rate < 1.0
+            and random.random() >= self.allow_sample_rate
+        )
+        now = time.monotonic()
+        key = self._dedup_key(payload)
+        with self._lock:
+            if sampled_out:
+                self._counters['sampled_out'] += 1
+                return False
+            last_seen = self._seen.get(key)
+            if last_seen is not None and now - last_seen < self.dedup_window:
+                self._counters['deduplicated'] += 1
+                return False
+            self._seen[key] = now
+
+            if len(self._entries) == self.capacity:
+                self._counters['dropped'] += 1
+            self._entries.append(payload)
+            self._counters['recorded'] += 1
+            due = self._is_due(now)
+
+        if due:
+            self.schedule_flush()
+        return True
+
+    def _is_due(self, now: float) -> bool:
+        return bool(self._entries) and (
+            len(self._entries) >= self.flush_size
+            or now - self._last_flush >= self.flush_interval
+        )
+
+    # --------------------------------------------------
+    # FLUSHING
+    # --------------------------------------------------
+    def schedule_flush(self) -> None:
+        """Flush now, or once the current transaction commits."""
+
+        if not connection.in_atomic_block:
+            # No transaction to wait for. This also recovers from a previous
+            # on_commit callback that was discarded by a rollback and left
+            # _flush_scheduled set.
+            self.flush()
+            return
+
+        with self._lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        try:
+            transaction.on_commit(self.flush)
+        except Exception:
+            with self._lock:
+                self._flush_scheduled = False
+            raise
+
+    def flush_if_due(self) -> None:
+        with self._lock:
+            due = self._is_due(time.monotonic())
+        if due:
+            self.schedule_flush()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries)
+            self._entries.clear()
+            now = time.monotonic()
+            self._last_flush = now
+            self._flush_scheduled = False
+            cutoff = now - self.dedup_window
+            self._seen = {key: ts for key, ts in self._seen.items() if ts >= cutoff}
+        return entries
+
+    def flush(self) -> int:
+        """Write all pending rows with bulk_create. Returns the number written."""
+
+        entries = self._drain()
+        if not entries:
+            return 0
+
+        from .models import PolicyLog
+
+        # Attribute dicts may carry dates/UUIDs; normalise the whole batch
+        # once so a single value cannot fail the bulk insert.
+        entries = json.loads(json.dumps(entries, cls=DjangoJSONEncoder))
+
+        rows = [
+            PolicyLog(
+                user_id=payload['user_id'],
+                organization_id=payload['organization_id'],
+                policy_id=payload['policy_id'],
+                resource_type=payload['resource_type'],
+                resource_id=payload['resource_id'],
+                action=payload['action'],
+                result=payload['result'],
+                subject_attributes=payload['subject_attributes'],
+                resource_attributes=payload['resource_attributes'],
+                environment_attributes=payload['environment_attributes'],
+                policies_evaluated=payload['policies_evaluated'],
+                decision_reason=payload['decision_reason'],
+            )
+            for payload in entries
+        ]
+
+        try:
+            PolicyLog.objects.bulk_create(rows, batch_size=self.flush_size)
+        except Exception as exc:
+            with self._lock:
+                self._counters['flush_errors'] += 1
+                self._counters['dropped'] += len(rows)
+            logger.error(f"Failed to flush {len(rows)} ABAC policy logs: {exc}")
+            return 0
+
+        with self._lock:
+            self._counters['flushed'] += len(rows)
+        return len(rows)
+
+    # --------------------------------------------------
+    # METRICS
+    # --------------------------------------------------
+    def stats(self) -> Dict[str, int]:
+        """Counters since process start plus current queue depth."""
+
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._entries)
+        return stats
+
+
+policy_log_buffer = PolicyLogBuffer(
+    capacity=getattr(settings, 'ABAC_POLICY_LOG_BUFFER_SIZE', 10000),
+    flush_size=getattr(settings, 'ABAC_POLICY_LOG_FLUSH_SIZE', 500),
+    flush_interval_ms=getattr(settings, 'ABAC_POLICY_LOG_FLUSH_INTERVAL_MS', 2000),
+    dedup_window_seconds=getattr(settings, 'ABAC_POLICY_LOG_DEDUP_WINDOW_SECONDS', 60),
+    allow_sample_rate=getattr(settings, 'ABAC_POLICY_LOG_ALLOW_SAMPLE_RATE', 1.0),
+)
+
+
+def _flush_on_request_finished(sender, **kwargs):
+    try:
+        policy_log_buffer.flush_if_due()
+    except Exception as exc:  # pragma: no cover - never break the response cycle
+        logger.error(f"ABAC policy log flush failed: {exc}")
+
+
+def _flush_on_exit():
+    try:
+        policy_log_buffer.flush()
+    except Exception:  # pragma: no cover - interpreter shutdown
+        pass
+
+
+request_finished.connect(_flush_on_request_finished, dispatch_uid='abac_policy_log_flush')
+atexit.register(_flush_on_exit)
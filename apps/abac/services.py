@@ -1,6 +1,6 @@
 """ABAC service orchestrating tenant-safe policy evaluation."""
 
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Sequence
 
 from django.core.exceptions import PermissionDenied
 
@@ -34,3 +34,26 @@ class ABACService:
             resource_attrs=resource_attributes,
             resource_id=resource_id,
         )
+
+    @staticmethod
+    def evaluate_access_many(
+        user,
+        resource_type: str,
+        action: str,
+        resource_attributes_list: Sequence[Optional[Dict[str, object]]],
+        resource_ids: Optional[Sequence[Optional[str]]] = None,
+        log_decision: bool = True,
+    ) -> List[PolicyDecision]:
+        """Batched evaluate_access: one decision per resource, setup paid once."""
+
+        organization = get_current_organization()
+        if not organization and not getattr(user, 'is_superuser', False):
+            raise PermissionDenied('Organization context required for ABAC evaluation.')
+
+        engine = PolicyEngine(user, log_decisions=log_decision)
+        return engine.evaluate_many(
+            resource_type=resource_type,
+            action=action,
+            resource_attrs_list=resource_attributes_list,
+            resource_ids=resource_ids,
+        )
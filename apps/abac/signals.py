@@ -6,7 +6,7 @@ When user roles or permissions change, all their active sessions and tokens
 are invalidated to force re-authentication with updated permissions.
 """
 
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.sessions.models import Session
@@ -204,7 +204,7 @@ def _invalidate_user_sessions(user, reason, branch_id=None):
             old_values={},
             new_values={'reason': reason},
             changed_fields=['session'],
-            ip_address='system',
+            ip_address=None,
             user_agent='ABAC Security Signal'
         )
         
@@ -318,3 +318,86 @@ def invalidate_on_role_permission_change(sender, instance, **kwargs):
                 
     except Exception as e:
         logger.error(f"Error invalidating sessions on role change: {e}")
+
+
+# ============================================================================
+# COMPILED POLICY SNAPSHOT INVALIDATION
+# ============================================================================
+
+@receiver(post_save, sender='abac.Policy')
+@receiver(post_delete, sender='abac.Policy')
+@receiver(post_save, sender='abac.PolicyRule')
+@receiver(post_delete, sender='abac.PolicyRule')
+@receiver(post_save, sender='abac.UserPolicy')
+@receiver(post_delete, sender='abac.UserPolicy')
+@receiver(post_save, sender='abac.GroupPolicy')
+@receiver(post_delete, sender='abac.GroupPolicy')
+@receiver(post_save, sender='abac.Role')
+@receiver(post_delete, sender='abac.Role')
+@receiver(post_save, sender='abac.RoleAssignment')
+@receiver(post_delete, sender='abac.RoleAssignment')
+@receiver(post_save, sender='abac.AttributeType')
+@receiver(post_delete, sender='abac.AttributeType')
+@receiver(post_save, sender='abac.Permission')
+@receiver(post_delete, sender='abac.Permission')
+@receiver(post_save, sender='abac.RolePermission')
+@receiver(post_delete, sender='abac.RolePermission')
+def invalidate_policy_snapshot(sender, instance, **kwargs):
+    """Bump the organization's compiled policy snapshot on any ABAC write."""
+    from apps.abac.snapshot import invalidate_snapshot
+    invalidate_snapshot(getattr(instance, 'organization_id', None))
+
+
+def _invalidate_snapshot_on_m2m(sender, instance, action, **kwargs):
+    """Group/role policy membership changes do not fire post_save."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from apps.abac.snapshot import invalidate_snapshot
+    invalidate_snapshot(getattr(instance, 'organization_id', None))
+
+
+def _connect_m2m_snapshot_invalidation():
+    from apps.abac.models import GroupPolicy, Role
+
+    m2m_changed.connect(
+        _invalidate_snapshot_on_m2m,
+        sender=GroupPolicy.policies.through,
+        dispatch_uid='abac_grouppolicy_policies_snapshot',
+    )
+    m2m_changed.connect(
+        _invalidate_snapshot_on_m2m,
+        sender=Role.policies.through,
+        dispatch_uid='abac_role_policies_snapshot',
+    )
+
+
+_connect_m2m_snapshot_invalidation()
+
+
+# ============================================================================
+# DECISION CACHE GENERATIONS
+# ============================================================================
+
+@receiver(post_save, sender='authentication.User')
+@receiver(post_save, sender='employees.Employee')
+@receiver(post_delete, sender='employees.Employee')
+def bump_decision_generation(sender, instance, **kwargs):
+    """
+    Subject attributes (admin flag, department, location, designation...)
+    feed policy evaluation, so cached decisions for this user are dropped.
+    """
+    from apps.abac.decision_cache import bump_user_generation
+    user_id = instance.pk if sender._meta.label == 'authentication.User' else instance.user_id
+    bump_user_generation(user_id)
+
+
+@receiver(post_save, sender='abac.UserRole')
+@receiver(post_delete, sender='abac.UserRole')
+def bump_decision_generation_on_user_role(sender, instance, **kwargs):
+    """
+    Legacy role grants change what the user may do. Role, RolePermission
+    and Permission writes (and the role/group policy m2m) bump the whole
+    organization through the policy version instead.
+    """
+    from apps.abac.decision_cache import bump_user_generation
+    bump_user_generation(instance.user_id)
@@ -0,0 +1,456 @@
+"""
+ABAC Policy Snapshot - Compiled, per-organization policy index
+
+A snapshot holds every active policy of one organization, indexed by
+(resource_type, action), with each PolicyRule precompiled into a plain
+Python predicate. User, group and role assignments are folded into the
+same snapshot so that resolving applicable policies for a warm
+organization costs zero database queries.
+
+Snapshots live in process memory and are stamped with a version stored in
+the shared cache (Redis in production). Any policy-related write bumps the
+version (see apps/abac/signals.py), which forces every worker to rebuild
+on its next check.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from operator import eq, ge, gt, le, lt, ne
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = 'abac:policy_version:'
+WILDCARD = ''
+
+# Seconds a worker trusts its local snapshot before re-reading the shared
+# version stamp. Same-process invalidations are always immediate.
+VERSION_CHECK_INTERVAL = getattr(settings, 'ABAC_SNAPSHOT_VERSION_CHECK_INTERVAL', 1.0)
+
+Predicate = Callable[[Dict[str, Any], Dict[str, Any], Dict[str, Any]], bool]
+
+_MISSING = object()
+
+
+# --------------------------------------------------
+# RULE COMPILATION
+# --------------------------------------------------
+def _compile_operator(operator: str, value: Any) -> Callable[[Any], bool]:
+    """Return a single-argument comparison for a PolicyRule operator."""
+
+    from .models import PolicyRule
+
+    if operator == PolicyRule.EQUALS:
+        return lambda attr: eq(attr, value)
+    if operator == PolicyRule.NOT_EQUALS:
+        return lambda attr: ne(attr, value)
+    if operator == PolicyRule.GREATER_THAN:
+        return lambda attr: gt(attr, value)
+    if operator == PolicyRule.GREATER_THAN_EQUAL:
+        return lambda attr: ge(attr, value)
+    if operator == PolicyRule.LESS_THAN:
+        return lambda attr: lt(attr, value)
+    if operator == PolicyRule.LESS_THAN_EQUAL:
+        return lambda attr: le(attr, value)
+    if operator == PolicyRule.IN:
+        return lambda attr: attr in value
+    if operator == PolicyRule.NOT_IN:
+        return lambda attr: attr not in value
+    if operator == PolicyRule.CONTAINS:
+        return lambda attr: value in str(attr)
+    if operator == PolicyRule.NOT_CONTAINS:
+        return lambda attr: value not in str(attr)
+    if operator == PolicyRule.STARTS_WITH:
+        prefix = str(value)
+        return lambda attr: str(attr).startswith(prefix)
+    if operator == PolicyRule.ENDS_WITH:
+        suffix = str(value)
+        return lambda attr: str(attr).endswith(suffix)
+    if operator == PolicyRule.REGEX:
+        try:
+            pattern = re.compile(value)
+        except (re.error, TypeError):
+            logger.warning("Invalid ABAC regex %r treated as non-matching", value)
+            return lambda attr: False
+        return lambda attr: bool(pattern.match(str(attr)))
+    return lambda attr: False
+
+
+def compile_rule(category: str, attribute_path: str, operator: str, value: Any,
+                 negate: bool = False) -> Predicate:
+    """
+    Compile a PolicyRule definition into a predicate.
+
+    The predicate takes (subject_attrs, resource_attrs, environment_attrs)
+    and mirrors PolicyRule.evaluate() exactly, without touching the ORM.
+    """
+
+    from .models import AttributeType
+
+    source_index = {
+        AttributeType.SUBJECT: 0,
+        AttributeType.RESOURCE: 1,
+        AttributeType.ENVIRONMENT: 2,
+    }.get(category)
+    if source_index is None:
+        return lambda subject, resource, environment: False
+
+    path = tuple(attribute_path.split('.'))
+    compare = _compile_operator(operator, value)
+
+    def predicate(subject, resource, environment):
+        attr_value = (subject, resource, environment)[source_index]
+        for part in path:
+            if isinstance(attr_value, dict):
+                attr_value = attr_value.get(part)
+            else:
+                attr_value = getattr(attr_value, part, _MISSING)
+                if attr_value is _MISSING:
+                    return False
+
+        if callable(attr_value):
+            attr_value = attr_value()
+
+        try:
+            result = bool(compare(attr_value))
+        except (TypeError, ValueError, AttributeError):
+            result = False
+
+        return not result if negate else result
+
+    return predicate
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """Immutable, ORM-free view of a Policy and its active rules."""
+
+    id: str
+    name: str
+    code: str
+    effect: str
+    priority: int
+    resource_type: str
+    resource_id: str
+    actions: FrozenSet[str]
+    combine_logic: str
+    valid_from: Any = None
+    valid_until: Any = None
+    predicates: Tuple[Predicate, ...] = ()
+    # False when no rule reads resource attributes, so one evaluation
+    # holds for every resource in a batch.
+    uses_resource_attrs: bool = False
+
+    def is_valid_now(self, now=None) -> bool:
+        now = now or timezone.now()
+        if self.valid_from and now < self.valid_from:
+            return False
+        if self.valid_until and now > self.valid_until:
+            return False
+        return True
+
+    def evaluate(self, subject_attrs, resource_attrs, action, environment_attrs) -> bool:
+        """Same contract as Policy.evaluate()."""
+
+        from .models import Policy
+
+        if not self.is_valid_now():
+            return False
+
+        if self.actions and action not in self.actions:
+            return False
+
+        if not self.predicates:
+            return self.effect == Policy.ALLOW
+
+        results = (
+            predicate(subject_attrs, resource_attrs, environment_attrs)
+            for predicate in self.predicates
+        )
+        if self.combine_logic == Policy.COMBINE_AND:
+            matches = all(results)
+        else:
+            matches = any(results)
+
+        return matches and self.effect == Policy.ALLOW
+
+
+@dataclass
+class PolicySnapshot:
+    """All compiled policies and assignments of one organization."""
+
+    organization_id: str
+    version: str
+    policies: Dict[str, CompiledPolicy] = field(default_factory=dict)
+    # (resource_type | '', action | '') -> policy ids
+    target_index: Dict[Tuple[str, str], FrozenSet[str]] = field(default_factory=dict)
+    # user_id -> [(policy_id, valid_from, valid_until)]
+    user_policies: Dict[str, List[Tuple[str, Any, Any]]] = field(default_factory=dict)
+    # (group_type, group_value) -> policy ids
+    group_policies: Dict[Tuple[str, str], FrozenSet[str]] = field(default_factory=dict)
+    # user_id -> [(role_id, valid_from, valid_until)]
+    role_assignments: Dict[str, List[Tuple[str, Any, Any]]] = field(default_factory=dict)
+    # role_id -> policy ids
+    role_policies: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    checked_at: float = 0.0
+
+    GROUP_ATTRIBUTES = ('department', 'location', 'job_level', 'employment_type')
+
+    def _candidates(self, resource_type: str, action: str) -> set:
+        index = self.target_index
+        candidates = set()
+        for key in (
+            (resource_type, action),
+            (resource_type, WILDCARD),
+            (WILDCARD, action),
+            (WILDCARD, WILDCARD),
+        ):
+            candidates.update(index.get(key, ()))
+        return candidates
+
+    def assigned_policy_ids(self, user_id: str, subject_attrs: Dict[str, Any]) -> set:
+        """Resolve policy ids reachable by the user via direct, group and role assignments."""
+
+        now = timezone.now()
+        policies = self.policies
+        assigned = set()
+
+        for policy_id, valid_from, valid_until in self.user_policies.get(user_id, ()):
+            if _window_open(now, valid_from, valid_until) and policies[policy_id].is_valid_now(now):
+                assigned.add(policy_id)
+
+        for group_type in self.GROUP_ATTRIBUTES:
+            value = subject_attrs.get(group_type)
+            if value is None:
+                continue
+            assigned.update(self.group_policies.get((group_type, value), ()))
+
+        for role_id, valid_from, valid_until in self.role_assignments.get(user_id, ()):
+            if not _window_open(now, valid_from, valid_until):
+                continue
+            for policy_id in self.role_policies.get(role_id, ()):
+                if policies[policy_id].is_valid_now(now):
+                    assigned.add(policy_id)
+
+        return assigned
+
+    def applicable_policies(
+        self,
+        user_id: str,
+        subject_attrs: Dict[str, Any],
+        resource_type: str,
+        action: str,
+        resource_id: Optional[str] = None,
+    ) -> List[CompiledPolicy]:
+        """Policies assigned to the user that target this resource/action, highest priority first."""
+
+        policy_ids = self._candidates(resource_type, action)
+        if not policy_ids:
+            return []
+        policy_ids &= self.assigned_policy_ids(user_id, subject_attrs)
+
+        applicable = []
+        for policy_id in policy_ids:
+            policy = self.policies[policy_id]
+            if policy.resource_id and resource_id and policy.resource_id != resource_id:
+                continue
+            applicable.append(policy)
+
+        applicable.sort(key=lambda p: (-p.priority, p.name))
+        return applicable
+
+
+def _window_open(now, valid_from, valid_until) -> bool:
+    if valid_from and now < valid_from:
+        return False
+    if valid_until and now > valid_until:
+        return False
+    return True
+
+
+# --------------------------------------------------
+# SNAPSHOT BUILD
+# --------------------------------------------------
+def build_snapshot(organization_id, version: str) -> PolicySnapshot:
+    """Load and compile every active policy and assignment for an organization."""
+
+    from .models import (
+        AttributeType, GroupPolicy, Policy, PolicyRule, Role, RoleAssignment, UserPolicy,
+    )
+
+    org_id = str(organization_id)
+    snapshot = PolicySnapshot(organization_id=org_id, version=version)
+
+    rules_by_policy = defaultdict(list)
+    resource_bound = set()
+    rules = (
+        PolicyRule.objects.filter(
+            organization_id=organization_id,
+            is_active=True,
+            policy__is_active=True,
+        )
+        .order_by('policy_id', 'id')
+        .values_list(
+            'policy_id', 'attribute_type__category', 'attribute_path',
+            'operator', 'value', 'negate',
+        )
+    )
+    for policy_id, category, path, operator, value, negate in rules:
+        rules_by_policy[str(policy_id)].append(
+            compile_rule(category, path, operator, value, negate)
+        )
+        if category == AttributeType.RESOURCE:
+            resource_bound.add(str(policy_id))
+
+    index = defaultdict(set)
+    policies = Policy.objects.filter(
+        organization_id=organization_id,
+        is_active=True,
+    )
+    for policy in policies:
+        policy_id = str(policy.id)
+        actions = frozenset(policy.actions or ())
+        snapshot.policies[policy_id] = CompiledPolicy(
+            id=policy_id,
+            name=policy.name,
+            code=policy.code,
+            effect=policy.effect,
+            priority=policy.priority,
+            resource_type=policy.resource_type or WILDCARD,
+            resource_id=policy.resource_id or '',
+            actions=actions,
+            combine_logic=policy.combine_logic,
+            valid_from=policy.valid_from,
+            valid_until=policy.valid_until,
+            predicates=tuple(rules_by_policy.get(policy_id, ())),
+            uses_resource_attrs=policy_id in resource_bound,
+        )
+        for action in actions or (WILDCARD,):
+            index[(policy.resource_type or WILDCARD, action)].add(policy_id)
+    snapshot.target_index = {key: frozenset(ids) for key, ids in index.items()}
+
+    known = snapshot.policies
+
+    user_policies = defaultdict(list)
+    for user_id, policy_id, valid_from, valid_until in UserPolicy.objects.filter(
+        organization_id=organization_id,
+        is_active=True,
+    ).values_list('user_id', 'policy_id', 'valid_from', 'valid_until'):
+        if str(policy_id) in known:
+            user_policies[str(user_id)].append((str(policy_id), valid_from, valid_until))
+    snapshot.user_policies = dict(user_policies)
+
+    group_policies = defaultdict(set)
+    for group_type, group_value, policy_id in GroupPolicy.policies.through.objects.filter(
+        grouppolicy__organization_id=organization_id,
+        grouppolicy__is_active=True,
+        grouppolicy__is_deleted=False,
+    ).values_list('grouppolicy__group_type', 'grouppolicy__group_value', 'policy_id'):
+        if str(policy_id) in known:
+            group_policies[(group_type, group_value)].add(str(policy_id))
+    snapshot.group_policies = {key: frozenset(ids) for key, ids in group_policies.items()}
+
+    role_policies = defaultdict(set)
+    for role_id, policy_id in Role.policies.through.objects.filter(
+        role__organization_id=organization_id,
+        role__is_active=True,
+        role__is_deleted=False,
+    ).values_list('role_id', 'policy_id'):
+        if str(policy_id) in known:
+            role_policies[str(role_id)].add(str(policy_id))
+    snapshot.role_policies = {key: frozenset(ids) for key, ids in role_policies.items()}
+
+    role_assignments = defaultdict(list)
+    for user_id, role_id, valid_from, valid_until in RoleAssignment.objects.filter(
+        organization_id=organization_id,
+        is_active=True,
+    ).values_list('user_id', 'role_id', 'valid_from', 'valid_until'):
+        if str(role_id) in snapshot.role_policies:
+            role_assignments[str(user_id)].append((str(role_id), valid_from, valid_until))
+    snapshot.role_assignments = dict(role_assignments)
+
+    return snapshot
+
+
+# --------------------------------------------------
+# PROCESS-LOCAL STORE + SHARED VERSION STAMP
+# --------------------------------------------------
+_snapshots: Dict[str, PolicySnapshot] = {}
+_lock = threading.Lock()
+
+
+def policy_version_key(organization_id) -> str:
+    return f"{VERSION_KEY_PREFIX}{organization_id}"
+
+
+def get_policy_version(organization_id) -> str:
+    """Return the shared version stamp for an organization's policies."""
+
+    key = policy_version_key(organization_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def get_snapshot(organization) -> PolicySnapshot:
+    """Return a current compiled snapshot for the organization, rebuilding if stale."""
+
+    org_id = str(organization.id)
+    snapshot = _snapshots.get(org_id)
+    now = time.monotonic()
+    if snapshot is not None and now - snapshot.checked_at < VERSION_CHECK_INTERVAL:
+        return snapshot
+
+    version = get_policy_version(org_id)
+    if snapshot is not None and snapshot.version == version:
+        snapshot.checked_at = now
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(org_id)
+        if snapshot is None or snapshot.version != version:
+            snapshot = build_snapshot(org_id, version)
+            _snapshots[org_id] = snapshot
+        snapshot.checked_at = time.monotonic()
+    return snapshot
+
+
+def invalidate_snapshot(organization_id) -> None:
+    """
+    Drop the local snapshot immediately and bump the shared version once
+    the surrounding transaction commits, so other workers never rebuild
+    from uncommitted data under the new stamp.
+    """
+
+    if not organization_id:
+        return
+    org_id = str(organization_id)
+
+    def _bump():
+        _snapshots.pop(org_id, None)
+        try:
+            cache.set(policy_version_key(org_id), uuid.uuid4().hex, None)
+        except Exception as exc:
+            logger.error(f"Failed to bump ABAC policy version for org {org_id}: {exc}")
+
+    _snapshots.pop(org_id, None)
+    transaction.on_commit(_bump)
+
+
+def clear_snapshots() -> None:
+    """Drop every process-local snapshot (tests / management commands)."""
+
+    with _lock:
+        _snapshots.clear()
@@ -22,7 +22,7 @@ from .models import (
     Permission,
     RoleAssignment,
 )
-from .permissions import ABACPermission, IsPolicyOrgAdmin
+from .permissions import ABACObjectFilterMixin, ABACPermission, IsPolicyOrgAdmin
 from .serializers import (
     AttributeTypeSerializer,
     PolicySerializer,
@@ -61,8 +61,17 @@ class TenantScopedViewMixin:
             queryset = queryset.filter(organization=org)
         return queryset
 
+    def get_queryset(self):
+        # The class-level queryset is a .none() placeholder, so start from the
+        # model's manager. FAIL-CLOSED like OrganizationViewSetMixin.
+        manager = self.queryset.model._default_manager
+        org = getattr(self.request, 'organization', None) or get_current_organization()
+        if not org:
+            return manager.none()
+        return manager.filter(organization_id=org.id)
+
 
-class AttributeTypeViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class AttributeTypeViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing attribute types"""
 
     queryset = AttributeType.objects.none()
@@ -81,7 +90,7 @@ class AttributeTypeViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, view
     search_fields = ['name', 'code', 'description']
 
 
-class PolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class PolicyViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing policies"""
     
     queryset = Policy.objects.none()
@@ -171,7 +180,7 @@ class PolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.Mo
         })
 
 
-class PolicyRuleViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class PolicyRuleViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing policy rules"""
     
     queryset = PolicyRule.objects.none()
@@ -193,7 +202,7 @@ class PolicyRuleViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewset
     search_fields = ['attribute_path']
 
 
-class UserPolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class UserPolicyViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing user policy assignments"""
     
     queryset = UserPolicy.objects.none()
@@ -246,7 +255,7 @@ class UserPolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewset
         }, status=status.HTTP_201_CREATED)
 
 
-class GroupPolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class GroupPolicyViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing group policy assignments"""
     
     queryset = GroupPolicy.objects.none()
@@ -264,16 +273,16 @@ class GroupPolicyViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewse
         serializer.save(organization=self._get_organization())
 
 
-class PolicyLogViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ReadOnlyModelViewSet):
+class PolicyLogViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing policy evaluation logs (read-only)"""
     
     queryset = PolicyLog.objects.none()
     serializer_class = PolicyLogSerializer
-    permission_classes = [IsAuthenticated, ABACPermission]
+    permission_classes = [IsAuthenticated, IsPolicyOrgAdmin, ABACPermission]
     abac_resource_type = 'abac_policy_log'
     
     def get_queryset(self):
-        return super().get_queryset()
+        return super().get_queryset().select_related('user', 'policy')
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = PolicyLogFilter
     search_fields = ['user__email', 'resource_type', 'resource_id']
@@ -305,7 +314,7 @@ class PolicyLogViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets
         return Response(serializer.data)
 
 
-class RoleViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class RoleViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing roles"""
     
     queryset = Role.objects.none()
@@ -324,7 +333,7 @@ class RoleViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.Mode
         serializer.save(organization=self._get_organization())
 
 
-class PermissionViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class PermissionViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing permissions"""
     
     queryset = Permission.objects.none()
@@ -343,12 +352,12 @@ class PermissionViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewset
         serializer.save(organization=self._get_organization())
 
 
-class RoleAssignmentViewSet(TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
+class RoleAssignmentViewSet(ABACObjectFilterMixin, TenantScopedViewMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """ViewSet for managing user role assignments"""
     
     queryset = RoleAssignment.objects.none()
     serializer_class = RoleAssignmentSerializer
-    permission_classes = [IsAuthenticated, ABACPermission]
+    permission_classes = [IsAuthenticated, IsPolicyOrgAdmin, ABACPermission]
     abac_resource_type = 'abac_role_assignment'
     
     def get_queryset(self):
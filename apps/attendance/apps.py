@@ -6,3 +6,7 @@ class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.attendance'
     verbose_name = 'Attendance Management'
+
+    def ready(self):
+        # Import signal handlers
+        from . import signals  # pylint: disable=unused-import
@@ -0,0 +1,485 @@
+"""
+Face index - 1:N search and 1:1 verification over FaceEmbedding rows
+
+``FaceEmbedding.embedding`` holds a vector as little-endian float32 bytes
+(``encode`` / ``decode``). Per organization and embedding model, a
+``FaceIndex`` keeps every active embedding as one contiguous matrix:
+
+- rows are unit-normalized when FACE_INDEX_NORMALIZE is set (cosine
+  similarity becomes a dot product), and stored as FACE_INDEX_DTYPE:
+  float32, float16 (half the memory, slower to score: NumPy widens it
+  without SIMD) or int8 (a quarter, with one float32 scale per row)
+- ``search`` scores a probe against all rows in blocks and returns the
+  top-k by cosine similarity; ``verify`` scores it against one employee's
+  rows only
+
+Storage: each index is written under FACE_INDEX_DIR/<organization>/<model>/
+as .npy files of one generation plus a manifest, and memory-mapped
+read-only, so worker processes share the pages and restarts skip the
+database scan. A new generation is written to fresh files and the manifest
+swapped atomically. The previous generation is kept for readers that
+loaded the old manifest; older ones are removed once they are
+STALE_GENERATION_AGE seconds old, so a concurrent writer's fresh files
+are never touched.
+
+Freshness: FaceEmbedding writes bump a version in the shared cache, as for
+the geo-fence index. A stale index is brought up to date incrementally:
+only rows with ``updated_at`` since the index's sync point (minus
+FACE_INDEX_SYNC_MARGIN seconds, for transactions committing late) are
+read, upserted or removed, and a new generation is written only when
+something changed. Hard deletes, moves between models and soft deletes
+(which do not touch ``updated_at``) publish a new rebuild token in the
+shared cache; every host whose manifest was built under another token
+rebuilds from scratch, so a revoked embedding stops matching everywhere.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = 'face-index:version:'
+REBUILD_KEY_PREFIX = 'face-index:rebuild:'
+MANIFEST = 'manifest.json'
+FORMAT = 1
+
+LOCAL_TTL = getattr(settings, 'FACE_INDEX_LOCAL_TTL', 30.0)
+LOCAL_SIZE = getattr(settings, 'FACE_INDEX_SIZE', 64)
+
+# Rows scored per matrix product; small blocks keep the float32 copy of
+# quantized rows in cache
+SEARCH_BLOCK = 2048
+# Generations older than the previous one are removed after this many
+# seconds; younger files may belong to a write still in progress
+STALE_GENERATION_AGE = 300.0
+DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+ARRAYS = ('vectors', 'norms', 'scales', 'ids', 'employee_ids', 'updated')
+
+Key = Tuple[str, str]
+
+
+def _directory() -> str:
+    return str(getattr(settings, 'FACE_INDEX_DIR', os.path.join(settings.BASE_DIR, 'var', 'face_index')))
+
+
+def _dtype() -> str:
+    dtype = getattr(settings, 'FACE_INDEX_DTYPE', 'float32')
+    if dtype not in DTYPES:
+        raise ValueError(f"FACE_INDEX_DTYPE must be one of {', '.join(DTYPES)}")
+    return dtype
+
+
+def _normalize() -> bool:
+    return getattr(settings, 'FACE_INDEX_NORMALIZE', True)
+
+
+def _sync_margin() -> float:
+    return getattr(settings, 'FACE_INDEX_SYNC_MARGIN', 300.0)
+
+
+def match_threshold() -> float:
+    return getattr(settings, 'FACE_MATCH_THRESHOLD', 0.6)
+
+
+# --------------------------------------------------
+# VECTORS
+# --------------------------------------------------
+def encode(vector) -> bytes:
+    return np.ascontiguousarray(vector, dtype='<f4').tobytes()
+
+
+def decode(blob) -> np.ndarray:
+    return np.frombuffer(bytes(blob), dtype='<f4').astype(np.float32)
+
+
+def _quantize(vectors: np.ndarray, dtype: str, normalize: bool):
+    """(stored rows, norms, int8 scales or empty) for float32 ``vectors``."""
+
+    norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+    if normalize:
+        vectors = vectors / np.where(norms > 0, norms, 1)[:, None]
+        norms = (norms > 0).astype(np.float32)
+    if dtype == 'int8':
+        scales = (np.abs(vectors).max(axis=1, initial=0) / 127).astype(np.float32)
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), norms, scales
+    return vectors.astype(DTYPES[dtype]), norms, np.empty(0, dtype=np.float32)
+
+
+@dataclass
+class FaceMatch:
+    embedding_id: str
+    employee_id: str
+    score: float
+
+
+@dataclass
+class FaceVerification:
+    verified: bool
+    score: float
+    embedding_id: Optional[str]
+
+
+@dataclass
+class FaceIndex:
+    dtype: str
+    normalized: bool
+    vectors: np.ndarray
+    norms: np.ndarray
+    scales: np.ndarray
+    ids: np.ndarray
+    employee_ids: np.ndarray
+    updated: np.ndarray
+    synced_at: Optional[float] = None
+    rebuild: Optional[str] = None
+    _rows_by_employee: Optional[Dict[str, np.ndarray]] = field(default=None, repr=False)
+
+    @classmethod
+    def build(cls, rows: List[tuple], dtype: str, normalize: bool, synced_at=None) -> 'FaceIndex':
+        """``rows``: (embedding id, employee id, float32 vector, updated_at epoch)."""
+
+        dim = len(rows[0][2]) if rows else 0
+        vectors = np.vstack([row[2] for row in rows]) if rows else np.empty((0, dim), dtype=np.float32)
+        stored, norms, scales = _quantize(vectors, dtype, normalize)
+        return cls(
+            dtype=dtype, normalized=normalize, vectors=stored, norms=norms, scales=scales,
+            ids=np.array([str(row[0]) for row in rows], dtype='U36'),
+            employee_ids=np.array([str(row[1]) for row in rows], dtype='U36'),
+            updated=np.array([row[3] for row in rows], dtype=np.float64),
+            synced_at=synced_at,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    # --------------------------------------------------
+    # SCORING
+    # --------------------------------------------------
+    def _probe(self, query) -> Tuple[np.ndarray, float]:
+        query = np.asarray(query, dtype=np.float32).ravel()
+        if len(self) and len(query) != self.dim:
+            raise ValueError(f"Expected a {self.dim}-dimensional embedding, got {len(query)}")
+        return query, float(np.linalg.norm(query))
+
+    def _scores(self, query: np.ndarray, norm: float, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of ``query`` with all rows (or ``rows``)."""
+
+        count = len(self) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK):
+            block = slice(start, start + SEARCH_BLOCK)
+            selected = block if rows is None else rows[block]
+            vectors = self.vectors[selected]
+            scores[block] = vectors.astype(np.float32, copy=False) @ query
+            if self.scales.size:
+                scores[block] *= self.scales[selected]
+            scores[block] /= np.maximum(self.norms[selected] * norm, np.float32(1e-12))
+        return scores
+
+    def search(self, query, k: int = 5) -> List[FaceMatch]:
+        """The ``k`` rows most similar to ``query``, best first."""
+
+        query, norm = self._probe(query)
+        if not len(self) or k <= 0:
+            return []
+        scores = self._scores(query, norm)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [FaceMatch(str(self.ids[i]), str(self.employee_ids[i]), float(scores[i])) for i in top]
+
+    def verify(self, employee_id, query, threshold: Optional[float] = None) -> FaceVerification:
+        """1:1 check of ``query`` against the employee's own embeddings."""
+
+        query, norm = self._probe(query)
+        rows = self.rows_of(employee_id)
+        if not len(rows):
+            return FaceVerification(False, 0.0, None)
+        scores = self._scores(query, norm, rows)
+        best = int(np.argmax(scores))
+        threshold = match_threshold() if threshold is None else threshold
+        return FaceVerification(
+            bool(scores[best] >= threshold), float(scores[best]), str(self.ids[rows[best]]),
+        )
+
+    def rows_of(self, employee_id) -> np.ndarray:
+        if self._rows_by_employee is None:
+            order = np.argsort(self.employee_ids, kind='stable')
+            keys, starts = np.unique(self.employee_ids[order], return_index=True)
+            self._rows_by_employee = dict(zip(keys.tolist(), np.split(order, starts[1:])))
+        return self._rows_by_employee.get(str(employee_id), np.empty(0, dtype=np.int64))
+
+    # --------------------------------------------------
+    # INCREMENTAL UPDATE
+    # --------------------------------------------------
+    def apply(self, changes: List[tuple], synced_at) -> Optional['FaceIndex']:
+        """
+        A new index with ``changes`` applied - (id, employee id, vector or
+        None to remove, updated_at epoch) - or None when nothing changed.
+        """
+        positions = {embedding_id: i for i, embedding_id in enumerate(self.ids.tolist())}
+        drop, added = set(), []
+        for embedding_id, employee_id, vector, updated in changes:
+            position = positions.get(str(embedding_id))
+            if vector is None:
+                if position is not None:
+                    drop.add(position)
+            elif position is None or updated > self.updated[position]:
+                if position is not None:
+                    drop.add(position)
+                added.append((embedding_id, employee_id, vector, updated))
+        if not drop and not added:
+            return None
+
+        addition = FaceIndex.build(added, self.dtype, self.normalized)
+        if len(self) and len(addition) and addition.dim != self.dim:
+            raise ValueError(f"Embedding dimension changed from {self.dim} to {addition.dim}")
+        keep = np.ones(len(self), dtype=bool)
+        keep[list(drop)] = False
+        merged = {}
+        for name in ARRAYS:
+            current, extra = getattr(self, name), getattr(addition, name)
+            if name == 'vectors' and not len(self):
+                merged[name] = extra
+            elif name == 'scales' and not current.size and not extra.size:
+                merged[name] = current
+            else:
+                merged[name] = np.concatenate([current[keep], extra]) if len(extra) else current[keep]
+        return FaceIndex(
+            dtype=self.dtype, normalized=self.normalized, synced_at=synced_at, rebuild=self.rebuild, **merged
+        )
+
+
+# --------------------------------------------------
+# DATABASE
+# --------------------------------------------------
+def _changed_rows(organization_id, embedding_model, since: Optional[float] = None) -> List[tuple]:
+    """(id, employee id, vector or None, updated_at epoch) of rows changed since ``since``."""
+    from datetime import datetime, timezone as dt_timezone
+
+    from apps.attendance.models import FaceEmbedding
+
+    rows = FaceEmbedding.all_objects.filter(organization_id=organization_id, embedding_model=embedding_model)
+    if since is not None:
+        rows = rows.filter(updated_at__gte=datetime.fromtimestamp(since - _sync_margin(), tz=dt_timezone.utc))
+    changes = []
+    for embedding_id, employee_id, blob, is_active, is_deleted, updated_at in rows.values_list(
+        'id', 'employee_id', 'embedding', 'is_active', 'is_deleted', 'updated_at'
+    ).iterator():
+        vector = decode(blob) if is_active and not is_deleted and blob else None
+        changes.append((embedding_id, employee_id, vector, updated_at.timestamp()))
+    return changes
+
+
+def _build(organization_id, embedding_model, rebuild: Optional[str] = None) -> FaceIndex:
+    rows = [row for row in _changed_rows(organization_id, embedding_model) if row[2] is not None]
+    dims = {len(row[2]) for row in rows}
+    if len(dims) > 1:
+        # A model emits one dimension; keep the most common and report the rest
+        common = max(dims, key=lambda dim: sum(len(row[2]) == dim for row in rows))
+        logger.warning(f"Face embeddings of {embedding_model} in {organization_id} mix dimensions {sorted(dims)}")
+        rows = [row for row in rows if len(row[2]) == common]
+    index = FaceIndex.build(rows, _dtype(), _normalize(), max((row[3] for row in rows), default=None))
+    index.rebuild = rebuild
+    return index
+
+
+# --------------------------------------------------
+# FILES
+# --------------------------------------------------
+def _path(key: Key) -> str:
+    organization_id, embedding_model = key
+    return os.path.join(_directory(), str(organization_id), re.sub(r'[^\w.-]', '_', embedding_model))
+
+
+def _read(key: Key) -> Optional[FaceIndex]:
+    path = _path(key)
+    try:
+        with open(os.path.join(path, MANIFEST)) as handle:
+            manifest = json.load(handle)
+        if (manifest.get('format'), manifest.get('dtype'), manifest.get('normalized')) != (
+            FORMAT, _dtype(), _normalize()
+        ):
+            return None
+        arrays = {
+            name: np.load(os.path.join(path, f"{manifest['generation']}.{name}.npy"), mmap_mode='r')
+            for name in ARRAYS
+        }
+    except (OSError, ValueError, KeyError) as exc:
+        if not isinstance(exc, FileNotFoundError):
+            logger.warning(f"Face index files unreadable for {key}: {exc}")
+        return None
+    return FaceIndex(
+        dtype=manifest['dtype'], normalized=manifest['normalized'], synced_at=manifest['synced_at'],
+        rebuild=manifest.get('rebuild'), **arrays
+    )
+
+
+def _write(key: Key, index: FaceIndex) -> FaceIndex:
+    """Persist ``index`` as a new generation and return it memory-mapped."""
+
+    path = _path(key)
+    generation = uuid.uuid4().hex
+    previous = None
+    try:
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{generation}.{name}.npy"), np.ascontiguousarray(getattr(index, name)))
+        manifest = {
+            'format': FORMAT, 'generation': generation, 'dtype': index.dtype,
+            'normalized': index.normalized, 'synced_at': index.synced_at, 'count': len(index),
+            'rebuild': index.rebuild,
+        }
+        temporary = os.path.join(path, f"{generation}.{MANIFEST}")
+        with open(temporary, 'w') as handle:
+            json.dump(manifest, handle)
+        try:
+            with open(os.path.join(path, MANIFEST)) as handle:
+                previous = json.load(handle).get('generation')
+        except (OSError, ValueError):
+            pass
+        os.replace(temporary, os.path.join(path, MANIFEST))
+    except OSError as exc:
+        logger.warning(f"Face index write failed for {key}: {exc}")
+        return index
+
+    _remove_stale_generations(path, {generation, previous})
+    return _read(key) or index
+
+
+def _remove_stale_generations(path: str, keep: set) -> None:
+    cutoff = time.time() - STALE_GENERATION_AGE
+    for name in os.listdir(path):
+        if name == MANIFEST or name.split('.', 1)[0] in keep:
+            continue
+        filename = os.path.join(path, name)
+        try:
+            if os.path.getmtime(filename) < cutoff:
+                os.remove(filename)
+        except OSError:
+            pass
+
+
+def _sync(key: Key) -> FaceIndex:
+    # The files, not the process copy, are the base: another process may
+    # have written a newer generation or discarded them
+    rebuild = _shared_rebuild(key)
+    current = _read(key)
+    if current is None or current.rebuild != rebuild:
+        return _write(key, _build(*key, rebuild=rebuild))
+    changes = _changed_rows(*key, since=current.synced_at)
+    synced_at = max([row[3] for row in changes] + [current.synced_at or 0]) or None
+    updated = current.apply(changes, synced_at)
+    return current if updated is None else _write(key, updated)
+
+
+# --------------------------------------------------
+# PROCESS CACHE
+# --------------------------------------------------
+_entries: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_key(key: Key) -> str:
+    return f"{VERSION_KEY_PREFIX}{key[0]}:{key[1]}"
+
+
+def rebuild_key(key: Key) -> str:
+    return f"{REBUILD_KEY_PREFIX}{key[0]}:{key[1]}"
+
+
+def _shared_version(key: Key) -> Optional[str]:
+    try:
+        return cache.get(version_key(key))
+    except Exception as exc:
+        logger.warning(f"Face index version read failed for {key}: {exc}")
+        return None
+
+
+def _shared_rebuild(key: Key) -> Optional[str]:
+    try:
+        return cache.get(rebuild_key(key))
+    except Exception as exc:
+        logger.warning(f"Face index rebuild token read failed for {key}: {exc}")
+        return None
+
+
+def get_index(organization_id, embedding_model) -> FaceIndex:
+    """The organization's index for ``embedding_model``, synced when its version moved."""
+
+    key = (str(organization_id), embedding_model)
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+    if entry is not None:
+        version, checked_at, index = entry
+        if now - checked_at < LOCAL_TTL:
+            return index
+        if _shared_version(key) == version:
+            with _lock:
+                _entries[key] = (version, now, index)
+            return index
+
+    # Read the version first: a save landing during the sync bumps it again
+    version = _shared_version(key)
+    index = _sync(key)
+    with _lock:
+        _entries[key] = (version, now, index)
+        _entries.move_to_end(key)
+        while len(_entries) > LOCAL_SIZE:
+            _entries.popitem(last=False)
+    return index
+
+
+def search(organization_id, embedding_model, query, k: int = 5) -> List[FaceMatch]:
+    return get_index(organization_id, embedding_model).search(query, k)
+
+
+def verify(employee, embedding_model, query, threshold: Optional[float] = None) -> FaceVerification:
+    return get_index(employee.organization_id, embedding_model).verify(employee.id, query, threshold)
+
+
+def _bump(key: Key, discard: bool) -> None:
+    with _lock:
+        _entries.pop(key, None)
+    try:
+        if discard:
+            cache.set(rebuild_key(key), uuid.uuid4().hex, None)
+        cache.set(version_key(key), uuid.uuid4().hex, None)
+    except Exception as exc:
+        logger.warning(f"Face index version bump failed for {key}: {exc}")
+
+
+def invalidate(keys: Iterable[Key], discard: bool = False) -> None:
+    """
+    Mark the indexes stale now and again once the write commits;
+    ``discard`` makes every host rebuild them from scratch on next read.
+    """
+    keys = {(str(organization_id), model) for organization_id, model in keys if organization_id and model}
+    for key in keys:
+        _bump(key, discard)
+    transaction.on_commit(lambda: [_bump(key, discard) for key in keys])
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,215 @@
+"""
+Fraud engine - batch re-scoring of stored punches
+
+``evaluate_window`` re-scores the punches of an organization created in a
+time window in one pass instead of one ``FraudDetectionService`` call per
+punch:
+
+1. the window's punches and, per employee, the punches before them (one
+   query each) are loaded into NumPy columns, sorted by employee and time
+2. features are computed over the whole batch: device flags from their
+   columns, suspicious timing (one of the previous 3 punches less than
+   5 minutes away) and device mismatch (a device not among the devices
+   of the previous 10 punches) with shifted comparisons; the outcome of
+   checks that need the punch request (geo-fence, face, liveness) is read
+   back from the stored ``fraud_flags``
+3. score = feature matrix @ ``FraudDetectionService.WEIGHTS`` capped at
+   100, plus the surcharges of ``AttendanceService._score_punch``
+
+Scores only go up: a punch keeps its stored score when it is higher.
+Punches reaching the review threshold get a 'suspicious_pattern' FraudLog
+(``bulk_create(ignore_conflicts=True)`` against the one-log-per-punch-and-type
+constraint, so re-runs and concurrent workers are harmless) and their
+AttendanceRecords are flagged with a single UPDATE.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import AttendancePunch, AttendanceRecord, FraudLog
+from .services import FraudDetectionService
+
+# Same look-back as the punch path (punch_context.RECENT_DEVICES / RECENT_PUNCHES)
+DEVICE_HISTORY = 10
+TIMING_HISTORY = 3
+TIMING_SECONDS = 300
+
+# Flags decided at punch time from the request; read back from fraud_flags
+STORED_FLAGS = ('geo_mismatch', 'face_mismatch', 'liveness_failed', 'vpn_detected')
+# AttendanceService._score_punch surcharges, on top of the capped score
+SURCHARGES = {'geo_mismatch': Decimal('40'), 'low_face_confidence': Decimal('30')}
+
+FEATURES = (
+    'mock_gps', 'rooted_device', 'emulator', 'device_mismatch', 'suspicious_timing',
+) + STORED_FLAGS
+
+COLUMNS = (
+    'id', 'employee_id', 'attendance_id', 'punch_type', 'punch_time', 'device_id',
+    'is_mock_gps', 'is_rooted', 'is_emulator', 'fraud_score', 'fraud_flags', 'is_flagged',
+)
+
+
+def _window_hours() -> int:
+    return getattr(settings, 'ATTENDANCE_FRAUD_WINDOW_HOURS', 12)
+
+
+def _batch_size() -> int:
+    return getattr(settings, 'ATTENDANCE_FRAUD_BATCH_SIZE', 1000)
+
+
+@dataclass
+class PunchBatch:
+    """Columnar punches sorted by (employee, punch_time); ``in_window`` marks the ones to score."""
+
+    rows: List[tuple]
+    employee: np.ndarray
+    punch_time: np.ndarray
+    device: np.ndarray
+    has_device: np.ndarray
+    stored_score: np.ndarray
+    in_window: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple], window_ids) -> 'PunchBatch':
+        rows = sorted(rows, key=lambda row: (str(row[1]), row[4], str(row[0])))
+        _, employee = np.unique(np.array([str(row[1]) for row in rows], dtype=object), return_inverse=True)
+        devices = np.array([row[5] or '' for row in rows], dtype=object)
+        _, device = np.unique(devices, return_inverse=True)
+        return cls(
+            rows=rows,
+            employee=employee.astype(np.int64),
+            punch_time=np.array([row[4].timestamp() for row in rows], dtype=np.float64),
+            device=device.astype(np.int64),
+            has_device=devices != '',
+            stored_score=np.array([float(row[9] or 0) for row in rows], dtype=np.float64),
+            in_window=np.array([row[0] in window_ids for row in rows], dtype=bool),
+        )
+
+    def column(self, index: int) -> np.ndarray:
+        return np.array([bool(row[index]) for row in self.rows], dtype=bool)
+
+    def stored_flag(self, flag: str) -> np.ndarray:
+        return np.array([flag in (row[10] or ()) for row in self.rows], dtype=bool)
+
+
+def _shifted(values: np.ndarray, k: int, fill) -> np.ndarray:
+    """values[i - k], ``fill`` for the first k rows."""
+    out = np.full(values.shape, fill, dtype=values.dtype)
+    out[k:] = values[:-k]
+    return out
+
+
+def features(batch: PunchBatch) -> np.ndarray:
+    """Boolean feature matrix (punches x FEATURES)."""
+
+    n = len(batch.rows)
+    suspicious_timing = np.zeros(n, dtype=bool)
+    seen_device = np.zeros(n, dtype=bool)
+    device_history = np.zeros(n, dtype=bool)
+    for k in range(1, max(DEVICE_HISTORY, TIMING_HISTORY) + 1):
+        same_employee = _shifted(batch.employee, k, -1) == batch.employee
+        if k <= TIMING_HISTORY:
+            gap = np.abs(batch.punch_time - _shifted(batch.punch_time, k, np.inf))
+            suspicious_timing |= same_employee & (gap < TIMING_SECONDS)
+        if k <= DEVICE_HISTORY:
+            previous_has_device = same_employee & _shifted(batch.has_device, k, False)
+            device_history |= previous_has_device
+            seen_device |= previous_has_device & (_shifted(batch.device, k, -1) == batch.device)
+    device_mismatch = batch.has_device & device_history & ~seen_device
+
+    return np.column_stack([
+        batch.column(6), batch.column(7), batch.column(8), device_mismatch, suspicious_timing,
+    ] + [batch.stored_flag(flag) for flag in STORED_FLAGS])
+
+
+def scores(batch: PunchBatch, matrix: np.ndarray) -> np.ndarray:
+    weights = np.array([FraudDetectionService.WEIGHTS[name] for name in FEATURES], dtype=np.float64)
+    total = np.minimum(matrix.astype(np.float64) @ weights, 100.0)
+    for flag, surcharge in SURCHARGES.items():
+        total += batch.stored_flag(flag) * float(surcharge)
+    return np.maximum(total, batch.stored_score)
+
+
+# --------------------------------------------------
+# LOADING
+# --------------------------------------------------
+def load(organization, since, until=None) -> PunchBatch:
+    """Punches created in ``since``..``until`` plus the history they are judged against."""
+
+    until = until or timezone.now()
+    window = list(AttendancePunch.objects.filter(
+        organization=organization, created_at__gte=since, created_at__lte=until,
+    ).values_list(*COLUMNS))
+    if not window:
+        return PunchBatch.from_rows([], set())
+    window_ids = {row[0] for row in window}
+    employee_ids = {row[1] for row in window}
+    earliest = min(row[4] for row in window)
+
+    # Every other punch from the earliest scored one on, and the last
+    # DEVICE_HISTORY before it
+    history = list(AttendancePunch.objects.filter(
+        employee_id__in=employee_ids, punch_time__gte=earliest,
+    ).exclude(id__in=window_ids).values_list(*COLUMNS))
+    history += [row[:-1] for row in AttendancePunch.objects.filter(
+        employee_id__in=employee_ids, punch_time__lt=earliest,
+    ).annotate(
+        recency=Window(RowNumber(), partition_by=[F('employee_id')], order_by=F('punch_time').desc())
+    ).filter(recency__lte=DEVICE_HISTORY).values_list(*COLUMNS, 'recency')]
+    return PunchBatch.from_rows(window + history, window_ids)
+
+
+# --------------------------------------------------
+# EVALUATION
+# --------------------------------------------------
+def evaluate_window(organization, since=None, until=None) -> Dict:
+    """Re-score a window of punches; persist raised scores, fraud logs and flags."""
+
+    since = since or timezone.now() - timedelta(hours=_window_hours())
+    batch = load(organization, since, until)
+    if not len(batch.rows):
+        return {'evaluated': 0, 'rescored': 0, 'flagged': 0}
+
+    matrix = features(batch)
+    totals = scores(batch, matrix)
+    flagged_mask = np.asarray(FraudDetectionService.should_flag_for_review(totals), dtype=bool)
+
+    punches, logs, attendance_ids = [], [], set()
+    for index in np.flatnonzero(batch.in_window):
+        row = batch.rows[index]
+        score = Decimal(str(round(totals[index], 2)))
+        flags = list(row[10] or [])
+        flags += [name for name, hit in zip(FEATURES, matrix[index]) if hit and name not in flags]
+        # Flags raised by the punch path or by HR are never lowered
+        is_flagged = bool(row[11]) or bool(flagged_mask[index])
+        changed = totals[index] > batch.stored_score[index] or flags != list(row[10] or [])
+        if changed or is_flagged != bool(row[11]):
+            punches.append(AttendancePunch(
+                id=row[0], fraud_score=score, fraud_flags=flags, is_flagged=is_flagged,
+            ))
+        if flagged_mask[index]:
+            attendance_ids.add(row[2])
+            logs.append(FraudLog(
+                organization=organization, employee_id=row[1], punch_id=row[0],
+                fraud_type='suspicious_pattern', severity=FraudDetectionService.get_severity(score),
+                details={'fraud_score': float(score), 'punch_type': row[3], 'flags': flags},
+            ))
+
+    AttendancePunch.objects.bulk_update(punches, ['fraud_score', 'fraud_flags', 'is_flagged'], batch_size=_batch_size())
+    FraudLog.objects.bulk_create(logs, ignore_conflicts=True, batch_size=_batch_size())
+    AttendanceRecord.objects.filter(id__in=attendance_ids, is_flagged=False).update(
+        is_flagged=True, updated_at=timezone.now(),
+    )
+    return {
+        'evaluated': int(batch.in_window.sum()),
+        'rescored': len(punches),
+        'flagged': len(logs),
+    }
@@ -0,0 +1,268 @@
+"""
+Geo-fence index - punch location checks without a GeoFence query per punch
+
+Each process keeps, per location, a ``GeoFenceIndex``: the active fences of
+the location as NumPy columns (radians, cosines, radii). A check computes
+the haversine distance from every point to every candidate fence at once.
+
+Locations with many fences (field sites, franchise networks) also get a
+coarse lat/lon grid of GEOFENCE_GRID_DEGREES cells: each fence is listed
+in the cells its circle touches, and a point is only compared with the
+fences listed in the cells its accuracy box touches. The nearest fence of
+a point outside every fence is still computed against all fences.
+
+Freshness: saving or deleting a GeoFence bumps the location's version in
+the shared cache (immediately and again after commit) and drops the
+process copy. Other processes trust their copy for GEOFENCE_INDEX_LOCAL_TTL
+seconds, then compare its version with the shared one and rebuild on
+mismatch.
+"""
+
+import copy
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = 'geofence:version:'
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = EARTH_RADIUS_M * math.pi / 180
+
+LOCAL_TTL = getattr(settings, 'GEOFENCE_INDEX_LOCAL_TTL', 30.0)
+LOCAL_SIZE = getattr(settings, 'GEOFENCE_INDEX_SIZE', 1024)
+GRID_DEGREES = getattr(settings, 'GEOFENCE_GRID_DEGREES', 0.05)
+GRID_MIN_FENCES = getattr(settings, 'GEOFENCE_GRID_MIN_FENCES', 32)
+
+# Points compared with all fences per block when there is no grid
+MATRIX_BLOCK = 4096
+# Widens grid boxes so longitude scaling within a cell never drops a fence
+GRID_MARGIN = 1.1
+
+
+@dataclass
+class GeoFenceMatch:
+    """Result for one point; ``fence`` is the matched or nearest fence (index)."""
+
+    valid: bool
+    fence: Optional[int]
+    distance: float
+
+
+@dataclass
+class GeoFenceIndex:
+    fences: List = field(default_factory=list)
+    lat: np.ndarray = None
+    lon: np.ndarray = None
+    cos_lat: np.ndarray = None
+    radius: np.ndarray = None
+    grid: Optional[Dict[Tuple[int, int], np.ndarray]] = None
+
+    @classmethod
+    def build(cls, fences: Sequence) -> 'GeoFenceIndex':
+        lat = np.radians(np.array([float(f.latitude) for f in fences], dtype=np.float64))
+        lon = np.radians(np.array([float(f.longitude) for f in fences], dtype=np.float64))
+        index = cls(
+            fences=list(fences), lat=lat, lon=lon, cos_lat=np.cos(lat),
+            radius=np.array([f.radius_meters for f in fences], dtype=np.float64),
+        )
+        if len(fences) >= GRID_MIN_FENCES:
+            index.grid = index._build_grid()
+        return index
+
+    def __len__(self):
+        return len(self.fences)
+
+    # --------------------------------------------------
+    # GRID
+    # --------------------------------------------------
+    @staticmethod
+    def _cell_ranges(lat_deg: np.ndarray, lon_deg: np.ndarray, meters: np.ndarray):
+        """Cell index bounds of the boxes ``meters`` around each point."""
+
+        dlat = meters * GRID_MARGIN / METERS_PER_DEGREE
+        cos_lat = np.maximum(np.cos(np.radians(np.abs(lat_deg) + dlat)), 0.01)
+        dlon = dlat / cos_lat
+        return (
+            np.floor((lat_deg - dlat) / GRID_DEGREES).astype(np.int64),
+            np.floor((lat_deg + dlat) / GRID_DEGREES).astype(np.int64),
+            np.floor((lon_deg - dlon) / GRID_DEGREES).astype(np.int64),
+            np.floor((lon_deg + dlon) / GRID_DEGREES).astype(np.int64),
+        )
+
+    def _build_grid(self) -> Dict[Tuple[int, int], np.ndarray]:
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        ranges = self._cell_ranges(np.degrees(self.lat), np.degrees(self.lon), self.radius)
+        for i, (lat0, lat1, lon0, lon1) in enumerate(zip(*ranges)):
+            for cell_lat in range(lat0, lat1 + 1):
+                for cell_lon in range(lon0, lon1 + 1):
+                    cells.setdefault((cell_lat, cell_lon), []).append(i)
+        return {cell: np.array(members, dtype=np.int64) for cell, members in cells.items()}
+
+    def _candidates(self, lat_deg: float, lon_deg: float, accuracy: float) -> np.ndarray:
+        lat0, lat1, lon0, lon1 = (
+            int(bound[0]) for bound in self._cell_ranges(
+                np.array([lat_deg]), np.array([lon_deg]), np.array([accuracy])
+            )
+        )
+        found = [
+            self.grid[cell]
+            for cell in ((a, b) for a in range(lat0, lat1 + 1) for b in range(lon0, lon1 + 1))
+            if cell in self.grid
+        ]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    # --------------------------------------------------
+    # DISTANCES
+    # --------------------------------------------------
+    def distances(self, lat: np.ndarray, lon: np.ndarray, fences: Optional[np.ndarray] = None) -> np.ndarray:
+        """Haversine distances in meters, shape (points, fences)."""
+
+        f_lat, f_lon, f_cos = self.lat, self.lon, self.cos_lat
+        if fences is not None:
+            f_lat, f_lon, f_cos = f_lat[fences], f_lon[fences], f_cos[fences]
+        p_lat = np.radians(lat)[:, None]
+        p_lon = np.radians(lon)[:, None]
+        a = (
+            np.sin((f_lat - p_lat) / 2) ** 2
+            + np.cos(p_lat) * f_cos * np.sin((f_lon - p_lon) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    def match(self, lat, lon, accuracy=None) -> List[GeoFenceMatch]:
+        """
+        Check points against the fences. A point matches the first fence
+        (in GeoFence ordering) within ``radius + accuracy``; otherwise the
+        nearest fence is reported.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        accuracy = np.zeros_like(lat) if accuracy is None else np.nan_to_num(
+            np.asarray(accuracy, dtype=np.float64)
+        )
+        accuracy = np.maximum(accuracy, 0)
+        results: List[Optional[GeoFenceMatch]] = [None] * len(lat)
+
+        if self.grid is not None:
+            for i in range(len(lat)):
+                candidates = self._candidates(lat[i], lon[i], accuracy[i])
+                if len(candidates):
+                    distance = self.distances(lat[i:i + 1], lon[i:i + 1], candidates)[0]
+                    inside = distance <= self.radius[candidates] + accuracy[i]
+                    if inside.any():
+                        first = int(np.argmax(inside))
+                        results[i] = GeoFenceMatch(True, int(candidates[first]), float(distance[first]))
+            pending = np.array([i for i, result in enumerate(results) if result is None], dtype=np.int64)
+        else:
+            pending = np.arange(len(lat))
+
+        # Full comparison: first fence inside, else the nearest one
+        for start in range(0, len(pending), MATRIX_BLOCK):
+            block = pending[start:start + MATRIX_BLOCK]
+            distance = self.distances(lat[block], lon[block])
+            inside = distance <= self.radius[None, :] + accuracy[block, None]
+            first = np.argmax(inside, axis=1)
+            nearest = np.argmin(distance, axis=1)
+            for row, i in enumerate(block):
+                if inside[row, first[row]]:
+                    results[i] = GeoFenceMatch(True, int(first[row]), float(distance[row, first[row]]))
+                else:
+                    results[i] = GeoFenceMatch(False, int(nearest[row]), float(distance[row, nearest[row]]))
+        return results
+
+
+# --------------------------------------------------
+# PROCESS CACHE
+# --------------------------------------------------
+_entries: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+
+def version_key(location_id) -> str:
+    return f"{VERSION_KEY_PREFIX}{location_id}"
+
+
+def _shared_version(location_id) -> Optional[str]:
+    try:
+        return cache.get(version_key(location_id))
+    except Exception as exc:
+        logger.warning(f"Geo-fence version read failed for {location_id}: {exc}")
+        return None
+
+
+def _load(location_id) -> GeoFenceIndex:
+    from apps.attendance.models import GeoFence
+
+    return GeoFenceIndex.build(list(
+        GeoFence.objects.filter(location_id=location_id, is_active=True)
+    ))
+
+
+def get_index(location_id) -> GeoFenceIndex:
+    """The location's fence index, rebuilt when its version moved."""
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(location_id)
+        if entry is not None:
+            _entries.move_to_end(location_id)
+    if entry is not None:
+        version, checked_at, index = entry
+        if now - checked_at < LOCAL_TTL:
+            return index
+        if _shared_version(location_id) == version:
+            with _lock:
+                _entries[location_id] = (version, now, index)
+            return index
+
+    # Read the version first: a save landing during the load bumps it again
+    version = _shared_version(location_id)
+    index = _load(location_id)
+    with _lock:
+        _entries[location_id] = (version, now, index)
+        _entries.move_to_end(location_id)
+        while len(_entries) > LOCAL_SIZE:
+            _entries.popitem(last=False)
+    return index
+
+
+def _bump(location_id) -> None:
+    with _lock:
+        _entries.pop(location_id, None)
+    try:
+        cache.set(version_key(location_id), uuid.uuid4().hex, None)
+    except Exception as exc:
+        logger.warning(f"Geo-fence version bump failed for {location_id}: {exc}")
+
+
+def invalidate(location_ids: Iterable) -> None:
+    """Mark the locations' indexes stale now and again once the write commits."""
+
+    location_ids = {location_id for location_id in location_ids if location_id}
+    for location_id in location_ids:
+        _bump(location_id)
+    transaction.on_commit(lambda: [_bump(location_id) for location_id in location_ids])
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def fence_copy(index: GeoFenceIndex, position: Optional[int]):
+    """A copy of the cached GeoFence, safe to hand to callers."""
+
+    return copy.copy(index.fences[position]) if position is not None else None
@@ -0,0 +1,332 @@
+"""
+Bulk punch ingestion - turnstiles, biometric terminals, offline mobile sync
+
+``ingest_punches`` takes thousands of punches of one organization in one
+call and answers one result per punch (created / duplicate / rejected):
+
+1. Duplicates: every punch carries a client ``idempotency_key``, unique per
+   organization. A key repeated in the payload keeps its first occurrence;
+   a key already stored answers the stored punch.
+2. Validation in batch: employees (by id or employee code) resolved with
+   one query, failed face / liveness checks, device security flags and the
+   payroll lock as in the punch path, geo-fences per location through ``GeoFenceService.validate_locations``
+   and fraud scores against the employees' recent punches (one window query).
+3. Writes: missing AttendanceRecords and all AttendancePunches with
+   ``bulk_create``; the affected records are locked in id order.
+4. Derivation: every touched (employee, date) is recomputed from all its
+   stored punches by ``recalculation.derive_records`` - the earliest IN and
+   the latest OUT after it - so duplicates and out-of-order arrival always
+   give the same record. Regularized records keep their approved times.
+
+Bulk writes bypass signals: payroll watermarks and punch contexts are
+updated here.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import punch_context
+from .models import (
+    AttendancePunch, AttendanceRecord, FraudLog, _get_payroll_locked_date,
+)
+from .recalculation import derive_records
+from .services import AttendanceService, GeoFenceService
+
+STATUS_CREATED = 'created'
+STATUS_DUPLICATE = 'duplicate'
+STATUS_REJECTED = 'rejected'
+
+# Same window as punch_context.RECENT_DEVICES
+HISTORY_PUNCHES = punch_context.RECENT_DEVICES
+
+
+def _batch_size() -> int:
+    return getattr(settings, 'ATTENDANCE_BULK_PUNCH_BATCH_SIZE', 1000)
+
+
+def _future_tolerance() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'ATTENDANCE_PUNCH_FUTURE_TOLERANCE', 300))
+
+
+def _verification_message(item: Dict) -> Optional[str]:
+    """
+    Face and liveness checks as in the punch path. Terminals without a
+    camera (fingerprint, card) send None and are only scored.
+    """
+    if item.get('face_verified') is False:
+        return 'Face verification failed. Please retry.'
+    if item.get('liveness_verified') is False:
+        return 'Liveness detection failed. Punch rejected.'
+    return None
+
+
+def _result(item: Dict, status: str, message: str = '', punch_id=None, fraud_score=None) -> Dict:
+    return {
+        'idempotency_key': item.get('idempotency_key'),
+        'status': status,
+        'punch_id': str(punch_id) if punch_id else None,
+        'fraud_score': float(fraud_score) if fraud_score is not None else None,
+        'message': message,
+    }
+
+
+# --------------------------------------------------
+# LOOKUPS
+# --------------------------------------------------
+def _resolve_employees(organization, items: Sequence[Dict]) -> Dict:
+    """{('id', uuid) | ('code', employee code): Employee} within the organization."""
+
+    from apps.employees.models import Employee
+
+    ids = {item['employee'] for item in items if item.get('employee')}
+    codes = {item['employee_code'] for item in items if item.get('employee_code') and not item.get('employee')}
+    if not ids and not codes:
+        return {}
+    found = {}
+    for employee in Employee.objects.filter(organization=organization).filter(
+        Q(id__in=ids) | Q(employee_id__in=codes)
+    ):
+        found[('id', employee.id)] = employee
+        found[('code', employee.employee_id)] = employee
+    return found
+
+
+def _employee_for(item: Dict, employees: Dict):
+    if item.get('employee'):
+        return employees.get(('id', item['employee']))
+    return employees.get(('code', item.get('employee_code')))
+
+
+def _history(employee_ids) -> Dict:
+    """The last HISTORY_PUNCHES stored punches of each employee, newest first."""
+
+    history = defaultdict(list)
+    rows = AttendancePunch.objects.filter(employee_id__in=employee_ids).annotate(
+        recency=Window(RowNumber(), partition_by=[F('employee_id')], order_by=F('punch_time').desc())
+    ).filter(recency__lte=HISTORY_PUNCHES).order_by('employee_id', '-punch_time').values_list(
+        'employee_id', 'punch_time', 'punch_type', 'device_id'
+    )
+    for employee_id, *punch in rows:
+        history[employee_id].append(punch_context.RecentPunch(*punch))
+    return history
+
+
+def _geo_results(accepted: List[Dict]) -> Dict:
+    """{item index: validate_location result} for punches carrying coordinates."""
+
+    by_location = defaultdict(list)
+    for entry in accepted:
+        data = entry['data']
+        if data.get('latitude') is not None and data.get('longitude') is not None:
+            by_location[entry['employee'].location_id].append(entry)
+
+    results = {}
+    for entries in by_location.values():
+        checks = GeoFenceService.validate_locations(entries[0]['employee'], [
+            (entry['data']['latitude'], entry['data']['longitude'], entry['data'].get('accuracy'))
+            for entry in entries
+        ])
+        for entry, check in zip(entries, checks):
+            results[entry['index']] = check
+    return results
+
+
+def _lock_records(pairs) -> Dict:
+    """Lock the records of (employee_id, date) pairs, in id order."""
+
+    employees_by_date = defaultdict(set)
+    for employee_id, day in pairs:
+        employees_by_date[day].add(employee_id)
+    match = Q()
+    for day, employee_ids in employees_by_date.items():
+        match |= Q(date=day, employee_id__in=employee_ids)
+    records = AttendanceRecord.objects.select_for_update().filter(match).order_by('id')
+    return {(record.employee_id, record.date): record for record in records}
+
+
+# --------------------------------------------------
+# INGESTION
+# --------------------------------------------------
+def ingest_punches(organization, items: Sequence[Dict]) -> Dict:
+    """
+    Ingest validated punch payloads (see BulkPunchItemSerializer).
+
+    Returns {'created', 'duplicates', 'rejected', 'results'}, with
+    ``results`` aligned with ``items``.
+    """
+    results: List[Optional[Dict]] = [None] * len(items)
+
+    # 1. Duplicate keys: first occurrence in the payload, then stored punches
+    first_index = {}
+    for index, item in enumerate(items):
+        key = item['idempotency_key']
+        if key in first_index:
+            results[index] = _result(item, STATUS_DUPLICATE, f'Same idempotency key as punch {first_index[key]}.')
+        else:
+            first_index[key] = index
+    stored = dict(AttendancePunch.all_objects.filter(
+        organization=organization, idempotency_key__in=list(first_index)
+    ).values_list('idempotency_key', 'id'))
+    for key, punch_id in stored.items():
+        results[first_index[key]] = _result(items[first_index[key]], STATUS_DUPLICATE, 'Already ingested.', punch_id)
+
+    # 2. Per-punch validation
+    pending = [index for index in first_index.values() if results[index] is None]
+    employees = _resolve_employees(organization, [items[index] for index in pending])
+    locked_before = _get_payroll_locked_date(organization) if pending else None
+    latest_allowed = timezone.now() + _future_tolerance()
+
+    accepted = []
+    for index in pending:
+        item = items[index]
+        employee = _employee_for(item, employees)
+        message = None
+        if employee is None:
+            message = 'Employee not found in this organization.'
+        elif item['punch_time'] > latest_allowed:
+            message = 'Punch time is in the future.'
+        else:
+            message = _verification_message(item) or AttendanceService._device_security_message(item)
+        day = timezone.localdate(item['punch_time'])
+        if not message and locked_before and day < locked_before:
+            message = 'Attendance is locked because payroll has been processed.'
+        if message:
+            results[index] = _result(item, STATUS_REJECTED, message)
+            continue
+        accepted.append({'index': index, 'data': item, 'employee': employee, 'date': day})
+
+    if not accepted:
+        return _summary(results)
+
+    with transaction.atomic():
+        _write(organization, accepted, results)
+    return _summary(results)
+
+
+def _write(organization, accepted: List[Dict], results: List[Optional[Dict]]) -> None:
+    # 3. Fraud scores, in punch order per employee so each punch is judged
+    #    against the ones before it
+    accepted.sort(key=lambda entry: (
+        str(entry['employee'].id), entry['data']['punch_time'], entry['data']['punch_type'],
+        entry['data']['idempotency_key'],
+    ))
+    history = _history({entry['employee'].id for entry in accepted})
+    geo = _geo_results(accepted)
+    for entry in accepted:
+        data, employee = entry['data'], entry['employee']
+        previous = history[employee.id]
+        geo_result = geo.get(entry['index'])
+        punch_data = dict(data)
+        if geo_result is not None:
+            punch_data['geo_valid'] = geo_result['valid']
+        entry['geo'] = geo_result
+        entry['scoring'] = AttendanceService._score_punch(
+            employee, punch_data, geo_result, previous,
+            [punch.device_id for punch in previous if punch.device_id],
+        )
+        previous.insert(0, punch_context.RecentPunch(data['punch_time'], data['punch_type'], data.get('device_id', '')))
+
+    # 4. Records (missing ones created, all locked) and punches
+    pairs = {(entry['employee'].id, entry['date']) for entry in accepted}
+    new_records = {}
+    for entry in accepted:
+        pair = (entry['employee'].id, entry['date'])
+        if pair not in new_records:
+            new_records[pair] = AttendanceRecord(
+                organization=organization, employee_id=pair[0], date=pair[1],
+                branch_id=entry['employee'].branch_id, device_id=entry['data'].get('device_id', ''),
+            )
+    AttendanceRecord.objects.bulk_create(new_records.values(), ignore_conflicts=True, batch_size=_batch_size())
+    records = _lock_records(pairs)
+    created_record_ids = {record.id for record in new_records.values()}
+
+    punches = []
+    for entry in accepted:
+        data, employee = entry['data'], entry['employee']
+        record = records.get((employee.id, entry['date']))
+        if record is None or record.organization_id != organization.id:
+            results[entry['index']] = _result(data, STATUS_REJECTED, 'Attendance record unavailable for this date.')
+            continue
+        scoring, geo_result = entry['scoring'], entry['geo']
+        entry['punch'] = AttendancePunch(
+            organization=organization,
+            employee_id=employee.id,
+            branch_id=record.branch_id or employee.branch_id,
+            attendance_id=record.id,
+            punch_type=data['punch_type'],
+            punch_time=data['punch_time'],
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
+            accuracy=data.get('accuracy'),
+            geo_fence_id=geo_result['geo_fence'].id if geo_result and geo_result['geo_fence'] else None,
+            device_id=data.get('device_id', ''),
+            device_model=data.get('device_model', ''),
+            is_rooted=data.get('is_rooted', False),
+            is_emulator=data.get('is_emulator', False),
+            is_mock_gps=data.get('is_mock_gps', False),
+            face_verified=bool(data.get('face_verified')),
+            face_confidence=data.get('face_confidence'),
+            liveness_verified=bool(data.get('liveness_verified')),
+            fraud_score=scoring['fraud_score'],
+            fraud_flags=scoring['fraud_flags'],
+            is_flagged=scoring['low_face_confidence'] or scoring['flagged'],
+            idempotency_key=data['idempotency_key'],
+        )
+        punches.append(entry)
+
+    AttendancePunch.objects.bulk_create(
+        [entry['punch'] for entry in punches], ignore_conflicts=True, batch_size=_batch_size()
+    )
+    # A concurrent request may have stored the same key first
+    inserted = set(AttendancePunch.objects.filter(
+        id__in=[entry['punch'].id for entry in punches]
+    ).values_list('id', flat=True))
+    raced = dict(AttendancePunch.all_objects.filter(
+        organization=organization,
+        idempotency_key__in=[entry['data']['idempotency_key'] for entry in punches if entry['punch'].id not in inserted],
+    ).values_list('idempotency_key', 'id')) if len(inserted) < len(punches) else {}
+
+    fraud_logs = []
+    for entry in punches:
+        punch, data = entry['punch'], entry['data']
+        if punch.id not in inserted:
+            results[entry['index']] = _result(
+                data, STATUS_DUPLICATE, 'Already ingested.', raced.get(data['idempotency_key'])
+            )
+            continue
+        results[entry['index']] = _result(data, STATUS_CREATED, punch_id=punch.id, fraud_score=punch.fraud_score)
+        fraud_logs.extend(
+            FraudLog(
+                organization=organization, employee_id=punch.employee_id, punch_id=punch.id,
+                fraud_type=event['type'], severity=event.get('severity', 'medium'),
+                details=event.get('details', {}),
+            )
+            for event in entry['scoring']['fraud_events']
+        )
+    FraudLog.objects.bulk_create(fraud_logs, batch_size=_batch_size())
+
+    touched = {
+        (entry['punch'].employee_id, entry['date']): records[(entry['punch'].employee_id, entry['date'])]
+        for entry in punches if entry['punch'].id in inserted
+    }
+    derive_records(organization, touched, created_record_ids, batch_size=_batch_size())
+    punch_context.invalidate({employee_id for employee_id, _ in touched})
+
+
+def _summary(results: List[Dict]) -> Dict:
+    counts = defaultdict(int)
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        'created': counts[STATUS_CREATED],
+        'duplicates': counts[STATUS_DUPLICATE],
+        'rejected': counts[STATUS_REJECTED],
+        'results': results,
+    }
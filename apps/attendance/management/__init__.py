@@ -0,0 +1 @@
+# Django management command init file
@@ -0,0 +1,27 @@
+"""
+Build Attendance Rollup - recount AttendanceMonthlySummary rows from the records
+Run with: python manage.py build_attendance_rollup [--organization <id>] [--year YYYY]
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.attendance import monthly_rollup
+from apps.core.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the per employee and month attendance rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Organization id (default: all active organizations)')
+        parser.add_argument('--year', type=int, help='Only this year (default: all years)')
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.filter(is_active=True)
+        if options['organization']:
+            organizations = organizations.filter(id=options['organization'])
+
+        for organization in organizations:
+            months = monthly_rollup.rebuild(organization.id, options['year'])
+            self.stdout.write(f'{organization.name}: {months} months recounted')
+        self.stdout.write(self.style.SUCCESS('Attendance rollup built'))
@@ -0,0 +1,39 @@
+"""
+Build Shift Calendar - materialize EmployeeShiftDay rows for the rolling window
+Run with: python manage.py build_shift_calendar [--organization <id>] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.attendance import shift_calendar
+from apps.core.models import Organization
+
+
+class Command(BaseCommand):
+    help = 'Materialize the effective shift of every active employee per day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', help='Organization id (default: all active organizations)')
+        parser.add_argument('--start', help='First date (default: SHIFT_CALENDAR_PAST_DAYS ago)')
+        parser.add_argument('--end', help='Last date (default: SHIFT_CALENDAR_FUTURE_DAYS ahead)')
+
+    def handle(self, *args, **options):
+        start, end = self._date(options['start']), self._date(options['end'])
+        organizations = Organization.objects.filter(is_active=True)
+        if options['organization']:
+            organizations = organizations.filter(id=options['organization'])
+
+        for organization in organizations:
+            added = shift_calendar.build(organization.id, start, end)
+            self.stdout.write(f'{organization.name}: {added} days materialized')
+        self.stdout.write(self.style.SUCCESS('Shift calendar built'))
+
+    def _date(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_alter_attendancepunch_organization_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancepunch',
+            name='idempotency_key',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='attendancepunch',
+            index=models.Index(fields=['employee', 'punch_time'], name='att_punch_emp_time_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendancepunch',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('organization', 'idempotency_key'), name='uq_att_punch_org_idempotency_key'),
+        ),
+    ]
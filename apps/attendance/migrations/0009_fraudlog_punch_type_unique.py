@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:02
+
+from django.db import migrations, models
+
+
+def drop_duplicate_fraud_logs(apps, schema_editor):
+    """Keep the oldest log of each (punch, fraud_type) before adding the constraint."""
+    FraudLog = apps.get_model("attendance", "FraudLog")
+
+    duplicates = (
+        FraudLog.objects.filter(punch__isnull=False)
+        .values("punch_id", "fraud_type")
+        .annotate(count=models.Count("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        ids = list(
+            FraudLog.objects.filter(punch_id=duplicate["punch_id"], fraud_type=duplicate["fraud_type"])
+            .order_by("created_at", "id")
+            .values_list("id", flat=True)
+        )
+        FraudLog.objects.filter(id__in=ids[1:]).delete()
+
+
+def reverse_noop(apps, schema_editor):
+    return
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_attendancerecalculation'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_fraud_logs, reverse_noop),
+        migrations.AddConstraint(
+            model_name='fraudlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('punch__isnull', False)), fields=('punch', 'fraud_type'), name='uq_fraud_log_punch_type'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:40
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+STATUS_FIELDS = {
+    'present': 'present_days',
+    'absent': 'absent_days',
+    'half_day': 'half_days',
+    'late': 'late_days',
+    'early_out': 'early_out_days',
+    'on_leave': 'leave_days',
+    'holiday': 'holiday_days',
+    'weekend': 'weekend_days',
+    'wfh': 'wfh_days',
+}
+BATCH_SIZE = 1000
+
+
+def backfill_monthly_summaries(apps, schema_editor):
+    """Count existing records into AttendanceMonthlySummary so reports do not start at zero."""
+    AttendanceRecord = apps.get_model("attendance", "AttendanceRecord")
+    AttendanceMonthlySummary = apps.get_model("attendance", "AttendanceMonthlySummary")
+
+    totals = (
+        AttendanceRecord.objects.filter(is_deleted=False)
+        .annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("organization_id", "employee_id", "year", "month")
+        .annotate(
+            record_count=models.Count("id"),
+            total_hours=models.Sum("total_hours"),
+            overtime_hours=models.Sum("overtime_hours"),
+            **{field: models.Count("id", filter=models.Q(status=status)) for status, field in STATUS_FIELDS.items()},
+        )
+        .order_by()
+    )
+
+    batch = []
+    for row in totals.iterator(chunk_size=BATCH_SIZE):
+        row["total_hours"] = row["total_hours"] or 0
+        row["overtime_hours"] = row["overtime_hours"] or 0
+        batch.append(AttendanceMonthlySummary(**row))
+        if len(batch) >= BATCH_SIZE:
+            AttendanceMonthlySummary.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        AttendanceMonthlySummary.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def clear_monthly_summaries(apps, schema_editor):
+    apps.get_model("attendance", "AttendanceMonthlySummary").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_attendancemonthlysummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_monthly_summaries, clear_monthly_summaries),
+    ]
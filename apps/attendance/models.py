@@ -95,13 +95,19 @@ class Shift(OrganizationEntity):
     def __str__(self):
         return f"{self.name} ({self.start_time} - {self.end_time})"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_code = self.code
+
     def clean(self):
         super().clean()
         _ensure_same_org(self, self.branch, 'branch')
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self._original_code = self.code
+        return result
 
 
 class GeoFence(OrganizationEntity):
@@ -135,6 +141,10 @@ class GeoFence(OrganizationEntity):
     def __str__(self):
         return f"{self.name} ({self.location.name})"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_location_id = self.location_id
+
     def clean(self):
         super().clean()
         _ensure_same_org(self, self.location, 'location')
@@ -142,7 +152,9 @@ class GeoFence(OrganizationEntity):
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self._original_location_id = self.location_id
+        return result
 
 
 
@@ -238,6 +250,27 @@ class AttendanceRecord(OrganizationEntity):
     def __str__(self):
         return f"{self.employee.employee_id} - {self.date}"
 
+    # Fields the monthly rollup (apps/attendance/monthly_rollup.py) sums
+    ROLLUP_FIELDS = ('employee_id', 'date', 'status', 'total_hours', 'overtime_hours', 'is_deleted')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_status = self.status
+        self._original_rollup = self.rollup_state()
+
+    def rollup_state(self):
+        """Values of ROLLUP_FIELDS, None while any of them is deferred."""
+        try:
+            return tuple(self.__dict__[field] for field in self.ROLLUP_FIELDS)
+        except KeyError:
+            return None
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Loading a deferred field must not forget unsaved changes
+        if fields is None:
+            self._original_rollup = self.rollup_state()
+
     def clean(self):
         super().clean()
         _ensure_employee_org(self)
@@ -249,13 +282,65 @@ class AttendanceRecord(OrganizationEntity):
         if locked_before and self.pk and self.date < locked_before:
             raise ValidationError({'date': 'Attendance is locked because payroll has been processed.'})
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, validate=True, **kwargs):
+        """
+        ``validate=False`` skips ``full_clean`` for callers that already ran
+        its checks (the punch path, see AttendanceService.punch_in).
+        """
         if self.employee_id and not self.organization_id:
             self.organization = self.employee.organization
         if self.employee_id and not self.branch_id and getattr(self.employee, 'branch_id', None):
-            self.branch = self.employee.branch
-        self.full_clean()
-        return super().save(*args, **kwargs)
+            self.branch_id = self.employee.branch_id
+        if validate:
+            self.full_clean()
+        result = super().save(*args, **kwargs)
+        self._original_status = self.status
+        self._original_rollup = self.rollup_state()
+        return result
+
+
+class AttendanceMonthlySummary(OrganizationEntity):
+    """
+    Attendance totals per employee and calendar month, kept in step with
+    AttendanceRecord writes by apps/attendance/monthly_rollup.py.
+    """
+
+    employee = models.ForeignKey(
+        'employees.Employee',
+        on_delete=models.CASCADE,
+        related_name='attendance_summaries'
+    )
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    # Signed so a missed write shows up instead of failing every later one;
+    # `manage.py build_attendance_rollup` recomputes them from the records
+    record_count = models.IntegerField(default=0)
+    present_days = models.IntegerField(default=0)
+    absent_days = models.IntegerField(default=0)
+    half_days = models.IntegerField(default=0)
+    late_days = models.IntegerField(default=0)
+    early_out_days = models.IntegerField(default=0)
+    leave_days = models.IntegerField(default=0)
+    holiday_days = models.IntegerField(default=0)
+    weekend_days = models.IntegerField(default=0)
+    wfh_days = models.IntegerField(default=0)
+    total_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    overtime_hours = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee', 'year', 'month'],
+                name='uq_attendance_summary_employee_month'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'year', 'month'], name='att_summary_org_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.year}-{self.month:02d}"
 
 
 class AttendancePunch(OrganizationEntity):
@@ -323,11 +408,22 @@ class AttendancePunch(OrganizationEntity):
     
     # Photo evidence
     selfie = models.ImageField(upload_to='attendance/selfies/', null=True, blank=True)
+
+    # Client-supplied key of punches ingested in bulk (devices, offline sync)
+    idempotency_key = models.CharField(max_length=100, blank=True, default='')
     
     class Meta:
         ordering = ['-punch_time']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'idempotency_key'],
+                condition=~models.Q(idempotency_key=''),
+                name='uq_att_punch_org_idempotency_key'
+            )
+        ]
         indexes = [
             models.Index(fields=['organization', 'punch_time'], name='att_punch_org_time_idx'),
+            models.Index(fields=['employee', 'punch_time'], name='att_punch_emp_time_idx'),
         ]
     
     def __str__(self):
@@ -347,12 +443,14 @@ class AttendancePunch(OrganizationEntity):
         _ensure_same_org(self, self.branch, 'branch')
         _ensure_same_org(self, self.geo_fence, 'geo_fence')
 
-    def save(self, *args, **kwargs):
+    def save(self, *args, validate=True, **kwargs):
+        """``validate=False`` skips ``full_clean``, as for AttendanceRecord."""
         if self.employee_id and not self.organization_id:
             self.organization = self.employee.organization
         if self.attendance_id and not self.branch_id and self.attendance.branch_id:
-            self.branch = self.attendance.branch
-        self.full_clean()
+            self.branch_id = self.attendance.branch_id
+        if validate:
+            self.full_clean()
         return super().save(*args, **kwargs)
 
 
@@ -405,6 +503,15 @@ class FraudLog(OrganizationEntity):
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One log per punch and fraud type, so batch re-scoring can
+            # insert with ignore_conflicts
+            models.UniqueConstraint(
+                fields=['punch', 'fraud_type'],
+                condition=models.Q(punch__isnull=False),
+                name='uq_fraud_log_punch_type'
+            )
+        ]
     
     def __str__(self):
         return f"{self.employee.employee_id} - {self.fraud_type}"
@@ -444,6 +551,10 @@ class FaceEmbedding(OrganizationEntity):
     def __str__(self):
         return f"{self.employee.employee_id} - Face Embedding"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_embedding_model = self.embedding_model
+
     def clean(self):
         super().clean()
         _ensure_employee_org(self)
@@ -452,7 +563,9 @@ class FaceEmbedding(OrganizationEntity):
         if self.employee_id and not self.organization_id:
             self.organization = self.employee.organization
         self.full_clean()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self._original_embedding_model = self.embedding_model
+        return result
 
 
 class ShiftAssignment(OrganizationEntity):
@@ -513,13 +626,71 @@ class ShiftAssignment(OrganizationEntity):
             if overlapping.exists():
                 raise ValidationError('Shift assignment overlaps with an existing assignment.')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_effective_from = self.effective_from
+
     def save(self, *args, **kwargs):
         if self.employee_id and not self.organization_id:
             self.organization = self.employee.organization
         if self.employee_id and not self.branch_id and self.employee.branch_id:
             self.branch = self.employee.branch
         self.full_clean()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        self._original_effective_from = self.effective_from
+        return result
+
+
+class EmployeeShiftDay(OrganizationEntity):
+    """
+    Materialized shift calendar: the shift in effect for an employee on a
+    date. Maintained by apps/attendance/shift_calendar.py.
+    """
+
+    SOURCE_ASSIGNMENT = 'assignment'
+    SOURCE_DEFAULT = 'default'
+
+    SOURCE_CHOICES = [
+        (SOURCE_ASSIGNMENT, 'Shift Assignment'),
+        (SOURCE_DEFAULT, 'Organization Default'),
+    ]
+
+    employee = models.ForeignKey(
+        'employees.Employee',
+        on_delete=models.CASCADE,
+        related_name='shift_days'
+    )
+    date = models.DateField()
+    shift = models.ForeignKey(
+        Shift,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='calendar_days'
+    )
+    # Assignment covering the date, kept even while its shift is inactive
+    assignment = models.ForeignKey(
+        ShiftAssignment,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='calendar_days'
+    )
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['employee', 'date'],
+                name='uq_shift_day_employee_date'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'date'], name='att_shift_day_org_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.date}: {self.shift_id}"
 
 
 class OvertimeRequest(OrganizationEntity):
@@ -593,3 +764,53 @@ class OvertimeRequest(OrganizationEntity):
             self.branch = self.employee.branch
         self.full_clean()
         return super().save(*args, **kwargs)
+
+
+class AttendanceRecalculation(OrganizationEntity):
+    """
+    Set-based recalculation of attendance records over a date range,
+    fanned out to chunk tasks by apps/attendance/recalculation.py.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # Empty: every employee with records in the range
+    employee_ids = models.JSONField(default=list, blank=True)
+    reason = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+
+    # Fan-out progress: each chunk task bumps these in one UPDATE
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_completed = models.PositiveIntegerField(default=0)
+    chunks_failed = models.PositiveIntegerField(default=0)
+    records_updated = models.PositiveIntegerField(default=0)
+    failed_employee_ids = models.JSONField(default=list, blank=True)
+
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Recalculation {self.start_date} - {self.end_date} ({self.status})"
+
+    def clean(self):
+        super().clean()
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': 'End date must be on or after start date.'})
+
+    def save(self, *args, **kwargs):
+        self.full_clean()
+        return super().save(*args, **kwargs)
@@ -0,0 +1,201 @@
+"""
+Monthly attendance rollup - per (employee, year, month) totals
+
+``AttendanceMonthlySummary`` rows hold, for one employee and calendar
+month, the number of AttendanceRecords per status, their total and
+overtime hours and the record count. Monthly / annual reports and the
+payroll summary read them instead of aggregating the records.
+
+Maintenance, in the transaction of the record write:
+- ``record_saved`` / ``record_deleted`` (apps/attendance/signals.py) diff
+  the record's rollup fields against the values it was loaded with and
+  add the difference to the affected months with one
+  ``UPDATE ... SET x = x + delta`` each. Saves that leave status, hours,
+  employee and date alone (most punch-ins) issue no query. Soft-deleted
+  records do not count.
+- Bulk writes that bypass signals (``recalculation.derive_records``, used
+  by bulk ingestion too) call ``refresh`` for the months they touched;
+  it locks the summaries and recounts them from the records with one
+  grouped query.
+
+Existing records are counted in by migration 0011. A month without a
+summary row yet (or a record loaded with deferred fields) is recounted
+instead of incremented. ``rebuild`` recounts every month of an
+organization (``manage.py build_attendance_rollup``).
+"""
+
+import datetime
+from calendar import monthrange
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, QuerySet, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .models import AttendanceMonthlySummary, AttendanceRecord
+
+STATUS_FIELDS = {
+    AttendanceRecord.STATUS_PRESENT: 'present_days',
+    AttendanceRecord.STATUS_ABSENT: 'absent_days',
+    AttendanceRecord.STATUS_HALF_DAY: 'half_days',
+    AttendanceRecord.STATUS_LATE: 'late_days',
+    AttendanceRecord.STATUS_EARLY_OUT: 'early_out_days',
+    AttendanceRecord.STATUS_ON_LEAVE: 'leave_days',
+    AttendanceRecord.STATUS_HOLIDAY: 'holiday_days',
+    AttendanceRecord.STATUS_WEEKEND: 'weekend_days',
+    AttendanceRecord.STATUS_WFH: 'wfh_days',
+}
+HOUR_FIELDS = ('total_hours', 'overtime_hours')
+FIELDS = ('record_count',) + tuple(STATUS_FIELDS.values()) + HOUR_FIELDS
+
+ZERO = Decimal('0')
+
+Key = Tuple[object, int, int]
+
+
+def _batch_size() -> int:
+    return getattr(settings, 'ATTENDANCE_ROLLUP_BATCH_SIZE', 1000)
+
+
+def _contribution(state) -> Optional[Tuple[Key, Dict]]:
+    """What one record (an ``AttendanceRecord.rollup_state()``) adds to its month."""
+    if state is None:
+        return None
+    employee_id, day, status, total_hours, overtime_hours, is_deleted = state
+    if is_deleted or not employee_id or not day:
+        return None
+    values = {'record_count': 1, 'total_hours': total_hours or ZERO, 'overtime_hours': overtime_hours or ZERO}
+    if status in STATUS_FIELDS:
+        values[STATUS_FIELDS[status]] = 1
+    return (employee_id, day.year, day.month), values
+
+
+def _deltas(previous, current) -> Dict[Key, Dict]:
+    deltas = defaultdict(lambda: defaultdict(int))
+    for state, sign in ((previous, -1), (current, 1)):
+        contribution = _contribution(state)
+        if contribution:
+            key, values = contribution
+            for field, value in values.items():
+                deltas[key][field] += sign * value
+    return {
+        key: {field: value for field, value in values.items() if value}
+        for key, values in deltas.items()
+        if any(values.values())
+    }
+
+
+def _increment(key: Key, delta: Dict) -> bool:
+    """Add ``delta`` to an existing summary; False when the month has none."""
+    employee_id, year, month = key
+    return bool(AttendanceMonthlySummary.all_objects.filter(
+        employee_id=employee_id, year=year, month=month,
+    ).update(updated_at=timezone.now(), **{field: F(field) + value for field, value in delta.items()}))
+
+
+# --------------------------------------------------
+# MAINTENANCE
+# --------------------------------------------------
+def record_saved(record, created: bool) -> None:
+    previous = None if created else record._original_rollup
+    current = record.rollup_state() or tuple(getattr(record, field) for field in record.ROLLUP_FIELDS)
+    if not created and previous is None:
+        # Loaded with deferred fields: the old values are unknown
+        contribution = _contribution(current)
+        if contribution:
+            refresh(record.organization_id, [contribution[0]])
+        return
+    for key, delta in _deltas(previous, current).items():
+        if not _increment(key, delta):
+            refresh(record.organization_id, [key])
+
+
+def record_deleted(record, origin=None) -> None:
+    if origin is not None:
+        origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+        if origin_model is not AttendanceRecord:
+            # Cascade from the employee or organization: their summaries are
+            # deleted by the same cascade, so there is nothing to decrement
+            return
+    for key, delta in _deltas(record._original_rollup or record.rollup_state(), None).items():
+        _increment(key, delta)
+
+
+def refresh(organization_id, keys: Iterable[Key]) -> int:
+    """Recount the summaries of ``keys`` from the records. Returns the number of months."""
+
+    keys = set(keys)
+    if not keys:
+        return 0
+    employee_ids = {key[0] for key in keys}
+    months = sorted((year, month) for _, year, month in keys)
+    first = datetime.date(months[0][0], months[0][1], 1)
+    last = datetime.date(months[-1][0], months[-1][1], monthrange(*months[-1])[1])
+    batch_size = _batch_size()
+
+    with transaction.atomic():
+        # Create missing rows, then lock all of them so concurrent increments
+        # either land before the recount (and are read by it) or after it
+        AttendanceMonthlySummary.all_objects.bulk_create([
+            AttendanceMonthlySummary(organization_id=organization_id, employee_id=employee_id, year=year, month=month)
+            for employee_id, year, month in keys
+        ], ignore_conflicts=True, batch_size=batch_size)
+        summaries = {
+            (summary.employee_id, summary.year, summary.month): summary
+            for summary in AttendanceMonthlySummary.all_objects.select_for_update().filter(
+                employee_id__in=employee_ids, year__gte=first.year, year__lte=last.year,
+            ).order_by('employee_id', 'year', 'month')
+        }
+
+        totals = {
+            (row['employee_id'], row['year'], row['month']): row
+            for row in AttendanceRecord.objects.filter(
+                organization_id=organization_id, employee_id__in=employee_ids, date__gte=first, date__lte=last,
+            ).annotate(
+                year=ExtractYear('date'), month=ExtractMonth('date'),
+            ).values('employee_id', 'year', 'month').annotate(
+                record_count=Count('id'),
+                total_hours=Sum('total_hours'),
+                overtime_hours=Sum('overtime_hours'),
+                **{field: Count('id', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()},
+            ).order_by()
+        }
+
+        now = timezone.now()
+        updated = []
+        for key in keys:
+            summary = summaries.get(key)
+            if summary is None:
+                continue
+            row = totals.get(key, {})
+            for field in FIELDS:
+                setattr(summary, field, row.get(field) or (ZERO if field in HOUR_FIELDS else 0))
+            summary.updated_at = now
+            updated.append(summary)
+        AttendanceMonthlySummary.all_objects.bulk_update(updated, FIELDS + ('updated_at',), batch_size=batch_size)
+    return len(updated)
+
+
+def rebuild(organization_id, year: Optional[int] = None) -> int:
+    """Recount every month with records or a summary. Returns the number of months."""
+
+    records = AttendanceRecord.objects.filter(organization_id=organization_id)
+    summaries = AttendanceMonthlySummary.all_objects.filter(organization_id=organization_id)
+    if year:
+        records = records.filter(date__year=year)
+        summaries = summaries.filter(year=year)
+
+    keys = set(records.annotate(
+        year=ExtractYear('date'), month=ExtractMonth('date'),
+    ).values_list('employee_id', 'year', 'month').distinct().order_by())
+    keys |= set(summaries.values_list('employee_id', 'year', 'month'))
+    keys = sorted(keys, key=lambda key: (str(key[0]), key[1], key[2]))
+
+    batch_size = _batch_size()
+    for start in range(0, len(keys), batch_size):
+        refresh(organization_id, keys[start:start + batch_size])
+    return len(keys)
@@ -0,0 +1,199 @@
+"""
+Punch Context Cache - what a punch needs to know about an employee, without queries
+
+A punch used to re-read the same history for every request: the recent
+devices (twice), the last punches, up to three Shift lookups and the
+payroll lock date. The shared cache (Redis in production) now keeps:
+
+- ``attendance:punch-context:<employee>`` -> PunchContext: recent device
+  ids, recent punch times and the shift resolved for ``shift_date``
+- ``attendance:shift-version:<organization>`` -> token bumped by Shift and
+  ShiftAssignment writes; a context resolved under another token
+  re-resolves its shift
+- ``attendance:payroll-locked:<organization>`` -> last locked payroll
+  date, dropped by PayrollRun writes
+
+All three are read with one ``get_many``. The punch path updates the
+context after its transaction commits; any other AttendancePunch write
+drops it (see apps/attendance/signals.py). Bulk writers bypass signals and
+must call ``invalidate`` themselves.
+
+Geo-fences are not copied per employee: they come from the per-location
+process index (apps/attendance/geofence_index.py).
+"""
+
+import datetime
+import logging
+import uuid
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_KEY_PREFIX = 'attendance:punch-context:'
+SHIFT_VERSION_KEY_PREFIX = 'attendance:shift-version:'
+PAYROLL_LOCK_KEY_PREFIX = 'attendance:payroll-locked:'
+
+CONTEXT_TTL = getattr(settings, 'PUNCH_CONTEXT_TTL', 86400)
+PAYROLL_LOCK_TTL = getattr(settings, 'PUNCH_PAYROLL_LOCK_TTL', 3600)
+
+# Same windows as FraudDetectionService._is_device_mismatch and the
+# previous-punches list of AttendanceService.punch_in / punch_out
+RECENT_DEVICES = 10
+RECENT_PUNCHES = 5
+
+_NOT_LOCKED = ''
+
+RecentPunch = namedtuple('RecentPunch', 'punch_time punch_type device_id')
+
+
+@dataclass
+class PunchContext:
+    employee_id: Any
+    device_ids: List[str] = field(default_factory=list)
+    punches: List[RecentPunch] = field(default_factory=list)
+    shift_date: Optional[datetime.date] = None
+    shift: Any = None
+    shift_version: Optional[str] = None
+    # Organization-level; read with the context, not stored in it
+    payroll_locked_through: Optional[datetime.date] = None
+
+    def record_punch(self, punch_time, punch_type, device_id) -> None:
+        self.punches = [RecentPunch(punch_time, punch_type, device_id)] + self.punches[:RECENT_PUNCHES - 1]
+        if device_id:
+            self.device_ids = [device_id] + self.device_ids[:RECENT_DEVICES - 1]
+
+
+def context_key(employee_id) -> str:
+    return f"{CONTEXT_KEY_PREFIX}{employee_id}"
+
+
+def shift_version_key(organization_id) -> str:
+    return f"{SHIFT_VERSION_KEY_PREFIX}{organization_id}"
+
+
+def payroll_lock_key(organization_id) -> str:
+    return f"{PAYROLL_LOCK_KEY_PREFIX}{organization_id}"
+
+
+def _cache_get_many(keys):
+    try:
+        return cache.get_many(keys)
+    except Exception as exc:
+        logger.warning(f"Punch context read failed: {exc}")
+        return {}
+
+
+def _cache_set(key, value, ttl) -> None:
+    try:
+        cache.set(key, value, ttl)
+    except Exception as exc:
+        logger.warning(f"Punch context write failed for {key}: {exc}")
+
+
+def _cache_delete_many(keys) -> None:
+    try:
+        cache.delete_many(keys)
+    except Exception as exc:
+        logger.warning(f"Punch context invalidation failed: {exc}")
+
+
+# --------------------------------------------------
+# LOAD
+# --------------------------------------------------
+def _load_history(employee) -> PunchContext:
+    from apps.attendance.models import AttendancePunch
+
+    device_ids = list(
+        AttendancePunch.objects.filter(employee=employee, device_id__isnull=False)
+        .exclude(device_id='')
+        .order_by('-punch_time')
+        .values_list('device_id', flat=True)[:RECENT_DEVICES]
+    )
+    punches = [
+        RecentPunch(*row)
+        for row in AttendancePunch.objects.filter(employee=employee)
+        .order_by('-punch_time')
+        .values_list('punch_time', 'punch_type', 'device_id')[:RECENT_PUNCHES]
+    ]
+    return PunchContext(employee_id=employee.id, device_ids=device_ids, punches=punches)
+
+
+def load(employee, today: datetime.date) -> PunchContext:
+    """The employee's punch context, with the shift resolved for ``today``."""
+
+    from apps.attendance.models import _get_payroll_locked_date
+    from apps.attendance.services import AttendanceService
+
+    keys = [
+        context_key(employee.id),
+        shift_version_key(employee.organization_id),
+        payroll_lock_key(employee.organization_id),
+    ]
+    cached = _cache_get_many(keys)
+    context = cached.get(keys[0])
+    shift_version = cached.get(keys[1])
+    dirty = False
+
+    if context is None:
+        context = _load_history(employee)
+        dirty = True
+    if context.shift_date != today or context.shift_version != shift_version:
+        if shift_version is None:
+            shift_version = uuid.uuid4().hex
+            _cache_set(keys[1], shift_version, None)
+        context.shift = AttendanceService._get_employee_shift(employee, today)
+        context.shift_date = today
+        context.shift_version = shift_version
+        dirty = True
+    if dirty:
+        _cache_set(keys[0], context, CONTEXT_TTL)
+
+    locked = cached.get(keys[2])
+    if locked is None:
+        locked = _get_payroll_locked_date(employee.organization_id) or _NOT_LOCKED
+        _cache_set(keys[2], locked, PAYROLL_LOCK_TTL)
+    context.payroll_locked_through = locked or None
+    return context
+
+
+def save_after_commit(context: PunchContext) -> None:
+    """Store ``context`` once the punch that updated it has committed."""
+
+    def store():
+        context.payroll_locked_through = None
+        _cache_set(context_key(context.employee_id), context, CONTEXT_TTL)
+
+    transaction.on_commit(store)
+
+
+# --------------------------------------------------
+# INVALIDATION
+# --------------------------------------------------
+def invalidate(employee_ids: Iterable) -> None:
+    """Drop the employees' contexts now and again once the write commits."""
+
+    keys = [context_key(employee_id) for employee_id in set(employee_ids) if employee_id]
+    if not keys:
+        return
+    _cache_delete_many(keys)
+    transaction.on_commit(lambda: _cache_delete_many(keys))
+
+
+def bump_shift_version(organization_id) -> None:
+    """Make every context of the organization re-resolve its shift."""
+
+    if organization_id:
+        _cache_set(shift_version_key(organization_id), uuid.uuid4().hex, None)
+        transaction.on_commit(lambda: _cache_set(shift_version_key(organization_id), uuid.uuid4().hex, None))
+
+
+def invalidate_payroll_lock(organization_id) -> None:
+    if organization_id:
+        _cache_delete_many([payroll_lock_key(organization_id)])
+        transaction.on_commit(lambda: _cache_delete_many([payroll_lock_key(organization_id)]))
@@ -0,0 +1,276 @@
+"""
+Attendance recalculation - set-based, chunked
+
+After a shift, assignment or policy change the derived fields of many
+AttendanceRecords (check-in / check-out, total hours, late and early-out
+minutes, status, overtime) must be recomputed. ``derive_records`` does it
+for any set of records in a constant number of queries:
+
+1. punches of all records in one query, shifts from the shift calendar
+   (apps/attendance/shift_calendar.py) in one query
+2. check-in is the earliest IN, check-out the latest OUT after it; records
+   without punches keep their stored times; regularized records are skipped
+3. metrics with the rules of AttendanceService.punch_in / punch_out
+4. one ``bulk_update``, overtime requests, payroll watermarks and the
+   monthly rollup (apps/attendance/monthly_rollup.py) in bulk
+
+Bulk punch ingestion (apps/attendance/ingestion.py) derives the records it
+touched with the same function.
+
+``start`` records an AttendanceRecalculation for an organization and date
+range and fans it out as one ``recalculate_attendance_chunk`` task per
+ATTENDANCE_RECALC_CHUNK_SIZE employees; each chunk locks its records in
+id order, recalculates them and bumps the job's progress counters
+(``get_progress``, served at /attendance/recalculations/<id>/progress/).
+Dates covered by a locked payroll run are never touched.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import monthly_rollup
+from .models import (
+    AttendancePunch, AttendanceRecalculation, AttendanceRecord, OvertimeRequest, _get_payroll_locked_date,
+)
+from .services import AttendanceService, FraudDetectionService
+
+DERIVED_FIELDS = [
+    'check_in', 'check_in_latitude', 'check_in_longitude', 'check_in_fraud_score',
+    'check_out', 'check_out_latitude', 'check_out_longitude', 'check_out_fraud_score',
+    'total_hours', 'overtime_hours', 'late_minutes', 'early_out_minutes',
+    'status', 'is_flagged', 'device_id', 'updated_at',
+]
+
+
+def _batch_size() -> int:
+    return getattr(settings, 'ATTENDANCE_RECALC_BATCH_SIZE', 1000)
+
+
+def _chunk_size() -> int:
+    return max(1, getattr(settings, 'ATTENDANCE_RECALC_CHUNK_SIZE', 250))
+
+
+# --------------------------------------------------
+# DERIVATION
+# --------------------------------------------------
+def derive_records(organization, records: Dict, created_record_ids=(), batch_size: Optional[int] = None) -> int:
+    """
+    Recompute the derived fields of ``records`` ({(employee_id, date): record})
+    from their stored punches. Returns the number of records updated.
+    """
+    from apps.payroll.models import PayrollInputWatermark
+    from apps.payroll.signals import LOP_STATUSES
+    from apps.payroll.watermarks import mark_changed_many
+
+    batch_size = batch_size or _batch_size()
+    records = {pair: record for pair, record in records.items() if not record.is_regularized}
+    if not records:
+        return 0
+    punches = defaultdict(list)
+    for row in AttendancePunch.objects.filter(
+        attendance_id__in=[record.id for record in records.values()]
+    ).order_by('punch_time', 'punch_type', 'id').values(
+        'attendance_id', 'punch_type', 'punch_time', 'latitude', 'longitude', 'fraud_score', 'device_id',
+    ):
+        punches[row['attendance_id']].append(row)
+    shifts = AttendanceService._get_employee_shifts(organization.id, records)
+
+    now = timezone.now()
+    overtime = {}
+    watermarks = []
+    for pair, record in records.items():
+        rows = punches[record.id]
+        previous_status = None if record.id in created_record_ids else record.status
+        if rows:
+            _apply_punches(record, rows)
+        record.updated_at = now
+        shift = shifts.get(pair)
+        checked_in = record.check_in is not None
+        checked_out = checked_in and record.check_out is not None and record.check_out > record.check_in
+
+        # Same rules as AttendanceService.punch_in / punch_out
+        record.late_minutes = AttendanceService._calculate_late_minutes(record.check_in, shift) if checked_in else 0
+        record.early_out_minutes = (
+            AttendanceService._calculate_early_out_minutes(record.check_out, shift) if checked_out else 0
+        )
+        if checked_out:
+            seconds = (record.check_out - record.check_in).total_seconds()
+            record.total_hours = (Decimal(seconds) / Decimal('3600')).quantize(Decimal('0.01'))
+            AttendanceService._apply_shift_status(record, shift, record.total_hours)
+            if shift and record.total_hours > Decimal(str(shift.working_hours)):
+                record.overtime_hours = (
+                    record.total_hours - Decimal(str(shift.working_hours))
+                ).quantize(Decimal('0.01'))
+                overtime[record.id] = record
+            elif shift:
+                record.overtime_hours = None
+        elif checked_in:
+            record.total_hours = None
+            AttendanceService._apply_shift_status(record, shift)
+
+        if previous_status != record.status and {previous_status, record.status} & LOP_STATUSES:
+            watermarks.append((record.employee_id, (record.date.year, record.date.month)))
+        record._original_status = record.status
+        record._original_rollup = record.rollup_state()
+
+    AttendanceRecord.objects.bulk_update(list(records.values()), DERIVED_FIELDS, batch_size=batch_size)
+    _request_overtime(organization, overtime, now, batch_size)
+    mark_changed_many(organization.id, watermarks, PayrollInputWatermark.SOURCE_ATTENDANCE)
+    monthly_rollup.refresh(organization.id, {
+        (record.employee_id, record.date.year, record.date.month) for record in records.values()
+    })
+    return len(records)
+
+
+def _apply_punches(record, rows) -> None:
+    first_in = next((row for row in rows if row['punch_type'] == AttendancePunch.PUNCH_IN), None)
+    last_out = next((
+        row for row in reversed(rows)
+        if row['punch_type'] == AttendancePunch.PUNCH_OUT
+        and (first_in is None or row['punch_time'] > first_in['punch_time'])
+    ), None)
+
+    record.check_in = first_in['punch_time'] if first_in else None
+    record.check_in_latitude = first_in['latitude'] if first_in else None
+    record.check_in_longitude = first_in['longitude'] if first_in else None
+    record.check_in_fraud_score = first_in['fraud_score'] if first_in else Decimal('0')
+    record.check_out = last_out['punch_time'] if last_out else None
+    record.check_out_latitude = last_out['latitude'] if last_out else None
+    record.check_out_longitude = last_out['longitude'] if last_out else None
+    record.check_out_fraud_score = last_out['fraud_score'] if last_out else Decimal('0')
+    record.is_flagged = record.is_flagged or any(
+        FraudDetectionService.should_flag_for_review(row['fraud_score']) for row in rows
+    )
+    if first_in and first_in['device_id']:
+        record.device_id = first_in['device_id']
+
+
+def _request_overtime(organization, records: Dict, now, batch_size: int) -> None:
+    """
+    Bulk form of AttendanceService._ensure_overtime_request. Requests that
+    were already approved or rejected keep their decision and hours.
+    """
+
+    if not records:
+        return
+    existing = {
+        request.attendance_id: request
+        for request in OvertimeRequest.objects.filter(attendance_id__in=list(records))
+    }
+    created, updated = [], []
+    for attendance_id, record in records.items():
+        request = existing.get(attendance_id)
+        if request is None:
+            created.append(OvertimeRequest(
+                attendance_id=attendance_id, employee_id=record.employee_id, branch_id=record.branch_id,
+                organization=organization, requested_hours=record.overtime_hours,
+                status=OvertimeRequest.STATUS_PENDING,
+            ))
+        elif request.status == OvertimeRequest.STATUS_PENDING and request.requested_hours != record.overtime_hours:
+            request.requested_hours = record.overtime_hours
+            request.updated_at = now
+            updated.append(request)
+    OvertimeRequest.objects.bulk_create(created, batch_size=batch_size)
+    OvertimeRequest.objects.bulk_update(updated, ['requested_hours', 'updated_at'], batch_size=batch_size)
+
+
+# --------------------------------------------------
+# RANGE RECALCULATION
+# --------------------------------------------------
+def recalculate(organization, start_date, end_date, employee_ids: Iterable) -> int:
+    """Recalculate the employees' records of ``start_date``..``end_date`` in one transaction."""
+
+    locked = _get_payroll_locked_date(organization)
+    if locked:
+        start_date = max(start_date, locked + timedelta(days=1))
+    if start_date > end_date:
+        return 0
+    with transaction.atomic():
+        records = AttendanceRecord.objects.select_for_update().filter(
+            organization=organization,
+            employee_id__in=list(employee_ids),
+            date__gte=start_date,
+            date__lte=end_date,
+        ).order_by('id')
+        return derive_records(organization, {(record.employee_id, record.date): record for record in records})
+
+
+def start(organization, start_date, end_date, employee_ids: Optional[Iterable] = None,
+          reason: str = '') -> AttendanceRecalculation:
+    """Record a recalculation job and fan it out, one chunk task per employee chunk."""
+    from celery import chord
+    from .tasks.recalculation_tasks import finalize_attendance_recalculation, recalculate_attendance_chunk
+
+    if employee_ids is None:
+        employee_ids = AttendanceRecord.objects.filter(
+            organization=organization, date__gte=start_date, date__lte=end_date,
+        ).order_by('employee_id').values_list('employee_id', flat=True).distinct()
+        requested = []
+    else:
+        employee_ids = requested = sorted({str(employee_id) for employee_id in employee_ids})
+    employee_ids = [str(employee_id) for employee_id in employee_ids]
+    chunk_size = _chunk_size()
+    chunks = [employee_ids[i:i + chunk_size] for i in range(0, len(employee_ids), chunk_size)]
+
+    job = AttendanceRecalculation.objects.create(
+        organization=organization, start_date=start_date, end_date=end_date,
+        employee_ids=requested, reason=reason,
+        status=AttendanceRecalculation.STATUS_PROCESSING, chunks_total=len(chunks),
+    )
+    if not chunks:
+        finalize(job)
+        return job
+
+    organization_id, job_id = str(organization.id), str(job.id)
+    transaction.on_commit(lambda: chord(
+        recalculate_attendance_chunk.s(organization_id, job_id, chunk) for chunk in chunks
+    )(finalize_attendance_recalculation.s(organization_id, job_id)))
+    return job
+
+
+def record_chunk(recalculation_id, updated: int) -> None:
+    AttendanceRecalculation.objects.filter(id=recalculation_id).update(
+        chunks_completed=F('chunks_completed') + 1,
+        records_updated=F('records_updated') + updated,
+        updated_at=timezone.now(),
+    )
+
+
+def record_chunk_failure(recalculation_id, employee_ids) -> None:
+    with transaction.atomic():
+        job = AttendanceRecalculation.objects.select_for_update().get(id=recalculation_id)
+        job.chunks_completed += 1
+        job.chunks_failed += 1
+        job.failed_employee_ids = list(job.failed_employee_ids) + list(employee_ids)
+        job.save(update_fields=['chunks_completed', 'chunks_failed', 'failed_employee_ids', 'updated_at'])
+
+
+def finalize(job: AttendanceRecalculation) -> AttendanceRecalculation:
+    job.refresh_from_db()
+    job.status = AttendanceRecalculation.STATUS_FAILED if job.chunks_failed else AttendanceRecalculation.STATUS_COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'completed_at', 'updated_at'])
+    return job
+
+
+def get_progress(job: AttendanceRecalculation) -> Dict:
+    """Progress counters of a job, as maintained by its chunk tasks."""
+    total = job.chunks_total
+    return {
+        'status': job.status,
+        'start_date': job.start_date,
+        'end_date': job.end_date,
+        'chunks_total': total,
+        'chunks_completed': job.chunks_completed,
+        'chunks_failed': job.chunks_failed,
+        'records_updated': job.records_updated,
+        'failed_employees': len(job.failed_employee_ids or []),
+        'percent': round(100 * job.chunks_completed / total, 1) if total else 100.0,
+    }
@@ -3,12 +3,13 @@ Attendance Serializers
 """
 
 from rest_framework import serializers
+from django.conf import settings
 from django.utils import timezone
 from apps.core.upload_validators import validate_upload as _validate_upload
 from .models import (
     Shift, GeoFence, AttendanceRecord,
     AttendancePunch, FraudLog, FaceEmbedding,
-    ShiftAssignment, OvertimeRequest
+    ShiftAssignment, OvertimeRequest, AttendanceRecalculation
 )
 from apps.employees.models import Location
 
@@ -199,6 +200,47 @@ class PunchOutSerializer(PunchInSerializer):
     pass
 
 
+class BulkPunchItemSerializer(serializers.Serializer):
+    """One punch of a bulk ingestion (device or offline sync)"""
+
+    idempotency_key = serializers.CharField(max_length=100)
+    employee = serializers.UUIDField(required=False, allow_null=True)
+    employee_code = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    punch_type = serializers.ChoiceField(choices=AttendancePunch.PUNCH_TYPES)
+    punch_time = serializers.DateTimeField()
+
+    latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False, allow_null=True)
+    longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False, allow_null=True)
+    accuracy = serializers.DecimalField(max_digits=8, decimal_places=2, required=False, allow_null=True)
+
+    device_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    device_model = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    is_rooted = serializers.BooleanField(required=False, default=False)
+    is_emulator = serializers.BooleanField(required=False, default=False)
+    is_mock_gps = serializers.BooleanField(required=False, default=False)
+
+    # Null when the terminal does not verify faces (fingerprint, card)
+    face_verified = serializers.BooleanField(required=False, allow_null=True, default=None)
+    liveness_verified = serializers.BooleanField(required=False, allow_null=True, default=None)
+    face_confidence = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=1, required=False, allow_null=True
+    )
+
+    def validate(self, attrs):
+        if not attrs.get('employee') and not attrs.get('employee_code'):
+            raise serializers.ValidationError('employee or employee_code is required.')
+        return attrs
+
+
+class BulkPunchSerializer(serializers.Serializer):
+    """Bulk punch ingestion request"""
+
+    punches = BulkPunchItemSerializer(
+        many=True, allow_empty=False,
+        max_length=getattr(settings, 'ATTENDANCE_BULK_PUNCH_MAX_ITEMS', 5000),
+    )
+
+
 class PunchResponseSerializer(serializers.Serializer):
     """Punch response serializer"""
     
@@ -242,6 +284,19 @@ class FraudLogSerializer(TenantScopedSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class AttendanceRecalculationSerializer(serializers.ModelSerializer):
+    """Recalculation job with its fan-out counters (read-only)"""
+
+    class Meta:
+        model = AttendanceRecalculation
+        fields = [
+            'id', 'start_date', 'end_date', 'employee_ids', 'reason', 'status',
+            'chunks_total', 'chunks_completed', 'chunks_failed', 'records_updated',
+            'failed_employee_ids', 'completed_at', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class AttendanceSummarySerializer(serializers.Serializer):
     """Attendance summary for dashboard"""
     
@@ -5,10 +5,10 @@ Attendance Services - Geo-fence, Fraud Detection, Verification
 import math
 from decimal import Decimal
 from datetime import datetime, timedelta
-from calendar import monthrange
 from typing import Dict, List, Optional, Tuple
 from django.utils import timezone
-from django.db.models import Sum, Q, Count
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 
 
 class GeoFenceService:
@@ -57,61 +57,53 @@ class GeoFenceService:
                 'message': str
             }
         """
-        from apps.attendance.models import GeoFence
-        
-        # Get geo-fences for employee's location
-        geo_fences = []
-        
-        # Primary geo-fence from employee's location
-        if employee.location_id:
-            geo_fences = list(GeoFence.objects.filter(
-                location_id=employee.location_id,
-                is_active=True
-            ))
-        
-        if not geo_fences:
+        return cls.validate_locations(employee, [(latitude, longitude, accuracy)])[0]
+
+    @classmethod
+    def validate_locations(cls, employee, points: List[Tuple]) -> List[Dict]:
+        """
+        Validate many (latitude, longitude, accuracy) points of one employee
+        at once (offline punch sync). Results are aligned with ``points``
+        and shaped like ``validate_location``.
+        """
+        from apps.attendance import geofence_index
+
+        # Geo-fences of the employee's location, from the process-local index
+        index = geofence_index.get_index(employee.location_id) if employee.location_id else None
+
+        if not index:
             # No geo-fences configured - allow punch
-            return {
-                'valid': True,
-                'geo_fence': None,
-                'distance_meters': 0,
-                'message': 'No geo-fence configured - punch allowed'
-            }
-        
-        # Check each geo-fence
-        best_match = None
-        min_distance = float('inf')
-        
-        for geo_fence in geo_fences:
-            distance = cls.haversine_distance(
-                latitude, longitude,
-                float(geo_fence.latitude), float(geo_fence.longitude)
-            )
-            
-            if distance < min_distance:
-                min_distance = distance
-                best_match = geo_fence
-            
-            # Check if within radius (considering accuracy)
-            effective_radius = geo_fence.radius_meters
-            if accuracy and accuracy > 0:
-                effective_radius += accuracy  # Allow for GPS inaccuracy
-            
-            if distance <= effective_radius:
-                return {
+            return [
+                {
                     'valid': True,
-                    'geo_fence': geo_fence,
-                    'distance_meters': distance,
-                    'message': f'Within geo-fence: {geo_fence.name}'
+                    'geo_fence': None,
+                    'distance_meters': 0,
+                    'message': 'No geo-fence configured - punch allowed'
                 }
-        
-        # Not within any geo-fence
-        return {
-            'valid': False,
-            'geo_fence': best_match,
-            'distance_meters': min_distance,
-            'message': f'Outside geo-fence. Nearest: {best_match.name} ({min_distance:.0f}m away)'
-        }
+                for _ in points
+            ]
+
+        latitudes, longitudes, accuracies = zip(*points) if points else ((), (), ())
+        matches = index.match(
+            [float(value) for value in latitudes],
+            [float(value) for value in longitudes],
+            [float(value) if value else 0.0 for value in accuracies],
+        )
+
+        results = []
+        for match in matches:
+            geo_fence = geofence_index.fence_copy(index, match.fence)
+            if match.valid:
+                message = f'Within geo-fence: {geo_fence.name}'
+            else:
+                message = f'Outside geo-fence. Nearest: {geo_fence.name} ({match.distance:.0f}m away)'
+            results.append({
+                'valid': match.valid,
+                'geo_fence': geo_fence,
+                'distance_meters': match.distance,
+                'message': message
+            })
+        return results
 
 
 class FraudDetectionService:
@@ -138,10 +130,14 @@ class FraudDetectionService:
         cls,
         employee,
         punch_data: Dict,
-        previous_punches: List = None
+        previous_punches: List = None,
+        recent_devices: List[str] = None
     ) -> Tuple[Decimal, List[str]]:
         """
         Calculate fraud score for a punch.
+
+        ``recent_devices`` (from the punch context) saves the device
+        history query.
         
         Returns:
             (fraud_score: Decimal, fraud_flags: List[str])
@@ -166,7 +162,7 @@ class FraudDetectionService:
         
         # Device mismatch (using different device than usual)
         if punch_data.get('device_id'):
-            if cls._is_device_mismatch(employee, punch_data['device_id']):
+            if cls._is_device_mismatch(employee, punch_data['device_id'], recent_devices):
                 score += cls.WEIGHTS['device_mismatch']
                 flags.append('device_mismatch')
         
@@ -197,17 +193,18 @@ class FraudDetectionService:
         return fraud_score, flags
     
     @classmethod
-    def _is_device_mismatch(cls, employee, device_id: str) -> bool:
+    def _is_device_mismatch(cls, employee, device_id: str, recent_devices: List[str] = None) -> bool:
         """Check if device is different from usual"""
         from apps.attendance.models import AttendancePunch
         
         # Get last 10 punches
-        recent_devices = AttendancePunch.objects.filter(
-            employee=employee,
-            device_id__isnull=False
-        ).exclude(
-            device_id=''
-        ).order_by('-punch_time')[:10].values_list('device_id', flat=True)
+        if recent_devices is None:
+            recent_devices = list(AttendancePunch.objects.filter(
+                employee=employee,
+                device_id__isnull=False
+            ).exclude(
+                device_id=''
+            ).order_by('-punch_time')[:10].values_list('device_id', flat=True))
         
         if not recent_devices:
             return False  # No history, can't determine mismatch
@@ -266,20 +263,52 @@ class AttendanceService:
     def _validate_tenant(employee, organization) -> bool:
         return not organization or employee.organization_id == organization.id
 
-    @classmethod
-    def _validate_security_flags(cls, employee, punch_data: Dict):
+    @staticmethod
+    def _device_security_message(punch_data: Dict) -> Optional[str]:
         if punch_data.get('is_rooted'):
-            return cls._build_failure('Rooted or jailbroken devices are not allowed.')
+            return 'Rooted or jailbroken devices are not allowed.'
         if punch_data.get('is_emulator'):
-            return cls._build_failure('Punch rejected because the device appears to be an emulator.')
+            return 'Punch rejected because the device appears to be an emulator.'
         if punch_data.get('is_mock_gps'):
-            return cls._build_failure('Mock GPS detected. Disable mock locations to continue.')
+            return 'Mock GPS detected. Disable mock locations to continue.'
+        return None
+
+    @classmethod
+    def _validate_security_flags(cls, employee, punch_data: Dict, recent_devices: List[str] = None):
+        message = cls._device_security_message(punch_data)
+        if message:
+            return cls._build_failure(message)
 
         device_id = punch_data.get('device_id')
-        if device_id and cls._is_device_mismatch(employee, device_id):
+        if device_id and FraudDetectionService._is_device_mismatch(employee, device_id, recent_devices):
             return cls._build_failure('Device mismatch detected. Please use the registered device to punch.')
         return None
 
+    @staticmethod
+    def _create_todays_record(employee, organization, today, punch_data: Dict):
+        """Insert the day's record; a concurrent first punch-in that won the insert is re-read."""
+        from apps.attendance.models import AttendanceRecord
+
+        try:
+            with transaction.atomic():
+                attendance = AttendanceRecord(
+                    employee=employee,
+                    date=today,
+                    device_id=punch_data.get('device_id', ''),
+                    organization=organization,
+                    branch_id=employee.branch_id,
+                )
+                attendance.save(validate=False)
+                return attendance
+        except IntegrityError:
+            return AttendanceRecord.objects.get(employee=employee, date=today)
+
+    @staticmethod
+    def _is_payroll_locked(context, target_date) -> bool:
+        # Same rule as AttendanceRecord.clean, from the cached lock date
+        locked_before = context.payroll_locked_through
+        return bool(locked_before and target_date < locked_before)
+
     @staticmethod
     def _is_low_face_confidence(punch_data: Dict) -> bool:
         face_confidence = punch_data.get('face_confidence')
@@ -296,15 +325,76 @@ class AttendanceService:
             return
         from apps.attendance.models import FraudLog
 
-        for event in events:
-            FraudLog.objects.create(
+        FraudLog.objects.bulk_create([
+            FraudLog(
                 employee=employee,
-                organization=punch.organization,
+                organization_id=punch.organization_id,
                 punch=punch,
                 fraud_type=event['type'],
                 severity=event.get('severity', 'medium'),
                 details=event.get('details', {})
             )
+            for event in events
+        ])
+
+    @classmethod
+    def _score_punch(cls, employee, punch_data: Dict, geo_result: Optional[Dict],
+                     previous_punches: List, recent_devices: List[str]) -> Dict:
+        """
+        Fraud score, flags and FraudLog events of one punch. ``geo_result``
+        is None when the punch carries no location (biometric terminals).
+        """
+        fraud_score, fraud_flags = FraudDetectionService.calculate_fraud_score(
+            employee, punch_data, previous_punches, recent_devices
+        )
+        fraud_events = []
+
+        if geo_result and not geo_result['valid']:
+            fraud_score += Decimal('40')
+            fraud_flags.append('geo_mismatch')
+            fraud_events.append({
+                'type': 'geo_mismatch',
+                'severity': 'high',
+                'details': {
+                    'message': geo_result['message'],
+                    'distance_meters': geo_result.get('distance_meters'),
+                }
+            })
+
+        low_face_confidence = cls._is_low_face_confidence(punch_data)
+        if low_face_confidence:
+            fraud_score += Decimal('30')
+            fraud_flags.append('low_face_confidence')
+            fraud_events.append({
+                'type': 'face_mismatch',
+                'severity': 'medium',
+                'details': {'face_confidence': float(punch_data.get('face_confidence') or 0)}
+            })
+
+        flagged = FraudDetectionService.should_flag_for_review(fraud_score)
+        if flagged:
+            logged_types = {event['type'] for event in fraud_events}
+            severity = FraudDetectionService.get_severity(fraud_score)
+            for flag in fraud_flags:
+                if flag in logged_types:
+                    continue
+                fraud_events.append({
+                    'type': flag,
+                    'severity': severity,
+                    'details': {
+                        'fraud_score': float(fraud_score),
+                        'device_id': punch_data.get('device_id', ''),
+                    }
+                })
+                logged_types.add(flag)
+
+        return {
+            'fraud_score': fraud_score,
+            'fraud_flags': fraud_flags,
+            'fraud_events': fraud_events,
+            'low_face_confidence': low_face_confidence,
+            'flagged': flagged,
+        }
 
     @classmethod
     def _apply_shift_status(cls, attendance, shift, total_hours: Optional[Decimal] = None):
@@ -375,7 +465,12 @@ class AttendanceService:
                 'fraud_score': float,
                 'warnings': list,
             }
+
+        Device history, recent punches, today's shift and the payroll lock
+        date come from the punch context cache; records are written without
+        ``full_clean`` since their checks are done here.
         """
+        from apps.attendance import punch_context
         from apps.attendance.models import AttendanceRecord, AttendancePunch
 
         organization = organization or employee.organization
@@ -387,21 +482,21 @@ class AttendanceService:
         if not punch_data.get('liveness_verified', False):
             return cls._build_failure('Liveness detection failed. Punch rejected.')
 
-        security_failure = cls._validate_security_flags(employee, punch_data)
+        today = timezone.localdate()
+        context = punch_context.load(employee, today)
+
+        security_failure = cls._validate_security_flags(employee, punch_data, context.device_ids)
         if security_failure:
             return security_failure
 
-        today = timezone.localdate()
+        if cls._is_payroll_locked(context, today):
+            return cls._build_failure('Attendance is locked because payroll has been processed.')
+
         warnings = []
-        attendance, _ = AttendanceRecord.objects.get_or_create(
-            employee=employee,
-            date=today,
-            defaults={
-                'device_id': punch_data.get('device_id', ''),
-                'organization': organization,
-                'branch': employee.branch,
-            }
-        )
+        attendance = AttendanceRecord.objects.filter(employee=employee, date=today).first()
+        if attendance is None:
+            attendance = cls._create_todays_record(employee, organization, today, punch_data)
+        attendance.employee = employee
 
         if attendance.organization_id != organization.id:
             return cls._build_failure('Attendance record belongs to another tenant.', attendance)
@@ -419,42 +514,36 @@ class AttendanceService:
         if not geo_result['valid']:
             warnings.append(geo_result['message'])
 
-        previous_punches = list(AttendancePunch.objects.filter(
-            employee=employee
-        ).order_by('-punch_time')[:5])
+        scoring = cls._score_punch(employee, punch_data, geo_result, context.punches, context.device_ids)
+        fraud_score, fraud_flags = scoring['fraud_score'], scoring['fraud_flags']
+        flagged = scoring['flagged']
 
-        fraud_score, fraud_flags = FraudDetectionService.calculate_fraud_score(
-            employee, punch_data, previous_punches
-        )
-        fraud_events = []
+        punch_time = timezone.now()
+        shift = context.shift
 
-        if not geo_result['valid']:
-            fraud_score += Decimal('40')
-            fraud_flags.append('geo_mismatch')
-            fraud_events.append({
-                'type': 'geo_mismatch',
-                'severity': 'high',
-                'details': {
-                    'message': geo_result['message'],
-                    'distance_meters': geo_result.get('distance_meters'),
-                }
-            })
+        attendance.check_in = punch_time
+        attendance.check_in_latitude = punch_data.get('latitude')
+        attendance.check_in_longitude = punch_data.get('longitude')
+        attendance.check_in_fraud_score = fraud_score
+        attendance.device_id = punch_data.get('device_id', '')
+        attendance.branch_id = attendance.branch_id or employee.branch_id
 
-        low_face_confidence = cls._is_low_face_confidence(punch_data)
-        if low_face_confidence:
-            fraud_score += Decimal('30')
-            fraud_flags.append('low_face_confidence')
-            fraud_events.append({
-                'type': 'face_mismatch',
-                'severity': 'medium',
-                'details': {'face_confidence': float(punch_data.get('face_confidence') or 0)}
-            })
+        if shift:
+            late_minutes = cls._calculate_late_minutes(punch_time, shift)
+            attendance.late_minutes = late_minutes
+            if late_minutes > 0:
+                warnings.append(f'Late by {late_minutes} minutes')
+        cls._apply_shift_status(attendance, shift)
 
-        punch_time = timezone.now()
-        punch = AttendancePunch.objects.create(
+        if flagged:
+            attendance.is_flagged = True
+            warnings.append('Flagged for review due to potential fraud indicators')
+        attendance.save(validate=False)
+
+        punch = AttendancePunch(
             employee=employee,
             organization=organization,
-            branch=employee.branch,
+            branch_id=attendance.branch_id,
             attendance=attendance,
             punch_type=AttendancePunch.PUNCH_IN,
             punch_time=punch_time,
@@ -472,48 +561,14 @@ class AttendanceService:
             liveness_verified=punch_data.get('liveness_verified', False),
             fraud_score=fraud_score,
             fraud_flags=fraud_flags,
-            is_flagged=low_face_confidence,
+            is_flagged=scoring['low_face_confidence'] or flagged,
             selfie=punch_data.get('selfie'),
         )
+        punch.save(validate=False)
+        context.record_punch(punch_time, punch.punch_type, punch.device_id)
+        punch_context.save_after_commit(context)
 
-        shift = cls._get_employee_shift(employee)
-
-        attendance.check_in = punch_time
-        attendance.check_in_latitude = punch_data.get('latitude')
-        attendance.check_in_longitude = punch_data.get('longitude')
-        attendance.check_in_fraud_score = fraud_score
-        attendance.device_id = punch_data.get('device_id', '')
-        attendance.branch = attendance.branch or employee.branch
-
-        if shift:
-            late_minutes = cls._calculate_late_minutes(punch_time, shift)
-            attendance.late_minutes = late_minutes
-            if late_minutes > 0:
-                warnings.append(f'Late by {late_minutes} minutes')
-        cls._apply_shift_status(attendance, shift)
-
-        logged_types = {event['type'] for event in fraud_events}
-        if FraudDetectionService.should_flag_for_review(fraud_score):
-            attendance.is_flagged = True
-            warnings.append('Flagged for review due to potential fraud indicators')
-            punch.is_flagged = True
-            punch.save(update_fields=['is_flagged'])
-            severity = FraudDetectionService.get_severity(fraud_score)
-            for flag in fraud_flags:
-                if flag in logged_types:
-                    continue
-                fraud_events.append({
-                    'type': flag,
-                    'severity': severity,
-                    'details': {
-                        'fraud_score': float(fraud_score),
-                        'device_id': punch.device_id,
-                    }
-                })
-                logged_types.add(flag)
-
-        cls._create_fraud_logs(employee, punch, fraud_events)
-        attendance.save()
+        cls._create_fraud_logs(employee, punch, scoring['fraud_events'])
 
         return {
             'success': True,
@@ -526,7 +581,8 @@ class AttendanceService:
     
     @classmethod
     def punch_out(cls, employee, punch_data: Dict, organization=None) -> Dict:
-        """Process punch-out request"""
+        """Process punch-out request (same punch context as punch_in)"""
+        from apps.attendance import punch_context
         from apps.attendance.models import AttendanceRecord, AttendancePunch
 
         organization = organization or employee.organization
@@ -538,17 +594,23 @@ class AttendanceService:
         if not punch_data.get('liveness_verified', False):
             return cls._build_failure('Liveness verification failed. Punch rejected.')
 
-        security_failure = cls._validate_security_flags(employee, punch_data)
+        today = timezone.localdate()
+        context = punch_context.load(employee, today)
+
+        security_failure = cls._validate_security_flags(employee, punch_data, context.device_ids)
         if security_failure:
             return security_failure
 
-        today = timezone.localdate()
         warnings = []
 
         try:
             attendance = AttendanceRecord.objects.get(employee=employee, date=today)
         except AttendanceRecord.DoesNotExist:
             return cls._build_failure('No punch-in found for today. Please punch in first.', warnings=['No punch-in record'])
+        attendance.employee = employee
+
+        if cls._is_payroll_locked(context, today):
+            return cls._build_failure('Attendance is locked because payroll has been processed.', attendance)
 
         if attendance.organization_id != organization.id:
             return cls._build_failure('Attendance record belongs to another tenant.', attendance)
@@ -569,42 +631,40 @@ class AttendanceService:
         if not geo_result['valid']:
             warnings.append(geo_result['message'])
 
-        previous_punches = list(AttendancePunch.objects.filter(
-            employee=employee
-        ).order_by('-punch_time')[:5])
+        scoring = cls._score_punch(employee, punch_data, geo_result, context.punches, context.device_ids)
+        fraud_score, fraud_flags = scoring['fraud_score'], scoring['fraud_flags']
+        flagged = scoring['flagged']
 
-        fraud_score, fraud_flags = FraudDetectionService.calculate_fraud_score(
-            employee, punch_data, previous_punches
-        )
-        fraud_events = []
+        punch_time = timezone.now()
 
-        if not geo_result['valid']:
-            fraud_score += Decimal('40')
-            fraud_flags.append('geo_mismatch')
-            fraud_events.append({
-                'type': 'geo_mismatch',
-                'severity': 'high',
-                'details': {
-                    'message': geo_result['message'],
-                    'distance_meters': geo_result.get('distance_meters'),
-                }
-            })
+        attendance.check_out = punch_time
+        attendance.check_out_latitude = punch_data.get('latitude')
+        attendance.check_out_longitude = punch_data.get('longitude')
+        attendance.check_out_fraud_score = fraud_score
 
-        low_face_confidence = cls._is_low_face_confidence(punch_data)
-        if low_face_confidence:
-            fraud_score += Decimal('30')
-            fraud_flags.append('low_face_confidence')
-            fraud_events.append({
-                'type': 'face_mismatch',
-                'severity': 'medium',
-                'details': {'face_confidence': float(punch_data.get('face_confidence') or 0)}
-            })
+        total_seconds = (attendance.check_out - attendance.check_in).total_seconds()
+        total_hours = (Decimal(total_seconds) / Decimal('3600')).quantize(Decimal('0.01'))
+        attendance.total_hours = total_hours
 
-        punch_time = timezone.now()
-        punch = AttendancePunch.objects.create(
+        shift = context.shift
+        if shift:
+            early_out_mins = cls._calculate_early_out_minutes(punch_time, shift)
+            attendance.early_out_minutes = early_out_mins
+            if early_out_mins > 0:
+                warnings.append(f'Early out by {early_out_mins} minutes')
+        cls._apply_shift_status(attendance, shift, total_hours)
+        if shift and attendance.status == AttendanceRecord.STATUS_HALF_DAY:
+            warnings.append('Marked as half day due to insufficient hours')
+        cls._ensure_overtime_request(attendance, total_hours, shift)
+
+        if flagged:
+            attendance.is_flagged = True
+        attendance.save(validate=False)
+
+        punch = AttendancePunch(
             employee=employee,
             organization=organization,
-            branch=attendance.branch or employee.branch,
+            branch_id=attendance.branch_id or employee.branch_id,
             attendance=attendance,
             punch_type=AttendancePunch.PUNCH_OUT,
             punch_time=punch_time,
@@ -622,51 +682,14 @@ class AttendanceService:
             liveness_verified=punch_data.get('liveness_verified', False),
             fraud_score=fraud_score,
             fraud_flags=fraud_flags,
-            is_flagged=low_face_confidence,
+            is_flagged=scoring['low_face_confidence'] or flagged,
             selfie=punch_data.get('selfie'),
         )
+        punch.save(validate=False)
+        context.record_punch(punch_time, punch.punch_type, punch.device_id)
+        punch_context.save_after_commit(context)
 
-        attendance.check_out = punch_time
-        attendance.check_out_latitude = punch_data.get('latitude')
-        attendance.check_out_longitude = punch_data.get('longitude')
-        attendance.check_out_fraud_score = fraud_score
-
-        total_seconds = (attendance.check_out - attendance.check_in).total_seconds()
-        total_hours = (Decimal(total_seconds) / Decimal('3600')).quantize(Decimal('0.01'))
-        attendance.total_hours = total_hours
-
-        shift = cls._get_employee_shift(employee)
-        if shift:
-            early_out_mins = cls._calculate_early_out_minutes(punch_time, shift)
-            attendance.early_out_minutes = early_out_mins
-            if early_out_mins > 0:
-                warnings.append(f'Early out by {early_out_mins} minutes')
-        cls._apply_shift_status(attendance, shift, total_hours)
-        if shift and attendance.status == AttendanceRecord.STATUS_HALF_DAY:
-            warnings.append('Marked as half day due to insufficient hours')
-        cls._ensure_overtime_request(attendance, total_hours, shift)
-
-        logged_types = {event['type'] for event in fraud_events}
-        if FraudDetectionService.should_flag_for_review(fraud_score):
-            attendance.is_flagged = True
-            punch.is_flagged = True
-            punch.save(update_fields=['is_flagged'])
-            severity = FraudDetectionService.get_severity(fraud_score)
-            for flag in fraud_flags:
-                if flag in logged_types:
-                    continue
-                fraud_events.append({
-                    'type': flag,
-                    'severity': severity,
-                    'details': {
-                        'fraud_score': float(fraud_score),
-                        'device_id': punch.device_id,
-                    }
-                })
-                logged_types.add(flag)
-
-        cls._create_fraud_logs(employee, punch, fraud_events)
-        attendance.save()
+        cls._create_fraud_logs(employee, punch, scoring['fraud_events'])
 
         return {
             'success': True,
@@ -682,10 +705,10 @@ class AttendanceService:
         """
         Get employee's assigned shift for a specific date.
         
-        Lookup order:
+        Read from the materialized shift calendar
+        (apps/attendance/shift_calendar.py), which resolves:
         1. Active ShiftAssignment for employee on target date
-        2. Department default shift (if configured)
-        3. Organization default shift ('GEN')
+        2. Organization default shift ('GEN')
         
         Args:
             employee: Employee instance
@@ -694,39 +717,23 @@ class AttendanceService:
         Returns:
             Shift instance or None
         """
-        from apps.attendance.models import Shift, ShiftAssignment
+        from apps.attendance import shift_calendar
         
         if target_date is None:
             target_date = timezone.localdate()
         
-        # 1. Check for employee-specific shift assignment
-        shift_assignment = ShiftAssignment.objects.filter(
-            employee=employee,
-            effective_from__lte=target_date,
-            is_active=True
-        ).filter(
-            Q(effective_to__isnull=True) | Q(effective_to__gte=target_date)
-        ).select_related('shift').order_by('-effective_from').first()
-        
-        if shift_assignment and shift_assignment.shift.is_active:
-            return shift_assignment.shift
-        
-        # 2. Fallback to department default shift (if configured)
-        if employee.department_id and hasattr(employee.department, 'default_shift_id'):
-            dept_shift = Shift.objects.filter(
-                id=employee.department.default_shift_id,
-                is_active=True
-            ).first()
-            if dept_shift:
-                return dept_shift
-        
-        # 3. Fallback to organization default 'GEN' shift
-        return Shift.objects.filter(
-            code='GEN',
-            organization=employee.organization,
-            is_active=True
-        ).first()
+        return shift_calendar.shift_for(employee, target_date)
     
+    @classmethod
+    def _get_employee_shifts(cls, organization_id, pairs) -> Dict:
+        """
+        Batch form of ``_get_employee_shift`` for (employee_id, date) pairs:
+        one calendar query whatever the number of pairs. Returns {pair: Shift or None}.
+        """
+        from apps.attendance import shift_calendar
+
+        return shift_calendar.shifts_for(organization_id, pairs)
+
     @classmethod
     def _calculate_late_minutes(cls, punch_time: datetime, shift) -> int:
         """Calculate late minutes based on shift"""
@@ -766,41 +773,29 @@ class AttendanceService:
 
     @classmethod
     def get_monthly_summary(cls, organization, employee_id, month: int, year: int) -> Optional[Dict]:
-        """Aggregate attendance metrics for payroll consumption."""
-        from datetime import date
-        from apps.attendance.models import AttendanceRecord
+        """Attendance metrics for payroll consumption, from the monthly rollup."""
+        from apps.attendance.models import AttendanceMonthlySummary
         from apps.employees.models import Employee
 
         employee = Employee.objects.filter(id=employee_id, organization=organization).first()
         if not employee:
             return None
 
-        _, last_day = monthrange(year, month)
-        start_date = date(year, month, 1)
-        end_date = date(year, month, last_day)
-
-        records = AttendanceRecord.objects.filter(
+        summary = AttendanceMonthlySummary.objects.filter(
             organization=organization,
             employee=employee,
-            date__gte=start_date,
-            date__lte=end_date
-        )
-
-        aggregates = records.aggregate(
-            present_days=Count('id', filter=Q(status=AttendanceRecord.STATUS_PRESENT)),
-            half_days=Count('id', filter=Q(status=AttendanceRecord.STATUS_HALF_DAY)),
-            late_days=Count('id', filter=Q(status=AttendanceRecord.STATUS_LATE)),
-            overtime_hours=Sum('overtime_hours'),
-        )
+            year=year,
+            month=month
+        ).first()
 
         return {
             'employee_id': str(employee.id),
             'month': month,
             'year': year,
-            'present_days': aggregates['present_days'] or 0,
-            'half_days': aggregates['half_days'] or 0,
-            'late_days': aggregates['late_days'] or 0,
-            'overtime_hours': (aggregates['overtime_hours'] or Decimal('0')).quantize(Decimal('0.01')),
+            'present_days': summary.present_days if summary else 0,
+            'half_days': summary.half_days if summary else 0,
+            'late_days': summary.late_days if summary else 0,
+            'overtime_hours': (summary.overtime_hours if summary else Decimal('0')).quantize(Decimal('0.01')),
         }
 
 
@@ -917,19 +912,19 @@ class ShiftManagementService:
         Returns:
             List of {'date': date, 'shift': Shift, 'shift_name': str}
         """
-        from datetime import timedelta
+        from apps.attendance import shift_calendar
         
+        shifts = shift_calendar.shifts_between(
+            employee.organization_id, [employee.id], start_date, end_date
+        )
         schedule = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            shift = AttendanceService._get_employee_shift(employee, current_date)
+        for current_date in shift_calendar.days_between(start_date, end_date):
+            shift = shifts[(employee.id, current_date)]
             schedule.append({
                 'date': current_date,
                 'shift': shift,
                 'shift_name': shift.name if shift else 'No Shift Assigned'
             })
-            current_date += timedelta(days=1)
         
         return schedule
     
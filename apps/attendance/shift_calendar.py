@@ -0,0 +1,227 @@
+"""
+Shift calendar - materialized (employee, date) -> shift
+
+``EmployeeShiftDay`` rows hold the shift in effect for an employee on a
+date, resolved once with the rules of ``AttendanceService._get_employee_shift``:
+
+1. the latest active ShiftAssignment covering the date, if its shift is active
+2. otherwise the organization's active 'GEN' shift
+
+Readers (punches, bulk ingestion, schedules, monthly reports, payroll)
+fetch any date range with one query and can join against the table.
+Reads never write: pairs not materialized (dates outside the window) are
+resolved in bulk (two queries) and returned without being stored.
+
+Freshness (apps/attendance/signals.py):
+- ShiftAssignment writes drop the employee's rows from the earliest
+  affected date and re-materialize them within the rolling window
+  (SHIFT_CALENDAR_PAST_DAYS back, SHIFT_CALENDAR_FUTURE_DAYS ahead).
+- Shift writes are applied in place with set-based UPDATEs: days assigned
+  to the shift follow its ``is_active``, and a change of the 'GEN' shift
+  re-points every default day of the organization.
+
+``build`` materializes the window for a whole organization. The
+``attendance.shift_calendar.build`` beat entry runs it nightly for every
+active organization so the window keeps moving forward with today
+(``manage.py build_shift_calendar`` does the same on demand).
+"""
+
+import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import EmployeeShiftDay, Shift, ShiftAssignment
+
+GENERAL_SHIFT_CODE = 'GEN'
+
+PAST_DAYS = getattr(settings, 'SHIFT_CALENDAR_PAST_DAYS', 62)
+FUTURE_DAYS = getattr(settings, 'SHIFT_CALENDAR_FUTURE_DAYS', 62)
+BATCH_SIZE = getattr(settings, 'SHIFT_CALENDAR_BATCH_SIZE', 5000)
+
+Pair = Tuple[object, datetime.date]
+
+
+def window(today: Optional[datetime.date] = None) -> Tuple[datetime.date, datetime.date]:
+    from django.utils import timezone
+
+    today = today or timezone.localdate()
+    return today - datetime.timedelta(days=PAST_DAYS), today + datetime.timedelta(days=FUTURE_DAYS)
+
+
+def days_between(start: datetime.date, end: datetime.date) -> Iterable[datetime.date]:
+    for offset in range((end - start).days + 1):
+        yield start + datetime.timedelta(days=offset)
+
+
+def general_shift(organization_id) -> Optional[Shift]:
+    return Shift.objects.filter(
+        code=GENERAL_SHIFT_CODE,
+        organization_id=organization_id,
+        is_active=True
+    ).first()
+
+
+# --------------------------------------------------
+# RESOLUTION
+# --------------------------------------------------
+def resolve(organization_id, pairs: Iterable[Pair]) -> Dict[Pair, EmployeeShiftDay]:
+    """Unsaved calendar rows for ``pairs``: two queries whatever their number."""
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    dates = [target_date for _, target_date in pairs]
+    assignments = {}
+    for assignment in ShiftAssignment.objects.filter(
+        employee_id__in={employee_id for employee_id, _ in pairs},
+        effective_from__lte=max(dates),
+        is_active=True
+    ).filter(
+        Q(effective_to__isnull=True) | Q(effective_to__gte=min(dates))
+    ).select_related('shift').order_by('-effective_from'):
+        assignments.setdefault(assignment.employee_id, []).append(assignment)
+    general = general_shift(organization_id)
+
+    rows = {}
+    for employee_id, target_date in pairs:
+        row = EmployeeShiftDay(
+            organization_id=organization_id, employee_id=employee_id, date=target_date,
+            shift=general, source=EmployeeShiftDay.SOURCE_DEFAULT,
+        )
+        for assignment in assignments.get(employee_id, ()):
+            if assignment.effective_from <= target_date and (
+                assignment.effective_to is None or assignment.effective_to >= target_date
+            ):
+                row.assignment = assignment
+                if assignment.shift.is_active:
+                    row.shift = assignment.shift
+                    row.source = EmployeeShiftDay.SOURCE_ASSIGNMENT
+                break
+        rows[(employee_id, target_date)] = row
+    return rows
+
+
+def materialize(organization_id, pairs: Iterable[Pair]) -> Dict[Pair, EmployeeShiftDay]:
+    rows = resolve(organization_id, pairs)
+    # A concurrent reader may store the same day first; both resolve alike
+    EmployeeShiftDay.objects.bulk_create(rows.values(), ignore_conflicts=True, batch_size=BATCH_SIZE)
+    return rows
+
+
+# --------------------------------------------------
+# READS
+# --------------------------------------------------
+def shifts_for(organization_id, pairs: Iterable[Pair]) -> Dict[Pair, Optional[Shift]]:
+    """{(employee_id, date): Shift or None} for arbitrary pairs."""
+
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    employees_by_date = {}
+    for employee_id, target_date in pairs:
+        employees_by_date.setdefault(target_date, set()).add(employee_id)
+    match = Q()
+    for target_date, employee_ids in employees_by_date.items():
+        match |= Q(date=target_date, employee_id__in=employee_ids)
+    return _read(organization_id, EmployeeShiftDay.objects.filter(match), pairs)
+
+
+def shifts_between(organization_id, employee_ids: Iterable, start: datetime.date,
+                   end: datetime.date) -> Dict[Pair, Optional[Shift]]:
+    """{(employee_id, date): Shift or None} for every day of ``start``..``end``."""
+
+    employee_ids = set(employee_ids)
+    pairs = {(employee_id, day) for employee_id in employee_ids for day in days_between(start, end)}
+    return _read(organization_id, EmployeeShiftDay.objects.filter(
+        employee_id__in=employee_ids, date__gte=start, date__lte=end,
+    ), pairs)
+
+
+def shift_for(employee, target_date: datetime.date) -> Optional[Shift]:
+    return shifts_for(employee.organization_id, [(employee.id, target_date)])[(employee.id, target_date)]
+
+
+def _read(organization_id, rows, pairs) -> Dict[Pair, Optional[Shift]]:
+    shifts = {
+        (employee_id, target_date): shift
+        for employee_id, target_date, shift in (
+            (row.employee_id, row.date, row.shift) for row in rows.select_related('shift')
+        )
+    }
+    missing = pairs - shifts.keys()
+    if missing:
+        shifts.update((pair, row.shift) for pair, row in resolve(organization_id, missing).items())
+    return shifts
+
+
+# --------------------------------------------------
+# MAINTENANCE
+# --------------------------------------------------
+def rebuild_employees(organization_id, employee_ids: Iterable, since: Optional[datetime.date] = None) -> None:
+    """Drop the employees' days from ``since`` and re-materialize them within the window."""
+
+    employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+    if not employee_ids:
+        return
+    rows = EmployeeShiftDay.objects.filter(employee_id__in=employee_ids)
+    if since:
+        rows = rows.filter(date__gte=since)
+    rows.delete()
+
+    start, end = window()
+    start = max(start, since) if since else start
+    if start <= end:
+        materialize(organization_id, (
+            (employee_id, day) for employee_id in employee_ids for day in days_between(start, end)
+        ))
+
+
+def build(organization_id, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> int:
+    """Materialize the missing days of every active employee; returns rows added."""
+
+    from apps.employees.models import Employee
+
+    default_start, default_end = window()
+    start, end = start or default_start, end or default_end
+    employee_ids = list(
+        Employee.objects.filter(organization_id=organization_id, is_active=True).values_list('id', flat=True)
+    )
+    added = 0
+    for offset in range(0, len(employee_ids), 200):
+        chunk = employee_ids[offset:offset + 200]
+        existing = set(EmployeeShiftDay.objects.filter(
+            employee_id__in=chunk, date__gte=start, date__lte=end,
+        ).values_list('employee_id', 'date'))
+        missing = {
+            (employee_id, day) for employee_id in chunk for day in days_between(start, end)
+        } - existing
+        added += len(materialize(organization_id, missing))
+    return added
+
+
+def assignment_changed(assignment) -> None:
+    since = min(
+        day for day in (assignment.effective_from, getattr(assignment, '_original_effective_from', None)) if day
+    )
+    rebuild_employees(assignment.organization_id, {assignment.employee_id}, since)
+
+
+def shift_changed(shift, removed: bool = False) -> None:
+    """Apply a Shift write (or hard delete, ``removed``) to the days that depend on it."""
+
+    general = general_shift(shift.organization_id)
+    active = shift.is_active and not shift.is_deleted and not removed
+
+    # Days assigned to this shift follow its active flag
+    assigned = EmployeeShiftDay.objects.filter(assignment__shift_id=shift.id)
+    if active:
+        assigned.update(shift_id=shift.id, source=EmployeeShiftDay.SOURCE_ASSIGNMENT)
+    else:
+        assigned.update(shift=general, source=EmployeeShiftDay.SOURCE_DEFAULT)
+
+    if GENERAL_SHIFT_CODE in (shift.code, getattr(shift, '_original_code', None)):
+        EmployeeShiftDay.objects.filter(
+            organization_id=shift.organization_id, source=EmployeeShiftDay.SOURCE_DEFAULT,
+        ).update(shift=general)
@@ -0,0 +1,88 @@
+"""
+Signal handlers for attendance caches.
+
+Keep the per-location geo-fence index (apps/attendance/geofence_index.py)
+in step with GeoFence writes, including soft deletes and moves between
+locations, and the punch context cache (apps/attendance/punch_context.py)
+in step with punch, shift and payroll lock changes, and the shift
+calendar (apps/attendance/shift_calendar.py) in step with Shift and
+ShiftAssignment writes, and the face index (apps/attendance/face_index.py)
+in step with FaceEmbedding writes, and the monthly rollup
+(apps/attendance/monthly_rollup.py) in step with AttendanceRecord writes.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.payroll.models import PayrollRun
+
+from . import face_index, geofence_index, monthly_rollup, punch_context, shift_calendar
+from .models import AttendancePunch, AttendanceRecord, FaceEmbedding, GeoFence, Shift, ShiftAssignment
+
+
+@receiver(post_save, sender=GeoFence)
+@receiver(post_delete, sender=GeoFence)
+def invalidate_geofence_index(sender, instance, **kwargs):
+    geofence_index.invalidate({instance.location_id, getattr(instance, '_original_location_id', None)})
+
+
+@receiver(post_save, sender=FaceEmbedding)
+def refresh_face_index(sender, instance, update_fields=None, **kwargs):
+    key = (instance.organization_id, instance.embedding_model)
+    previous = getattr(instance, '_original_embedding_model', None)
+    if previous and previous != instance.embedding_model:
+        face_index.invalidate({(instance.organization_id, previous)}, discard=True)
+    # Soft deletes and restores save without touching updated_at, which
+    # the incremental sync reads
+    face_index.invalidate({key}, discard=update_fields is not None and 'updated_at' not in update_fields)
+
+
+@receiver(post_delete, sender=FaceEmbedding)
+def discard_face_index(sender, instance, **kwargs):
+    face_index.invalidate({(instance.organization_id, instance.embedding_model)}, discard=True)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_monthly_rollup(sender, instance, created=False, **kwargs):
+    monthly_rollup.record_saved(instance, created)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def remove_from_monthly_rollup(sender, instance, origin=None, **kwargs):
+    monthly_rollup.record_deleted(instance, origin)
+
+
+@receiver(post_save, sender=AttendancePunch)
+@receiver(post_delete, sender=AttendancePunch)
+def invalidate_punch_context(sender, instance, **kwargs):
+    # The punch path stores its own updated context after commit
+    punch_context.invalidate({instance.employee_id})
+
+
+@receiver(post_save, sender=Shift)
+@receiver(post_delete, sender=Shift)
+@receiver(post_save, sender=ShiftAssignment)
+@receiver(post_delete, sender=ShiftAssignment)
+def bump_shift_version(sender, instance, **kwargs):
+    punch_context.bump_shift_version(instance.organization_id)
+
+
+@receiver(post_save, sender=ShiftAssignment)
+@receiver(post_delete, sender=ShiftAssignment)
+def refresh_assignment_calendar(sender, instance, **kwargs):
+    shift_calendar.assignment_changed(instance)
+
+
+@receiver(post_save, sender=Shift)
+def refresh_shift_calendar(sender, instance, **kwargs):
+    shift_calendar.shift_changed(instance)
+
+
+@receiver(post_delete, sender=Shift)
+def clear_shift_calendar(sender, instance, **kwargs):
+    shift_calendar.shift_changed(instance, removed=True)
+
+
+@receiver(post_save, sender=PayrollRun)
+@receiver(post_delete, sender=PayrollRun)
+def invalidate_payroll_lock(sender, instance, **kwargs):
+    punch_context.invalidate_payroll_lock(instance.organization_id)
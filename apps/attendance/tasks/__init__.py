@@ -1,10 +1,18 @@
 """Attendance task package exposing Celery jobs."""
 
-from .recalculation_tasks import recalculate_attendance
+from .recalculation_tasks import (
+    recalculate_attendance,
+    recalculate_attendance_chunk,
+    finalize_attendance_recalculation,
+)
 from .fraud_tasks import evaluate_recent_punches, escalate_flagged_attendance
+from .shift_calendar_tasks import build_shift_calendar
 
 __all__ = [
     'recalculate_attendance',
+    'recalculate_attendance_chunk',
+    'finalize_attendance_recalculation',
     'evaluate_recent_punches',
     'escalate_flagged_attendance',
+    'build_shift_calendar',
 ]
@@ -1,43 +1,19 @@
 """Fraud detection Celery tasks for attendance."""
 
-from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
 from apps.core.celery_tasks import TenantAwareTask
-from apps.attendance.models import AttendancePunch, AttendanceRecord, FraudLog
+from apps.attendance.models import AttendanceRecord
 from apps.notifications.services import NotificationService
 
 
 @shared_task(bind=True)
 def evaluate_recent_punches(self, organization_id: str):
-    """Review recent punches with high fraud scores and persist fraud logs."""
+    """Re-score recent punches in one batch and persist fraud logs and flags."""
+    from apps.attendance import fraud_engine
 
     organization = TenantAwareTask.get_organization(organization_id)
-    cutoff = timezone.now() - timedelta(hours=12)
-    suspicious_punches = AttendancePunch.objects.filter(
-        organization=organization,
-        fraud_score__gte=50,
-        created_at__gte=cutoff
-    ).select_related('employee', 'attendance')
-
-    for punch in suspicious_punches:
-        FraudLog.objects.get_or_create(
-            organization=organization,
-            employee=punch.employee,
-            punch=punch,
-            fraud_type='suspicious_pattern',
-            defaults={
-                'severity': 'high',
-                'details': {
-                    'fraud_score': float(punch.fraud_score or 0),
-                    'punch_type': punch.punch_type,
-                    'flags': punch.fraud_flags,
-                }
-            }
-        )
-        if punch.attendance and not punch.attendance.is_flagged:
-            punch.attendance.is_flagged = True
-            punch.attendance.save(update_fields=['is_flagged'])
+    return fraud_engine.evaluate_window(organization)
 
 
 @shared_task(bind=True)
@@ -64,4 +40,3 @@ def escalate_flagged_attendance(self, organization_id: str):
             entity_type='attendance',
             entity_id=record.id
         )
-*** End Patch
\ No newline at end of file
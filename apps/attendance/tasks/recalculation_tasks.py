@@ -1,28 +1,73 @@
 """Attendance recalculation tasks."""
 
+import logging
 from datetime import datetime
 from celery import shared_task
 from django.utils import timezone
 from apps.core.celery_tasks import TenantAwareTask
-from apps.attendance.models import AttendanceRecord
+from apps.attendance.models import AttendanceRecalculation
 
+logger = logging.getLogger(__name__)
 
-@shared_task(bind=True)
-def recalculate_attendance(self, organization_id: str, attendance_date: str):
-    """Recalculate attendance metrics for a specific date."""
 
-    organization = TenantAwareTask.get_organization(organization_id)
+def _parse_date(value, default):
     try:
-        target_date = datetime.fromisoformat(attendance_date).date()
+        return datetime.fromisoformat(value).date()
     except (TypeError, ValueError):
-        target_date = timezone.localdate()
+        return default
+
+
+@shared_task(bind=True)
+def recalculate_attendance(self, organization_id: str, attendance_date: str, end_date: str = None,
+                           employee_ids: list = None):
+    """Recalculate attendance metrics for a date (or a date range up to ``end_date``)."""
+    from apps.attendance import recalculation
 
-    records = AttendanceRecord.objects.filter(
-        organization=organization,
-        date=target_date
+    organization = TenantAwareTask.get_organization(organization_id)
+    start_date = _parse_date(attendance_date, timezone.localdate())
+    job = recalculation.start(
+        organization, start_date, _parse_date(end_date, start_date), employee_ids,
     )
+    return str(job.id)
+
+
+@shared_task(bind=True, max_retries=3)
+def recalculate_attendance_chunk(self, organization_id: str, recalculation_id: str, employee_ids: list):
+    """
+    Recalculate one employee chunk of a recalculation job.
+
+    Retried with backoff on failure; once retries are exhausted the chunk is
+    recorded as failed on the job and the task returns normally, so the
+    chord still finalizes the other chunks.
+    """
+    from apps.attendance import recalculation
 
-    for record in records:
-        if hasattr(record, 'recalculate'):
-            record.recalculate()
-*** End Patch
\ No newline at end of file
+    organization = TenantAwareTask.get_organization(organization_id)
+    job = AttendanceRecalculation.objects.filter(id=recalculation_id, organization=organization).first()
+    if not job:
+        return {'updated': 0, 'failed': 0}
+
+    try:
+        updated = recalculation.recalculate(organization, job.start_date, job.end_date, employee_ids)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=5 * 2 ** self.request.retries)
+        logger.exception(
+            "Attendance recalculation chunk failed for job %s (%d employees)", recalculation_id, len(employee_ids)
+        )
+        recalculation.record_chunk_failure(job.id, employee_ids)
+        return {'updated': 0, 'failed': len(employee_ids)}
+
+    recalculation.record_chunk(job.id, updated)
+    return {'updated': updated, 'failed': 0}
+
+
+@shared_task(bind=True)
+def finalize_attendance_recalculation(self, chunk_results, organization_id: str, recalculation_id: str):
+    """Chord callback: close the job once every chunk reported."""
+    from apps.attendance import recalculation
+
+    organization = TenantAwareTask.get_organization(organization_id)
+    job = AttendanceRecalculation.objects.filter(id=recalculation_id, organization=organization).first()
+    if job:
+        recalculation.finalize(job)
@@ -0,0 +1,24 @@
+"""Shift calendar Celery tasks."""
+
+from celery import shared_task
+from apps.core.celery_tasks import TenantAwareTask
+
+
+@shared_task(bind=True)
+def build_shift_calendar(self, organization_id: str = None):
+    """Materialize the rolling shift calendar window of one organization.
+
+    Without ``organization_id`` (the nightly beat entry) one task is queued
+    per active organization.
+    """
+    from apps.attendance import shift_calendar
+    from apps.core.models import Organization
+
+    if organization_id is None:
+        organization_ids = list(Organization.objects.filter(is_active=True).values_list('id', flat=True))
+        for pk in organization_ids:
+            build_shift_calendar.delay(str(pk))
+        return {'organizations': len(organization_ids)}
+
+    organization = TenantAwareTask.get_organization(organization_id)
+    return {'organization_id': str(organization.id), 'added': shift_calendar.build(organization.id)}
@@ -6,7 +6,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     ShiftViewSet, GeoFenceViewSet, AttendanceViewSet, FraudLogViewSet,
-    AttendancePunchViewSet, ShiftAssignmentViewSet, AttendancePayrollSummaryView
+    AttendancePunchViewSet, ShiftAssignmentViewSet, AttendancePayrollSummaryView,
+    AttendanceRecalculationViewSet
 )
 
 router = DefaultRouter()
@@ -16,6 +17,7 @@ router.register(r'records', AttendanceViewSet, basename='attendance')
 router.register(r'punches', AttendancePunchViewSet, basename='punch')
 router.register(r'fraud-logs', FraudLogViewSet, basename='fraud-log')
 router.register(r'shift-assignments', ShiftAssignmentViewSet, basename='shift-assignment')
+router.register(r'recalculations', AttendanceRecalculationViewSet, basename='attendance-recalculation')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -12,7 +12,6 @@ from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.db.models import Sum, Count, Q
-from django.db.models.functions import ExtractMonth
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import timedelta
 import pytz
@@ -48,15 +47,16 @@ def get_employee_date(employee):
 
 from .models import (
     Shift, GeoFence, AttendanceRecord,
-    AttendancePunch, FraudLog, ShiftAssignment, OvertimeRequest
+    AttendancePunch, FraudLog, ShiftAssignment, OvertimeRequest, AttendanceMonthlySummary,
+    AttendanceRecalculation
 )
 from .permissions import AttendanceTenantPermission
 from .serializers import (
     ShiftSerializer, GeoFenceSerializer,
     AttendanceRecordListSerializer, AttendanceRecordDetailSerializer,
     AttendancePunchSerializer,
-    PunchInSerializer, PunchOutSerializer, PunchResponseSerializer,
-    AttendanceRegularizationSerializer, FraudLogSerializer,
+    PunchInSerializer, PunchOutSerializer, PunchResponseSerializer, BulkPunchSerializer,
+    AttendanceRegularizationSerializer, FraudLogSerializer, AttendanceRecalculationSerializer,
     AttendanceSummarySerializer, TeamAttendanceSerializer,
     GeoFenceBulkImportSerializer, ShiftAssignmentSerializer,
     ShiftAssignmentBulkSerializer, OvertimeRequestSerializer,
@@ -220,11 +220,11 @@ class AttendanceViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
             return None
         return employee
     
-    def get_queryset(self):
-        queryset = AttendanceRecord.objects.select_related(
-            'employee', 'employee__user', 'approved_by', 'branch'
-        ).prefetch_related('punches')
-        
+    def scope_queryset(self, queryset):
+        """
+        Restrict ``queryset`` (any model with ``organization`` and ``employee``)
+        to the organization, branches and employees the user may see.
+        """
         org = getattr(self.request, 'organization', None)
         if org:
             queryset = queryset.filter(organization=org)
@@ -253,6 +253,13 @@ class AttendanceViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
                 else:
                     queryset = queryset.none()
         
+        return queryset
+    
+    def get_queryset(self):
+        queryset = self.scope_queryset(AttendanceRecord.objects.select_related(
+            'employee', 'employee__user', 'approved_by', 'branch'
+        ).prefetch_related('punches'))
+        
         # Date range filter
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
@@ -679,35 +686,29 @@ class AttendanceViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
     def monthly_report(self, request):
         """Generate monthly attendance report"""
         import calendar
-        from datetime import date
         
         year = int(request.query_params.get('year', timezone.now().year))
         month = int(request.query_params.get('month', timezone.now().month))
         
         _, last_day = calendar.monthrange(year, month)
-        start_date = date(year, month, 1)
-        end_date = date(year, month, last_day)
         
-        queryset = self.get_queryset().filter(
-            date__gte=start_date,
-            date__lte=end_date
-        )
-
-        aggregates = queryset.values(
+        # Monthly rollup (apps/attendance/monthly_rollup.py), one row per employee
+        aggregates = self.scope_queryset(
+            AttendanceMonthlySummary.objects.filter(year=year, month=month, record_count__gt=0)
+        ).values(
             "employee_id",
             "employee__employee_id",
             "employee__user__first_name",
             "employee__user__last_name",
             "employee__department__name",
-        ).annotate(
-            present_days=Count("id", filter=Q(status="present")),
-            absent_days=Count("id", filter=Q(status="absent")),
-            late_days=Count("id", filter=Q(status="late")),
-            half_days=Count("id", filter=Q(status="half_day")),
-            leave_days=Count("id", filter=Q(status="on_leave")),
-            wfh_days=Count("id", filter=Q(status="wfh")),
-            total_hours=Sum("total_hours"),
-            overtime_hours=Sum("overtime_hours"),
+            "present_days",
+            "absent_days",
+            "late_days",
+            "half_days",
+            "leave_days",
+            "wfh_days",
+            "total_hours",
+            "overtime_hours",
         ).order_by("employee__employee_id")
 
         report_data = []
@@ -757,20 +758,12 @@ class AttendanceViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
     def annual_report(self, request):
         """Generate annual attendance report"""
         import calendar
-        from datetime import date
         
         year = int(request.query_params.get('year', timezone.now().year))
         
-        start_date = date(year, 1, 1)
-        end_date = date(year, 12, 31)
-        
-        queryset = self.get_queryset().filter(
-            date__gte=start_date,
-            date__lte=end_date
-        )
-
-        monthly_rows = queryset.annotate(
-            month=ExtractMonth("date")
+        # Monthly rollup (apps/attendance/monthly_rollup.py), one row per employee and month
+        monthly_rows = self.scope_queryset(
+            AttendanceMonthlySummary.objects.filter(year=year, record_count__gt=0)
         ).values(
             "employee_id",
             "employee__employee_id",
@@ -778,11 +771,10 @@ class AttendanceViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
             "employee__user__last_name",
             "employee__department__name",
             "month",
-        ).annotate(
-            present_days=Count("id", filter=Q(status="present")),
-            absent_days=Count("id", filter=Q(status="absent")),
-            total_hours=Sum("total_hours"),
-            overtime_hours=Sum("overtime_hours"),
+            "present_days",
+            "absent_days",
+            "total_hours",
+            "overtime_hours",
         ).order_by("employee__employee_id", "month")
 
         employee_map = {}
@@ -894,8 +886,28 @@ class AttendancePunchViewSet(OrganizationViewSetMixin, viewsets.ModelViewSet):
         'update': ['attendance.view'],
         'partial_update': ['attendance.view'],
         'destroy': ['attendance.view'],
+        'bulk': ['attendance.update'],
     }
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Ingest up to ATTENDANCE_BULK_PUNCH_MAX_ITEMS punches (biometric
+        terminals, turnstiles, offline mobile queues) keyed by idempotency
+        key. Answers one result per punch, in request order.
+        """
+        organization = getattr(request, 'organization', None)
+        if not organization:
+            raise PermissionDenied('Organization context is required.')
+
+        serializer = BulkPunchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        from .ingestion import ingest_punches
+
+        result = ingest_punches(organization, serializer.validated_data['punches'])
+        return Response(result, status=status.HTTP_200_OK)
+
     def perform_create(self, serializer):
         organization = getattr(self.request, 'organization', None)
         if not organization:
@@ -1037,6 +1049,37 @@ class FraudLogViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Read
         })
 
 
+class AttendanceRecalculationViewSet(OrganizationViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """Attendance recalculation jobs and their chunk progress"""
+
+    queryset = AttendanceRecalculation.objects.none()
+    serializer_class = AttendanceRecalculationSerializer
+    permission_classes = [IsAuthenticated, AttendanceTenantPermission, HasPermission]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status']
+    ordering = ['-created_at']
+
+    permission_map = {
+        'list': ['attendance.view'],
+        'retrieve': ['attendance.view'],
+        'progress': ['attendance.view'],
+    }
+
+    def get_queryset(self):
+        queryset = AttendanceRecalculation.objects.all()
+        org = getattr(self.request, 'organization', None)
+        if org:
+            queryset = queryset.filter(organization=org)
+        return queryset
+
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Chunk progress of a recalculation job (counters kept on the job row)"""
+        from .recalculation import get_progress
+
+        return Response(get_progress(self.get_object()))
+
+
 class ShiftAssignmentViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.ModelViewSet):
     """Assign shifts to employees"""
     
@@ -60,18 +60,18 @@ class OrganizationAwareJWTAuthentication(JWTAuthentication):
         # Resolve organization from token if not set by middleware
         if not request_org and token_org_id:
             try:
-                from apps.core.models import Organization
                 from apps.core.context import set_current_organization
+                from apps.core.tenant_cache import get_organization
                 
-                org = Organization.objects.get(id=token_org_id, is_active=True)
-                request.organization = org
-                set_current_organization(org)
-                return
-            except Organization.DoesNotExist:
-                raise AuthenticationFailed(_('Invalid organization in token'))
+                org = get_organization(token_org_id)
             except Exception as e:
                 logger.error(f"JWT org resolution failed: {e}")
                 raise AuthenticationFailed(_('Organization validation error'))
+            if org is None or not org.is_active:
+                raise AuthenticationFailed(_('Invalid organization in token'))
+            request.organization = org
+            set_current_organization(org)
+            return
 
         if not request_org:
             if user.is_superuser:
@@ -68,8 +68,8 @@ class User(AbstractBaseUser, PermissionsMixin):
         if not self.organization_id:
             return None
         try:
-            from apps.core.models import Organization
-            return Organization.objects.get(id=self.organization_id)
+            from apps.core.tenant_cache import get_organization
+            return get_organization(self.organization_id)
         except:
             return None
 
@@ -308,26 +308,26 @@ class User(AbstractBaseUser, PermissionsMixin):
         if not current_org and not self.is_superuser:
             return self.user_roles.none()
 
-        from django.utils import timezone
-        now = timezone.now()
+        return self.user_roles.filter(self.active_roles_q(current_org)).select_related('role')
 
-        qs = self.user_roles.filter(
-            is_active=True
-        ).filter(
-            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=now)
-        ).filter(
-            models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=now)
+    @staticmethod
+    def active_roles_q(current_org):
+        """
+        Role assignments that are active now, scoped to ``current_org``.
+        Shared with list views that prefetch get_roles() for a whole page.
+        """
+        now = timezone.now()
+        q = (
+            models.Q(is_active=True)
+            & (models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=now))
+            & (models.Q(valid_until__isnull=True) | models.Q(valid_until__gte=now))
         )
 
         # 🔒 CRITICAL FIX: tenant scoping
         if current_org:
             # RoleAssignment uses scope+scope_id, not 'organization' field
-            qs = qs.filter(
-                models.Q(scope='global') |
-                models.Q(scope='organization', scope_id=current_org.id)
-            )
-
-        return qs.select_related('role')
+            q &= models.Q(scope='global') | models.Q(scope='organization', scope_id=current_org.id)
+        return q
 
     
     def has_role(self, role_identifier):
@@ -366,16 +366,27 @@ class User(AbstractBaseUser, PermissionsMixin):
         1. Permission overrides (grant or revoke)
         2. Role-based permissions
         """
-        from django.db import connection
         if not self.organization_id:
             return self.is_superuser
 
-        from django.utils import timezone
-        
         # Check for superuser
         if self.is_superuser:
             return True
-        
+
+        from apps.abac.decision_cache import cached_decision
+        from apps.core.context import get_current_organization
+
+        current_org = get_current_organization()
+        return cached_decision(
+            self,
+            current_org.id if current_org else None,
+            permission_code,
+            module,
+            lambda: self._evaluate_permission(permission_code, module),
+        )
+
+    def _evaluate_permission(self, permission_code, module=None):
+        """Uncached ABAC + role evaluation behind has_permission_for."""
         # ABAC policy-based permission check
         try:
             from apps.abac.engine import PolicyEngine
@@ -393,9 +404,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         
         return False
 
-    def get_role_codes(self):
+    def get_role_codes(self, user_roles=None):
         """
         Get list of role codes for the user.
+        ``user_roles`` replaces get_roles() when already loaded.
         """
         # 🔒 SECURITY FIX: Superusers always have 'superuser' role
         roles = set()
@@ -407,18 +419,19 @@ class User(AbstractBaseUser, PermissionsMixin):
             roles.add('org_admin')
 
         # Add assigned roles
-        for user_role in self.get_roles():
+        for user_role in self.get_roles() if user_roles is None else user_roles:
             # Handle both legacy Role model and new RoleAssignment
             if hasattr(user_role, 'role'):
                 roles.add(user_role.role.code)
                 
         return list(roles)
 
-    def get_all_permissions(self):
+    def get_all_permissions(self, user_roles=None):
         """
         🔒 SECURITY FIX:
         Permissions are now tenant-isolated via role scoping.
         Superusers get all permissions.
+        ``user_roles`` replaces get_roles() when already loaded.
         """
         if self.is_superuser:
             # Return all available permissions for superuser
@@ -437,7 +450,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         if self.is_org_admin:
             permissions.add('org_admin_access')
             
-        for user_role in self.get_roles():
+        for user_role in self.get_roles() if user_roles is None else user_roles:
             # Handle both legacy Role model and new RoleAssignment
             if hasattr(user_role, 'role'):
                 # Check for legacy ManyToMany
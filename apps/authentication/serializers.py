@@ -147,22 +147,35 @@ class UserSerializer(serializers.ModelSerializer):
             'is_staff', 'is_org_admin', 'date_joined', 'last_login'
         ]
 
+    # UserViewSet prefetches memberships, roles and branch memberships into
+    # the ``active_*`` attributes; other callers fall back to the model.
+    def _membership(self, obj):
+        memberships = getattr(obj, 'active_memberships', None)
+        if memberships is None:
+            return obj.get_organization_membership()
+        # Same result as organization_memberships.get(is_active=True)
+        return memberships[0] if len(memberships) == 1 else None
+
     @extend_schema_field(OpenApiTypes.BOOL)
     def get_is_org_admin(self, obj):
-        return obj.is_organization_admin()
+        if not hasattr(obj, 'active_memberships'):
+            return obj.is_organization_admin()
+        membership = self._membership(obj)
+        return bool(membership) and membership.role == OrganizationUser.RoleChoices.ORG_ADMIN
 
     @extend_schema_field({'type': 'array', 'items': {'type': 'string'}})
     def get_roles(self, obj):
-        return obj.get_role_codes()
+        return obj.get_role_codes(getattr(obj, 'active_roles', None))
 
     @extend_schema_field({'type': 'array', 'items': {'type': 'string'}})
     def get_permissions(self, obj):
-        return obj.get_all_permissions()
+        return obj.get_all_permissions(getattr(obj, 'active_roles', None))
 
     @extend_schema_field({'type': 'object', 'nullable': True, 'properties': {'id': {'type': 'string'}, 'name': {'type': 'string'}, 'slug': {'type': 'string', 'nullable': True}, 'subscription_status': {'type': 'string', 'nullable': True}}})
     def get_organization(self, obj):
         try:
-            organization = obj.get_organization()
+            membership = self._membership(obj)
+            organization = membership.organization if membership else obj.organization
             if not organization:
                 return None
 
@@ -177,6 +190,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     @extend_schema_field({'type': 'array', 'items': {'type': 'string'}})
     def get_branch_ids(self, obj):
+        if hasattr(obj, 'active_branch_memberships'):
+            return [str(membership.branch_id) for membership in obj.active_branch_memberships]
         try:
             memberships = obj.branch_memberships.filter(is_active=True)
             request = self.context.get('request') if self.context else None
@@ -328,7 +343,8 @@ class UserSelfProfileSerializer(serializers.ModelSerializer):
     @extend_schema_field({'type': 'string', 'nullable': True})
     def get_organization_name(self, obj):
         try:
-            organization = obj.get_organization()
+            membership = self._membership(obj)
+            organization = membership.organization if membership else obj.organization
             if not organization:
                 return None
             return organization.name
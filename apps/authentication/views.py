@@ -346,6 +346,37 @@ class UserViewSet(SuperuserLeakageGuardMixin, viewsets.ModelViewSet):
         if not user.is_superuser:
             qs = qs.filter(is_superuser=False)
 
+        return self._prefetch_serializer_relations(qs, request_org)
+
+    def _prefetch_serializer_relations(self, qs, request_org):
+        """Load what UserSerializer reads per row once for the whole page."""
+        from django.db.models import Prefetch
+        from apps.abac.models import RoleAssignment
+        from apps.core.context import get_current_organization
+
+        branch_memberships = BranchUser.objects.filter(is_active=True)
+        if request_org:
+            branch_memberships = branch_memberships.filter(branch__organization=request_org)
+        qs = qs.prefetch_related(
+            Prefetch(
+                'organization_memberships',
+                queryset=OrganizationUser.objects.filter(is_active=True).select_related('organization'),
+                to_attr='active_memberships',
+            ),
+            Prefetch('branch_memberships', queryset=branch_memberships, to_attr='active_branch_memberships'),
+        )
+
+        # Without an organization get_roles() depends on each row's
+        # is_superuser; leave that case to the model.
+        current_org = get_current_organization()
+        if current_org:
+            qs = qs.prefetch_related(Prefetch(
+                'user_roles',
+                queryset=RoleAssignment._default_manager.filter(
+                    User.active_roles_q(current_org)
+                ).select_related('role'),
+                to_attr='active_roles',
+            ))
         return qs
 
     def get_serializer_class(self):
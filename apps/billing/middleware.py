@@ -1,15 +1,25 @@
-"""Middleware enforcing subscription access rules and feature flags"""
+"""
+Middleware enforcing subscription access rules and feature flags
+
+Read-only: the subscription's access state comes from the tenant context
+cache (apps/core/tenant_cache.py), whose entry expires at the next trial /
+expiry / grace transition. Deactivation and organization status changes
+are applied by the billing sweeper (billing.tasks.subscription_expiry_task),
+never inline on a request.
+"""
 from django.http import JsonResponse
-from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
-from .services import RenewalService, SubscriptionService
+from apps.core.tenant_cache import get_tenant_state
+
+from .models import OrganizationSubscription
 
 EXEMPT_PATH_PREFIXES = (
     '/admin',
     '/api/v1/auth',
     '/api/v1/health',
     '/api/v1/readiness',
+    '/api/metrics',
     '/api/v1/billing',     # billing endpoints must remain accessible
     '/api/admin/billing',
     '/api/schema',
@@ -30,7 +40,7 @@ FEATURE_PATH_MAP = {
 
 
 class SubscriptionMiddleware(MiddlewareMixin):
-    """Block tenant requests when subscription or trial has expired."""
+    """Block tenant requests when subscription or trial has expired. No queries, no writes."""
 
     def process_request(self, request):
         if self._should_skip(request):
@@ -40,36 +50,30 @@ class SubscriptionMiddleware(MiddlewareMixin):
         if not organization:
             return None
 
-        subscription = SubscriptionService.get_active_subscription(organization)
-        if not subscription:
+        state = get_tenant_state(organization.id)
+        if not state or not state.subscription:
             return self._payment_required('No active subscription for organization')
 
         request._subscription_grace_warning = False
 
-        if RenewalService.has_grace_passed(subscription):
-            subscription.deactivate(reason='grace_period_ended')
+        if state.access == OrganizationSubscription.ACCESS_GRACE_LAPSED:
             return self._payment_required(
                 'Subscription expired after the grace window. Renew to continue.'
             )
 
-        if RenewalService.is_within_grace(subscription):
-            RenewalService.mark_org_past_due(subscription)
+        if state.access == OrganizationSubscription.ACCESS_GRACE:
             request._subscription_grace_warning = True
             return None
 
-        RenewalService.mark_org_active(subscription)
-
-        if subscription.is_trial and subscription.trial_end_date:
-            if timezone.now().date() > subscription.trial_end_date:
-                subscription.deactivate()
-                return self._payment_required(
-                    'Trial period has ended. Please activate a paid subscription.'
-                )
+        if state.access == OrganizationSubscription.ACCESS_TRIAL_ENDED:
+            return self._payment_required(
+                'Trial period has ended. Please activate a paid subscription.'
+            )
 
         # Feature gate: block disabled modules
         feature_flag = self._match_feature(request.path)
         if feature_flag:
-            plan = subscription.plan
+            plan = state.plan
             if plan and not getattr(plan, feature_flag, True):
                 return JsonResponse(
                     {
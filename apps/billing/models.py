@@ -62,6 +62,12 @@ class OrganizationSubscription(OrganizationEntity):
 
     GRACE_PERIOD_DEFAULT = 3
 
+    # Request access states, see access_state()
+    ACCESS_OK = 'ok'
+    ACCESS_GRACE = 'grace'
+    ACCESS_GRACE_LAPSED = 'grace_lapsed'
+    ACCESS_TRIAL_ENDED = 'trial_ended'
+
     plan = models.ForeignKey(Plan, on_delete=models.PROTECT, related_name='subscriptions')
     start_date = models.DateField()
     expiry_date = models.DateField()
@@ -153,6 +159,30 @@ class OrganizationSubscription(OrganizationEntity):
         grace_end = self.grace_expires_on
         return today > grace_end
 
+    def access_state(self, today=None):
+        """
+        Return ``(state, changes_on)`` for an active subscription.
+
+        ``state`` is what a request should see today (checked in the same
+        order as the grace/trial properties above) and ``changes_on`` is the
+        first date on which that answer changes, or ``None`` if it never
+        does. Lets callers cache the state until its next transition.
+        """
+        today = today or timezone.now().date()
+        expiry, grace_end = self.expiry_date, self.grace_expires_on
+        trial_end = self.trial_end_date if self.is_trial else None
+        one_day = timedelta(days=1)
+
+        if expiry and today > grace_end:
+            return self.ACCESS_GRACE_LAPSED, None
+        if expiry and expiry < today:
+            return self.ACCESS_GRACE, grace_end + one_day
+        if trial_end and today > trial_end:
+            return self.ACCESS_TRIAL_ENDED, expiry + one_day if expiry else None
+
+        boundaries = [day + one_day for day in (trial_end, expiry) if day]
+        return self.ACCESS_OK, min(boundaries) if boundaries else None
+
 class OrganizationBillingProfile(OrganizationEntity):
     """Stores GST billing details per organization"""
 
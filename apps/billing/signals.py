@@ -9,13 +9,15 @@ Signal handlers for subscription automation.
 import logging
 
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 from apps.authentication.models_hierarchy import Branch
 from apps.core.models import Organization
+from apps.core.tenant_cache import invalidate_organization
 from apps.employees.models import Document, Employee
 
+from .models import OrganizationSubscription, Plan
 from .services import SubscriptionService, SubscriptionEnforcer
 
 logger = logging.getLogger(__name__)
@@ -85,4 +87,26 @@ def enforce_storage_limit(sender, instance, **kwargs):
         return
 
     SubscriptionEnforcer.check_storage_limit(instance.organization, delta)
-    instance.file_size = file_size
\ No newline at end of file
+    instance.file_size = file_size
+
+# ------------------------------------------------------------------
+# 5. Tenant context cache (subscription state, plan flags, rate tier)
+# ------------------------------------------------------------------
+@receiver(post_save, sender=OrganizationSubscription)
+@receiver(post_delete, sender=OrganizationSubscription)
+def invalidate_tenant_subscription(sender, instance, **kwargs):
+    """Drop the cached tenant state when a subscription changes."""
+    invalidate_organization(instance.organization_id)
+
+
+@receiver(post_save, sender=Plan)
+def invalidate_tenant_plan(sender, instance, created, **kwargs):
+    """Plan flags are cached per organization; refresh every subscriber."""
+    if created:
+        return
+    organization_ids = (
+        OrganizationSubscription.objects.filter(plan=instance, is_active=True)
+        .values_list('organization_id', flat=True)
+    )
+    for organization_id in organization_ids:
+        invalidate_organization(organization_id)
@@ -8,10 +8,15 @@ Handles:
   - Grace period enforcement
   - Organization suspension
   - Organization status sync
+
+Also runs hourly with ``transitions_only=True``: only subscriptions past a
+lifecycle boundary are visited. SubscriptionMiddleware is read-only, so
+this sweep is what applies those transitions during the day.
 """
 import logging
 
 from celery import shared_task
+from django.db.models import Q
 from django.utils import timezone
 
 from apps.billing.models import OrganizationSubscription
@@ -20,10 +25,14 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task(bind=True, ignore_result=True, name='billing.tasks.subscription_expiry_task')
-def subscription_expiry_task(self):
+def subscription_expiry_task(self, transitions_only=False):
     """
     Daily sweep of all active subscriptions.
 
+    With ``transitions_only`` the sweep is limited to subscriptions whose
+    trial or expiry date has passed, plus past-due organizations that have
+    since renewed. Reminder e-mails never fall in that set.
+
     For each subscription the task:
       1. Checks trial expiry → deactivate if past ``trial_end_date``
       2. Delegates to ``RenewalService.process_subscription`` for reminder
@@ -41,6 +50,12 @@ def subscription_expiry_task(self):
         .select_related('organization', 'plan')
         .filter(is_active=True)
     )
+    if transitions_only:
+        active_subs = active_subs.filter(
+            Q(is_trial=True, trial_end_date__lt=today)
+            | Q(expiry_date__lt=today)
+            | Q(organization__subscription_status='past_due', expiry_date__gte=today)
+        )
 
     stats = {
         'date': str(today),
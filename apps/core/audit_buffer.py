@@ -0,0 +1,120 @@
+"""
+Audit Buffer - Per-transaction AuditLog batching
+
+Audit signal handlers hand finished AuditLog rows to ``enqueue``. Inside a
+transaction, rows are collected per savepoint scope and written with one
+bulk_create from ``transaction.on_commit``; a rolled-back transaction or
+savepoint discards its rows together with its on_commit hook, so the trail
+only ever contains committed changes. Outside a transaction the row is
+written immediately.
+
+Nothing here issues a query on the save path.
+"""
+
+import logging
+import time
+from typing import List
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_BATCHES_ATTR = '_audit_batches'
+
+# Table existence is checked once per process; a negative answer (e.g.
+# before migrations) is re-checked at most this often.
+TABLE_RECHECK_SECONDS = 60
+
+_table_state = {'exists': False, 'checked_at': None}
+
+
+def audit_table_exists(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """Return True once the AuditLog table is known to exist."""
+
+    if _table_state['exists']:
+        return True
+
+    now = time.monotonic()
+    checked_at = _table_state['checked_at']
+    if checked_at is not None and now - checked_at < TABLE_RECHECK_SECONDS:
+        return False
+
+    _table_state['checked_at'] = now
+    try:
+        from .models import AuditLog
+
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        _table_state['exists'] = AuditLog._meta.db_table in tables
+    except Exception:
+        _table_state['exists'] = False
+    return _table_state['exists']
+
+
+class _AuditBatch:
+    """AuditLog rows collected within one savepoint scope."""
+
+    __slots__ = ('entries', 'using')
+
+    def __init__(self, using: str):
+        self.entries: List = []
+        self.using = using
+
+    def flush(self) -> None:
+        write_entries(self.entries, using=self.using)
+        self.entries = []
+
+
+def _pending_batch(connection):
+    """Return the open batch for the current savepoint scope, creating it if needed."""
+
+    batches = connection.__dict__.setdefault(_BATCHES_ATTR, {})
+    scope = tuple(connection.savepoint_ids)
+    batch = batches.get(scope)
+    if batch is not None:
+        # Commit clears run_on_commit; rollback removes the scope's hooks.
+        # Either way a batch whose hook is gone must not be reused.
+        if any(hook[1] == batch.flush for hook in connection.run_on_commit):
+            return batch
+
+    batch = _AuditBatch(connection.alias)
+    batches[scope] = batch
+    transaction.on_commit(batch.flush, using=connection.alias)
+    return batch
+
+
+def enqueue(entry, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Queue an unsaved AuditLog instance for writing after commit."""
+
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        write_entries([entry], using=using)
+        return
+    _pending_batch(connection).entries.append(entry)
+
+
+def write_entries(entries, using: str = DEFAULT_DB_ALIAS) -> int:
+    """bulk_create AuditLog rows; never raises into the caller."""
+
+    if not entries:
+        return 0
+
+    from .models import AuditLog
+
+    try:
+        AuditLog.objects.using(using).bulk_create(entries)
+        return len(entries)
+    except IntegrityError:
+        # The acting user may have been removed in the meantime; keep the
+        # trail and drop only the user link.
+        for entry in entries:
+            entry.user_id = None
+        try:
+            AuditLog.objects.using(using).bulk_create(entries)
+            return len(entries)
+        except Exception as exc:
+            logger.error(f"Audit logging failed for {len(entries)} entries: {exc}")
+    except Exception as exc:
+        logger.error(f"Audit logging failed for {len(entries)} entries: {exc}")
+    return 0
@@ -0,0 +1,39 @@
+"""
+Core Cache Backends - Hit/miss accounting for request metrics
+
+Drop-in replacements for the configured cache backends that report every
+lookup to apps.core.metrics, so MetricsMiddleware can attribute cache hits
+and misses to the route that caused them.
+"""
+
+from django.core.cache.backends.locmem import LocMemCache
+from django_redis.cache import RedisCache
+
+from .metrics import record_cache_lookups
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        if value is _MISSING:
+            record_cache_lookups(0, 1)
+            return default
+        record_cache_lookups(1, 0)
+        return value
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    # BaseCache.get_many() loops over get(), which is already counted.
+    pass
+
+
+class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+
+    def get_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        found = super().get_many(keys, version=version, **kwargs)
+        record_cache_lookups(len(found), len(keys) - len(found))
+        return found
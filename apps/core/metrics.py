@@ -0,0 +1,251 @@
+"""
+Core Metrics - Per-route request metrics in Prometheus format
+
+MetricsMiddleware opens a RequestStats scope for every request. While it is
+active, DB queries (via connection.execute_wrapper) and cache lookups (via
+the instrumented cache backends in apps/core/cache_backends.py) are counted
+against it. When the response is ready the totals are observed into
+histograms labelled by the resolver route template, never the raw path.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR (entrypoint.sh does) so every
+worker writes to shared files and /api/metrics aggregates all of them.
+"""
+
+import heapq
+import logging
+import os
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 1000)
+SLOW_REQUEST_SAMPLE_RATE = getattr(settings, 'METRICS_SLOW_REQUEST_SAMPLE_RATE', 0.1)
+SLOW_REQUEST_TOP_QUERIES = getattr(settings, 'METRICS_SLOW_REQUEST_TOP_QUERIES', 5)
+
+UNRESOLVED_ROUTE = '<unresolved>'
+
+# Buffer counters are published at most this often per process.
+POLICY_LOG_STATS_INTERVAL = 5.0
+
+
+REQUESTS = Counter(
+    'hrms_http_requests',
+    'HTTP requests by route template and status code.',
+    ['method', 'route', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'hrms_http_request_duration_seconds',
+    'Request latency by route template.',
+    ['method', 'route'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_QUERIES = Histogram(
+    'hrms_http_db_queries',
+    'DB queries executed per request.',
+    ['method', 'route'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+DB_TIME = Histogram(
+    'hrms_http_db_duration_seconds',
+    'Time spent in DB queries per request.',
+    ['method', 'route'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CACHE_LOOKUPS = Counter(
+    'hrms_http_cache_lookups',
+    'Cache lookups per route template and result.',
+    ['method', 'route', 'result'],
+)
+RESPONSE_SIZE = Histogram(
+    'hrms_http_response_size_bytes',
+    'Response body size by route template.',
+    ['method', 'route'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+POLICY_LOG_BUFFER = Gauge(
+    'hrms_abac_policy_log_buffer',
+    'ABAC PolicyLog buffer counters (see PolicyLogBuffer.stats).',
+    ['counter'],
+    multiprocess_mode='livesum',
+)
+
+
+class RequestStats:
+    """DB and cache usage of a single request."""
+
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses', 'slowest', '_keep')
+
+    def __init__(self, keep_queries: int = SLOW_REQUEST_TOP_QUERIES):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Min-heap of (duration, sql) holding the slowest queries seen.
+        self.slowest = []
+        self._keep = keep_queries
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook."""
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            if self._keep:
+                if len(self.slowest) < self._keep:
+                    heapq.heappush(self.slowest, (elapsed, sql))
+                elif elapsed > self.slowest[0][0]:
+                    heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def top_queries(self):
+        return sorted(self.slowest, reverse=True)
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar('request_stats', default=None)
+
+
+@contextmanager
+def track_request(stats: RequestStats):
+    """Attribute DB queries and cache lookups on this thread to ``stats``."""
+
+    token = _current_stats.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def record_cache_lookups(hits: int, misses: int) -> None:
+    """Called by the instrumented cache backends."""
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+_ROUTE_ANCHOR = re.compile(r'(^|/)\^')
+
+
+@lru_cache(maxsize=1024)
+def _normalize_route(route: str) -> str:
+    # DRF router patterns are regexes; drop their anchors so included
+    # routes read like path templates.
+    return '/' + _ROUTE_ANCHOR.sub(r'\1', route).replace('$', '')
+
+
+def route_template(request) -> str:
+    """Resolver route of the request, e.g. /api/v1/employees/(?P<pk>[^/.]+)/."""
+
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.route:
+        return UNRESOLVED_ROUTE
+    return _normalize_route(match.route)
+
+
+def response_size(response) -> Optional[int]:
+    if getattr(response, 'streaming', False):
+        length = response.get('Content-Length')
+        return int(length) if length and length.isdigit() else None
+    return len(response.content)
+
+
+def observe_request(method: str, route: str, status: int, duration: float,
+                    stats: RequestStats, size: Optional[int]) -> None:
+    """Record one finished request."""
+
+    REQUESTS.labels(method, route, str(status)).inc()
+    REQUEST_LATENCY.labels(method, route).observe(duration)
+    DB_QUERIES.labels(method, route).observe(stats.queries)
+    DB_TIME.labels(method, route).observe(stats.db_time)
+    if stats.cache_hits:
+        CACHE_LOOKUPS.labels(method, route, 'hit').inc(stats.cache_hits)
+    if stats.cache_misses:
+        CACHE_LOOKUPS.labels(method, route, 'miss').inc(stats.cache_misses)
+    if size is not None:
+        RESPONSE_SIZE.labels(method, route).observe(size)
+    publish_policy_log_stats()
+
+    if (
+        duration * 1000 >= SLOW_REQUEST_MS
+        and SLOW_REQUEST_SAMPLE_RATE > 0
+        and random.random() < SLOW_REQUEST_SAMPLE_RATE
+    ):
+        logger.warning(
+            "slow_request method=%s route=%s status=%s duration_ms=%d queries=%d "
+            "db_ms=%.1f cache_hits=%d cache_misses=%d top_queries=%s",
+            method,
+            route,
+            status,
+            duration * 1000,
+            stats.queries,
+            stats.db_time * 1000,
+            stats.cache_hits,
+            stats.cache_misses,
+            [(round(elapsed * 1000, 1), sql) for elapsed, sql in stats.top_queries()],
+        )
+
+
+_policy_log_published_at = [0.0]
+
+
+def publish_policy_log_stats(force: bool = False) -> None:
+    """Copy PolicyLogBuffer counters into the exported gauge."""
+
+    now = time.monotonic()
+    if not force and now - _policy_log_published_at[0] < POLICY_LOG_STATS_INTERVAL:
+        return
+    _policy_log_published_at[0] = now
+
+    from apps.abac.log_buffer import policy_log_buffer
+    for counter, value in policy_log_buffer.stats().items():
+        POLICY_LOG_BUFFER.labels(counter).set(value)
+
+
+def _authorized(request) -> bool:
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if not token:
+        return settings.DEBUG
+    return constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (/api/metrics)."""
+
+    if not _authorized(request):
+        return HttpResponse(status=403)
+
+    publish_policy_log_stats(force=True)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -9,9 +9,18 @@ import re
 import time
 from typing import Optional
 from django.http import JsonResponse, HttpRequest, HttpResponse
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from django.core.exceptions import ValidationError
 from apps.core.logging import set_correlation_id
+from apps.core.metrics import (
+    RequestStats,
+    observe_request,
+    response_size,
+    route_template,
+    track_request,
+)
+from apps.core.parsers import cache_parsed_json, parse_json_body
 
 from .context import (
     set_client_ip,
@@ -74,10 +83,20 @@ class InputSanitizationMiddleware(MiddlewareMixin):
     """
     XSS / injection guard for write requests.
     Checks both form-encoded POST data AND JSON request bodies.
+
+    JSON bodies are parsed once here and cached on the request; DRF's
+    CachedJSONParser (apps/core/parsers.py) reuses that result.
     """
 
     _pattern = re.compile(r"<script|onerror|onload|javascript:", re.IGNORECASE)
 
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.max_json_bytes = getattr(
+            settings, "INPUT_SANITIZATION_MAX_JSON_BYTES", 10 * 1024 * 1024
+        )
+        self.max_json_depth = getattr(settings, "INPUT_SANITIZATION_MAX_JSON_DEPTH", 64)
+
     def process_request(self, request: HttpRequest) -> Optional[HttpResponse]:
         if is_schema_request(request):
             return None
@@ -85,45 +104,110 @@ class InputSanitizationMiddleware(MiddlewareMixin):
         if request.method not in ("POST", "PUT", "PATCH"):
             return None
 
+        content_type = request.content_type or ""
+
         # 1. Check form-encoded POST data
-        try:
-            for key, value in request.POST.items():
-                if isinstance(value, str) and self._pattern.search(value):
-                    raise ValidationError(
-                        f"Invalid input detected in field: {key}"
-                    )
-        except Exception:
-            pass
+        if "json" not in content_type:
+            try:
+                for key, value in request.POST.items():
+                    if isinstance(value, str) and self._pattern.search(value):
+                        raise ValidationError(
+                            f"Invalid input detected in field: {key}"
+                        )
+            except Exception:
+                pass
+            return None
 
         # 2. Check JSON body
-        content_type = request.content_type or ""
-        if "json" in content_type:
+        try:
+            content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > self.max_json_bytes:
+            return self._too_large()
+
+        body = request.body
+        if not body:
+            return None
+        if len(body) > self.max_json_bytes:
+            return self._too_large()
+
+        encoding = request.content_params.get("charset") or settings.DEFAULT_CHARSET
+        try:
+            data = parse_json_body(body, encoding)
+        except RecursionError:
+            return self._too_deep()
+        except (ValueError, LookupError):
+            return None  # Let DRF handle malformed JSON
+
+        if isinstance(data, (dict, list)):
             try:
-                import json
-                body = request.body
-                if body:
-                    data = json.loads(body)
-                    self._scan_json(data)
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                pass  # Let DRF handle malformed JSON
-            except ValidationError:
-                raise  # Re-raise our own validation errors
+                self._scan_json(data)
+            except _JSONTooDeep:
+                return self._too_deep()
 
+        cache_parsed_json(request, data)
         return None
 
-    def _scan_json(self, data, path=""):
-        """Recursively scan JSON data for XSS patterns."""
-        if isinstance(data, dict):
-            for key, value in data.items():
-                field_path = f"{path}.{key}" if path else key
-                if isinstance(value, str) and self._pattern.search(value):
-                    raise ValidationError(
-                        f"Invalid input detected in field: {field_path}"
-                    )
-                self._scan_json(value, field_path)
-        elif isinstance(data, list):
-            for i, item in enumerate(data):
-                self._scan_json(item, f"{path}[{i}]")
+    def _scan_json(self, data) -> None:
+        """
+        Scan JSON data for XSS patterns without recursion.
+
+        Each pending container carries a (key, parent) link instead of a
+        formatted path; the path is only rendered when a match is found.
+        """
+        search = self._pattern.search
+        max_depth = self.max_json_depth
+        stack = [(data, None, 1)]
+        while stack:
+            node, link, depth = stack.pop()
+            if depth > max_depth:
+                raise _JSONTooDeep()
+            items = node.items() if isinstance(node, dict) else enumerate(node)
+            for key, value in items:
+                if isinstance(value, str):
+                    if search(value):
+                        raise ValidationError(
+                            f"Invalid input detected in field: {self._format_path((key, link))}"
+                        )
+                elif isinstance(value, (dict, list)):
+                    stack.append((value, (key, link), depth + 1))
+
+    @staticmethod
+    def _format_path(link) -> str:
+        keys = []
+        while link is not None:
+            key, link = link
+            keys.append(key)
+        path = ""
+        for key in reversed(keys):
+            if isinstance(key, int):
+                path = f"{path}[{key}]"
+            else:
+                path = f"{path}.{key}" if path else key
+        return path
+
+    def _too_large(self) -> JsonResponse:
+        return JsonResponse(
+            {
+                "error": f"Request body exceeds {self.max_json_bytes} bytes",
+                "code": "payload_too_large",
+            },
+            status=413,
+        )
+
+    def _too_deep(self) -> JsonResponse:
+        return JsonResponse(
+            {
+                "error": f"JSON nesting exceeds {self.max_json_depth} levels",
+                "code": "payload_too_deep",
+            },
+            status=400,
+        )
+
+
+class _JSONTooDeep(Exception):
+    pass
 
 
 # =============================================================================
@@ -185,7 +269,9 @@ class RequestIDMiddleware:
 
 class MetricsMiddleware:
     """
-    Logs request latency and status.
+    Records per-route latency, DB queries, DB time, cache lookups and
+    response size (see apps/core/metrics.py), and logs request latency
+    and status.
     """
 
     def __init__(self, get_response):
@@ -195,18 +281,34 @@ class MetricsMiddleware:
         if is_schema_request(request):
             return self.get_response(request)
 
+        stats = RequestStats()
         start = time.monotonic()
-        response = self.get_response(request)
-        duration_ms = int((time.monotonic() - start) * 1000)
+        with track_request(stats):
+            response = self.get_response(request)
+        duration = time.monotonic() - start
+        duration_ms = int(duration * 1000)
+
+        route = route_template(request)
+        observe_request(
+            request.method,
+            route,
+            response.status_code,
+            duration,
+            stats,
+            response_size(response),
+        )
 
         user = getattr(request, "user", None)
 
         logger.info(
-            "request_metrics method=%s path=%s status=%s duration_ms=%s user_id=%s",
+            "request_metrics method=%s route=%s status=%s duration_ms=%s "
+            "queries=%s db_ms=%.1f user_id=%s",
             request.method,
-            request.path,
+            route,
             response.status_code,
             duration_ms,
+            stats.queries,
+            stats.db_time * 1000,
             getattr(user, "id", None),
         )
 
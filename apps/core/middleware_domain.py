@@ -22,14 +22,14 @@ class DomainTenantMiddleware:
         request.domain_email_config = {}
 
         host = self._extract_host(request)
-        domain_entry = self._match_domain(host)
+        state = self._match_domain(host)
 
-        if domain_entry:
-            organization = domain_entry.organization
+        if state:
+            organization = state.organization
             if organization and organization.is_active:
                 request.domain_organization = organization
                 request.organization = organization
-                branding, email_settings = self._build_branding(request, organization)
+                branding, email_settings = self._build_branding(request, organization, state.branding)
                 request.domain_branding = branding
                 request.domain_email_config = email_settings
 
@@ -56,21 +56,16 @@ class DomainTenantMiddleware:
     def _match_domain(self, host):
         if not host:
             return None
-        from apps.core.models import OrganizationDomain
+        from apps.core.tenant_cache import get_host_organization_id, get_tenant_state
 
         try:
-            return (
-                OrganizationDomain.objects.select_related('organization')
-                .filter(domain_name=host, is_active=True)
-                .first()
-            )
+            organization_id = get_host_organization_id(host)
+            return get_tenant_state(organization_id) if organization_id else None
         except Exception:  # pragma: no cover - defensive DB guard
             logger.exception("Failed to map domain: %s", host)
             return None
 
-    def _build_branding(self, request, organization):
-        from apps.core.models import OrganizationSettings
-
+    def _build_branding(self, request, organization, org_settings=None):
         logo_url = None
         if organization.logo:
             try:
@@ -80,16 +75,13 @@ class DomainTenantMiddleware:
             except Exception:
                 logger.debug("Failed to build logo url for org %s", organization.id, exc_info=True)
 
-        settings_qs = getattr(OrganizationSettings, 'all_objects', OrganizationSettings.objects)
-        org_settings = settings_qs.filter(organization=organization).first()
-
         primary_color = '#1976d2'
         secondary_color = '#dc004e'
         custom_settings = {}
         if org_settings:
-            primary_color = org_settings.branding_primary_color or primary_color
-            secondary_color = org_settings.branding_secondary_color or secondary_color
-            custom_settings = org_settings.custom_settings or {}
+            primary_color = org_settings['branding_primary_color'] or primary_color
+            secondary_color = org_settings['branding_secondary_color'] or secondary_color
+            custom_settings = org_settings['custom_settings'] or {}
 
         smtp_settings = custom_settings.get('smtp') if isinstance(custom_settings, dict) else {}
         if not isinstance(smtp_settings, dict):
@@ -142,14 +134,14 @@ class DomainTenantMiddleware:
                 )
             return None
 
-        user_org = getattr(user, 'organization', None)
-        if user_org and str(user_org.id) != domain_org_id:
+        user_org_id = getattr(user, 'organization_id', None)
+        if user_org_id and str(user_org_id) != domain_org_id:
             logger.warning(
                 "domain_tenant_violation",
                 extra={
                     'event': 'domain_tenant_violation',
                     'user_id': str(user.id),
-                    'user_org': str(user_org.id),
+                    'user_org': str(user_org_id),
                     'domain_org': domain_org_id,
                 },
             )
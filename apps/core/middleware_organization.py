@@ -49,6 +49,7 @@ def is_public_path(path: str) -> bool:
         "/api/docs",
         "/api/redoc",
         "/api/health",
+        "/api/metrics",
         "/admin",
         "/static",
         "/media",
@@ -138,15 +139,15 @@ class OrganizationMiddleware(MiddlewareMixin):
         set_current_user(request.user)
         logger.debug("Authenticated user: %s", request.user.email)
 
-        from apps.core.models import Organization
+        from apps.core.tenant_cache import get_organization, get_user_organization
 
         # ---------------------------------------------------------------------
         # User has organization
         # S6 — HEADER SPOOFING PROTECTION: Non-superusers ALWAYS use their
         # own organization. X-Organization-ID header is IGNORED for them.
         # ---------------------------------------------------------------------
-        if getattr(request.user, "organization", None):
-            org = request.user.organization
+        org = get_user_organization(request.user)
+        if org:
 
             # S6: Detect and log header spoofing attempts by non-superusers
             if not request.user.is_superuser:
@@ -294,25 +295,8 @@ class OrganizationMiddleware(MiddlewareMixin):
             org_id = header_org_id
 
             if org_id:
-                try:
-                    org = Organization.objects.get(id=org_id, is_active=True)
-
-                    log_superuser_org_switch(request.user, org, request)
-
-                    set_current_organization(org)
-                    request.organization = org
-
-                    if getattr(settings, "ENABLE_POSTGRESQL_RLS", False):
-                        try:
-                            with connection.cursor() as cursor:
-                                cursor.execute(
-                                    "SET LOCAL app.current_organization_id = %s",
-                                    [str(org.id)],
-                                )
-                        except Exception:
-                            logger.exception("Failed to set RLS for superuser")
-
-                except Organization.DoesNotExist:
+                org = get_organization(org_id)
+                if org is None or not org.is_active:
                     logger.warning(
                         "invalid_org_switch",
                         extra={
@@ -326,6 +310,21 @@ class OrganizationMiddleware(MiddlewareMixin):
                         status=400,
                     )
 
+                log_superuser_org_switch(request.user, org, request)
+
+                set_current_organization(org)
+                request.organization = org
+
+                if getattr(settings, "ENABLE_POSTGRESQL_RLS", False):
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                "SET LOCAL app.current_organization_id = %s",
+                                [str(org.id)],
+                            )
+                    except Exception:
+                        logger.exception("Failed to set RLS for superuser")
+
             # Superuser allowed without org
             return None
 
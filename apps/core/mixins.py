@@ -19,6 +19,10 @@ class BulkImportExportMixin:
         """Return serializer class used for export. Defaults to serializer_class."""
         return self.get_serializer_class()
 
+    def filter_export_objects(self, queryset):
+        """Hook to drop rows the user may not export. Defaults to all of ``queryset``."""
+        return queryset
+
     def get_import_serializer_class(self):
         """Return serializer class used for import. Defaults to serializer_class."""
         return self.get_serializer_class()
@@ -59,8 +63,8 @@ class BulkImportExportMixin:
     def export(self, request):
         """Export data to CSV/Excel."""
         print(f"DEBUG: Export called. Tenant: {dict(request.headers)}")
-        queryset = self.filter_queryset(self.get_queryset())
-        print(f"DEBUG: Queryset count: {queryset.count()}")
+        queryset = self.filter_export_objects(self.filter_queryset(self.get_queryset()))
+        print(f"DEBUG: Queryset count: {len(queryset)}")
         serializer_class = self.get_export_serializer_class()
         serializer = serializer_class(queryset, many=True)
         
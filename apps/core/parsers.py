@@ -0,0 +1,60 @@
+"""
+Core Parsers - Single-parse JSON bodies
+
+InputSanitizationMiddleware parses JSON request bodies to scan them and
+stores the result on the Django request. CachedJSONParser hands that
+result to DRF instead of decoding the same body a second time.
+"""
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import json
+
+PARSED_JSON_ATTR = '_parsed_json'
+
+_MISSING = object()
+
+
+def parse_json_body(body: bytes, encoding: str = 'utf-8'):
+    """
+    Decode a JSON body with the same semantics as DRF's JSONParser.
+
+    Raises ValueError (including UnicodeDecodeError) on malformed input and
+    RecursionError on pathologically nested input.
+    """
+
+    parse_constant = json.strict_constant if api_settings.STRICT_JSON else None
+    return json.loads(body.decode(encoding), parse_constant=parse_constant)
+
+
+def cache_parsed_json(request, data) -> None:
+    """Remember a successfully parsed body on the Django request."""
+
+    setattr(request, PARSED_JSON_ATTR, data)
+
+
+def get_parsed_json(request, default=None):
+    """Return the body cached by cache_parsed_json, or ``default``."""
+
+    return getattr(request, PARSED_JSON_ATTR, default)
+
+
+class CachedJSONParser(JSONParser):
+    """
+    JSONParser that reuses the body already parsed by the middleware.
+
+    Falls back to regular parsing when nothing was cached (e.g. the
+    middleware skipped the request or the body was malformed).
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get('request')
+        django_request = getattr(request, '_request', request)
+        cached = get_parsed_json(django_request, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        try:
+            return super().parse(stream, media_type, parser_context)
+        except RecursionError:
+            raise ParseError('JSON parse error - document is nested too deeply')
@@ -16,9 +16,22 @@ from django.conf import settings
 from rest_framework.throttling import BaseThrottle
 from rest_framework.response import Response
 from rest_framework import status
+import logging
+import threading
 import time
 import json
+import uuid
+from collections import deque
+from dataclasses import dataclass
 from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    from django_redis.cache import RedisCache
+except ImportError:  # pragma: no cover - django-redis is a base requirement
+    RedisCache = None
+
+logger = logging.getLogger(__name__)
 
 
 # ============================================================================
@@ -82,24 +95,260 @@ RATE_LIMIT_CONFIG = {
 
 
 # ============================================================================
-# REDIS-BASED RATE LIMITER (Token Bucket Algorithm)
+# ATOMIC LIMITER (Redis Lua, single round trip)
+# ============================================================================
+
+TOKEN_BUCKET = 'token_bucket'
+SLIDING_WINDOW = 'sliding_window'
+
+# Checks every limit first and consumes from all of them only if all allow
+# the request, so a rejected request never drains the other buckets.
+# KEYS[i]            -> state key of limit i
+# ARGV[1]            -> '1' to consume, '0' to peek
+# ARGV[2]            -> unique member for sliding-window logs
+# ARGV[3 + 3(i-1)..] -> mode ('tb' | 'sw'), limit, window in milliseconds
+# Returns {allowed, remaining, retry_after_ms} per limit.
+RATE_LIMIT_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local consume = ARGV[1] == '1'
+local member = ARGV[2]
+local results = {}
+local state = {}
+local all_allowed = true
+
+for i = 1, #KEYS do
+    local base = 2 + (i - 1) * 3
+    local mode = ARGV[base + 1]
+    local limit = tonumber(ARGV[base + 2])
+    local window = tonumber(ARGV[base + 3])
+    local key = KEYS[i]
+
+    if mode == 'tb' then
+        local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(bucket[1])
+        local ts = tonumber(bucket[2])
+        if tokens == nil or ts == nil then
+            tokens = limit
+            ts = now
+        end
+        local rate = limit / window
+        tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+        state[i] = tokens
+        if tokens < 1 then
+            all_allowed = false
+            results[i] = {0, 0, math.ceil((1 - tokens) / rate)}
+        else
+            results[i] = {1, math.floor(tokens - 1), 0}
+        end
+    else
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        local count = redis.call('ZCARD', key)
+        if count >= limit then
+            all_allowed = false
+            local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+            local retry = window
+            if oldest[2] then
+                retry = math.max(1, tonumber(oldest[2]) + window - now)
+            end
+            results[i] = {0, 0, retry}
+        else
+            results[i] = {1, limit - count - 1, 0}
+        end
+    end
+end
+
+if consume and all_allowed then
+    for i = 1, #KEYS do
+        local base = 2 + (i - 1) * 3
+        local window = tonumber(ARGV[base + 3])
+        if ARGV[base + 1] == 'tb' then
+            redis.call('HSET', KEYS[i], 'tokens', tostring(state[i] - 1), 'ts', now)
+        else
+            redis.call('ZADD', KEYS[i], now, member)
+        end
+        redis.call('PEXPIRE', KEYS[i], window)
+    end
+end
+
+return results
+"""
+
+_MODE_CODES = {TOKEN_BUCKET: 'tb', SLIDING_WINDOW: 'sw'}
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """``limit`` requests per ``window`` seconds for one key."""
+
+    key: str
+    limit: int
+    window: float
+    mode: str = TOKEN_BUCKET
+
+
+@dataclass(frozen=True)
+class RateDecision:
+    allowed: bool
+    remaining: int
+    retry_after: float  # seconds; 0 when allowed
+
+
+class AtomicRateLimiter:
+    """
+    Evaluates any number of limits in one atomic step.
+
+    With a django-redis cache this is a single EVALSHA round trip. Other
+    cache backends (LocMemCache in development/tests) fall back to an
+    in-process implementation with the same semantics.
+    """
+
+    def __init__(self, cache_backend=None):
+        self.cache = cache_backend or cache
+        self._script = None
+        self._local_lock = threading.Lock()
+        self._local_buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._local_logs: Dict[str, deque] = {}
+
+    def check(self, limits: Sequence[RateLimit], consume: bool = True) -> List[RateDecision]:
+        if not limits:
+            return []
+        client = self._redis_client()
+        if client is not None:
+            try:
+                return self._check_redis(client, limits, consume)
+            except Exception as exc:
+                # Fail open: losing Redis must not take the API down.
+                logger.warning(f"Rate limiter unavailable, allowing request: {exc}")
+                return [RateDecision(True, limit.limit, 0) for limit in limits]
+        return self._check_local(limits, consume)
+
+    def peek(self, limits: Sequence[RateLimit]) -> List[RateDecision]:
+        """Current state without consuming."""
+        return self.check(limits, consume=False)
+
+    def state_key(self, limit: RateLimit) -> str:
+        return self.cache.make_key(f"ratelimit:{_MODE_CODES[limit.mode]}:{limit.key}")
+
+    # --------------------------------------------------
+    # Redis
+    # --------------------------------------------------
+    def _redis_client(self):
+        if RedisCache is None or not isinstance(self.cache, RedisCache):
+            return None
+        return self.cache.client.get_client(write=True)
+
+    def _check_redis(self, client, limits, consume) -> List[RateDecision]:
+        if self._script is None:
+            self._script = client.register_script(RATE_LIMIT_LUA)
+        args = ['1' if consume else '0', uuid.uuid4().hex]
+        for limit in limits:
+            args.extend((_MODE_CODES[limit.mode], limit.limit, int(limit.window * 1000)))
+        rows = self._script(keys=[self.state_key(limit) for limit in limits], args=args, client=client)
+        return [
+            RateDecision(bool(allowed), int(remaining), int(retry_ms) / 1000.0)
+            for allowed, remaining, retry_ms in rows
+        ]
+
+    # --------------------------------------------------
+    # In-process fallback
+    # --------------------------------------------------
+    def _check_local(self, limits, consume) -> List[RateDecision]:
+        now = time.monotonic()
+        decisions = []
+        pending = []
+        with self._local_lock:
+            for limit in limits:
+                key = self.state_key(limit)
+                if limit.mode == TOKEN_BUCKET:
+                    tokens, ts, _ = self._local_buckets.get(key, (limit.limit, now, 0))
+                    rate = limit.limit / limit.window
+                    tokens = min(limit.limit, tokens + max(0.0, now - ts) * rate)
+                    pending.append((limit, key, tokens))
+                    if tokens < 1:
+                        decisions.append(RateDecision(False, 0, (1 - tokens) / rate))
+                    else:
+                        decisions.append(RateDecision(True, int(tokens - 1), 0))
+                else:
+                    log = self._local_logs.setdefault(key, deque())
+                    while log and log[0] <= now - limit.window:
+                        log.popleft()
+                    pending.append((limit, key, None))
+                    if len(log) >= limit.limit:
+                        decisions.append(RateDecision(False, 0, log[0] + limit.window - now))
+                    else:
+                        decisions.append(RateDecision(True, limit.limit - len(log) - 1, 0))
+
+            if consume and all(decision.allowed for decision in decisions):
+                for limit, key, tokens in pending:
+                    if limit.mode == TOKEN_BUCKET:
+                        self._local_buckets[key] = (tokens - 1, now, now + limit.window)
+                    else:
+                        self._local_logs[key].append(now)
+                self._prune_local(now)
+        return decisions
+
+    def _prune_local(self, now: float) -> None:
+        if len(self._local_buckets) > 10000:
+            self._local_buckets = {
+                key: value for key, value in self._local_buckets.items() if value[2] > now
+            }
+        if len(self._local_logs) > 10000:
+            self._local_logs = {key: log for key, log in self._local_logs.items() if log}
+
+    def reset_local(self) -> None:
+        with self._local_lock:
+            self._local_buckets.clear()
+            self._local_logs.clear()
+
+
+rate_limiter = AtomicRateLimiter()
+
+
+# ============================================================================
+# ORGANIZATION TIER
+# ============================================================================
+
+def organization_tier(organization) -> str:
+    """
+    Rate-limit tier of an organization, taken from its subscription plan code.
+
+    The plan comes from the tenant state (apps/core/tenant_cache.py), which
+    subscription and plan writes invalidate; there is no tier cache of its own.
+    """
+
+    from apps.core.tenant_cache import get_tenant_state
+
+    default = getattr(settings, 'DEFAULT_Organization_TIER', 'starter')
+    state = get_tenant_state(organization.id) if organization is not None else None
+    code = (getattr(state.plan, 'code', '') or '').lower() if state else ''
+    return code if code in RATE_LIMIT_CONFIG['tiers'] else default
+
+
+def organization_key(organization) -> str:
+    """Identifier used in limiter keys and the VIP table."""
+    return getattr(organization, 'slug', None) or str(organization.id)
+
+
+# ============================================================================
+# PER-ORGANIZATION LIMITER
 # ============================================================================
 
 class TokenBucketLimiter:
     """
-    Token Bucket algorithm for rate limiting.
-    
-    How it works:
-    - Bucket has capacity = rate limit
-    - Tokens regenerate over time
-    - Each request consumes 1 token
-    - If bucket empty, request blocked
+    Per-organization, per-endpoint minute and hour limits.
+
+    Both windows are checked and consumed together in one atomic limiter
+    call. ``mode`` selects token bucket (smooth refill) or sliding-window
+    log (exact count over the trailing window).
     """
     
-    def __init__(self, cache_backend=None):
+    def __init__(self, cache_backend=None, mode=TOKEN_BUCKET):
         self.cache = cache_backend or cache
+        self.limiter = rate_limiter if cache_backend is None else AtomicRateLimiter(cache_backend)
+        self.mode = mode
     
-    def get_limit_config(self, organization_slug, path):
+    def get_limit_config(self, organization_slug, path, organization=None):
         """Get applicable rate limit for Organization + endpoint."""
         
         # Check VIP Organizations
@@ -113,58 +362,36 @@ class TokenBucketLimiter:
         if path in RATE_LIMIT_CONFIG['endpoints']:
             return RATE_LIMIT_CONFIG['endpoints'][path]
         
-        # Check Organization tier (future: from database)
-        tier = getattr(settings, 'DEFAULT_Organization_TIER', 'starter')
+        # Organization tier from its (cached) subscription plan
         return RATE_LIMIT_CONFIG['tiers'].get(
-            tier,
+            organization_tier(organization),
             RATE_LIMIT_CONFIG['default']
         )
+
+    def _limits(self, organization_slug, path, organization=None):
+        config = self.get_limit_config(organization_slug, path, organization)
+        return [
+            RateLimit(f'{organization_slug}:{path}:minute', config['per_minute'], 60, self.mode),
+            RateLimit(f'{organization_slug}:{path}:hour', config['per_hour'], 3600, self.mode),
+        ]
     
-    def is_allowed(self, organization_slug, path, ip_address):
+    def is_allowed(self, organization_slug, path, ip_address, organization=None):
         """
         Check if request is allowed under rate limit.
         
         Returns: (allowed: bool, remaining: int, reset_time: int)
         """
         
-        config = self.get_limit_config(organization_slug, path)
-        per_minute = config['per_minute']
-        per_hour = config['per_hour']
-        
-        # Cache keys
-        minute_key = f'ratelimit:{organization_slug}:{path}:minute:{int(time.time() / 60)}'
-        hour_key = f'ratelimit:{organization_slug}:{path}:hour:{int(time.time() / 3600)}'
-        
-        # Get current counts
-        minute_count = self.cache.get(minute_key, 0)
-        hour_count = self.cache.get(hour_key, 0)
-        
-        # Check limits
-        if minute_count >= per_minute:
-            reset_time = int(time.time() / 60 + 1) * 60
-            return False, 0, reset_time
-        
-        if hour_count >= per_hour:
-            reset_time = int(time.time() / 3600 + 1) * 3600
-            return False, 0, reset_time
-        
-        # Increment counts
-        self.cache.set(minute_key, minute_count + 1, 61)  # Expire after 1 minute
-        self.cache.set(hour_key, hour_count + 1, 3601)    # Expire after 1 hour
-        
-        # Calculate remaining
-        remaining = min(
-            per_minute - minute_count - 1,
-            per_hour - hour_count - 1
-        )
-        
-        return True, remaining, 0
+        decisions = self.limiter.check(self._limits(organization_slug, path, organization))
+        if not all(decision.allowed for decision in decisions):
+            retry_after = max(decision.retry_after for decision in decisions)
+            return False, 0, int(time.time() + retry_after) + 1
+        return True, min(decision.remaining for decision in decisions), 0
     
-    def get_reset_time(self, organization_slug, path):
-        """Get when rate limit will reset."""
-        minute_key = f'ratelimit:{organization_slug}:{path}:minute:{int(time.time() / 60)}'
-        ttl = self.cache.ttl(minute_key)  # Requires Redis cache
-        return int(time.time()) + ttl if ttl > 0 else 0
+    def get_reset_time(self, organization_slug, path, organization=None):
+        """Get when the minute limit will admit the next request."""
+        minute = self.limiter.peek(self._limits(organization_slug, path, organization))[0]
+        return int(time.time() + minute.retry_after) if not minute.allowed else 0
 
 
 # ============================================================================
@@ -187,7 +414,7 @@ class PerOrganizationRateLimitMiddleware(MiddlewareMixin):
             return None
         
         # Get Organization (assumes middleware sets request.organization)
-        Organization = getattr(request, 'Organization', None)
+        Organization = getattr(request, 'organization', None)
         if not Organization:
             return None  # No Organization, skip rate limiting
         
@@ -196,9 +423,10 @@ class PerOrganizationRateLimitMiddleware(MiddlewareMixin):
         
         # Check rate limit
         allowed, remaining, reset_time = self.limiter.is_allowed(
-            Organization.slug,
+            organization_key(Organization),
             request.path,
-            ip_address
+            ip_address,
+            organization=Organization,
         )
         
         # Store for response headers
@@ -209,7 +437,7 @@ class PerOrganizationRateLimitMiddleware(MiddlewareMixin):
             return JsonResponse(
                 {
                     'error': 'rate_limit_exceeded',
-                    'detail': f'Rate limit exceeded for Organization {Organization.slug}',
+                    'detail': f'Rate limit exceeded for Organization {organization_key(Organization)}',
                     'reset_time': reset_time,
                 },
                 status=429  # Too Many Requests
@@ -274,7 +502,7 @@ class OrganizationAwareThrottle(BaseThrottle):
         """
         
         # Get Organization
-        Organization = getattr(request, 'Organization', None)
+        Organization = getattr(request, 'organization', None)
         if not Organization:
             return True
         
@@ -283,9 +511,10 @@ class OrganizationAwareThrottle(BaseThrottle):
         
         # Check limit
         allowed, remaining, reset_time = self.limiter.is_allowed(
-            Organization.slug,
+            organization_key(Organization),
             path,
-            self._get_client_ip(request)
+            self._get_client_ip(request),
+            organization=Organization,
         )
         
         # Store for headers
@@ -339,22 +568,17 @@ def rate_limit(per_minute=60, per_hour=1000):
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            limiter = TokenBucketLimiter()
-            Organization = getattr(request, 'Organization', None)
+            Organization = getattr(request, 'organization', None)
             
             if Organization:
-                config = {
-                    'per_minute': per_minute,
-                    'per_hour': per_hour,
-                }
+                key = f'{organization_key(Organization)}:{request.path}'
+                decisions = rate_limiter.check([
+                    RateLimit(f'{key}:minute', per_minute, 60),
+                    RateLimit(f'{key}:hour', per_hour, 3600),
+                ])
                 
-                allowed, remaining, reset_time = limiter.is_allowed(
-                    Organization.slug,
-                    request.path,
-                    _get_client_ip(request)
-                )
-                
-                if not allowed:
+                if not all(decision.allowed for decision in decisions):
+                    reset_time = int(time.time() + max(d.retry_after for d in decisions)) + 1
                     return JsonResponse(
                         {
                             'error': 'rate_limit_exceeded',
@@ -424,14 +648,11 @@ def get_rate_limit_stats(organization_slug):
     limiter = TokenBucketLimiter()
     config = limiter.get_limit_config(organization_slug, '/api/v1/')
     
-    current_minute = int(time.time() / 60)
-    current_hour = int(time.time() / 3600)
-    
-    minute_key = f'ratelimit:{organization_slug}:/api/v1/:minute:{current_minute}'
-    hour_key = f'ratelimit:{organization_slug}:/api/v1/:hour:{current_hour}'
+    minute, hour = limiter.limiter.peek(limiter._limits(organization_slug, '/api/v1/'))
     
-    requests_minute = cache.get(minute_key, 0)
-    requests_hour = cache.get(hour_key, 0)
+    # remaining counts the request a peek pretends to make
+    requests_minute = config['per_minute'] - (minute.remaining + 1 if minute.allowed else 0)
+    requests_hour = config['per_hour'] - (hour.remaining + 1 if hour.allowed else 0)
     
     return {
         'requests_this_minute': requests_minute,
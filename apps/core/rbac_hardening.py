@@ -18,7 +18,8 @@ from uuid import UUID
 from django.utils import timezone
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import BasePermission
-from rest_framework.throttling import SimpleRateThrottle
+
+from apps.core.throttling import AtomicRateThrottle
 
 logger = logging.getLogger(__name__)
 
@@ -353,7 +354,7 @@ class TenantFKValidatorMixin:
 # S9 — PER-TENANT RATE THROTTLE
 # ═══════════════════════════════════════════════════════════════════════════
 
-class OrganizationRateThrottle(SimpleRateThrottle):
+class OrganizationRateThrottle(AtomicRateThrottle):
     """
     Throttle requests per organization (tenant).
 
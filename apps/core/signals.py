@@ -1,29 +1,42 @@
 """
 Audit Signal Handlers - Automatic audit logging for all model changes
+
+The save path adds no queries: original field values are captured when an
+instance is initialised (post_init), diffs are computed in memory on
+post_save, and AuditLog rows are written in bulk once the surrounding
+transaction commits (see apps/core/audit_buffer.py).
 """
 
 import sys
 import threading
 import logging
 from contextlib import contextmanager
-from django.db.models.signals import post_save, post_delete, pre_save
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
 from django.dispatch import receiver
-from django.contrib.contenttypes.models import ContentType
-from django.forms.models import model_to_dict
-from django.db import connection
 from django.contrib.auth import get_user_model
-import json
-import uuid
 
 logger = logging.getLogger(__name__)
 
+from .audit_buffer import audit_table_exists, enqueue
 from .context import get_current_user, get_current_organization, get_client_ip, get_user_agent
-from .models import Organization
+from .models import Organization, OrganizationDomain, OrganizationSettings
+from .tenant_cache import invalidate_host, invalidate_organization
 
 
 # Thread-local storage for audit disable flag
 _audit_locals = threading.local()
 
+# Django/auth internals that are never audited
+_EXCLUDED_APP_LABELS = frozenset(
+    ['contenttypes', 'sessions', 'admin', 'auth', 'tenants', 'authentication', 'rbac']
+)
+_SKIPPED_FIELDS = frozenset(['id', 'created_at', 'updated_at'])
+
+_ORIGINAL_ATTR = '_audit_original'
+
+# sender -> tuple of (field name, attname) for audited concrete fields
+_audited_fields = {}
+
 
 def _is_audit_disabled():
     """Check if audit logging is temporarily disabled"""
@@ -45,270 +58,183 @@ def _is_running_migrations():
     return 'migrate' in sys.argv or 'makemigrations' in sys.argv
 
 
-def _get_user_if_exists(user):
-    """Return user if it exists in the database, else None to avoid FK errors."""
-    if not user or not getattr(user, 'is_authenticated', False):
-        return None
-
+def _fields_for(sender):
+    """
+    Return (name, attname) pairs audited for a model, or None if the model
+    is not audited at all. Resolved once per model class.
+    """
     try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        if User.objects.filter(pk=user.pk).exists():
-            return user
-    except Exception:
-        return None
+        return _audited_fields[sender]
+    except KeyError:
+        pass
+
+    meta = sender._meta
+    if (
+        meta.app_label in _EXCLUDED_APP_LABELS
+        or sender.__name__ == 'AuditLog'
+        or not getattr(sender, '_audit_enabled', True)
+    ):
+        fields = None
+    else:
+        fields = tuple(
+            (field.name, field.attname)
+            for field in meta.concrete_fields
+            if field.name not in _SKIPPED_FIELDS
+        )
+    _audited_fields[sender] = fields
+    return fields
 
-    return None
 
+def _serialize(value):
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    return str(value)
 
-def _audit_table_exists():
-    """Check if audit log table exists in the database"""
-    try:
-        from django.db import connection, ProgrammingError
-        with connection.cursor() as cursor:
-            # Check if table exists in active organization
-            cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = current_schema() 
-                    AND table_name = 'core_auditlog'
-                )
-            """)
-            return cursor.fetchone()[0]
-    except (Exception, ProgrammingError):
-        return False
-
-
-
-def get_model_changes(instance, old_instance=None):
+
+def _snapshot(instance, fields):
+    """Raw attribute values (FKs as ids, so nothing is fetched)."""
+    values = instance.__dict__
+    return {attname: values[attname] for _, attname in fields if attname in values}
+
+
+def get_model_changes(instance, original=None, fields=None):
     """
-    Compare old and new instance to get changed fields.
+    Compare an instance against its captured original state.
     Returns dict of {field_name: {'old': old_value, 'new': new_value}}
     """
+    fields = fields if fields is not None else (_fields_for(type(instance)) or ())
+    values = instance.__dict__
     changes = {}
-    
-    if old_instance is None:
-        # New instance - all fields are "new"
-        for field in instance._meta.fields:
-            if field.name in ['id', 'created_at', 'updated_at']:
-                continue
-            value = getattr(instance, field.name)
-            if hasattr(value, 'pk'):
-                value = str(value.pk)
-            elif not isinstance(value, (str, int, float, bool, type(None))):
-                value = str(value)
-            changes[field.name] = {'old': None, 'new': value}
-    else:
-        # Compare instances
-        for field in instance._meta.fields:
-            if field.name in ['id', 'created_at', 'updated_at']:
-                continue
-            
-            old_value = getattr(old_instance, field.name)
-            new_value = getattr(instance, field.name)
-            
-            # Handle foreign keys
-            if hasattr(old_value, 'pk'):
-                old_value = str(old_value.pk) if old_value else None
-            if hasattr(new_value, 'pk'):
-                new_value = str(new_value.pk) if new_value else None
-            
-            # Convert non-serializable types
-            if not isinstance(old_value, (str, int, float, bool, type(None))):
-                old_value = str(old_value)
-            if not isinstance(new_value, (str, int, float, bool, type(None))):
-                new_value = str(new_value)
-            
-            if old_value != new_value:
-                changes[field.name] = {'old': old_value, 'new': new_value}
-    
+
+    for name, attname in fields:
+        if attname not in values:
+            # Deferred and never loaded: unchanged by definition
+            continue
+        new_value = _serialize(values[attname])
+        if original is None:
+            changes[name] = {'old': None, 'new': new_value}
+            continue
+        old_value = _serialize(original.get(attname))
+        if old_value != new_value:
+            changes[name] = {'old': old_value, 'new': new_value}
+
     return changes
 
 
-# Store pre-save state for comparison
-_instance_cache = {}
+def _audit_context(instance):
+    """Resolve user, email and organization for an AuditLog row without queries."""
+    user = get_current_user()
+    is_authenticated = bool(user and getattr(user, 'is_authenticated', False))
 
+    org = get_current_organization()
+    organization_id = getattr(org, 'pk', None)
+    if organization_id is None:
+        organization_id = getattr(instance, 'organization_id', None)
+    if organization_id is None and isinstance(instance, Organization):
+        organization_id = instance.pk
 
-@receiver(pre_save)
-def cache_old_instance(sender, instance, **kwargs):
-    """Cache the old instance before save for comparison"""
-    # Skip if audit signals are disabled
-    if _is_audit_disabled():
-        return
-    
-    # Skip during migrations
-    if _is_running_migrations():
-        return
-    
-    # Skip audit models and django internal models
-    if sender._meta.app_label in ['contenttypes', 'sessions', 'admin', 'auth', 'tenants', 'authentication', 'rbac']:
-        return
-    
-    if sender.__name__ == 'AuditLog':
+    return {
+        'user_id': user.pk if is_authenticated else None,
+        'user_email': user.email if is_authenticated else 'system',
+        'organization_id': organization_id,
+        'ip_address': get_client_ip(),
+        'user_agent': get_user_agent()[:500] if get_user_agent() else None,
+    }
+
+
+def _should_audit(sender):
+    if _is_audit_disabled() or _is_running_migrations():
+        return None
+    return _fields_for(sender)
+
+
+@receiver(post_init)
+def capture_original_state(sender, instance, **kwargs):
+    """Remember field values as loaded, so saves can be diffed in memory."""
+    fields = _fields_for(sender)
+    if fields is None:
         return
-    
-    if instance.pk:
-        try:
-            old_instance = sender.objects.get(pk=instance.pk)
-            _instance_cache[f"{sender.__name__}:{instance.pk}"] = old_instance
-        except sender.DoesNotExist:
-            pass
+    instance.__dict__[_ORIGINAL_ATTR] = _snapshot(instance, fields)
 
 
 @receiver(post_save)
 def log_save(sender, instance, created, **kwargs):
     """Log all create/update operations"""
-    # Skip if audit signals are disabled
-    if _is_audit_disabled():
-        return
-    
-    # Skip during migrations
-    if _is_running_migrations():
-        return
-    
-    # Skip audit models and django internal models
-    if sender._meta.app_label in ['contenttypes', 'sessions', 'admin', 'auth', 'authentication', 'rbac']:
+    fields = _should_audit(sender)
+    if fields is None:
         return
-    
-    if sender.__name__ == 'AuditLog':
-        return
-    
-    # Skip if no audit is configured
-    if not getattr(sender, '_audit_enabled', True):
-        return
-    
-    # Skip if no organization context is set (optional, depends on policy)
-    # if not get_current_organization():
-    #     return
-    
-    # Skip if audit table doesn't exist yet (extra safety)
-    if not _audit_table_exists():
-        return
-    
+
     try:
-        from .models import AuditLog
-        
-        user = get_current_user()
-        org = get_current_organization()
+        original = None if created else instance.__dict__.get(_ORIGINAL_ATTR)
+        changes = get_model_changes(instance, original, fields)
+
+        # The next save of this instance diffs against what was just written
+        instance.__dict__[_ORIGINAL_ATTR] = _snapshot(instance, fields)
 
-        # Only keep user if it exists in current schema to avoid FK failures
-        log_user = _get_user_if_exists(user)
-        
-        # Get old instance from cache
-        cache_key = f"{sender.__name__}:{instance.pk}"
-        old_instance = _instance_cache.pop(cache_key, None)
-        
-        # Get changes
-        changes = get_model_changes(instance, old_instance)
-        
         if not changes and not created:
             # No actual changes
             return
-        
-        # Create audit log
-        try:
-            from django.db import ProgrammingError
-            AuditLog.objects.create(
-                user=log_user,
-                user_email=user.email if user and getattr(user, 'is_authenticated', False) else 'system',
+
+        context = _audit_context(instance)
+        if context['organization_id'] is None or not audit_table_exists(kwargs.get('using') or 'default'):
+            return
+
+        from .models import AuditLog
+
+        enqueue(
+            AuditLog(
                 action='create' if created else 'update',
                 resource_type=sender.__name__,
                 resource_id=str(instance.pk),
-                resource_repr=str(instance)[:500],
+                resource_repr=str(instance)[:255],
                 old_values={k: v['old'] for k, v in changes.items()} if not created else {},
                 new_values={k: v['new'] for k, v in changes.items()},
                 changed_fields=list(changes.keys()),
-                ip_address=get_client_ip(),
-                user_agent=get_user_agent()[:500] if get_user_agent() else None,
-                organization=org,
-            )
-        except ProgrammingError as e:
-            # Table doesn't exist in this schema - common during tenant creation
-            if 'relation "core_auditlog" does not exist' in str(e):
-                return
-            raise e
+                **context,
+            ),
+            using=kwargs.get('using') or 'default',
+        )
     except Exception as e:
-
         # Don't break the app if audit logging fails
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"Audit logging failed: {e}")
 
 
 @receiver(post_delete)
 def log_delete(sender, instance, **kwargs):
     """Log all delete operations"""
-    # Skip if audit signals are disabled
-    if _is_audit_disabled():
-        return
-    
-    # Skip during migrations
-    if _is_running_migrations():
+    fields = _should_audit(sender)
+    if fields is None:
         return
-    
-    # Skip audit models and django internal models
-    if sender._meta.app_label in ['contenttypes', 'sessions', 'admin', 'auth', 'tenants', 'authentication', 'rbac']:
-        return
-    
-    if sender.__name__ == 'AuditLog':
-        return
-    
-    if not getattr(sender, '_audit_enabled', True):
-        return
-    
-    # Skip if no organization context
-    # if not get_current_organization():
-    #     return
-    
-    # Skip if audit table doesn't exist yet (extra safety)
-    if not _audit_table_exists():
-        return
-    
+
     try:
-        from .models import AuditLog
-        
-        user = get_current_user()
-        org = get_current_organization()
+        context = _audit_context(instance)
+        if context['organization_id'] is None or not audit_table_exists(kwargs.get('using') or 'default'):
+            return
 
-        # Only keep user if it exists in current schema to avoid FK failures
-        log_user = _get_user_if_exists(user)
+        from .models import AuditLog
 
         # Get all field values for the deleted instance
-        old_values = {}
-        for field in instance._meta.fields:
-            if field.name in ['id']:
-                continue
-            value = getattr(instance, field.name)
-            if hasattr(value, 'pk'):
-                value = str(value.pk)
-            elif not isinstance(value, (str, int, float, bool, type(None))):
-                value = str(value)
-            old_values[field.name] = value
-        
-        try:
-            from django.db import ProgrammingError
-            AuditLog.objects.create(
-                user=log_user,
-                user_email=user.email if user and getattr(user, 'is_authenticated', False) else 'system',
+        values = instance.__dict__
+        old_values = {
+            name: _serialize(values[attname])
+            for name, attname in fields
+            if attname in values
+        }
+
+        enqueue(
+            AuditLog(
                 action='delete',
                 resource_type=sender.__name__,
                 resource_id=str(instance.pk),
-                resource_repr=str(instance)[:500],
+                resource_repr=str(instance)[:255],
                 old_values=old_values,
                 new_values={},
                 changed_fields=[],
-                ip_address=get_client_ip(),
-                user_agent=get_user_agent()[:500] if get_user_agent() else None,
-                organization=org,
-            )
-        except ProgrammingError as e:
-            if 'relation "core_auditlog" does not exist' in str(e):
-                return
-            raise e
+                **context,
+            ),
+            using=kwargs.get('using') or 'default',
+        )
     except Exception as e:
-
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f"Audit logging failed: {e}")
 
 
@@ -396,3 +322,33 @@ def ensure_organization_settings(sender, instance, created, **kwargs):
             "error": str(exc),
         })
 
+
+# ---------------------------------------------------------------------------
+# Tenant context cache invalidation (apps/core/tenant_cache.py)
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+@receiver(post_save, sender=OrganizationSettings)
+@receiver(post_delete, sender=OrganizationSettings)
+def invalidate_tenant_state(sender, instance, **kwargs):
+    invalidate_organization(instance.pk if sender is Organization else instance.organization_id)
+
+
+@receiver(pre_save, sender=OrganizationDomain)
+def remember_previous_domain(sender, instance, **kwargs):
+    """A renamed domain must also drop the mapping of its old host."""
+    instance._previous_domain_name = None
+    if instance.pk:
+        instance._previous_domain_name = (
+            OrganizationDomain.all_objects.filter(pk=instance.pk)
+            .values_list('domain_name', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=OrganizationDomain)
+@receiver(post_delete, sender=OrganizationDomain)
+def invalidate_tenant_host(sender, instance, **kwargs):
+    invalidate_host(instance.domain_name)
+    invalidate_host(getattr(instance, '_previous_domain_name', None))
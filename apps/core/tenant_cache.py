@@ -0,0 +1,339 @@
+"""
+Tenant Context Cache - host, organization and membership lookups without DB hits
+
+Every authenticated request resolves the same tenant context several times
+(domain middleware, JWT authentication, OrganizationMiddleware,
+SubscriptionMiddleware, ``User.organization``). This module answers all of
+those lookups from two tiers:
+
+- Process tier: a small LRU of recently used entries, trusted for
+  TENANT_CACHE_LOCAL_TTL seconds. This bounds how long another worker can
+  serve state that was changed elsewhere.
+- Shared tier: the default cache (Redis in production), kept for
+  TENANT_CACHE_TTL seconds.
+
+Entries:
+- ``tenant:host:<host>``  -> organization id, or '' for hosts without a
+  custom domain (negative entries matter: most traffic uses the main host)
+- ``tenant:org:<id>``     -> TenantState (organization, active subscription
+  with its plan and access state, branding settings). The entry expires on
+  the subscription's next access transition (trial end, expiry, grace
+  end), so SubscriptionMiddleware never sees a stale state.
+
+Membership is ``User.organization_id``, which is already on the loaded user
+row, so resolving a user's organization goes straight to the org entry.
+
+Writes to Organization, OrganizationDomain, OrganizationSettings,
+OrganizationSubscription and Plan invalidate the affected entries (see
+apps/core/signals.py and apps/billing/signals.py). The shared entry is
+deleted immediately and again after commit, so a concurrent request cannot
+re-cache pre-commit data. Until the writing transaction commits, its own
+thread reads those entries straight from the database and caches nothing,
+so a rollback never leaves uncommitted state behind.
+
+Callers always receive copies of the cached model instances.
+"""
+
+import copy
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HOST_KEY_PREFIX = 'tenant:host:'
+ORG_KEY_PREFIX = 'tenant:org:'
+
+TENANT_CACHE_TTL = getattr(settings, 'TENANT_CACHE_TTL', 300)
+LOCAL_TTL = getattr(settings, 'TENANT_CACHE_LOCAL_TTL', 5.0)
+LOCAL_SIZE = getattr(settings, 'TENANT_CACHE_LOCAL_SIZE', 2048)
+
+# Upper bound on how long an uncommitted invalidation bypasses the cache
+# (a rolled-back transaction never clears its pending keys).
+PENDING_WINDOW = 60.0
+
+_NO_DOMAIN = ''
+
+
+@dataclass
+class TenantState:
+    """Everything the request pipeline needs to know about one organization."""
+
+    organization: Any
+    subscription: Any = None
+    branding: Optional[Dict[str, Any]] = None
+    # OrganizationSubscription.access_state() of ``subscription``
+    access: Optional[str] = None
+    access_changes_on: Optional[datetime.date] = None
+
+    @property
+    def plan(self):
+        return getattr(self.subscription, 'plan', None)
+
+    def seconds_valid(self) -> Optional[float]:
+        """Seconds until the access state changes; ``None`` if it never does."""
+        if self.access_changes_on is None:
+            return None
+        changes_at = datetime.datetime.combine(
+            self.access_changes_on, datetime.time.min, tzinfo=datetime.timezone.utc
+        )
+        return (changes_at - timezone.now()).total_seconds()
+
+    def copy(self) -> 'TenantState':
+        organization = copy.copy(self.organization)
+        subscription = copy.copy(self.subscription) if self.subscription is not None else None
+        if subscription is not None:
+            subscription.organization = organization
+        return TenantState(
+            organization, subscription, self.branding, self.access, self.access_changes_on
+        )
+
+
+# --------------------------------------------------
+# PROCESS TIER
+# --------------------------------------------------
+class _LocalLRU:
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_local = _LocalLRU(LOCAL_SIZE, LOCAL_TTL)
+
+
+_pending = threading.local()
+
+
+def _pending_keys() -> Dict[str, float]:
+    keys = getattr(_pending, 'keys', None)
+    if keys is None:
+        keys = _pending.keys = {}
+    return keys
+
+
+def _is_pending(key: str) -> bool:
+    """True while this thread's open transaction has invalidated ``key``."""
+
+    keys = getattr(_pending, 'keys', None)
+    if not keys or key not in keys:
+        return False
+    if transaction.get_connection().in_atomic_block and time.monotonic() - keys[key] < PENDING_WINDOW:
+        return True
+    keys.pop(key, None)
+    return False
+
+
+def _cache_get(key):
+    try:
+        return cache.get(key)
+    except Exception as exc:
+        logger.warning(f"Tenant cache read failed for {key}: {exc}")
+        return None
+
+
+def _cache_set(key, value, ttl: Optional[float] = None) -> None:
+    timeout = TENANT_CACHE_TTL if ttl is None else max(1, min(int(ttl), TENANT_CACHE_TTL))
+    try:
+        cache.set(key, value, timeout)
+    except Exception as exc:
+        logger.warning(f"Tenant cache write failed for {key}: {exc}")
+
+
+# --------------------------------------------------
+# ORGANIZATION STATE
+# --------------------------------------------------
+def org_key(organization_id) -> str:
+    return f"{ORG_KEY_PREFIX}{organization_id}"
+
+
+def host_key(host: str) -> str:
+    return f"{HOST_KEY_PREFIX}{host}"
+
+
+def _load_organization(organization_id):
+    from apps.core.models import Organization
+
+    try:
+        return Organization.objects.filter(id=organization_id).first()
+    except (ValidationError, ValueError):
+        return None
+
+
+def build_tenant_state(organization_id) -> Optional[TenantState]:
+    """Load an organization's tenant state from the database."""
+
+    from apps.billing.models import OrganizationSubscription
+    from apps.core.models import OrganizationSettings
+
+    organization = _load_organization(organization_id)
+    if organization is None:
+        return None
+
+    subscription = (
+        OrganizationSubscription.objects.select_related('plan')
+        .filter(organization=organization, is_active=True)
+        .order_by('-start_date')
+        .first()
+    )
+
+    settings_qs = getattr(OrganizationSettings, 'all_objects', OrganizationSettings.objects)
+    branding = (
+        settings_qs.filter(organization=organization)
+        .values('branding_primary_color', 'branding_secondary_color', 'custom_settings')
+        .first()
+    )
+    access, changes_on = subscription.access_state() if subscription else (None, None)
+    return TenantState(organization, subscription, branding, access, changes_on)
+
+
+def get_tenant_state(organization_id) -> Optional[TenantState]:
+    """Return the tenant state of an organization (active or not), or ``None``."""
+
+    if not organization_id:
+        return None
+    key = org_key(organization_id)
+    if _is_pending(key):
+        return build_tenant_state(organization_id)
+
+    state = _local.get(key)
+    if state is None:
+        state = _cache_get(key)
+        if state is None or _expired(state):
+            state = build_tenant_state(organization_id)
+            if state is None:
+                return None
+            _cache_set(key, state, state.seconds_valid())
+        _local.set(key, state, state.seconds_valid())
+    return state.copy()
+
+
+def _expired(state: TenantState) -> bool:
+    remaining = state.seconds_valid()
+    return remaining is not None and remaining <= 0
+
+
+def get_organization(organization_id):
+    """Cached replacement for ``Organization.objects.filter(id=...).first()``."""
+
+    if organization_id and _is_pending(org_key(organization_id)):
+        return _load_organization(organization_id)
+    state = get_tenant_state(organization_id)
+    return state.organization if state else None
+
+
+def get_user_organization(user):
+    """The organization a user belongs to (``User.organization_id``)."""
+
+    organization_id = getattr(user, 'organization_id', None)
+    return get_organization(organization_id) if organization_id else None
+
+
+# --------------------------------------------------
+# HOST MAPPING
+# --------------------------------------------------
+def _lookup_domain(host: str) -> str:
+    from apps.core.models import OrganizationDomain
+
+    organization_id = (
+        OrganizationDomain.objects.filter(domain_name=host, is_active=True)
+        .values_list('organization_id', flat=True)
+        .first()
+    )
+    return str(organization_id) if organization_id else _NO_DOMAIN
+
+
+def get_host_organization_id(host: Optional[str]) -> Optional[str]:
+    """Organization id mapped to a custom domain, or ``None``."""
+
+    if not host:
+        return None
+    key = host_key(host)
+    if _is_pending(key):
+        return _lookup_domain(host) or None
+
+    organization_id = _local.get(key)
+    if organization_id is None:
+        organization_id = _cache_get(key)
+        if organization_id is None:
+            organization_id = _lookup_domain(host)
+            _cache_set(key, organization_id)
+        _local.set(key, organization_id)
+    return organization_id or None
+
+
+# --------------------------------------------------
+# INVALIDATION
+# --------------------------------------------------
+def _invalidate(key: str) -> None:
+    def _delete():
+        _local.pop(key)
+        try:
+            cache.delete(key)
+        except Exception as exc:
+            logger.error(f"Failed to invalidate tenant cache entry {key}: {exc}")
+
+    def _committed():
+        _pending_keys().pop(key, None)
+        _delete()
+
+    _delete()
+    if transaction.get_connection().in_atomic_block:
+        _pending_keys()[key] = time.monotonic()
+        transaction.on_commit(_committed)
+
+
+def invalidate_organization(organization_id) -> None:
+    if organization_id:
+        _invalidate(org_key(organization_id))
+
+
+def invalidate_host(host: Optional[str]) -> None:
+    if host:
+        _invalidate(host_key(host))
+
+
+def clear_local() -> None:
+    """Drop the process tier (tests / management commands)."""
+
+    _local.clear()
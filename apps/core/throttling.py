@@ -2,6 +2,11 @@
 Central DRF throttle classes used across environments.
 
 Rates are controlled from `REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]`.
+
+All throttles here are evaluated together through
+`apps.core.rate_limiting.rate_limiter`: the first throttle DRF asks
+checks every throttle of the view in one atomic call (one Redis round
+trip), and the rest read the memoized decision.
 """
 
 from __future__ import annotations
@@ -13,6 +18,14 @@ from django.core.cache import cache
 from rest_framework.request import Request
 from rest_framework.throttling import SimpleRateThrottle
 
+from apps.core.rate_limiting import (
+    SLIDING_WINDOW,
+    TOKEN_BUCKET,
+    RateDecision,
+    RateLimit,
+    rate_limiter,
+)
+
 
 def _ident(request: Request) -> str:
     return request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0].strip() or request.META.get("REMOTE_ADDR", "unknown")
@@ -22,7 +35,68 @@ def _safe_hash(value: str) -> str:
     return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
 
 
-class OrganizationRateThrottle(SimpleRateThrottle):
+class AtomicRateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle backed by the atomic limiter.
+
+    Subclasses only provide ``scope`` and ``get_cache_key``; ``mode``
+    picks token bucket (default) or sliding-window log.
+    """
+
+    mode = TOKEN_BUCKET
+
+    def rate_limit(self, request: Request, view=None) -> Optional[RateLimit]:
+        if self.rate is None:
+            return None
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return None
+        return RateLimit(key, self.num_requests, self.duration, self.mode)
+
+    def allow_request(self, request: Request, view) -> bool:
+        decisions = getattr(request, "_rate_limit_decisions", None)
+        if decisions is None or type(self) not in decisions:
+            decisions = _check_view_throttles(request, view, self)
+        self.decision = decisions[type(self)]
+        return self.decision is None or self.decision.allowed
+
+    def wait(self) -> Optional[float]:
+        decision: Optional[RateDecision] = getattr(self, "decision", None)
+        if decision is None or decision.allowed:
+            return None
+        return decision.retry_after
+
+
+def _check_view_throttles(request: Request, view, throttle: AtomicRateThrottle) -> dict:
+    """Decide every atomic throttle of ``view`` in one limiter call."""
+
+    throttles = [throttle]
+    get_throttles = getattr(view, "get_throttles", None)
+    if get_throttles is not None:
+        throttles += [
+            other for other in get_throttles()
+            if isinstance(other, AtomicRateThrottle) and type(other) is not type(throttle)
+        ]
+
+    decisions = {}
+    pending = []
+    for candidate in throttles:
+        limit = candidate.rate_limit(request, view)
+        if limit is None:
+            decisions[type(candidate)] = None
+        else:
+            pending.append((type(candidate), limit))
+
+    for (throttle_class, _), decision in zip(
+        pending, rate_limiter.check([limit for _, limit in pending])
+    ):
+        decisions[throttle_class] = decision
+
+    request._rate_limit_decisions = decisions
+    return decisions
+
+
+class OrganizationRateThrottle(AtomicRateThrottle):
     scope = "organization"
 
     def get_cache_key(self, request: Request, view=None) -> Optional[str]:
@@ -32,7 +106,7 @@ class OrganizationRateThrottle(SimpleRateThrottle):
         return f"throttle:org:ip:{_ident(request)}"
 
 
-class OrganizationUserRateThrottle(SimpleRateThrottle):
+class OrganizationUserRateThrottle(AtomicRateThrottle):
     scope = "org_user"
 
     def get_cache_key(self, request: Request, view=None) -> Optional[str]:
@@ -44,8 +118,10 @@ class OrganizationUserRateThrottle(SimpleRateThrottle):
         return f"throttle:org:{org_id}:user:{user.id}"
 
 
-class LoginRateThrottle(SimpleRateThrottle):
+class LoginRateThrottle(AtomicRateThrottle):
     scope = "login"
+    # Small limits: count exactly over the trailing window.
+    mode = SLIDING_WINDOW
 
     def get_cache_key(self, request: Request, view=None) -> str:
         email = str(request.data.get("email", "")).strip().lower()
@@ -53,8 +129,9 @@ class LoginRateThrottle(SimpleRateThrottle):
         return f"throttle:login:{_ident(request)}:{email_key}"
 
 
-class TwoFactorRateThrottle(SimpleRateThrottle):
+class TwoFactorRateThrottle(AtomicRateThrottle):
     scope = "two_factor"
+    mode = SLIDING_WINDOW
 
     def get_cache_key(self, request: Request, view=None) -> str:
         user = getattr(request, "user", None)
@@ -63,8 +140,9 @@ class TwoFactorRateThrottle(SimpleRateThrottle):
         return f"throttle:2fa:ip:{_ident(request)}"
 
 
-class PasswordResetThrottle(SimpleRateThrottle):
+class PasswordResetThrottle(AtomicRateThrottle):
     scope = "password_reset"
+    mode = SLIDING_WINDOW
 
     def get_cache_key(self, request: Request, view=None) -> str:
         email = str(request.data.get("email", "")).strip().lower()
@@ -72,7 +150,7 @@ class PasswordResetThrottle(SimpleRateThrottle):
         return f"throttle:password_reset:{_ident(request)}:{email_key}"
 
 
-class AttendancePunchThrottle(SimpleRateThrottle):
+class AttendancePunchThrottle(AtomicRateThrottle):
     scope = "attendance_punch"
 
     def get_cache_key(self, request: Request, view=None) -> str:
@@ -82,7 +160,7 @@ class AttendancePunchThrottle(SimpleRateThrottle):
         return f"throttle:attendance_punch:ip:{_ident(request)}"
 
 
-class APIKeyRateThrottle(SimpleRateThrottle):
+class APIKeyRateThrottle(AtomicRateThrottle):
     scope = "api_key"
 
     def get_cache_key(self, request: Request, view=None) -> Optional[str]:
@@ -92,7 +170,7 @@ class APIKeyRateThrottle(SimpleRateThrottle):
         return f"throttle:api_key:{_safe_hash(api_key)}"
 
 
-class BurstRateThrottle(SimpleRateThrottle):
+class BurstRateThrottle(AtomicRateThrottle):
     scope = "burst"
 
     def get_cache_key(self, request: Request, view=None) -> str:
@@ -102,7 +180,7 @@ class BurstRateThrottle(SimpleRateThrottle):
         return f"throttle:burst:ip:{_ident(request)}"
 
 
-class SustainedRateThrottle(SimpleRateThrottle):
+class SustainedRateThrottle(AtomicRateThrottle):
     scope = "sustained"
 
     def get_cache_key(self, request: Request, view=None) -> str:
@@ -112,7 +190,7 @@ class SustainedRateThrottle(SimpleRateThrottle):
         return f"throttle:sustained:ip:{_ident(request)}"
 
 
-class ReportExportThrottle(SimpleRateThrottle):
+class ReportExportThrottle(AtomicRateThrottle):
     scope = "report_export"
 
     def get_cache_key(self, request: Request, view=None) -> str:
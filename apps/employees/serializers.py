@@ -506,6 +506,7 @@ class OrgChartSerializer(serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
     name = serializers.ReadOnlyField(source='full_name')
     title = serializers.ReadOnlyField(source='designation.name')
+    avatar = serializers.ImageField(source='user.avatar', read_only=True)
     
     class Meta:
         model = Employee
@@ -513,9 +514,16 @@ class OrgChartSerializer(serializers.ModelSerializer):
     
     @extend_schema_field({'type': 'array', 'items': {'type': 'object'}})
     def get_children(self, obj):
-        if hasattr(obj, 'direct_reports'):
-             return OrgChartSerializer(obj.direct_reports.filter(is_active=True), many=True).data
-        return []
+        # ``reports`` (manager id -> direct reports) lets the caller load the
+        # whole tree in one query instead of one per node
+        reports = self.context.get('reports')
+        if reports is not None:
+            children = reports.get(obj.id, [])
+        elif hasattr(obj, 'direct_reports'):
+            children = obj.direct_reports.filter(is_active=True)
+        else:
+            return []
+        return OrgChartSerializer(children, many=True, context=self.context).data
 
 class EmployeeBulkImportSerializer(serializers.Serializer):
     file = serializers.FileField(validators=[_validate_upload])
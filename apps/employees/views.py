@@ -15,6 +15,7 @@ from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 import secrets
 import logging
+from collections import defaultdict
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError as DjangoValidationError
@@ -123,11 +124,23 @@ class EmployeeBranchScopedMixin:
         raise ValidationError({'employee': 'Employee is required.'})
 
 
+class EmployeeBaseQuerysetMixin:
+    """
+    Start from ``Employee.objects`` instead of the class-level ``.none()``
+    placeholder, so the organization and permission scoping above it apply
+    to real rows. Must come after those mixins.
+    """
+
+    def get_queryset(self):
+        return Employee.objects.all()
+
+
 class EmployeeViewSet(
     BulkImportExportMixin,
     OrganizationViewSetMixin,
     FilterByPermissionMixin,
     PermissionRequiredMixin,
+    EmployeeBaseQuerysetMixin,
     viewsets.ModelViewSet,
 ):
     """
@@ -199,7 +212,8 @@ class EmployeeViewSet(
             "reporting_manager__user",
         )
 
-        if self.action == "retrieve":
+        # Export serializes every row with the detail serializer
+        if self.action in ("retrieve", "export"):
             queryset = queryset.prefetch_related(
                 Prefetch(
                     "addresses",
@@ -624,7 +638,9 @@ class EmployeeViewSet(
     def team(self, request, pk=None):
         """Get direct reports"""
         employee = self.get_object()
-        team = employee.direct_reports.filter(is_active=True)
+        team = employee.direct_reports.filter(is_active=True).select_related(
+            "user", "department", "designation", "location", "reporting_manager", "reporting_manager__user",
+        )
         serializer = emp_serializers.EmployeeListSerializer(team, many=True)
         return Response({'success': True, 'data': serializer.data})
     
@@ -735,16 +751,19 @@ class EmployeeViewSet(
     def org_chart(self, request):
         org = getattr(request, 'organization', None)
 
-        qs = Employee.objects.filter(
-            reporting_manager__isnull=True,
-            is_active=True,
-            is_deleted=False
-        )
+        qs = Employee.objects.filter(is_active=True).select_related('designation', 'user')
 
         if org:
             qs = qs.filter(organization=org)
 
-        serializer = emp_serializers.OrgChartSerializer(qs, many=True)
+        roots, reports = [], defaultdict(list)
+        for employee in qs:
+            if employee.reporting_manager_id is not None:
+                reports[employee.reporting_manager_id].append(employee)
+            elif not employee.is_deleted:
+                roots.append(employee)
+
+        serializer = emp_serializers.OrgChartSerializer(roots, many=True, context={'reports': reports})
         return Response({'success': True, 'data': serializer.data})
 
 
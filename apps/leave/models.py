@@ -239,6 +239,7 @@ class LeaveRequest(OrganizationEntity):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._original_status = self.status
+        self._original_dates = (self.start_date, self.end_date)
 
     def clean(self):
         super().clean()
@@ -317,6 +318,7 @@ class LeaveRequest(OrganizationEntity):
         super().save(*args, **kwargs)
         self._sync_leave_balance(previous_status)
         self._original_status = self.status
+        self._original_dates = (self.start_date, self.end_date)
 
     def _sync_leave_balance(self, previous_status):
         if not self.employee_id or not self.leave_type_id or not self.total_days:
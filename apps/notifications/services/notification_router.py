@@ -1,7 +1,7 @@
 """Channel routing for notifications"""
 from __future__ import annotations
 
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Sequence
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -85,6 +85,11 @@ class NotificationRouter:
         # Placeholder for Teams/Slack connectors.
         return None
 
+    def push_realtime_many(self, notifications: Sequence[Notification]) -> None:
+        """Push already-delivered notifications to the recipients' open sockets."""
+        for notification in notifications:
+            self._push_realtime(notification)
+
     # Helpers -----------------------------------------------------------------
     def _push_realtime(self, notification: Notification) -> None:
         channel_layer = get_channel_layer()
@@ -1,6 +1,7 @@
 """Notification orchestration services"""
 from __future__ import annotations
 
+import logging
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Sequence
 
@@ -11,6 +12,8 @@ from apps.notifications.models import Notification, NotificationPreference, Noti
 from .notification_router import NotificationRouter
 from .template_renderer import RenderedNotification, TemplateRenderer
 
+logger = logging.getLogger(__name__)
+
 
 class NotificationService:
     """High-level orchestration for notification workflows."""
@@ -120,6 +123,65 @@ class NotificationService:
 
         return {'created': created, 'missing_recipients': missing_ids}
 
+    @classmethod
+    def send_email_batch(
+        cls,
+        *,
+        organization_id: str,
+        messages: Sequence[Dict[str, Any]],
+        entity_type: str = '',
+    ) -> List[Notification]:
+        """
+        Send direct emails (``employee``, ``subject``, ``body``, ``entity_id``)
+        over one SMTP connection and record them with one insert. Channel
+        preferences apply; recipients in quiet hours go through ``notify``,
+        which schedules their delivery.
+        """
+        from django.conf import settings
+        from django.core.mail import EmailMessage, get_connection
+
+        notifications: List[Notification] = []
+        with get_connection() as connection:
+            for message in messages:
+                employee = message['employee']
+                preference = cls._get_preferences(employee)
+                if cls._apply_quiet_hours(preference, None):
+                    cls.notify(
+                        organization_id=str(organization_id), employee=employee,
+                        subject=message['subject'], body=message['body'], channel='email',
+                        entity_type=entity_type, entity_id=message.get('entity_id'),
+                    )
+                    continue
+
+                channel = cls._apply_channel_preferences('email', preference)
+                notification = Notification(
+                    organization_id=organization_id, recipient=employee, channel=channel,
+                    subject=message['subject'], body=message['body'], status='sent', sent_at=timezone.now(),
+                    delivery_attempts=1, metadata={'notification_type': None, 'context': {}},
+                    entity_type=entity_type, entity_id=message.get('entity_id'),
+                )
+                if channel == 'email':
+                    try:
+                        if not employee.user.email:
+                            raise ValueError('Recipient has no email address')
+                        connection.send_messages([EmailMessage(
+                            message['subject'], message['body'], settings.DEFAULT_FROM_EMAIL,
+                            [employee.user.email], connection=connection,
+                        )])
+                    except Exception as exc:
+                        logger.exception("Email to employee %s failed", employee.id)
+                        notification.status = 'failed'
+                        notification.sent_at = None
+                        notification.metadata = {**notification.metadata, 'error': str(exc)}
+                notifications.append(notification)
+
+        Notification.objects.bulk_create(notifications)
+        try:
+            cls.router.push_realtime_many(notifications)
+        except Exception as exc:
+            logger.warning("Realtime notifications skipped: %s", exc)
+        return notifications
+
     @classmethod
     def mark_as_read(cls, notification_id: str, user) -> bool:
         notification = cls._safe_queryset(Notification.objects.all(), user=user).filter(id=notification_id).first()
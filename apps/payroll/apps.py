@@ -6,3 +6,7 @@ class PayrollConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.payroll'
     verbose_name = 'Payroll Management'
+
+    def ready(self):
+        # Import signal handlers
+        from . import signals  # pylint: disable=unused-import
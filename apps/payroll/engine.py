@@ -0,0 +1,399 @@
+"""
+Payroll Batch Engine - set-based payslip calculation
+
+Computes the payslips of any set of employees of a PayrollRun in a fixed
+number of passes instead of a handful of queries and writes per employee:
+
+1. salaries      - latest EmployeeSalary effective for the period
+2. attendance    - absent / half-day counts, one grouped aggregation
+3. unpaid leave  - approved unpaid leave overlapping the period
+4. encashments   - approved and unpaid (or already attached to this run)
+5. writes        - bulk_create new payslips, bulk_update existing ones and
+                   one UPDATE attaching the encashments to the run
+
+Money is held in integer paise on NumPy int64 columns: LOP proration is
+exact and rounds half-up like ``Decimal.quantize(ROUND_HALF_UP)``.
+``compute()`` is a pure function of the loaded columns, so callers can run
+it on modified inputs without touching the database.
+"""
+
+import calendar
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import EmployeeSalary, PayrollRun, Payslip
+
+# EmployeeSalary fields paid as prorated earnings (breakdown key = upper case)
+EARNING_FIELDS = (
+    'basic', 'hra', 'special_allowance', 'conveyance',
+    'medical_allowance', 'lta', 'performance_bonus',
+)
+# Deductions prorated with the earnings
+PRORATED_DEDUCTIONS = (
+    ('PF_EMPLOYEE', 'pf_employee'),
+    ('ESI_EMPLOYEE', 'esi_employee'),
+)
+# Deductions charged in full regardless of LOP
+FIXED_DEDUCTIONS = (
+    ('PROF_TAX', 'professional_tax'),
+)
+SALARY_FIELDS = EARNING_FIELDS + tuple(
+    name for _, name in PRORATED_DEDUCTIONS + FIXED_DEDUCTIONS
+)
+
+WRITE_BATCH_SIZE = 500
+
+# Payslip fields compared to report which payslips a re-run changed
+COMPARED_FIELDS = (
+    'gross_salary', 'total_deductions', 'net_salary',
+    'earnings_breakdown', 'deductions_breakdown',
+)
+
+
+def pay_period(payroll_run):
+    """(first day, last day, number of days) of the run's month."""
+
+    _, last_day = calendar.monthrange(payroll_run.year, payroll_run.month)
+    start = datetime.date(payroll_run.year, payroll_run.month, 1)
+    end = datetime.date(payroll_run.year, payroll_run.month, last_day)
+    return start, end, last_day
+
+
+def to_paise(values: Iterable, count: int) -> np.ndarray:
+    return np.fromiter((int((value or 0) * 100) for value in values), dtype=np.int64, count=count)
+
+
+def to_decimal(paise) -> Decimal:
+    return Decimal(int(paise)).scaleb(-2)
+
+
+def scale(amounts: np.ndarray, numerator, denominator: int) -> np.ndarray:
+    """``amounts * numerator / denominator`` in paise, rounded half away from zero."""
+
+    product = amounts * numerator
+    rounded = (2 * np.abs(product) + denominator) // (2 * denominator)
+    return np.sign(product) * rounded
+
+
+def prorate(amounts: np.ndarray, worked_halves: np.ndarray, total_days: int) -> np.ndarray:
+    """``amounts * worked / total`` in paise, rounded half away from zero."""
+
+    return scale(amounts, worked_halves, 2 * total_days)
+
+
+@dataclass(frozen=True)
+class LopPolicy:
+    """Loss of pay charged per input, in half days."""
+
+    absent: int = 2
+    half_day: int = 1
+    unpaid_leave: int = 2
+
+
+DEFAULT_LOP_POLICY = LopPolicy()
+
+
+@dataclass
+class PayrollInputs:
+    """Column-oriented calculation inputs; row ``i`` is ``employee_ids[i]``."""
+
+    total_days: int
+    employee_ids: List = field(default_factory=list)
+    salary_ids: List = field(default_factory=list)
+    # EmployeeSalary field -> monthly amount in paise
+    components: Dict[str, np.ndarray] = field(default_factory=dict)
+    absent_days: np.ndarray = None
+    half_days: np.ndarray = None
+    unpaid_leave_days: np.ndarray = None
+    encashment: np.ndarray = None
+    encashment_ids: List = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+
+@dataclass
+class PayrollColumns:
+    """Calculated amounts in paise, aligned with ``PayrollInputs`` rows."""
+
+    lop_halves: np.ndarray
+    worked_halves: np.ndarray
+    earnings: Dict[str, np.ndarray]
+    deductions: Dict[str, np.ndarray]
+    encashment: np.ndarray
+    gross: np.ndarray
+    total_deductions: np.ndarray
+    net: np.ndarray
+
+
+@dataclass
+class PayrollBatchResult:
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    # Employees whose payslip is new or whose amounts/breakdowns changed
+    changed_employee_ids: List = field(default_factory=list)
+    gross: Decimal = Decimal('0.00')
+    deductions: Decimal = Decimal('0.00')
+    net: Decimal = Decimal('0.00')
+
+
+def compute(inputs: PayrollInputs, policy: LopPolicy = DEFAULT_LOP_POLICY) -> PayrollColumns:
+    """Apply the payslip rules to every row at once."""
+
+    total_days = inputs.total_days
+    # By default absent = 1 day, half day = 0.5 day, unpaid leave = 1 day per day of overlap
+    lop_halves = (
+        policy.absent * inputs.absent_days
+        + policy.half_day * inputs.half_days
+        + policy.unpaid_leave * inputs.unpaid_leave_days
+    )
+    worked_halves = np.maximum(2 * total_days - lop_halves, 0)
+
+    earnings = {
+        name: prorate(inputs.components[name], worked_halves, total_days)
+        for name in EARNING_FIELDS
+    }
+    deductions = {
+        code: prorate(inputs.components[name], worked_halves, total_days)
+        for code, name in PRORATED_DEDUCTIONS
+    }
+    deductions.update({code: inputs.components[name] for code, name in FIXED_DEDUCTIONS})
+
+    gross = sum(earnings.values()) + inputs.encashment
+    total_deductions = sum(deductions.values())
+    return PayrollColumns(
+        lop_halves=lop_halves,
+        worked_halves=worked_halves,
+        earnings=earnings,
+        deductions=deductions,
+        encashment=inputs.encashment,
+        gross=gross,
+        total_deductions=total_deductions,
+        net=gross - total_deductions,
+    )
+
+
+class PayrollBatchEngine:
+    """Load, compute and store the payslips of one payroll run."""
+
+    def __init__(self, payroll_run):
+        self.payroll_run = payroll_run
+        self.organization_id = payroll_run.organization_id
+        self.start, self.end, self.total_days = pay_period(payroll_run)
+
+    def employees(self, employee_ids: Optional[Iterable] = None):
+        """Employees covered by the run (its branch, if any)."""
+
+        from apps.employees.models import Employee
+
+        queryset = Employee.objects.filter(organization_id=self.organization_id, is_active=True)
+        if self.payroll_run.branch_id:
+            queryset = queryset.filter(branch_id=self.payroll_run.branch_id)
+        if employee_ids is not None:
+            queryset = queryset.filter(id__in=list(employee_ids))
+        return queryset
+
+    # --------------------------------------------------
+    # LOAD
+    # --------------------------------------------------
+    def load(self, employee_ids: Optional[Iterable] = None, lock: bool = False) -> PayrollInputs:
+        """Load the inputs of every covered employee with a salary."""
+
+        from apps.attendance.models import AttendanceRecord
+        from apps.leave.models import LeaveEncashment, LeaveRequest
+
+        scope = self.employees(employee_ids).values('id')
+        inputs = PayrollInputs(total_days=self.total_days)
+
+        salaries = (
+            EmployeeSalary.objects.filter(
+                organization_id=self.organization_id,
+                employee_id__in=scope,
+                is_active=True,
+                effective_from__lte=self.payroll_run.pay_date,
+            )
+            .filter(Q(effective_to__isnull=True) | Q(effective_to__gte=self.start))
+            .order_by('employee_id', '-effective_from')
+            .values_list('id', 'employee_id', *SALARY_FIELDS)
+        )
+        rows = []
+        for row in salaries:
+            if inputs.employee_ids and inputs.employee_ids[-1] == row[1]:
+                continue  # older version of the same employee's salary
+            inputs.salary_ids.append(row[0])
+            inputs.employee_ids.append(row[1])
+            rows.append(row[2:])
+
+        count = len(inputs.employee_ids)
+        index = {employee_id: i for i, employee_id in enumerate(inputs.employee_ids)}
+        for position, name in enumerate(SALARY_FIELDS):
+            inputs.components[name] = to_paise((row[position] for row in rows), count)
+
+        inputs.absent_days = np.zeros(count, dtype=np.int64)
+        inputs.half_days = np.zeros(count, dtype=np.int64)
+        attendance = (
+            AttendanceRecord.objects.filter(
+                organization_id=self.organization_id,
+                employee_id__in=scope,
+                date__range=(self.start, self.end),
+                status__in=[AttendanceRecord.STATUS_ABSENT, AttendanceRecord.STATUS_HALF_DAY],
+            )
+            .order_by()
+            .values('employee_id')
+            .annotate(
+                absent=Count('id', filter=Q(status=AttendanceRecord.STATUS_ABSENT)),
+                half=Count('id', filter=Q(status=AttendanceRecord.STATUS_HALF_DAY)),
+            )
+        )
+        for row in attendance:
+            i = index.get(row['employee_id'])
+            if i is not None:
+                inputs.absent_days[i] = row['absent']
+                inputs.half_days[i] = row['half']
+
+        inputs.unpaid_leave_days = np.zeros(count, dtype=np.int64)
+        leaves = list(
+            LeaveRequest.objects.filter(
+                organization_id=self.organization_id,
+                employee_id__in=scope,
+                status=LeaveRequest.STATUS_APPROVED,
+                leave_type__is_paid=False,
+                start_date__lte=self.end,
+                end_date__gte=self.start,
+            ).values_list('employee_id', 'start_date', 'end_date')
+        )
+        leaves = [row for row in leaves if row[0] in index]
+        if leaves:
+            rows_at = np.fromiter((index[row[0]] for row in leaves), dtype=np.int64, count=len(leaves))
+            starts = np.array([row[1] for row in leaves], dtype='datetime64[D]')
+            ends = np.array([row[2] for row in leaves], dtype='datetime64[D]')
+            overlap = (
+                np.minimum(ends, np.datetime64(self.end)) - np.maximum(starts, np.datetime64(self.start))
+            ).astype(np.int64) + 1
+            np.add.at(inputs.unpaid_leave_days, rows_at, overlap)
+
+        inputs.encashment = np.zeros(count, dtype=np.int64)
+        encashments = LeaveEncashment.objects.filter(
+            Q(status=LeaveEncashment.STATUS_APPROVED, paid_in_payroll__isnull=True)
+            | Q(paid_in_payroll=self.payroll_run),
+            organization_id=self.organization_id,
+            employee_id__in=scope,
+        )
+        if lock:
+            encashments = encashments.select_for_update(of=('self',))
+        for encashment_id, employee_id, amount in encashments.values_list('id', 'employee_id', 'total_amount'):
+            i = index.get(employee_id)
+            if i is not None:
+                inputs.encashment[i] += int((amount or 0) * 100)
+                inputs.encashment_ids.append(encashment_id)
+        return inputs
+
+    # --------------------------------------------------
+    # STORE
+    # --------------------------------------------------
+    def build_payslip(self, inputs: PayrollInputs, columns: PayrollColumns, i: int) -> Payslip:
+        earnings = {
+            name.upper(): float(to_decimal(columns.earnings[name][i]))
+            for name in EARNING_FIELDS
+            if inputs.components[name][i] > 0
+        }
+        if columns.encashment[i]:
+            earnings['LEAVE_ENCASHMENT'] = float(to_decimal(columns.encashment[i]))
+        deductions = {code: float(to_decimal(amounts[i])) for code, amounts in columns.deductions.items()}
+
+        lop_days = int(columns.lop_halves[i]) / 2
+        return Payslip(
+            organization_id=self.organization_id,
+            payroll_run=self.payroll_run,
+            employee_id=inputs.employee_ids[i],
+            salary_snapshot={
+                'salary_id': str(inputs.salary_ids[i]),
+                **{name: float(to_decimal(inputs.components[name][i])) for name in SALARY_FIELDS},
+            },
+            attendance_snapshot={
+                'total_days': self.total_days,
+                'absent_days': int(inputs.absent_days[i]),
+                'half_days': int(inputs.half_days[i]),
+                'unpaid_leave_days': int(inputs.unpaid_leave_days[i]),
+                'lop_days': lop_days,
+                'days_worked': int(columns.worked_halves[i]) / 2,
+            },
+            gross_salary=to_decimal(columns.gross[i]),
+            total_deductions=to_decimal(columns.total_deductions[i]),
+            net_salary=to_decimal(columns.net[i]),
+            earnings_breakdown=earnings,
+            deductions_breakdown=deductions,
+        )
+
+    def run(self, employee_ids: Optional[Iterable] = None) -> PayrollBatchResult:
+        """Create or update the payslips of the covered employees."""
+
+        from apps.leave.models import LeaveEncashment
+
+        if self.payroll_run.status == PayrollRun.STATUS_LOCKED:
+            raise ValidationError("Cannot modify payslip after payroll is locked.")
+
+        # Stamped before loading as the payslips' computed_at: an input changed
+        # while this runs stays newer than the payslip (see
+        # apps/payroll/watermarks.py).
+        now = timezone.now()
+        with transaction.atomic():
+            inputs = self.load(employee_ids, lock=True)
+            result = PayrollBatchResult(processed=len(inputs))
+            if not len(inputs):
+                return result
+            columns = compute(inputs)
+
+            existing = {
+                row[0]: row[1:]
+                for row in Payslip.objects.filter(
+                    payroll_run=self.payroll_run, employee_id__in=inputs.employee_ids
+                ).values_list('employee_id', 'id', *COMPARED_FIELDS)
+            }
+            to_create, to_update = [], []
+            for i in range(len(inputs)):
+                payslip = self.build_payslip(inputs, columns, i)
+                payslip.computed_at = now
+                previous = existing.get(payslip.employee_id)
+                if previous is None:
+                    to_create.append(payslip)
+                    result.changed_employee_ids.append(payslip.employee_id)
+                    continue
+                payslip.id = previous[0]
+                payslip.updated_at = now
+                to_update.append(payslip)
+                if tuple(getattr(payslip, name) for name in COMPARED_FIELDS) != previous[1:]:
+                    result.changed_employee_ids.append(payslip.employee_id)
+
+            Payslip.objects.bulk_create(to_create, batch_size=WRITE_BATCH_SIZE)
+            Payslip.objects.bulk_update(
+                to_update,
+                [
+                    'salary_snapshot', 'attendance_snapshot', 'gross_salary',
+                    'total_deductions', 'net_salary', 'earnings_breakdown',
+                    'deductions_breakdown', 'computed_at', 'updated_at',
+                ],
+                batch_size=WRITE_BATCH_SIZE,
+            )
+            if inputs.encashment_ids:
+                LeaveEncashment.objects.filter(id__in=inputs.encashment_ids).update(
+                    status=LeaveEncashment.STATUS_PROCESSED,
+                    paid_in_payroll=self.payroll_run,
+                    updated_at=now,
+                )
+
+        result.created = len(to_create)
+        result.updated = len(to_update)
+        result.gross = to_decimal(columns.gross.sum())
+        result.deductions = to_decimal(columns.total_deductions.sum())
+        result.net = to_decimal(columns.net.sum())
+        return result
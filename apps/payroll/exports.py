@@ -0,0 +1,195 @@
+"""
+Streaming payroll exports
+
+Statutory reports (PF / ESI / PT), the payroll register and the bank
+transfer file are written row by row into a ``StreamingHttpResponse``.
+
+Row generators read flat tuples with ``values_list(...).iterator()`` (a
+server-side cursor on PostgreSQL) instead of model instances, so memory
+stays flat whatever the headcount, and the header line is sent before the
+first query runs. CSV lines are formatted by one ``csv.writer`` over a
+pass-through buffer and yielded in batches of EXPORT_BATCH_ROWS.
+"""
+
+import csv
+from typing import Iterable, Iterator, Sequence
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
+
+from .models import PFContribution, Payslip
+
+# Lines joined into one chunk of the response body
+EXPORT_BATCH_ROWS = 500
+
+
+class _Echo:
+    """Pseudo-buffer: ``csv.writer(_Echo()).writerow`` returns the formatted line."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header: Sequence, rows: Iterable[Sequence]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= EXPORT_BATCH_ROWS:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_csv(filename: str, header: Sequence, rows: Iterable[Sequence]) -> StreamingHttpResponse:
+    """CSV attachment streamed from ``rows`` (any lazy iterable of sequences)."""
+
+    response = StreamingHttpResponse(csv_lines(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_filename(prefix: str, payroll_run) -> str:
+    return f"{prefix}_{payroll_run.month}_{payroll_run.year}.csv"
+
+
+def _chunk_size() -> int:
+    return getattr(settings, 'PAYROLL_EXPORT_CHUNK_SIZE', 2000)
+
+
+def _full_name(first, middle, last) -> str:
+    # Same as User.full_name
+    return ' '.join(part for part in (first, middle, last) if part)
+
+
+NAME_FIELDS = ('employee__user__first_name', 'employee__user__middle_name', 'employee__user__last_name')
+
+
+def _payslips(payroll_run):
+    return Payslip.objects.filter(payroll_run=payroll_run).order_by('employee__employee_id')
+
+
+# --------------------------------------------------
+# PF (ECR)
+# --------------------------------------------------
+PF_HEADER = (
+    'UAN', 'Member Name', 'Gross Wages', 'EPF Wages', 'EPS Wages',
+    'EDLI Wages', 'EPF Employee', 'EPS Employer', 'EPF Employer Diff',
+    'NCP Days', 'Refund of Advances',
+)
+
+
+def pf_rows(payroll_run) -> Iterator[tuple]:
+    contributions = (
+        PFContribution.objects.filter(payslip__payroll_run=payroll_run)
+        .order_by('payslip__employee__employee_id')
+        .values_list(
+            'uan', *(f'payslip__{name}' for name in NAME_FIELDS), 'payslip__gross_salary',
+            'pf_wages', 'epf_employee', 'eps', 'epf_employer',
+        )
+    )
+    for uan, first, middle, last, gross, wages, epf_employee, eps, epf_employer in contributions.iterator(
+        chunk_size=_chunk_size()
+    ):
+        yield (
+            uan, _full_name(first, middle, last), gross, wages, wages, wages,
+            epf_employee, eps, epf_employer - eps, 0, 0,
+        )
+
+
+# --------------------------------------------------
+# ESI
+# --------------------------------------------------
+ESI_HEADER = (
+    'IP Number', 'IP Name', 'No of Days Worked', 'Total Wages',
+    'IP Contribution', 'Employer Contribution', 'Total Contribution',
+)
+
+
+def esi_rows(payroll_run) -> Iterator[tuple]:
+    payslips = _payslips(payroll_run).values_list(
+        'employee__employee_id', *NAME_FIELDS, 'attendance_snapshot__days_worked', 'gross_salary',
+        'salary_snapshot__esi_employee', 'salary_snapshot__esi_employer',
+    )
+    for employee_id, first, middle, last, days_worked, gross, esi_employee, esi_employer in payslips.iterator(
+        chunk_size=_chunk_size()
+    ):
+        esi_employee, esi_employer = esi_employee or 0, esi_employer or 0
+        if esi_employee > 0 or esi_employer > 0:
+            yield (
+                employee_id, _full_name(first, middle, last), days_worked or 0, gross,
+                esi_employee, esi_employer, esi_employee + esi_employer,
+            )
+
+
+# --------------------------------------------------
+# Professional tax
+# --------------------------------------------------
+PT_HEADER = ('Employee ID', 'Employee Name', 'PAN', 'State', 'Gross Salary', 'Professional Tax')
+
+
+def pt_rows(payroll_run) -> Iterator[tuple]:
+    payslips = _payslips(payroll_run).values_list(
+        'employee__employee_id', *NAME_FIELDS, 'employee__pan_number', 'employee__location__state',
+        'gross_salary', 'salary_snapshot__professional_tax',
+    )
+    for employee_id, first, middle, last, pan, state, gross, pt in payslips.iterator(chunk_size=_chunk_size()):
+        if pt and pt > 0:
+            yield (employee_id, _full_name(first, middle, last), pan or '', state or '', gross, pt)
+
+
+# --------------------------------------------------
+# Payroll register
+# --------------------------------------------------
+REGISTER_HEADER = (
+    'Employee ID', 'Employee Name', 'Days Worked', 'LOP Days',
+    'Gross Salary', 'Total Deductions', 'Net Salary',
+)
+
+
+def register_rows(payroll_run) -> Iterator[tuple]:
+    payslips = _payslips(payroll_run).values_list(
+        'employee__employee_id', *NAME_FIELDS,
+        'attendance_snapshot__days_worked', 'attendance_snapshot__lop_days',
+        'gross_salary', 'total_deductions', 'net_salary',
+    )
+    for employee_id, first, middle, last, *amounts in payslips.iterator(chunk_size=_chunk_size()):
+        yield (employee_id, _full_name(first, middle, last), *amounts)
+
+
+# --------------------------------------------------
+# Bank transfer
+# --------------------------------------------------
+BANK_TRANSFER_HEADER = (
+    'Employee ID', 'Beneficiary Name', 'Bank Name', 'Account Number',
+    'IFSC', 'Amount', 'Narration',
+)
+
+
+def bank_transfer_rows(payroll_run) -> Iterator[tuple]:
+    """Net pay per payslip to the employee's primary bank account (blank when none)."""
+
+    from apps.core.encryption import decrypt_value
+    from apps.employees.models import EmployeeBankAccount
+
+    accounts = EmployeeBankAccount.objects.filter(employee_id=OuterRef('employee_id')).order_by(
+        '-is_primary', 'created_at'
+    )
+    payslips = _payslips(payroll_run).annotate(
+        **{
+            f'bank_{name}': Subquery(accounts.values(name)[:1])
+            for name in ('account_holder_name', 'bank_name', 'account_number', 'ifsc_code')
+        }
+    ).values_list(
+        'employee__employee_id', 'bank_account_holder_name', 'bank_bank_name',
+        'bank_account_number', 'bank_ifsc_code', 'net_salary',
+    )
+    narration = f"Salary {payroll_run.month}/{payroll_run.year}"
+    for employee_id, holder, bank, account_number, ifsc, net in payslips.iterator(chunk_size=_chunk_size()):
+        yield (
+            employee_id, holder or '', bank or '',
+            decrypt_value(account_number) if account_number else '', ifsc or '', net, narration,
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:16
+
+from django.db import migrations, models
+
+
+def backfill_computed_at(apps, schema_editor):
+    # Existing payslips keep the watermark they were compared with so far
+    Payslip = apps.get_model('payroll', 'Payslip')
+    Payslip.objects.filter(computed_at__isnull=True).update(computed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0005_payrollinputwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payslip',
+            name='computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_computed_at, migrations.RunPython.noop),
+    ]
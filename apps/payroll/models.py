@@ -196,6 +196,13 @@ class PayrollRun(OrganizationEntity):
     total_deductions = models.DecimalField(max_digits=16, decimal_places=2, default=0)
     total_net = models.DecimalField(max_digits=16, decimal_places=2, default=0)
 
+    # Fan-out progress: each chunk task bumps these in one UPDATE
+    chunks_total = models.PositiveIntegerField(default=0)
+    chunks_completed = models.PositiveIntegerField(default=0)
+    chunks_failed = models.PositiveIntegerField(default=0)
+    employees_processed = models.PositiveIntegerField(default=0)
+    failed_employee_ids = models.JSONField(default=list, blank=True)
+
     processed_at = models.DateTimeField(null=True, blank=True)
     approved_at = models.DateTimeField(null=True, blank=True)
     locked_at = models.DateTimeField(null=True, blank=True)
@@ -275,6 +282,10 @@ class Payslip(OrganizationEntity):
 
     pdf_file = models.FileField(upload_to='payslips/', null=True, blank=True)
 
+    # Set only by the payroll engine; compared with input watermarks
+    # (updated_at also moves on PDF storage and other edits).
+    computed_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         ordering = ['employee__employee_id']
         constraints = [
@@ -298,6 +309,50 @@ class Payslip(OrganizationEntity):
         return f"{self.employee} - {self.payroll_run.month}/{self.payroll_run.year}"
 
 
+# =====================================================
+# PAYROLL INPUT WATERMARK (Incremental Recalculation)
+# =====================================================
+
+class PayrollInputWatermark(OrganizationEntity):
+    """
+    When an employee's payroll inputs for a pay period last changed.
+    Payslips computed before ``changed_at`` are stale.
+    """
+    SOURCE_ATTENDANCE = 'attendance'
+    SOURCE_LEAVE = 'leave'
+    SOURCE_SALARY = 'salary'
+
+    SOURCE_CHOICES = [
+        (SOURCE_ATTENDANCE, 'Attendance'),
+        (SOURCE_LEAVE, 'Leave'),
+        (SOURCE_SALARY, 'Salary'),
+    ]
+
+    employee = models.ForeignKey(
+        'employees.Employee',
+        on_delete=models.CASCADE,
+        related_name='payroll_watermarks'
+    )
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    changed_at = models.DateTimeField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['organization', 'employee', 'year', 'month'],
+                name='uq_payroll_watermark_per_period'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['organization', 'year', 'month', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - {self.month}/{self.year} ({self.source})"
+
+
 # =====================================================
 # PF CONTRIBUTION
 # =====================================================
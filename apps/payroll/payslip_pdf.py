@@ -0,0 +1,134 @@
+"""
+Payslip PDF rendering
+
+Rendering is pure: a ``PayslipLayout`` (the per-run static part: organization
+header, period and branch block) plus one plain payslip row produce one PDF.
+Nothing here touches Django.
+
+Every PDF is written to a file in a caller-provided directory and the caller
+streams those files to storage. Runs are parallelised by the Celery group of
+payslip chunk tasks (apps/payroll/tasks.py), not inside a task: prefork
+workers are daemonic and cannot start child processes.
+"""
+
+import io
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FONT = "Helvetica"
+FONT_BOLD = "Helvetica-Bold"
+
+
+@dataclass(frozen=True)
+class PayslipLayout:
+    """The part of a payslip shared by every employee of a run."""
+
+    organization_name: str
+    period: str
+    branch_name: Optional[str] = None
+
+
+@lru_cache(maxsize=256)
+def get_layout(organization_name: str, month: int, year: int,
+               branch_name: Optional[str] = None) -> PayslipLayout:
+    return PayslipLayout(organization_name, f"{month}/{year}", branch_name)
+
+
+def layout_for(payroll_run) -> PayslipLayout:
+    branch = payroll_run.branch
+    return get_layout(
+        payroll_run.organization.name, payroll_run.month, payroll_run.year,
+        branch.name if branch else None,
+    )
+
+
+def render_payslip(layout: PayslipLayout, row: Dict, output=None):
+    """
+    Draw one payslip. ``row`` carries employee_name, employee_code,
+    earnings, deductions, gross, total_deductions and net.
+    Returns the PDF bytes, or writes them to ``output`` when given.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    buf = output if output is not None else io.BytesIO()
+    c = pdf_canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    y = height - 30 * mm
+
+    # Header
+    c.setFont(FONT_BOLD, 16)
+    c.drawString(30 * mm, y, layout.organization_name)
+    y -= 10 * mm
+    c.setFont(FONT, 10)
+    c.drawString(30 * mm, y, "Payslip")
+    y -= 8 * mm
+
+    c.drawString(30 * mm, y, f"Employee: {row['employee_name']} ({row['employee_code']})")
+    y -= 6 * mm
+    c.drawString(30 * mm, y, f"Month/Year: {layout.period}")
+    y -= 6 * mm
+    if layout.branch_name:
+        c.drawString(30 * mm, y, f"Branch: {layout.branch_name}")
+        y -= 6 * mm
+    y -= 4 * mm
+
+    # Earnings
+    c.setFont(FONT_BOLD, 11)
+    c.drawString(30 * mm, y, "Earnings")
+    y -= 6 * mm
+    c.setFont(FONT, 10)
+    for label, amount in (row.get('earnings') or {}).items():
+        c.drawString(35 * mm, y, f"{label}:")
+        c.drawRightString(width - 30 * mm, y, f"{amount}")
+        y -= 5 * mm
+
+    y -= 4 * mm
+    c.setFont(FONT_BOLD, 11)
+    c.drawString(30 * mm, y, "Deductions")
+    y -= 6 * mm
+    c.setFont(FONT, 10)
+    for label, amount in (row.get('deductions') or {}).items():
+        c.drawString(35 * mm, y, f"{label}:")
+        c.drawRightString(width - 30 * mm, y, f"{amount}")
+        y -= 5 * mm
+
+    # Totals
+    y -= 6 * mm
+    c.setFont(FONT_BOLD, 11)
+    c.drawString(30 * mm, y, f"Gross: {row['gross']}")
+    y -= 6 * mm
+    c.drawString(30 * mm, y, f"Deductions: {row['total_deductions']}")
+    y -= 6 * mm
+    c.drawString(30 * mm, y, f"Net Pay: {row['net']}")
+
+    c.showPage()
+    c.save()
+    if output is None:
+        return buf.getvalue()
+    return None
+
+
+def render_to_file(layout: PayslipLayout, row: Dict, directory: str) -> Optional[str]:
+    """Render ``row`` into ``directory``; returns the file path, or None on failure."""
+
+    path = os.path.join(directory, row['filename'])
+    try:
+        with open(path, 'wb') as handle:
+            render_payslip(layout, row, handle)
+    except Exception:
+        logger.exception("Payslip PDF rendering failed for %s", row.get('employee_code'))
+        return None
+    return path
+
+
+def render_files(layout: PayslipLayout, rows: List[Dict], directory: str) -> List[Optional[str]]:
+    """Render every row into ``directory``; paths are aligned with ``rows``."""
+
+    return [render_to_file(layout, row, directory) for row in rows]
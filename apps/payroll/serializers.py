@@ -238,3 +238,45 @@ class LoanRepaymentSerializer(TenantScopedSerializer):
             'payslip', 'remarks', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'organization', 'created_at', 'updated_at']
+
+
+class PayrollSimulationSerializer(serializers.Serializer):
+    """What-if scenario for PayrollRunViewSet.simulate (see apps/payroll/simulation.py)."""
+
+    component_factors = serializers.DictField(
+        child=serializers.DecimalField(max_digits=8, decimal_places=4, min_value=0),
+        required=False,
+        help_text="Multiply salary components, e.g. {\"basic\": 1.1}",
+    )
+    percent_of_basic = serializers.DictField(
+        child=serializers.DecimalField(max_digits=7, decimal_places=4, min_value=0),
+        required=False,
+        help_text="Set components as a percentage of basic, e.g. {\"hra\": 40}",
+    )
+    absent_lop_days = serializers.DecimalField(max_digits=3, decimal_places=1, min_value=0, default=1)
+    half_day_lop_days = serializers.DecimalField(max_digits=3, decimal_places=1, min_value=0, default=0.5)
+    unpaid_leave_lop_days = serializers.DecimalField(max_digits=3, decimal_places=1, min_value=0, default=1)
+    include_encashments = serializers.BooleanField(default=True)
+    limit = serializers.IntegerField(min_value=0, max_value=1000, default=100)
+
+    def _validate_components(self, value, allowed):
+        unknown = set(value) - set(allowed)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown salary components: {', '.join(sorted(unknown))}")
+        return value
+
+    def validate_component_factors(self, value):
+        from .engine import SALARY_FIELDS
+
+        return self._validate_components(value, SALARY_FIELDS)
+
+    def validate_percent_of_basic(self, value):
+        from .engine import SALARY_FIELDS
+
+        return self._validate_components(value, [name for name in SALARY_FIELDS if name != 'basic'])
+
+    def validate(self, attrs):
+        for name in ('absent_lop_days', 'half_day_lop_days', 'unpaid_leave_lop_days'):
+            if attrs[name] * 2 % 1:
+                raise serializers.ValidationError({name: "Must be a multiple of 0.5 days"})
+        return attrs
@@ -3,222 +3,214 @@ Payroll Services - Calculation Engine and Processing Logic
 """
 
 from decimal import Decimal, ROUND_HALF_UP
-from django.utils import timezone
+from django.conf import settings
 from django.db import transaction
-from .models import (
-    EmployeeSalary, PayrollRun, Payslip
-)
-from apps.attendance.models import AttendanceRecord
-from apps.leave.models import LeaveRequest
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+from .engine import PayrollBatchEngine, PayrollBatchResult
+from .models import PayrollInputWatermark, PayrollRun, Payslip
 
 class PayrollCalculationService:
     """
     Core engine for payroll calculations.
     Handles earnings, deductions, statutory components, and LOP.
+    The math lives in apps/payroll/engine.py and runs set-based over a whole run.
     """
-    
+
     @staticmethod
     def calculate_payslip(employee, payroll_run):
         """
         Calculate all components for an individual employee's payslip.
+        Returns None when the employee has no salary effective for the run.
         """
-        from apps.core.signals import disable_audit_signals
-        with disable_audit_signals():
-            import calendar
-        
-        # 1. Get current compensation structure (Now Flat Model)
-        salary = EmployeeSalary.objects.filter(
-            employee=employee,
-            effective_from__lte=payroll_run.pay_date
-        ).first() # OneToOne basically, but filter handles effective_date check simpler? 
-        
-        # Actually it's OneToOne, so we should just get it.
-        # But we might want to check effective_date.
-        try:
-            salary = employee.salary
-            if salary.effective_from > payroll_run.pay_date:
-                # If salary starts in future, skip?
-                # Or assume current is valid.
-                pass 
-        except EmployeeSalary.DoesNotExist:
+        result = PayrollBatchEngine(payroll_run).run([employee.id])
+        if not result.processed:
             return None
-            
-        # 2. Calculate working days and LOP
-        _, last_day = calendar.monthrange(payroll_run.year, payroll_run.month)
-        start_date = timezone.datetime(payroll_run.year, payroll_run.month, 1).date()
-        end_date = timezone.datetime(payroll_run.year, payroll_run.month, last_day).date()
-        
-        total_days = last_day
-        
-        # Count LOP days (Absent = 1 day, Half Day = 0.5 day)
-        absent_days = AttendanceRecord.objects.filter(
-            employee=employee,
-            date__range=(start_date, end_date),
-            status=AttendanceRecord.STATUS_ABSENT
-        ).count()
-        
-        half_days = AttendanceRecord.objects.filter(
-            employee=employee,
-            date__range=(start_date, end_date),
-            status=AttendanceRecord.STATUS_HALF_DAY
-        ).count()
-        
-        lop_days = Decimal(str(absent_days)) + (Decimal(str(half_days)) * Decimal('0.5'))
-        
-        # Add unpaid leaves
-        unpaid_leaves = LeaveRequest.objects.filter(
-            employee=employee,
-            start_date__lte=end_date,
-            end_date__gte=start_date,
-            status='approved',
-            leave_type__is_paid=False
-        )
-        
-        for lr in unpaid_leaves:
-            o_start = max(start_date, lr.start_date)
-            o_end = min(end_date, lr.end_date)
-            overlap = (o_end - o_start).days + 1
-            lop_days += overlap
-            
-        days_worked = Decimal(str(total_days)) - Decimal(str(lop_days))
-        
-        # 3. Calculate adjustment factor
-        adjustment_factor = days_worked / Decimal(str(total_days))
-        
-        # 4. Process individual components (Flat Model Mapping)
-        earnings = {}
-        deductions = {}
-        
-        # Explicit Mapping
-        earning_fields = [
-            'basic', 'hra', 'special_allowance', 'conveyance', 
-            'medical_allowance', 'lta', 'performance_bonus'
-        ]
-        
-        basic_salary = Decimal('0.0')
-        hra = Decimal('0.0')
-        other_allowances = Decimal('0.0')
-        
-        for field in earning_fields:
-            val = getattr(salary, field, Decimal('0.0')) or Decimal('0.0')
-            adjusted_val = (val * adjustment_factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            if val > 0:
-                earnings[field.upper()] = float(adjusted_val)
-                
-            if field == 'basic':
-                basic_salary = adjusted_val
-            elif field == 'hra':
-                hra = adjusted_val
-            else:
-                other_allowances += adjusted_val
+        return Payslip.objects.get(payroll_run=payroll_run, employee=employee)
 
-        # Deductions (Usually Fixed or Percentage)
-        # PF Employee
-        pf_val = getattr(salary, 'pf_employee', Decimal('0.0')) or Decimal('0.0')
-        # If PF is percentage of basic logic is needed, do it here. 
-        # But we assume the flat model value is the intended monthly deduction.
-        # However, PF usually scales with LOP too if it's on Basic.
-        # Let's scale it for now to be safe.
-        pf_employee = (pf_val * adjustment_factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        deductions['PF_EMPLOYEE'] = float(pf_employee)
-        
-        # ESI
-        esi_val = getattr(salary, 'esi_employee', Decimal('0.0')) or Decimal('0.0')
-        esi_employee = (esi_val * adjustment_factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        deductions['ESI_EMPLOYEE'] = float(esi_employee)
-        
-        # Prof Tax (Usually fixed slab, but we should allow it to be 0 if gross is low)
-        pt_val = getattr(salary, 'professional_tax', Decimal('0.0')) or Decimal('0.0')
-        # Simple logic: If gross is low, PT might be waived. 
-        # For now, we use the value from the salary structure.
-        deductions['PROF_TAX'] = float(pt_val)
-        
-        # 6. Sum totals
-        gross_salary = sum(Decimal(str(v)) for v in earnings.values())
-        
-        # Add Leave Encashment
-        from apps.leave.models import LeaveEncashment
-        approved_encashments = LeaveEncashment.objects.filter(
-            employee=employee,
-            status=LeaveEncashment.STATUS_APPROVED,
-            paid_in_payroll__isnull=True
-        )
-        
-        encashment_total = Decimal('0.0')
-        for enc in approved_encashments:
-            amt = enc.total_amount or Decimal('0.0')
-            encashment_total += amt
-            enc.status = LeaveEncashment.STATUS_PROCESSED
-            enc.paid_in_payroll = payroll_run
-            enc.save()
-            
-        gross_salary += encashment_total
-        total_deductions = sum(Decimal(str(v)) for v in deductions.values())
-        net_salary = gross_salary - total_deductions
-        
-        # 7. Create or update payslip
-        payslip, created = Payslip.objects.update_or_create(
-            payroll_run=payroll_run,
-            employee=employee,
-            defaults={
-                'total_days': total_days,
-                'working_days': int(days_worked),
-                'days_worked': days_worked,
-                'lop_days': lop_days,
-                'basic_salary': basic_salary,
-                'hra': hra,
-                'other_allowances': other_allowances,
-                'leave_encashment': encashment_total,
-                'gross_salary': gross_salary,
-                'pf_employee': pf_employee,
-                'total_deductions': total_deductions,
-                'net_salary': net_salary,
-                'earnings_breakdown': earnings,
-                'deductions_breakdown': deductions,
-                'organization': payroll_run.organization
-            }
+    @classmethod
+    def process_payroll_run(cls, payroll_run_id, employee_ids=None):
+        """
+        Process payroll for all active employees of the run (or ``employee_ids``).
+
+        Employees are split into chunks of PAYROLL_CHUNK_SIZE, each computed
+        by one task; a chord finalizes the run once every chunk reported.
+        """
+        from celery import chord
+        from .tasks import calculate_payroll_chunk, finalize_payroll_run_task
+
+        payroll_run = PayrollRun.objects.select_related('organization').get(id=payroll_run_id)
+        if employee_ids is None:
+            employee_ids = PayrollBatchEngine(payroll_run).employees().values_list('id', flat=True)
+        employee_ids = [str(employee_id) for employee_id in employee_ids]
+        chunk_size = max(1, getattr(settings, 'PAYROLL_CHUNK_SIZE', 250))
+        chunks = [employee_ids[i:i + chunk_size] for i in range(0, len(employee_ids), chunk_size)]
+
+        progress = {
+            'status': PayrollRun.STATUS_PROCESSING,
+            'chunks_total': len(chunks),
+            'chunks_completed': 0,
+            'chunks_failed': 0,
+            'employees_processed': 0,
+            'failed_employee_ids': [],
+        }
+        PayrollRun.objects.filter(id=payroll_run.id).update(updated_at=timezone.now(), **progress)
+        for name, value in progress.items():
+            setattr(payroll_run, name, value)
+
+        if not chunks:
+            return cls.finalize_payroll_run(payroll_run)
+
+        organization_id, run_id = str(payroll_run.organization_id), str(payroll_run.id)
+        job = chord(
+            (calculate_payroll_chunk.s(organization_id, run_id, chunk) for chunk in chunks),
+            finalize_payroll_run_task.s(organization_id, run_id),
         )
-        
-        return payslip
+        # Chunks must see the PROCESSING state committed by this transaction.
+        transaction.on_commit(job.apply_async)
+        return payroll_run
 
     @classmethod
-    def process_payroll_run(cls, payroll_run_id):
+    def recalculate_incremental(cls, payroll_run_id):
         """
-        Process payroll for all active employees using parallel tasks.
+        Recompute only the payslips whose inputs changed since they were
+        computed, and report which of them actually changed.
         """
-        from .tasks import calculate_single_payslip_task, finalize_payroll_run_task
-        from celery import group
-        
         payroll_run = PayrollRun.objects.select_related('organization').get(id=payroll_run_id)
-        payroll_run.status = PayrollRun.STATUS_PROCESSING
-        payroll_run.save()
-        
-        from apps.employees.models import Employee
-        active_employee_ids = list(Employee.objects.filter(
-            is_active=True, 
-            is_deleted=False
-        ).values_list('id', flat=True))
-        
-        if not active_employee_ids:
-            payroll_run.status = PayrollRun.STATUS_PROCESSED
-            payroll_run.processed_at = timezone.now()
-            payroll_run.save()
+        engine = PayrollBatchEngine(payroll_run)
+        stale = cls.stale_employee_ids(payroll_run, engine)
+        result = engine.run(stale) if stale else PayrollBatchResult()
+        cls.finalize_payroll_run(payroll_run)
+        return {
+            'recomputed': result.processed,
+            'created': result.created,
+            'changed_employee_ids': [str(employee_id) for employee_id in result.changed_employee_ids],
+        }
+
+    @staticmethod
+    def stale_employee_ids(payroll_run, engine=None):
+        """
+        Employees of the run whose payslip was computed (``computed_at``)
+        before their input watermark for the period, who have no payslip
+        yet, or who have an approved encashment waiting to be paid.
+        """
+        from apps.leave.models import LeaveEncashment
+
+        engine = engine or PayrollBatchEngine(payroll_run)
+        computed_at = Payslip.objects.filter(
+            payroll_run=payroll_run, employee_id=OuterRef('employee_id')
+        ).values('computed_at')[:1]
+        watermarked = (
+            PayrollInputWatermark.objects.filter(
+                organization_id=payroll_run.organization_id,
+                year=payroll_run.year,
+                month=payroll_run.month,
+            )
+            .annotate(computed_at=Subquery(computed_at))
+            .filter(Q(computed_at__isnull=True) | Q(changed_at__gt=F('computed_at')))
+            .values_list('employee_id', flat=True)
+        )
+        without_payslip = engine.employees().exclude(
+            id__in=Payslip.objects.filter(payroll_run=payroll_run).values('employee_id')
+        ).values_list('id', flat=True)
+        encashing = LeaveEncashment.objects.filter(
+            organization_id=payroll_run.organization_id,
+            status=LeaveEncashment.STATUS_APPROVED,
+            paid_in_payroll__isnull=True,
+        ).values_list('employee_id', flat=True)
+        return set(watermarked) | set(without_payslip) | set(encashing)
+
+    @staticmethod
+    def simulate(payroll_run, scenario_data, limit=100):
+        """What-if payroll for ``payroll_run`` compared with the last processed run; writes nothing."""
+        from .simulation import Scenario, simulate
+
+        return simulate(payroll_run, Scenario.from_data(scenario_data), limit=limit)
+
+    @classmethod
+    def retry_failed_chunks(cls, payroll_run_id):
+        """Re-dispatch the employees of the chunks that exhausted their retries."""
+        payroll_run = PayrollRun.objects.get(id=payroll_run_id)
+        if not payroll_run.failed_employee_ids:
             return payroll_run
+        return cls.process_payroll_run(payroll_run.id, payroll_run.failed_employee_ids)
 
-        # Create a group of tasks and link to a finalizer
-        job = group(
-            calculate_single_payslip_task.s(emp_id, str(payroll_run_id)) 
-            for emp_id in active_employee_ids
+    @staticmethod
+    def record_chunk(payroll_run_id, processed):
+        PayrollRun.objects.filter(id=payroll_run_id).update(
+            chunks_completed=F('chunks_completed') + 1,
+            employees_processed=F('employees_processed') + processed,
+            updated_at=timezone.now(),
         )
-        
-        # Trigger the group execution
-        # Note: In a real system we'd use .apply_async(link=finalize_payroll_run_task.s(str(payroll_run_id)))
-        # For simplicity in this architecture refactor, we are setting up the structure.
-        result = job.apply_async(link=finalize_payroll_run_task.s(str(payroll_run_id)))
-        
+
+    @staticmethod
+    def record_chunk_failure(payroll_run_id, employee_ids):
+        with transaction.atomic():
+            payroll_run = PayrollRun.objects.select_for_update().get(id=payroll_run_id)
+            payroll_run.chunks_completed += 1
+            payroll_run.chunks_failed += 1
+            payroll_run.failed_employee_ids = list(payroll_run.failed_employee_ids) + list(employee_ids)
+            payroll_run.save(update_fields=[
+                'chunks_completed', 'chunks_failed', 'failed_employee_ids', 'updated_at',
+            ])
+
+    @staticmethod
+    def get_progress(payroll_run):
+        """Progress counters of a run, as maintained by its chunk tasks."""
+        total = payroll_run.chunks_total
+        return {
+            'status': payroll_run.status,
+            'chunks_total': total,
+            'chunks_completed': payroll_run.chunks_completed,
+            'chunks_failed': payroll_run.chunks_failed,
+            'employees_processed': payroll_run.employees_processed,
+            'failed_employees': len(payroll_run.failed_employee_ids or []),
+            'percent': round(100 * payroll_run.chunks_completed / total, 1) if total else 100.0,
+        }
+
+    @staticmethod
+    def finalize_payroll_run(payroll_run):
+        """
+        Roll the run's payslips up into its totals and mark it processed.
+        A run with failed chunks stays in processing until they are retried.
+        """
+        totals = Payslip.objects.filter(payroll_run=payroll_run).aggregate(
+            employees=Count('id'),
+            gross=Sum('gross_salary'),
+            deductions=Sum('total_deductions'),
+            net=Sum('net_salary'),
+        )
+        payroll_run.total_employees = totals['employees']
+        payroll_run.total_gross = totals['gross'] or Decimal('0.00')
+        payroll_run.total_deductions = totals['deductions'] or Decimal('0.00')
+        payroll_run.total_net = totals['net'] or Decimal('0.00')
+        update_fields = ['total_employees', 'total_gross', 'total_deductions', 'total_net', 'updated_at']
+        if not payroll_run.chunks_failed:
+            payroll_run.status = PayrollRun.STATUS_PROCESSED
+            payroll_run.processed_at = timezone.now()
+            update_fields += ['status', 'processed_at']
+        payroll_run.save(update_fields=update_fields)
         return payroll_run
 
+class PayslipPDFService:
+    """On-demand payslip PDFs (bulk rendering lives in tasks.deliver_payslip_chunk)."""
+
+    @staticmethod
+    def generate_payslip_pdf(payslip):
+        from .payslip_pdf import layout_for, render_payslip
+
+        payroll_run = payslip.payroll_run
+        employee = payslip.employee
+        return render_payslip(layout_for(payroll_run), {
+            'employee_name': employee.user.full_name,
+            'employee_code': employee.employee_id,
+            'earnings': payslip.earnings_breakdown,
+            'deductions': payslip.deductions_breakdown,
+            'gross': str(payslip.gross_salary),
+            'total_deductions': str(payslip.total_deductions),
+            'net': str(payslip.net_salary),
+        })
+
 class SalaryStructureService:
     """
     Deprecated/Simplified Service.
@@ -0,0 +1,107 @@
+"""
+Signal handlers for payroll input watermarks.
+
+Stamp the pay periods whose payroll an attendance, leave or salary write
+affects, so incremental recalculation knows which payslips are stale.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.attendance.models import AttendanceRecord
+from apps.leave.models import LeaveRequest
+
+from .models import EmployeeSalary, PayrollInputWatermark
+from .watermarks import mark_changed, periods_between, salary_periods
+
+# Attendance statuses the engine counts as loss of pay
+LOP_STATUSES = {AttendanceRecord.STATUS_ABSENT, AttendanceRecord.STATUS_HALF_DAY}
+
+
+def _soft_delete_toggled(update_fields):
+    # SoftDeleteModel.delete()/restore() save only the soft-delete fields
+    return bool(update_fields) and 'is_deleted' in update_fields
+
+
+# ------------------------------------------------------------------
+# 1. Attendance: LOP status set, changed or removed
+# ------------------------------------------------------------------
+@receiver(post_save, sender=AttendanceRecord)
+def watermark_attendance(sender, instance, created, update_fields=None, **kwargs):
+    previous = None if created else getattr(instance, '_original_status', None)
+    if _soft_delete_toggled(update_fields):
+        previous = None
+    if previous == instance.status or not ({previous, instance.status} & LOP_STATUSES):
+        return
+    mark_changed(
+        instance.organization_id, instance.employee_id,
+        [(instance.date.year, instance.date.month)], PayrollInputWatermark.SOURCE_ATTENDANCE,
+    )
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def watermark_attendance_delete(sender, instance, **kwargs):
+    if instance.status in LOP_STATUSES:
+        mark_changed(
+            instance.organization_id, instance.employee_id,
+            [(instance.date.year, instance.date.month)], PayrollInputWatermark.SOURCE_ATTENDANCE,
+        )
+
+
+# ------------------------------------------------------------------
+# 2. Leave: approved unpaid leave granted, edited or withdrawn
+# ------------------------------------------------------------------
+def _leave_periods(instance, include_original=True):
+    ranges = [(instance.start_date, instance.end_date)]
+    if include_original:
+        ranges.append(getattr(instance, '_original_dates', (None, None)))
+    periods = []
+    for start, end in ranges:
+        if start and end:
+            periods.extend(periods_between(start, end))
+    return periods
+
+
+def _is_unpaid(instance):
+    leave_type = getattr(instance, 'leave_type', None)
+    return leave_type is not None and not leave_type.is_paid
+
+
+@receiver(post_save, sender=LeaveRequest)
+def watermark_leave(sender, instance, created, update_fields=None, **kwargs):
+    previous = None if created else getattr(instance, '_original_status', None)
+    if _soft_delete_toggled(update_fields):
+        previous, created = None, True
+    approved = LeaveRequest.STATUS_APPROVED
+    if approved not in (previous, instance.status):
+        return
+    dates_changed = getattr(instance, '_original_dates', None) != (instance.start_date, instance.end_date)
+    if previous == instance.status and not dates_changed:
+        return
+    if _is_unpaid(instance):
+        mark_changed(
+            instance.organization_id, instance.employee_id,
+            _leave_periods(instance, include_original=not created), PayrollInputWatermark.SOURCE_LEAVE,
+        )
+
+
+@receiver(post_delete, sender=LeaveRequest)
+def watermark_leave_delete(sender, instance, **kwargs):
+    if instance.status == LeaveRequest.STATUS_APPROVED and _is_unpaid(instance):
+        mark_changed(
+            instance.organization_id, instance.employee_id,
+            _leave_periods(instance, include_original=False), PayrollInputWatermark.SOURCE_LEAVE,
+        )
+
+
+# ------------------------------------------------------------------
+# 3. Salary structure edits
+# ------------------------------------------------------------------
+@receiver(post_save, sender=EmployeeSalary)
+@receiver(post_delete, sender=EmployeeSalary)
+def watermark_salary(sender, instance, **kwargs):
+    if instance.effective_from:
+        mark_changed(
+            instance.organization_id, instance.employee_id,
+            salary_periods(instance.organization_id, instance.effective_from, instance.effective_to),
+            PayrollInputWatermark.SOURCE_SALARY,
+        )
@@ -0,0 +1,168 @@
+"""
+Payroll what-if simulation
+
+Runs the batch engine's ``compute()`` on modified inputs of a payroll
+run and compares the result with the last processed run, without writing
+anything. A scenario can:
+
+- scale salary components (``component_factors``, e.g. ``{'basic': 1.1}``)
+- set components as a percentage of basic (``percent_of_basic``,
+  e.g. ``{'hra': 40}``), applied after the factors
+- change the LOP policy (days charged per absence, half day and unpaid
+  leave day; multiples of half a day)
+- leave pending leave encashments out
+
+Inputs are loaded with the engine's set-based queries, so a simulation
+costs the same handful of queries as a payroll run of the same size.
+"""
+
+from dataclasses import dataclass, field, replace
+from decimal import Decimal
+from typing import Dict, Optional
+
+import numpy as np
+
+from .engine import (
+    DEFAULT_LOP_POLICY, LopPolicy, PayrollBatchEngine, PayrollInputs,
+    compute, scale, to_decimal,
+)
+from .models import PayrollRun, Payslip
+
+# Runs whose payslips are a valid baseline
+BASELINE_STATUSES = (
+    PayrollRun.STATUS_PROCESSED, PayrollRun.STATUS_PENDING_APPROVAL,
+    PayrollRun.STATUS_APPROVED, PayrollRun.STATUS_LOCKED, PayrollRun.STATUS_PAID,
+)
+# Factors and percentages are applied exactly with this many decimal places
+RATE_SCALE = 10_000
+
+DEFAULT_DIFF_LIMIT = 100
+
+
+@dataclass(frozen=True)
+class Scenario:
+    component_factors: Dict[str, Decimal] = field(default_factory=dict)
+    percent_of_basic: Dict[str, Decimal] = field(default_factory=dict)
+    lop_policy: LopPolicy = DEFAULT_LOP_POLICY
+    include_encashments: bool = True
+
+    @classmethod
+    def from_data(cls, data: Dict) -> 'Scenario':
+        """Build a scenario from PayrollSimulationSerializer.validated_data."""
+
+        def halves(days):
+            return int(Decimal(days) * 2)
+
+        return cls(
+            component_factors=dict(data.get('component_factors') or {}),
+            percent_of_basic=dict(data.get('percent_of_basic') or {}),
+            lop_policy=LopPolicy(
+                absent=halves(data.get('absent_lop_days', 1)),
+                half_day=halves(data.get('half_day_lop_days', Decimal('0.5'))),
+                unpaid_leave=halves(data.get('unpaid_leave_lop_days', 1)),
+            ),
+            include_encashments=data.get('include_encashments', True),
+        )
+
+    def apply(self, inputs: PayrollInputs) -> PayrollInputs:
+        """A copy of ``inputs`` with the scenario's component changes."""
+
+        components = dict(inputs.components)
+        for name, factor in self.component_factors.items():
+            components[name] = scale(components[name], int(Decimal(factor) * RATE_SCALE), RATE_SCALE)
+        for name, percent in self.percent_of_basic.items():
+            components[name] = scale(components['basic'], int(Decimal(percent) * RATE_SCALE), 100 * RATE_SCALE)
+
+        encashment = inputs.encashment if self.include_encashments else np.zeros_like(inputs.encashment)
+        return replace(inputs, components=components, encashment=encashment)
+
+
+def baseline_run(payroll_run) -> Optional[PayrollRun]:
+    """The latest processed run of the same scope up to ``payroll_run``'s period."""
+
+    return (
+        PayrollRun.objects.filter(
+            organization_id=payroll_run.organization_id,
+            branch_id=payroll_run.branch_id,
+            status__in=BASELINE_STATUSES,
+        )
+        .filter(year__lte=payroll_run.year)
+        .exclude(year=payroll_run.year, month__gt=payroll_run.month)
+        .order_by('-year', '-month', '-processed_at')
+        .first()
+    )
+
+
+def _money(paise) -> str:
+    return str(to_decimal(paise))
+
+
+def _totals(gross, deductions, net) -> Dict[str, str]:
+    return {'gross': _money(gross), 'deductions': _money(deductions), 'net': _money(net)}
+
+
+def simulate(payroll_run, scenario: Scenario, limit: int = DEFAULT_DIFF_LIMIT) -> Dict:
+    """
+    Aggregate and per-employee deltas of ``scenario`` against the last
+    processed run. Per-employee diffs are the ``limit`` largest net
+    changes; employees missing on either side count as zero there.
+    """
+    inputs = PayrollBatchEngine(payroll_run).load()
+    columns = compute(scenario.apply(inputs), scenario.lop_policy)
+
+    baseline = baseline_run(payroll_run)
+    count = len(inputs)
+    base = np.zeros((3, count), dtype=np.int64)
+    in_baseline = np.zeros(count, dtype=bool)
+    removed = np.zeros(3, dtype=np.int64)
+    removed_count = 0
+    if baseline is not None:
+        index = {employee_id: i for i, employee_id in enumerate(inputs.employee_ids)}
+        payslips = Payslip.objects.filter(payroll_run=baseline).values_list(
+            'employee_id', 'gross_salary', 'total_deductions', 'net_salary'
+        )
+        for employee_id, *amounts in payslips.iterator(chunk_size=2000):
+            paise = [int(amount * 100) for amount in amounts]
+            i = index.get(employee_id)
+            if i is None:
+                removed += paise
+                removed_count += 1
+            else:
+                base[:, i] = paise
+                in_baseline[i] = True
+
+    simulated = np.stack([columns.gross, columns.total_deductions, columns.net])
+    baseline_totals = base.sum(axis=1) + removed
+    simulated_totals = simulated.sum(axis=1)
+
+    delta_net = simulated[2] - base[2]
+    order = np.argsort(-np.abs(delta_net), kind='stable')[:limit]
+    diffs = [
+        {
+            'employee_id': str(inputs.employee_ids[i]),
+            'in_baseline': bool(in_baseline[i]),
+            'baseline': _totals(*base[:, i]),
+            'simulated': _totals(*simulated[:, i]),
+            'delta': _totals(*(simulated[:, i] - base[:, i])),
+            'lop_days': int(columns.lop_halves[i]) / 2,
+        }
+        for i in order
+        if (simulated[:, i] != base[:, i]).any()
+    ]
+
+    return {
+        'payroll_run': str(payroll_run.id),
+        'baseline_run': str(baseline.id) if baseline else None,
+        'employees': count,
+        'employees_added': int(count - in_baseline.sum()) if baseline else count,
+        'employees_removed': removed_count,
+        'baseline': _totals(*baseline_totals),
+        'simulated': _totals(*simulated_totals),
+        'delta': _totals(*(simulated_totals - baseline_totals)),
+        'components': {
+            **{name.upper(): _money(amounts.sum()) for name, amounts in columns.earnings.items()},
+            'LEAVE_ENCASHMENT': _money(columns.encashment.sum()),
+            **{code: _money(amounts.sum()) for code, amounts in columns.deductions.items()},
+        },
+        'diffs': diffs,
+    }
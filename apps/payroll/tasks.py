@@ -3,11 +3,12 @@ Payroll Background Tasks
 SECURITY: Tenant-isolated Celery tasks
 """
 
-import io
 import logging
+import tempfile
 from celery import shared_task
-from django.core.files.base import ContentFile
-from django.template.loader import render_to_string
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
 from apps.core.celery_tasks import TenantAwareTask
 from apps.payroll.models import PayrollRun, Payslip
 
@@ -48,6 +49,55 @@ def generate_payroll(self, organization_id: str, payroll_run_id: str):
     PayrollCalculationService.process_payroll_run(payroll_run.id)
 
 
+@shared_task(bind=True, max_retries=3)
+def calculate_payroll_chunk(self, organization_id: str, payroll_run_id: str, employee_ids: list):
+    """
+    Compute the payslips of one chunk of a payroll run.
+
+    Retried with backoff on failure; once retries are exhausted the chunk is
+    recorded as failed on the run (for retry_failed_chunks) and the task
+    returns normally, so the chord still finalizes the other chunks.
+    """
+    from .engine import PayrollBatchEngine
+    from .services import PayrollCalculationService
+
+    organization = TenantAwareTask.get_organization(organization_id)
+    payroll_run = PayrollRun.objects.filter(id=payroll_run_id, organization=organization).first()
+    if not payroll_run:
+        return {'processed': 0, 'failed': 0}
+
+    try:
+        result = PayrollBatchEngine(payroll_run).run(employee_ids)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=5 * 2 ** self.request.retries)
+        logger.exception(
+            "Payroll chunk failed for run %s (%d employees)", payroll_run_id, len(employee_ids)
+        )
+        PayrollCalculationService.record_chunk_failure(payroll_run.id, employee_ids)
+        return {'processed': 0, 'failed': len(employee_ids)}
+
+    PayrollCalculationService.record_chunk(payroll_run.id, result.processed)
+    return {'processed': result.processed, 'failed': 0}
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_kwargs={'max_retries': 3},
+    retry_backoff=True,
+)
+def finalize_payroll_run_task(self, chunk_results, organization_id: str, payroll_run_id: str):
+    """Chord callback: roll the run's payslips up once every chunk reported."""
+    from .services import PayrollCalculationService
+
+    organization = TenantAwareTask.get_organization(organization_id)
+    payroll_run = PayrollRun.objects.filter(id=payroll_run_id, organization=organization).first()
+    if not payroll_run:
+        return
+    PayrollCalculationService.finalize_payroll_run(payroll_run)
+
+
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
@@ -58,117 +108,117 @@ def generate_payslip_pdfs_and_notify(self, organization_id: str, payroll_run_id:
     """
     On PayrollRun LOCK: Generate PDF payslips and email each employee.
 
+    Shards the run's payslips into chunks of PAYSLIP_DELIVERY_CHUNK_SIZE,
+    each rendered and mailed by one deliver_payslip_chunk task.
+
     🔒 SECURITY: Tenant-scoped — only processes payslips belonging to the org.
     """
+    from celery import group
+
     organization = TenantAwareTask.get_organization(organization_id)
     if not organization:
         return
 
-    payslips = Payslip.objects.filter(
-        payroll_run_id=payroll_run_id,
-        payroll_run__organization=organization,
-    ).select_related(
-        'employee', 'employee__user', 'payroll_run', 'payroll_run__branch',
-    )
+    payslip_ids = [
+        str(payslip_id) for payslip_id in Payslip.objects.filter(
+            payroll_run_id=payroll_run_id,
+            payroll_run__organization=organization,
+        ).values_list('id', flat=True)
+    ]
+    chunk_size = max(1, getattr(settings, 'PAYSLIP_DELIVERY_CHUNK_SIZE', 200))
+    group(
+        deliver_payslip_chunk.s(organization_id, payroll_run_id, payslip_ids[i:i + chunk_size])
+        for i in range(0, len(payslip_ids), chunk_size)
+    ).apply_async()
+
+
+@shared_task(bind=True)
+def deliver_payslip_chunk(self, organization_id: str, payroll_run_id: str, payslip_ids: list):
+    """
+    Render, store and email one chunk of payslips.
 
-    for payslip in payslips:
-        try:
-            _generate_single_payslip_pdf(payslip, organization)
-            _notify_employee_payslip(payslip, organization)
-        except Exception:
-            logger.exception(
-                "Payslip PDF/email failed for employee %s (payslip %s)",
-                payslip.employee_id,
-                payslip.id,
-            )
-
-
-def _generate_single_payslip_pdf(payslip, organization):
-    """Generate a PDF payslip using ReportLab and attach to Payslip.pdf_file."""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.units import mm
-    from reportlab.pdfgen import canvas as pdf_canvas
-
-    buf = io.BytesIO()
-    c = pdf_canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-    y = height - 30 * mm
-
-    # Header
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(30 * mm, y, organization.name)
-    y -= 10 * mm
-    c.setFont("Helvetica", 10)
-    c.drawString(30 * mm, y, "Payslip")
-    y -= 8 * mm
-
-    emp = payslip.employee
-    run = payslip.payroll_run
-    c.drawString(30 * mm, y, f"Employee: {emp.user.full_name} ({emp.employee_id})")
-    y -= 6 * mm
-    c.drawString(30 * mm, y, f"Month/Year: {run.month}/{run.year}")
-    y -= 6 * mm
-    if run.branch:
-        c.drawString(30 * mm, y, f"Branch: {run.branch.name}")
-        y -= 6 * mm
-    y -= 4 * mm
-
-    # Earnings
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(30 * mm, y, "Earnings")
-    y -= 6 * mm
-    c.setFont("Helvetica", 10)
-    for label, amount in (payslip.earnings_breakdown or {}).items():
-        c.drawString(35 * mm, y, f"{label}:")
-        c.drawRightString(width - 30 * mm, y, f"{amount}")
-        y -= 5 * mm
-
-    y -= 4 * mm
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(30 * mm, y, "Deductions")
-    y -= 6 * mm
-    c.setFont("Helvetica", 10)
-    for label, amount in (payslip.deductions_breakdown or {}).items():
-        c.drawString(35 * mm, y, f"{label}:")
-        c.drawRightString(width - 30 * mm, y, f"{amount}")
-        y -= 5 * mm
-
-    # Totals
-    y -= 6 * mm
-    c.setFont("Helvetica-Bold", 11)
-    c.drawString(30 * mm, y, f"Gross: {payslip.gross_salary}")
-    y -= 6 * mm
-    c.drawString(30 * mm, y, f"Deductions: {payslip.total_deductions}")
-    y -= 6 * mm
-    c.drawString(30 * mm, y, f"Net Pay: {payslip.net_salary}")
-
-    c.showPage()
-    c.save()
-
-    filename = f"payslip_{emp.employee_id}_{run.month}_{run.year}.pdf"
-    payslip.pdf_file.save(filename, ContentFile(buf.getvalue()), save=True)
-    buf.close()
-
-
-def _notify_employee_payslip(payslip, organization):
-    """Send payslip notification email to the employee."""
-    try:
-        from apps.notifications.services.notification_service import NotificationService
-    except ImportError:
-        logger.warning("NotificationService not available — skipping payslip email")
+    PDFs are rendered into a temporary directory and streamed to storage;
+    emails share one SMTP connection.
+    Not retried as a whole: a failed payslip is logged and skipped so the
+    others are never mailed twice.
+    """
+    organization = TenantAwareTask.get_organization(organization_id)
+    if not organization:
+        return
+
+    payroll_run = PayrollRun.objects.select_related('organization', 'branch').filter(
+        id=payroll_run_id, organization=organization
+    ).first()
+    if not payroll_run:
         return
 
-    emp = payslip.employee
-    run = payslip.payroll_run
-    NotificationService.notify(
-        organization_id=str(organization.id),
-        employee=emp,
-        subject=f"Payslip ready — {run.month}/{run.year}",
-        body=(
-            f"Hi {emp.user.first_name},\n\n"
-            f"Your payslip for {run.month}/{run.year} is now available. "
-            f"Net pay: ₹{payslip.net_salary}.\n\n"
-            f"You can download the PDF from your payroll dashboard."
-        ),
-        channel='email',
+    payslips = list(
+        Payslip.objects.filter(id__in=payslip_ids, payroll_run=payroll_run)
+        .select_related('employee', 'employee__user', 'employee__user__notification_prefs')
+    )
+    stored = _store_payslip_pdfs(payroll_run, payslips)
+    _email_payslips(payroll_run, stored)
+    return {'rendered': len(stored), 'failed': len(payslips) - len(stored)}
+
+
+def _store_payslip_pdfs(payroll_run, payslips):
+    """Render the payslips' PDFs and attach them; returns the stored payslips."""
+    from .payslip_pdf import layout_for, render_files
+
+    rows = [
+        {
+            'filename': f"payslip_{p.employee.employee_id}_{payroll_run.month}_{payroll_run.year}.pdf",
+            'employee_name': p.employee.user.full_name,
+            'employee_code': p.employee.employee_id,
+            'earnings': p.earnings_breakdown,
+            'deductions': p.deductions_breakdown,
+            'gross': str(p.gross_salary),
+            'total_deductions': str(p.total_deductions),
+            'net': str(p.net_salary),
+        }
+        for p in payslips
+    ]
+    stored = []
+    with tempfile.TemporaryDirectory(prefix='payslips-') as directory:
+        paths = render_files(layout_for(payroll_run), rows, directory)
+        for payslip, row, path in zip(payslips, rows, paths):
+            if path is None:
+                continue
+            try:
+                with open(path, 'rb') as handle:
+                    payslip.pdf_file.save(row['filename'], File(handle), save=False)
+            except Exception:
+                logger.exception("Payslip PDF upload failed for payslip %s", payslip.id)
+                continue
+            payslip.updated_at = timezone.now()
+            stored.append(payslip)
+
+    Payslip.objects.bulk_update(stored, ['pdf_file', 'updated_at'])
+    return stored
+
+
+def _payslip_message(payslip, payroll_run):
+    employee = payslip.employee
+    subject = f"Payslip ready — {payroll_run.month}/{payroll_run.year}"
+    body = (
+        f"Hi {employee.user.first_name},\n\n"
+        f"Your payslip for {payroll_run.month}/{payroll_run.year} is now available. "
+        f"Net pay: ₹{payslip.net_salary}.\n\n"
+        f"You can download the PDF from your payroll dashboard."
+    )
+    return subject, body
+
+
+def _email_payslips(payroll_run, payslips):
+    """Mail the chunk's payslips through one NotificationService email batch."""
+    from apps.notifications.services.notification_service import NotificationService
+
+    messages = []
+    for payslip in payslips:
+        subject, body = _payslip_message(payslip, payroll_run)
+        messages.append({
+            'employee': payslip.employee, 'subject': subject, 'body': body, 'entity_id': payslip.id,
+        })
+    NotificationService.send_email_batch(
+        organization_id=payroll_run.organization_id, messages=messages, entity_type='payslip',
     )
@@ -23,13 +23,17 @@ from .serializers import (
     PayslipSerializer, PayslipListSerializer, TaxDeclarationSerializer,
     ReimbursementClaimSerializer, ReimbursementClaimListSerializer,
     SalaryRevisionSerializer, EmployeeLoanSerializer, EmployeeLoanListSerializer,
-    LoanRepaymentSerializer
+    LoanRepaymentSerializer, PayrollSimulationSerializer
 )
 from .filters import (
     EmployeeSalaryFilter, PayrollRunFilter, PayslipFilter,
     TaxDeclarationFilter, ReimbursementClaimFilter, EmployeeLoanFilter,
 )
 from .services import PayrollCalculationService
+from .exports import (
+    BANK_TRANSFER_HEADER, ESI_HEADER, PF_HEADER, PT_HEADER, REGISTER_HEADER,
+    bank_transfer_rows, esi_rows, export_filename, pf_rows, pt_rows, register_rows, stream_csv,
+)
 
 from apps.core.tenant_guards import OrganizationViewSetMixin
 from apps.core.permissions_branch import BranchFilterBackend, BranchPermission
@@ -206,6 +210,50 @@ class PayrollRunViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
         payroll_run = PayrollCalculationService.process_payroll_run(payroll_run.id)
         serializer = self.get_serializer(payroll_run)
         return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def recalculate(self, request, pk=None):
+        """Recompute only the payslips whose attendance, leave or salary inputs changed"""
+        payroll_run = self.get_object()
+        if payroll_run.status != PayrollRun.STATUS_PROCESSED:
+            return Response(
+                {"error": "Only processed payroll runs can be recalculated"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        report = PayrollCalculationService.recalculate_incremental(payroll_run.id)
+        return Response(report)
+
+    @action(detail=True, methods=['post'])
+    def simulate(self, request, pk=None):
+        """What-if payroll (component and LOP policy changes) against the last processed run"""
+        payroll_run = self.get_object()
+        serializer = PayrollSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        scenario = dict(serializer.validated_data)
+        limit = scenario.pop('limit')
+        report = PayrollCalculationService.simulate(payroll_run, scenario, limit=limit)
+        return Response(report)
+
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Chunk progress of a processing run (counters kept on the run row)"""
+        payroll_run = self.get_object()
+        return Response(PayrollCalculationService.get_progress(payroll_run))
+
+    @action(detail=True, methods=['post'], url_path='retry-failed')
+    def retry_failed(self, request, pk=None):
+        """Re-dispatch the chunks that failed after exhausting their retries"""
+        payroll_run = self.get_object()
+        if payroll_run.status != PayrollRun.STATUS_PROCESSING or not payroll_run.failed_employee_ids:
+            return Response(
+                {"error": "Payroll run has no failed chunks to retry"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        payroll_run = PayrollCalculationService.retry_failed_chunks(payroll_run.id)
+        return Response(PayrollCalculationService.get_progress(payroll_run))
         
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
@@ -271,113 +319,43 @@ class PayrollRunViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.Mo
     @action(detail=True, methods=['get'], url_path='export-pf')
     def export_pf(self, request, pk=None):
         """Export PF contribution report for compliance"""
-        import csv
-        from django.http import HttpResponse
-        from .models import PFContribution
-        
         payroll_run = self.get_object()
-        payslips = payroll_run.payslips.select_related('employee', 'employee__user').all()
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="pf_report_{payroll_run.month}_{payroll_run.year}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'UAN', 'Member Name', 'Gross Wages', 'EPF Wages', 'EPS Wages',
-            'EDLI Wages', 'EPF Employee', 'EPS Employer', 'EPF Employer Diff',
-            'NCP Days', 'Refund of Advances'
-        ])
-        
-        for payslip in payslips:
-            try:
-                pf = payslip.pf_contribution
-                writer.writerow([
-                    pf.uan,
-                    payslip.employee.user.full_name,
-                    payslip.gross_salary,
-                    pf.pf_wages,
-                    pf.pf_wages,
-                    pf.pf_wages,
-                    pf.epf_employee,
-                    pf.eps,
-                    pf.epf_employer - pf.eps,
-                    0,
-                    0
-                ])
-            except PFContribution.DoesNotExist:
-                continue
-        
-        return response
+        return stream_csv(export_filename('pf_report', payroll_run), PF_HEADER, pf_rows(payroll_run))
 
     @action(detail=True, methods=['get'], url_path='export-esi')
     def export_esi(self, request, pk=None):
         """Export ESI contribution report for compliance"""
-        import csv
-        from django.http import HttpResponse
-        
         payroll_run = self.get_object()
-        payslips = payroll_run.payslips.select_related('employee', 'employee__user').all()
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="esi_report_{payroll_run.month}_{payroll_run.year}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'IP Number', 'IP Name', 'No of Days Worked', 'Total Wages',
-            'IP Contribution', 'Employer Contribution', 'Total Contribution'
-        ])
-        
-        for payslip in payslips:
-            salary_snap = payslip.salary_snapshot or {}
-            esi_employee = salary_snap.get('esi_employee', 0)
-            esi_employer = salary_snap.get('esi_employer', 0)
-            
-            if esi_employee > 0 or esi_employer > 0:
-                writer.writerow([
-                    payslip.employee.employee_id,
-                    payslip.employee.user.full_name,
-                    payslip.attendance_snapshot.get('days_worked', 0),
-                    payslip.gross_salary,
-                    esi_employee,
-                    esi_employer,
-                    esi_employee + esi_employer
-                ])
-        
-        return response
+        return stream_csv(export_filename('esi_report', payroll_run), ESI_HEADER, esi_rows(payroll_run))
 
     @action(detail=True, methods=['get'], url_path='export-pt')
     def export_pt(self, request, pk=None):
         """Export Professional Tax report for compliance"""
-        import csv
-        from django.http import HttpResponse
-        
         payroll_run = self.get_object()
-        payslips = payroll_run.payslips.select_related('employee', 'employee__user').all()
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="pt_report_{payroll_run.month}_{payroll_run.year}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Employee ID', 'Employee Name', 'PAN', 'State',
-            'Gross Salary', 'Professional Tax'
-        ])
-        
-        for payslip in payslips:
-            salary_snap = payslip.salary_snapshot or {}
-            pt = salary_snap.get('professional_tax', 0)
-            
-            if pt > 0:
-                writer.writerow([
-                    payslip.employee.employee_id,
-                    payslip.employee.user.full_name,
-                    getattr(payslip.employee, 'pan_number', ''),
-                    getattr(payslip.employee, 'state', ''),
-                    payslip.gross_salary,
-                    pt
-                ])
-        
-        return response
+        return stream_csv(export_filename('pt_report', payroll_run), PT_HEADER, pt_rows(payroll_run))
+
+    @action(detail=True, methods=['get'], url_path='export-register')
+    def export_register(self, request, pk=None):
+        """Export the payroll register (gross, deductions and net per employee)"""
+        payroll_run = self.get_object()
+        return stream_csv(
+            export_filename('payroll_register', payroll_run), REGISTER_HEADER, register_rows(payroll_run)
+        )
+
+    @action(detail=True, methods=['get'], url_path='export-bank-transfer')
+    def export_bank_transfer(self, request, pk=None):
+        """Export the salary bank transfer file of an approved run"""
+        payroll_run = self.get_object()
+        if payroll_run.status not in [
+            PayrollRun.STATUS_APPROVED, PayrollRun.STATUS_LOCKED, PayrollRun.STATUS_PAID
+        ]:
+            return Response(
+                {"error": "Only approved payroll runs can be exported for bank transfer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return stream_csv(
+            export_filename('bank_transfer', payroll_run), BANK_TRANSFER_HEADER, bank_transfer_rows(payroll_run)
+        )
 
 
 class PayslipViewSet(BranchFilterMixin, OrganizationViewSetMixin, viewsets.ReadOnlyModelViewSet):
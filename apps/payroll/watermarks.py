@@ -0,0 +1,84 @@
+"""
+Payroll input watermarks
+
+Every change to an input of the payroll engine (attendance status, unpaid
+leave, salary structure) stamps ``PayrollInputWatermark.changed_at`` for
+each pay period it affects, with one upsert. An incremental recalculation
+then only recomputes employees whose watermark is newer than their
+payslip's ``computed_at`` (see PayrollCalculationService.recalculate_incremental).
+
+Signal handlers live in apps/payroll/signals.py. Code that writes inputs
+with bulk_create/update() bypasses signals and must call ``mark_changed``
+(or ``mark_changed_many``) itself.
+"""
+
+import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from django.utils import timezone
+
+# Payroll run statuses whose payslips can still be recalculated
+OPEN_RUN_STATUSES = ('draft', 'processing', 'processed', 'pending_approval')
+
+
+def periods_between(start: datetime.date, end: datetime.date) -> List[Tuple[int, int]]:
+    """(year, month) pairs from ``start``'s month through ``end``'s month."""
+
+    periods = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def salary_periods(organization_id, effective_from: datetime.date,
+                   effective_to: Optional[datetime.date] = None) -> List[Tuple[int, int]]:
+    """
+    Periods of the organization's open payroll runs that can pick up a
+    salary version. An open-ended version reaches every later run, so only
+    runs that can still be recalculated are stamped.
+    """
+    from .models import PayrollRun
+
+    start = (effective_from.year, effective_from.month)
+    end = (effective_to.year, effective_to.month) if effective_to else None
+    open_periods = PayrollRun.objects.filter(
+        organization_id=organization_id, status__in=OPEN_RUN_STATUSES,
+    ).values_list('year', 'month').distinct()
+    return [
+        (year, month) for year, month in open_periods
+        if (year, month) >= start and (end is None or (year, month) <= end)
+    ]
+
+
+def mark_changed(organization_id, employee_id, periods: Iterable[Tuple[int, int]], source: str) -> None:
+    """Stamp ``employee_id``'s inputs for ``periods`` as changed now."""
+
+    if employee_id:
+        mark_changed_many(organization_id, ((employee_id, period) for period in periods), source)
+
+
+def mark_changed_many(organization_id, employee_periods: Iterable[Tuple[object, Tuple[int, int]]],
+                      source: str) -> None:
+    """Bulk form of ``mark_changed``: one upsert for (employee_id, (year, month)) pairs."""
+
+    from .models import PayrollInputWatermark
+
+    now = timezone.now()
+    rows = [
+        PayrollInputWatermark(
+            organization_id=organization_id, employee_id=employee_id,
+            year=year, month=month, changed_at=now, source=source,
+        )
+        for employee_id, (year, month) in sorted(set(employee_periods), key=lambda item: (str(item[0]), item[1]))
+        if employee_id
+    ]
+    if not rows or not organization_id:
+        return
+    PayrollInputWatermark.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['organization', 'employee', 'year', 'month'],
+        update_fields=['changed_at', 'source', 'updated_at'],
+    )
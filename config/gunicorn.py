@@ -0,0 +1,16 @@
+"""
+Gunicorn hooks.
+
+Loaded by entrypoint.sh with ``--config python:config.gunicorn``.
+"""
+
+import os
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges from the Prometheus
+    # multiprocess directory (see apps/core/metrics.py).
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
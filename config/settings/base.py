@@ -266,7 +266,7 @@ REDIS_CACHE_URL = config("REDIS_CACHE_URL", default=REDIS_URL)
 if REDIS_CACHE_URL:
     CACHES = {
         "default": {
-            "BACKEND": "django_redis.cache.RedisCache",
+            "BACKEND": "apps.core.cache_backends.InstrumentedRedisCache",
             "LOCATION": REDIS_CACHE_URL,
             "OPTIONS": {
                 "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -277,7 +277,7 @@ if REDIS_CACHE_URL:
 else:
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "BACKEND": "apps.core.cache_backends.InstrumentedLocMemCache",
             "LOCATION": f"hrms-{ENVIRONMENT}-cache",
         }
     }
@@ -356,6 +356,11 @@ REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
         "apps.core.renderers.StandardJSONRenderer",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.core.parsers.CachedJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_THROTTLE_CLASSES": [
         "apps.core.rbac_hardening.OrganizationRateThrottle",
     ],
@@ -412,6 +417,17 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(hour=0, minute=0),     # midnight daily
         "options": {"queue": "billing"},
     },
+    "billing.subscription.transitions": {
+        "task": "billing.tasks.subscription_expiry_task",
+        "schedule": crontab(minute=5),             # hourly; middleware is read-only
+        "kwargs": {"transitions_only": True},
+        "options": {"queue": "billing"},
+    },
+    # -- Attendance --
+    "attendance.shift_calendar.build": {
+        "task": "apps.attendance.tasks.shift_calendar_tasks.build_shift_calendar",
+        "schedule": crontab(hour=0, minute=30),    # nightly; moves the window forward
+    },
     # -- Payroll --
     "payroll.generate": {
         "task": "apps.payroll.tasks.generate_payroll",
@@ -501,3 +517,145 @@ BILLING_PORTAL_BASE_URL = config(
     "BILLING_PORTAL_BASE_URL",
     default=f"https://{BASE_DOMAIN}",
 )
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+# /api/metrics requires "Authorization: Bearer <token>"; without a token it
+# is only served when DEBUG is on.
+METRICS_AUTH_TOKEN = config("METRICS_AUTH_TOKEN", default="")
+
+# Requests slower than this log their slowest queries, sampled at the rate.
+METRICS_SLOW_REQUEST_MS = config("METRICS_SLOW_REQUEST_MS", default=1000, cast=int)
+METRICS_SLOW_REQUEST_SAMPLE_RATE = config("METRICS_SLOW_REQUEST_SAMPLE_RATE", default=0.1, cast=float)
+METRICS_SLOW_REQUEST_TOP_QUERIES = config("METRICS_SLOW_REQUEST_TOP_QUERIES", default=5, cast=int)
+
+# =============================================================================
+# TENANT CONTEXT CACHE
+# =============================================================================
+
+# Host -> organization and organization -> tenant state (apps/core/tenant_cache.py).
+# Entries are shared for TENANT_CACHE_TTL seconds and invalidated on writes;
+# each worker trusts its local copy for TENANT_CACHE_LOCAL_TTL seconds.
+# The plan-derived rate-limit tier (apps/core/rate_limiting.py) is read from
+# the tenant state, so these also bound how long a plan change takes to
+# reach the limiter; RATE_LIMIT_TIER_CACHE_TTL is no longer read.
+TENANT_CACHE_TTL = config("TENANT_CACHE_TTL", default=300, cast=int)
+TENANT_CACHE_LOCAL_TTL = config("TENANT_CACHE_LOCAL_TTL", default=5.0, cast=float)
+TENANT_CACHE_LOCAL_SIZE = config("TENANT_CACHE_LOCAL_SIZE", default=2048, cast=int)
+
+# =============================================================================
+# PAYROLL
+# =============================================================================
+
+# Employees per payroll chunk task (apps/payroll/tasks.py); chunks of a run
+# are dispatched as one chord and report progress on the PayrollRun row.
+PAYROLL_CHUNK_SIZE = config("PAYROLL_CHUNK_SIZE", default=250, cast=int)
+
+# Payslip PDF + email delivery on lock: payslips per chunk task; chunks
+# run in parallel across the Celery workers.
+PAYSLIP_DELIVERY_CHUNK_SIZE = config("PAYSLIP_DELIVERY_CHUNK_SIZE", default=200, cast=int)
+
+# Rows fetched per server-side cursor round trip by the streaming CSV
+# exports (apps/payroll/exports.py).
+PAYROLL_EXPORT_CHUNK_SIZE = config("PAYROLL_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# =============================================================================
+# ATTENDANCE
+# =============================================================================
+
+# Per-location geo-fence index (apps/attendance/geofence_index.py): each
+# process trusts its copy for GEOFENCE_INDEX_LOCAL_TTL seconds before
+# checking the version bumped by GeoFence writes. Locations with at least
+# GEOFENCE_GRID_MIN_FENCES fences get a GEOFENCE_GRID_DEGREES grid prefilter.
+GEOFENCE_INDEX_LOCAL_TTL = config("GEOFENCE_INDEX_LOCAL_TTL", default=30.0, cast=float)
+GEOFENCE_INDEX_SIZE = config("GEOFENCE_INDEX_SIZE", default=1024, cast=int)
+GEOFENCE_GRID_DEGREES = config("GEOFENCE_GRID_DEGREES", default=0.05, cast=float)
+GEOFENCE_GRID_MIN_FENCES = config("GEOFENCE_GRID_MIN_FENCES", default=32, cast=int)
+
+# Per-employee punch context (apps/attendance/punch_context.py): recent
+# devices/punches and today's shift, refreshed by every punch. The cached
+# payroll lock date is dropped on PayrollRun writes.
+PUNCH_CONTEXT_TTL = config("PUNCH_CONTEXT_TTL", default=86400, cast=int)
+PUNCH_PAYROLL_LOCK_TTL = config("PUNCH_PAYROLL_LOCK_TTL", default=3600, cast=int)
+
+# Bulk punch ingestion (apps/attendance/ingestion.py): punches per request,
+# rows per INSERT/UPDATE, and how far ahead of the server clock a device
+# clock may run (seconds).
+ATTENDANCE_BULK_PUNCH_MAX_ITEMS = config("ATTENDANCE_BULK_PUNCH_MAX_ITEMS", default=5000, cast=int)
+ATTENDANCE_BULK_PUNCH_BATCH_SIZE = config("ATTENDANCE_BULK_PUNCH_BATCH_SIZE", default=1000, cast=int)
+ATTENDANCE_PUNCH_FUTURE_TOLERANCE = config("ATTENDANCE_PUNCH_FUTURE_TOLERANCE", default=300, cast=int)
+
+# Materialized shift calendar (apps/attendance/shift_calendar.py): days
+# kept ahead of and behind today, built nightly by the
+# "attendance.shift_calendar.build" beat entry and refreshed when
+# assignments change; other dates are resolved on read without being stored.
+# Rebuild on demand with `manage.py build_shift_calendar`.
+SHIFT_CALENDAR_PAST_DAYS = config("SHIFT_CALENDAR_PAST_DAYS", default=62, cast=int)
+SHIFT_CALENDAR_FUTURE_DAYS = config("SHIFT_CALENDAR_FUTURE_DAYS", default=62, cast=int)
+SHIFT_CALENDAR_BATCH_SIZE = config("SHIFT_CALENDAR_BATCH_SIZE", default=5000, cast=int)
+
+# Attendance recalculation (apps/attendance/recalculation.py): employees per
+# chunk task and rows per bulk UPDATE.
+ATTENDANCE_RECALC_CHUNK_SIZE = config("ATTENDANCE_RECALC_CHUNK_SIZE", default=250, cast=int)
+ATTENDANCE_RECALC_BATCH_SIZE = config("ATTENDANCE_RECALC_BATCH_SIZE", default=1000, cast=int)
+
+# Batch fraud re-scoring (apps/attendance/fraud_engine.py): how far back
+# evaluate_recent_punches looks (by punch creation) and rows per bulk write.
+ATTENDANCE_FRAUD_WINDOW_HOURS = config("ATTENDANCE_FRAUD_WINDOW_HOURS", default=12, cast=int)
+ATTENDANCE_FRAUD_BATCH_SIZE = config("ATTENDANCE_FRAUD_BATCH_SIZE", default=1000, cast=int)
+
+# Face embedding index (apps/attendance/face_index.py): memory-mapped
+# per-organization matrices under FACE_INDEX_DIR, stored as float32,
+# float16 or int8 (FACE_INDEX_DTYPE). Processes trust their copy for
+# FACE_INDEX_LOCAL_TTL seconds; incremental syncs re-read rows updated
+# FACE_INDEX_SYNC_MARGIN seconds before the last sync point.
+FACE_INDEX_DIR = config("FACE_INDEX_DIR", default=str(BASE_DIR / "var" / "face_index"))
+FACE_INDEX_DTYPE = config("FACE_INDEX_DTYPE", default="float32")
+FACE_INDEX_NORMALIZE = config("FACE_INDEX_NORMALIZE", default=True, cast=bool)
+FACE_INDEX_LOCAL_TTL = config("FACE_INDEX_LOCAL_TTL", default=30.0, cast=float)
+FACE_INDEX_SIZE = config("FACE_INDEX_SIZE", default=64, cast=int)
+FACE_INDEX_SYNC_MARGIN = config("FACE_INDEX_SYNC_MARGIN", default=300.0, cast=float)
+FACE_MATCH_THRESHOLD = config("FACE_MATCH_THRESHOLD", default=0.6, cast=float)
+
+# Monthly attendance rollup (apps/attendance/monthly_rollup.py): months
+# recounted per transaction by `manage.py build_attendance_rollup` and rows
+# per bulk UPDATE.
+ATTENDANCE_ROLLUP_BATCH_SIZE = config("ATTENDANCE_ROLLUP_BATCH_SIZE", default=1000, cast=int)
+
+# =============================================================================
+# INPUT SANITIZATION
+# =============================================================================
+
+# JSON bodies larger than this are rejected before they are read; deeper
+# nesting is rejected while scanning (apps/core/middleware.py).
+INPUT_SANITIZATION_MAX_JSON_BYTES = config(
+    "INPUT_SANITIZATION_MAX_JSON_BYTES", default=10 * 1024 * 1024, cast=int
+)
+INPUT_SANITIZATION_MAX_JSON_DEPTH = config("INPUT_SANITIZATION_MAX_JSON_DEPTH", default=64, cast=int)
+
+# =============================================================================
+# ABAC
+# =============================================================================
+
+# Seconds a worker trusts its compiled policy snapshot before re-checking
+# the shared version stamp in the cache.
+ABAC_SNAPSHOT_VERSION_CHECK_INTERVAL = config(
+    "ABAC_SNAPSHOT_VERSION_CHECK_INTERVAL", default=1.0, cast=float
+)
+
+# Seconds a user's cached permission decisions are shared across requests.
+ABAC_DECISION_CACHE_TTL = config("ABAC_DECISION_CACHE_TTL", default=60, cast=int)
+
+# Buffered PolicyLog writer (apps/abac/log_buffer.py). DENY decisions are
+# always logged; ALLOW decisions are sampled at the given rate.
+ABAC_POLICY_LOG_BUFFER_SIZE = config("ABAC_POLICY_LOG_BUFFER_SIZE", default=10000, cast=int)
+ABAC_POLICY_LOG_FLUSH_SIZE = config("ABAC_POLICY_LOG_FLUSH_SIZE", default=500, cast=int)
+ABAC_POLICY_LOG_FLUSH_INTERVAL_MS = config("ABAC_POLICY_LOG_FLUSH_INTERVAL_MS", default=2000, cast=int)
+ABAC_POLICY_LOG_DEDUP_WINDOW_SECONDS = config(
+    "ABAC_POLICY_LOG_DEDUP_WINDOW_SECONDS", default=60, cast=float
+)
+ABAC_POLICY_LOG_ALLOW_SAMPLE_RATE = config(
+    "ABAC_POLICY_LOG_ALLOW_SAMPLE_RATE", default=1.0, cast=float
+)
@@ -7,6 +7,7 @@ from django.views.generic import RedirectView
 from drf_spectacular.views import SpectacularRedocView, SpectacularSwaggerView
 
 from apps.core.compat_views import DocumentCompatView
+from apps.core.metrics import metrics_view
 from apps.core.views_media import SecureMediaView
 
 
@@ -121,6 +122,7 @@ urlpatterns = [
     path("api/v1/health/", health_check, name="health-check"),
     path("api/v1/readiness/", readiness_check, name="readiness-check"),
     path("api/v1/health/deep/", deep_health_check, name="deep-health-check"),
+    path("api/metrics", metrics_view, name="metrics"),
 
     path("api/v1/auth/", include("apps.authentication.urls")),
     path("api/v1/employees/", include("apps.employees.urls")),
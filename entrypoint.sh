@@ -82,6 +82,13 @@ else:
     fi
 }
 
+# ---------- Prometheus multiprocess directory ---------------------------------
+prepare_metrics_dir() {
+    export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+}
+
 # =============================================================================
 # Main dispatch
 # =============================================================================
@@ -94,8 +101,10 @@ case "${1:-web}" in
     run_migrations
     collect_static
     create_superuser
+    prepare_metrics_dir
     echo "[entrypoint] Starting Gunicorn on 0.0.0.0:8000 ..."
     exec gunicorn config.wsgi:application \
+        --config python:config.gunicorn \
         --bind 0.0.0.0:8000 \
         --workers "${GUNICORN_WORKERS:-4}" \
         --threads "${GUNICORN_THREADS:-2}" \
@@ -1,6 +1,13 @@
 import factory
 from apps.authentication.models import User
-from apps.employees.models import Employee
+from apps.core.models import Organization
+from apps.employees.models import Department, Designation, Employee
+
+class OrganizationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Organization
+    name = factory.Sequence(lambda n: f'Organization {n}')
+    email = factory.Sequence(lambda n: f'admin{n}@org.example.com')
 
 class UserFactory(factory.django.DjangoModelFactory):
     class Meta:
@@ -9,6 +16,20 @@ class UserFactory(factory.django.DjangoModelFactory):
     password = 'testpass123'
     is_verified = True
 
+class DepartmentFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Department
+    organization = factory.SubFactory(OrganizationFactory)
+    name = factory.Sequence(lambda n: f'Department {n}')
+    code = factory.Sequence(lambda n: f'D{n:05d}')
+
+class DesignationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Designation
+    organization = factory.SubFactory(OrganizationFactory)
+    name = factory.Sequence(lambda n: f'Designation {n}')
+    code = factory.Sequence(lambda n: f'G{n:05d}')
+
 class EmployeeFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Employee
@@ -0,0 +1,217 @@
+"""
+Query budget harness
+====================
+Replays the GET operations of hrms_openapi.yaml in-process with the Django
+test client and counts the DB queries each one executes. Operations are
+planned exactly like scripts/openapi_test_runner.py (same schema walker,
+parameter resolution and id discovery), so both tools cover the same
+surface. Detail routes take their id from their own collection's listing.
+
+Budgets live in tests/query_budgets.yaml. A run measures every operation
+against a small and a large dataset; an operation fails when its query
+count grows with the row count or exceeds its budget. Operations that do
+not answer 2xx are listed under ``unmeasured`` with their status, so one
+that breaks, or starts working without a budget, fails the run as well.
+"""
+
+import os
+import re
+import sys
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = BASE_DIR / 'hrms_openapi.yaml'
+BUDGETS_PATH = Path(__file__).resolve().parent / 'query_budgets.yaml'
+
+# Set to re-generate query_budgets.yaml from the current tree.
+RECORD_ENV = 'QUERY_BUDGET_RECORD'
+
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.openapi_test_runner import OpenApiRunner, build_parser  # noqa: E402
+
+
+@dataclass
+class Measurement:
+    operation_id: str
+    path: str
+    status: int
+    queries: int
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+@dataclass
+class Budgets:
+    default_budget: int
+    growth_tolerance: int
+    operations: Dict[str, int]
+    unmeasured: Dict[str, int]
+    skip: List[str]
+
+    @classmethod
+    def load(cls, path: Path = BUDGETS_PATH) -> 'Budgets':
+        data = {}
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as handle:
+                data = yaml.safe_load(handle) or {}
+        return cls(
+            default_budget=int(data.get('default_budget', 50)),
+            growth_tolerance=int(data.get('growth_tolerance', 0)),
+            operations={k: int(v) for k, v in (data.get('operations') or {}).items()},
+            unmeasured={k: int(v) for k, v in (data.get('unmeasured') or {}).items()},
+            skip=list(data.get('skip') or []),
+        )
+
+    def budget_for(self, operation_id: str) -> int:
+        return self.operations.get(operation_id, self.default_budget)
+
+
+def _first_row_id(payload):
+    """The id of the first row of a (possibly wrapped) list response."""
+
+    while isinstance(payload, dict):
+        payload = payload.get('results', payload.get('data'))
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict):
+        return payload[0].get('id')
+    return None
+
+
+class QueryBudgetHarness:
+    """Measure per-operation query counts through the full middleware stack."""
+
+    def __init__(self, client, budgets: Optional[Budgets] = None, schema_path: Path = SCHEMA_PATH):
+        self.client = client
+        self.budgets = budgets or Budgets.load()
+        self.runner = OpenApiRunner(build_parser().parse_args(['--schema', str(schema_path)]))
+
+    def operations(self):
+        skip = set(self.budgets.skip)
+        operations = [
+            op for op in self.runner._iter_operations()
+            if op.method == 'GET' and op.operation_id not in skip
+        ]
+        # Collections first, so detail operations can use discovered ids.
+        return sorted(operations, key=lambda op: '{' in op.path)
+
+    def _with_collection_id(self, op, collection_ids):
+        """Fill the first path parameter with an id listed by its collection."""
+
+        match = re.search(r'\{([^}]+)\}', op.path)
+        if not match or op.path[:match.start()] not in collection_ids:
+            return op
+        name = match.group(1)
+        return replace(
+            op,
+            path=op.path.replace(match.group(0), str(collection_ids[op.path[:match.start()]])),
+            parameters=[p for p in op.parameters if not (p.get('in') == 'path' and p.get('name') == name)],
+        )
+
+    def measure(self) -> Dict[str, Measurement]:
+        self.runner.discovered_ids = {}
+        self.runner.discovery_pool = []
+        collection_ids = {}
+
+        results: Dict[str, Measurement] = {}
+        for op in self.operations():
+            op = self._with_collection_id(op, collection_ids)
+            path, query, _ = self.runner._resolve_path_and_query(op)
+            if not path:
+                # No value for a path parameter: never requested (status 0)
+                results[op.operation_id] = Measurement(op.operation_id, op.path, 0, 0)
+                continue
+            # Synthetic values for optional filters would shrink the result
+            # set to nothing; measure the unfiltered listing instead.
+            required = {
+                param.get('name') for param in op.parameters
+                if param.get('in') == 'query' and param.get('required')
+            }
+            query = {name: value for name, value in query.items() if name in required}
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(path, query, HTTP_ACCEPT='application/json')
+            measurement = Measurement(op.operation_id, path, response.status_code, len(captured))
+            results[op.operation_id] = measurement
+            if measurement.ok and response.get('Content-Type', '').startswith('application/json'):
+                try:
+                    payload = response.json()
+                except ValueError:
+                    continue
+                self.runner._extract_ids(payload)
+                row_id = _first_row_id(payload)
+                if row_id is not None and '{' not in op.path:
+                    collection_ids[op.path] = row_id
+        return results
+
+    def violations(self, small: Dict[str, Measurement], large: Dict[str, Measurement]) -> List[str]:
+        problems = []
+        for operation_id, measured in sorted(large.items()):
+            baseline = small.get(operation_id)
+            failed = next((m for m in (baseline, measured) if m is not None and not m.ok), None)
+            if failed is not None:
+                if self.budgets.unmeasured.get(operation_id) != failed.status:
+                    problems.append(
+                        f"{operation_id} ({failed.path}): returned {failed.status}, "
+                        f"expected 2xx or an unmeasured entry"
+                    )
+                continue
+            if operation_id in self.budgets.unmeasured:
+                problems.append(f"{operation_id} ({measured.path}): listed as unmeasured but returned 2xx")
+                continue
+            if baseline is None:
+                continue
+            budget = self.budgets.budget_for(operation_id)
+            if measured.queries > budget:
+                problems.append(
+                    f"{operation_id} ({measured.path}): {measured.queries} queries, budget {budget}"
+                )
+            growth = measured.queries - baseline.queries
+            if growth > self.budgets.growth_tolerance:
+                problems.append(
+                    f"{operation_id} ({measured.path}): {baseline.queries} -> {measured.queries} "
+                    f"queries as rows grow (N+1)"
+                )
+        return problems
+
+    def record(self, small: Dict[str, Measurement], large: Dict[str, Measurement],
+               path: Path = BUDGETS_PATH, headroom: int = 2) -> None:
+        """Write a budgets file matching the current tree."""
+
+        operations = {}
+        unmeasured = {}
+        for operation_id, measured in sorted(large.items()):
+            baseline = small.get(operation_id)
+            failed = next((m for m in (baseline, measured) if m is not None and not m.ok), None)
+            if failed is not None:
+                unmeasured[operation_id] = failed.status
+            elif baseline is not None:
+                operations[operation_id] = max(measured.queries, baseline.queries) + headroom
+
+        header = (
+            "# Per-operation DB query budgets enforced by tests/test_query_budgets.py.\n"
+            "# Regenerate with QUERY_BUDGET_RECORD=1 after an intentional change.\n"
+            "# unmeasured lists operations that do not answer 2xx with the seeded\n"
+            "# data, with the status they return.\n"
+        )
+        data = {
+            'default_budget': self.budgets.default_budget,
+            'growth_tolerance': self.budgets.growth_tolerance,
+            'skip': self.budgets.skip,
+            'operations': operations,
+            'unmeasured': unmeasured,
+        }
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(header)
+            yaml.safe_dump(data, handle, sort_keys=False, default_flow_style=False)
+
+
+def recording() -> bool:
+    return bool(os.environ.get(RECORD_ENV))
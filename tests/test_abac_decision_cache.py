@@ -0,0 +1,129 @@
+"""
+ABAC Decision Cache Tests
+=========================
+Validates:
+  1. Repeated checks within a request are served from the request memo
+  2. Decisions are shared across requests through the cache
+  3. Policy version and user generation bumps invalidate shared decisions
+  4. UserRole, RolePermission and Permission writes bump them
+
+Run:
+    python manage.py test tests.test_abac_decision_cache -v2
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+
+class _User:
+    """Stand-in for request.user: a fresh instance per request."""
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class DecisionCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.org_id = str(uuid.uuid4())
+        self.user_id = str(uuid.uuid4())
+        self.calls = 0
+
+    def _compute(self, result=True):
+        def compute():
+            self.calls += 1
+            return result
+        return compute
+
+    def _check(self, user, code='employees.view', result=True):
+        from apps.abac.decision_cache import cached_decision
+        return cached_decision(user, self.org_id, code, None, self._compute(result))
+
+    def test_request_memo(self):
+        user = _User(self.user_id)
+        for _ in range(50):
+            self.assertTrue(self._check(user))
+        self.assertEqual(self.calls, 1)
+
+    def test_shared_across_requests(self):
+        self._check(_User(self.user_id))
+        self.assertTrue(self._check(_User(self.user_id), result=False))
+        self.assertEqual(self.calls, 1)
+
+    def test_policy_version_bump_invalidates(self):
+        from apps.abac.snapshot import policy_version_key
+        self._check(_User(self.user_id))
+        cache.set(policy_version_key(self.org_id), 'new-version', None)
+        self.assertFalse(self._check(_User(self.user_id), result=False))
+        self.assertEqual(self.calls, 2)
+
+    def test_user_generation_bump_invalidates(self):
+        from apps.abac.decision_cache import bump_user_generation
+        self._check(_User(self.user_id))
+        bump_user_generation(self.user_id)
+        self._check(_User(self.user_id))
+        self.assertEqual(self.calls, 2)
+
+    def test_no_organization_is_not_cached(self):
+        from apps.abac.decision_cache import cached_decision
+        user = _User(self.user_id)
+        cached_decision(user, None, 'employees.view', None, self._compute())
+        cached_decision(user, None, 'employees.view', None, self._compute())
+        self.assertEqual(self.calls, 2)
+
+
+class DecisionInvalidationSignalTests(TestCase):
+
+    def setUp(self):
+        from apps.abac.models import Permission, Role
+        from tests.factories import OrganizationFactory, UserFactory
+
+        cache.clear()
+        self.organization = OrganizationFactory()
+        self.user = UserFactory(organization=self.organization)
+        self.role = Role.objects.create(organization=self.organization, name='Clerk', code='CLERK')
+        self.permission = Permission.objects.create(
+            organization=self.organization, name='View employees', code='employees.view', module='employees',
+        )
+
+    def _generation(self):
+        from apps.abac.decision_cache import _user_generation_key
+        return cache.get(_user_generation_key(self.user.pk))
+
+    def _version(self):
+        from apps.abac.snapshot import policy_version_key
+        return cache.get(policy_version_key(str(self.organization.id)))
+
+    def test_user_role_writes_bump_user_generation(self):
+        from apps.abac.models import UserRole
+
+        before = self._generation()
+        user_role = UserRole.objects.create(organization=self.organization, user=self.user, role=self.role)
+        granted = self._generation()
+        self.assertNotEqual(granted, before)
+        user_role.delete(hard_delete=True)
+        self.assertNotEqual(self._generation(), granted)
+
+    def test_permission_writes_bump_policy_version(self):
+        from apps.abac.models import RolePermission
+
+        before = self._version()
+        with self.captureOnCommitCallbacks(execute=True):
+            role_permission = RolePermission.objects.create(
+                organization=self.organization, role=self.role, permission=self.permission,
+            )
+        granted = self._version()
+        self.assertNotEqual(granted, before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            role_permission.delete(hard_delete=True)
+        revoked = self._version()
+        self.assertNotEqual(revoked, granted)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.permission.name = 'View all employees'
+            self.permission.save()
+        self.assertNotEqual(self._version(), revoked)
@@ -0,0 +1,116 @@
+"""
+ABAC List Filter Tests
+======================
+Validates:
+  1. List endpoints drop the rows no ABAC policy permits, before pagination
+  2. Filtering a page costs the same number of queries for 5 rows as for 15
+  3. Policy logs and role assignments are limited to org admins
+
+Run:
+    python manage.py test tests.test_abac_list_filter -v2
+"""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+class ABACListFilterTests(TestCase):
+
+    def setUp(self):
+        from apps.authentication.models_hierarchy import OrganizationUser
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+        from tests.factories import OrganizationFactory, UserFactory
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.organization = OrganizationFactory()
+        # An admin by membership only: the is_org_admin flag bypasses ABAC
+        self.user = UserFactory(organization=self.organization)
+        OrganizationUser.objects.filter(user=self.user).update(role=OrganizationUser.RoleChoices.ORG_ADMIN)
+        self.authors = [UserFactory(organization=self.organization) for _ in range(3)]
+
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(self.user).access_token}'
+        )
+        # Decision logging is buffered per process; keep it out of the counts
+        patcher = patch('apps.abac.log_buffer.policy_log_buffer.record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _allow(self, code, **target):
+        from apps.abac.models import Policy, UserPolicy
+
+        policy = Policy.objects.create(
+            organization=self.organization, name=code, code=code, effect=Policy.ALLOW, **target,
+        )
+        UserPolicy.objects.create(organization=self.organization, user=self.user, policy=policy)
+
+    def _logs(self, count):
+        from apps.abac.models import PolicyLog
+
+        return [
+            PolicyLog.objects.create(
+                organization=self.organization, user=self.authors[index % len(self.authors)],
+                resource_type='employee', resource_id=str(index), action='view', result=True,
+            )
+            for index in range(count)
+        ]
+
+    def _page(self, response):
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return body['data'] if 'pagination' not in body else body
+
+    def _ids(self, response):
+        return {row['id'] for row in self._page(response)['data']}
+
+    def test_unpermitted_rows_are_dropped(self):
+        logs = self._logs(3)
+        # The list itself is allowed; only two of the rows are
+        for log in logs[1:]:
+            self._allow(f'log-{log.resource_id}', resource_type='abac_policy_log', resource_id=str(log.id))
+
+        ids = self._ids(self.client.get('/api/v1/abac/policy-logs/'))
+        self.assertEqual(ids, {str(log.id) for log in logs[1:]})
+
+    def test_pagination_counts_permitted_rows_only(self):
+        logs = self._logs(3)
+        self._allow('log-0', resource_type='abac_policy_log', resource_id=str(logs[0].id))
+
+        page = self._page(self.client.get('/api/v1/abac/policy-logs/', {'page_size': 1}))
+        self.assertEqual([row['id'] for row in page['data']], [str(logs[0].id)])
+        self.assertEqual(page['pagination']['count'], 1)
+        self.assertIsNone(page['pagination']['next'])
+
+    def test_non_admin_is_forbidden(self):
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+        from tests.factories import UserFactory
+
+        self._allow('allow-all')
+        member = UserFactory(organization=self.organization)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(member).access_token}'
+        )
+        for url in ('/api/v1/abac/policy-logs/', '/api/v1/abac/user-roles/'):
+            self.assertEqual(client.get(url).status_code, 403)
+        self.assertEqual(client.post('/api/v1/abac/user-roles/', {}).status_code, 403)
+
+    def test_queries_do_not_grow_with_page(self):
+        def count(rows):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self._ids(self.client.get('/api/v1/abac/policy-logs/'))), rows)
+            return len(queries)
+
+        self._allow('allow-all')
+        self._logs(5)
+        count(5)  # warm the ABAC snapshot and decision caches
+        few = count(5)
+        self._logs(10)
+        self.assertEqual(count(15), few)
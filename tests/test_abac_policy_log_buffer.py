@@ -0,0 +1,106 @@
+"""
+ABAC Policy Log Buffer Tests
+============================
+Validates:
+  1. DENY decisions are always kept, ALLOW decisions are sampled
+  2. Identical decisions within the dedup window are suppressed
+  3. Overflowing the ring buffer drops the oldest entries and counts them
+  4. A rolled-back transaction does not stop later batches being written
+
+Run:
+    python manage.py test tests.test_abac_policy_log_buffer -v2
+"""
+
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase
+
+
+def _payload(result=True, resource_id='r1'):
+    return {
+        'user_id': 'u1',
+        'organization_id': 'org',
+        'policy_id': None,
+        'resource_type': 'employee',
+        'resource_id': resource_id,
+        'action': 'view',
+        'result': result,
+        'subject_attributes': {},
+        'resource_attributes': {},
+        'environment_attributes': {},
+        'policies_evaluated': [],
+        'decision_reason': 'test',
+    }
+
+
+class PolicyLogBufferTests(SimpleTestCase):
+
+    def _buffer(self, **kwargs):
+        from apps.abac.log_buffer import PolicyLogBuffer
+        options = {'flush_size': 1000, 'flush_interval_ms': 10 ** 9}
+        options.update(kwargs)
+        return PolicyLogBuffer(**options)
+
+    def test_allow_sampling_never_drops_deny(self):
+        buffer = self._buffer(allow_sample_rate=0.0)
+        self.assertFalse(buffer.record(_payload(result=True)))
+        self.assertTrue(buffer.record(_payload(result=False)))
+        stats = buffer.stats()
+        self.assertEqual(stats['sampled_out'], 1)
+        self.assertEqual(stats['pending'], 1)
+
+    def test_dedup_window(self):
+        buffer = self._buffer(dedup_window_seconds=60)
+        self.assertTrue(buffer.record(_payload()))
+        self.assertFalse(buffer.record(_payload()))
+        self.assertTrue(buffer.record(_payload(resource_id='r2')))
+        self.assertEqual(buffer.stats()['deduplicated'], 1)
+
+    def test_ring_overflow_counts_drops(self):
+        buffer = self._buffer(capacity=3, dedup_window_seconds=0)
+        for index in range(5):
+            buffer.record(_payload(resource_id=f'r{index}'))
+        stats = buffer.stats()
+        self.assertEqual(stats['pending'], 3)
+        self.assertEqual(stats['dropped'], 2)
+
+    def test_flush_size_triggers_flush(self):
+        buffer = self._buffer(flush_size=2, dedup_window_seconds=0)
+        with patch.object(buffer, 'schedule_flush') as schedule:
+            buffer.record(_payload(resource_id='a'))
+            schedule.assert_not_called()
+            buffer.record(_payload(resource_id='b'))
+            schedule.assert_called_once()
+
+
+class PolicyLogBufferRollbackTests(TransactionTestCase):
+
+    def test_rollback_does_not_wedge_flushing(self):
+        from apps.abac.log_buffer import PolicyLogBuffer
+        buffer = PolicyLogBuffer(flush_size=1, dedup_window_seconds=0)
+        written = []
+
+        def bulk_create(rows, **kwargs):
+            written.extend(rows)
+            return rows
+
+        with patch('apps.abac.models.PolicyLog.objects.bulk_create', side_effect=bulk_create):
+            try:
+                with transaction.atomic():
+                    buffer.record(_payload(resource_id='rolled-back'))
+                    raise RuntimeError('request failed')
+            except RuntimeError:
+                pass
+
+            # The on_commit callback was discarded with the rollback.
+            self.assertEqual(written, [])
+
+            buffer.record(_payload(resource_id='next'))
+
+        self.assertEqual(
+            sorted(row.resource_id for row in written),
+            ['next', 'rolled-back'],
+        )
+        self.assertEqual(buffer.stats()['pending'], 0)
+        self.assertEqual(buffer.stats()['dropped'], 0)
@@ -0,0 +1,189 @@
+"""
+ABAC Compiled Policy Snapshot Tests
+===================================
+Validates:
+  1. Compiled rule predicates mirror PolicyRule.evaluate()
+  2. CompiledPolicy honours actions, validity window and combine logic
+  3. PolicySnapshot resolves user / group / role assignments from memory
+
+Run:
+    python manage.py test tests.test_abac_policy_snapshot -v2
+"""
+
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+
+def _policy(policy_id='p1', effect='allow', priority=0, resource_type='employee',
+            actions=('view',), predicates=(), combine_logic='and', **kwargs):
+    from apps.abac.snapshot import CompiledPolicy
+    return CompiledPolicy(
+        id=policy_id,
+        name=policy_id,
+        code=policy_id,
+        effect=effect,
+        priority=priority,
+        resource_type=resource_type,
+        resource_id=kwargs.pop('resource_id', ''),
+        actions=frozenset(actions),
+        combine_logic=combine_logic,
+        predicates=tuple(predicates),
+        **kwargs,
+    )
+
+
+class CompileRuleTests(SimpleTestCase):
+    """Compiled predicates must match the ORM rule semantics."""
+
+    def test_subject_equals(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('subject', 'department', 'eq', 'HR')
+        self.assertTrue(rule({'department': 'HR'}, {}, {}))
+        self.assertFalse(rule({'department': 'IT'}, {}, {}))
+
+    def test_nested_resource_path(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('resource', 'owner.level', 'gte', 3)
+        self.assertTrue(rule({}, {'owner': {'level': 5}}, {}))
+        self.assertFalse(rule({}, {'owner': {'level': 1}}, {}))
+
+    def test_type_error_is_non_match(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('subject', 'job_level', 'gt', 3)
+        self.assertFalse(rule({'job_level': None}, {}, {}))
+
+    def test_negate(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('environment', 'is_weekend', 'eq', True, negate=True)
+        self.assertTrue(rule({}, {}, {'is_weekend': False}))
+
+    def test_regex_and_invalid_regex(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('subject', 'email', 'regex', r'.*@corp\.com$')
+        self.assertTrue(rule({'email': 'a@corp.com'}, {}, {}))
+        broken = compile_rule('subject', 'email', 'regex', '(')
+        self.assertFalse(broken({'email': 'a@corp.com'}, {}, {}))
+
+    def test_unknown_category_never_matches(self):
+        from apps.abac.snapshot import compile_rule
+        rule = compile_rule('action', 'anything', 'eq', 'x')
+        self.assertFalse(rule({'anything': 'x'}, {'anything': 'x'}, {'anything': 'x'}))
+
+
+class CompiledPolicyTests(SimpleTestCase):
+
+    def test_no_rules_allows_for_allow_effect(self):
+        self.assertTrue(_policy().evaluate({}, {}, 'view', {}))
+        self.assertFalse(_policy(effect='deny').evaluate({}, {}, 'view', {}))
+
+    def test_action_mismatch(self):
+        self.assertFalse(_policy().evaluate({}, {}, 'delete', {}))
+
+    def test_expired_policy(self):
+        policy = _policy(valid_until=timezone.now() - timedelta(days=1))
+        self.assertFalse(policy.evaluate({}, {}, 'view', {}))
+
+    def test_combine_logic(self):
+        yes = lambda s, r, e: True  # noqa: E731
+        no = lambda s, r, e: False  # noqa: E731
+        self.assertFalse(_policy(predicates=(yes, no)).evaluate({}, {}, 'view', {}))
+        self.assertTrue(
+            _policy(predicates=(yes, no), combine_logic='or').evaluate({}, {}, 'view', {})
+        )
+
+
+class PolicySnapshotTests(SimpleTestCase):
+
+    def _snapshot(self):
+        from apps.abac.snapshot import PolicySnapshot
+        direct = _policy('direct', priority=1)
+        grouped = _policy('grouped', priority=5, resource_type='', actions=())
+        role = _policy('role', resource_type='payroll')
+        return PolicySnapshot(
+            organization_id='org',
+            version='v1',
+            policies={p.id: p for p in (direct, grouped, role)},
+            target_index={
+                ('employee', 'view'): frozenset({'direct'}),
+                ('', ''): frozenset({'grouped'}),
+                ('payroll', 'view'): frozenset({'role'}),
+            },
+            user_policies={'u1': [('direct', None, None)]},
+            group_policies={('department', 'HR'): frozenset({'grouped'})},
+            role_assignments={'u1': [('r1', None, timezone.now() - timedelta(days=1))]},
+            role_policies={'r1': frozenset({'role'})},
+        )
+
+    def test_direct_and_group_policies_sorted_by_priority(self):
+        policies = self._snapshot().applicable_policies(
+            'u1', {'department': 'HR'}, 'employee', 'view'
+        )
+        self.assertEqual([p.id for p in policies], ['grouped', 'direct'])
+
+    def test_group_requires_matching_attribute(self):
+        policies = self._snapshot().applicable_policies(
+            'u1', {'department': 'IT'}, 'employee', 'view'
+        )
+        self.assertEqual([p.id for p in policies], ['direct'])
+
+    def test_expired_role_assignment_ignored(self):
+        policies = self._snapshot().applicable_policies('u1', {}, 'payroll', 'view')
+        self.assertEqual(policies, [])
+
+    def test_unknown_user_gets_nothing(self):
+        self.assertEqual(
+            self._snapshot().applicable_policies('u2', {}, 'employee', 'view'), []
+        )
+
+
+class EvaluateManyTests(SimpleTestCase):
+    """Batched evaluation returns one decision per resource, in order."""
+
+    def setUp(self):
+        from types import SimpleNamespace
+        from apps.core.context import set_current_organization
+        self.org = SimpleNamespace(id='org', name='Org')
+        set_current_organization(self.org)
+        self.user = SimpleNamespace(
+            id='u1', email='u1@test.com', is_superuser=False,
+            is_org_admin=False, is_verified=True,
+        )
+
+    def tearDown(self):
+        from apps.core.context import set_current_organization
+        set_current_organization(None)
+
+    def _snapshot(self):
+        from apps.abac.snapshot import PolicySnapshot, compile_rule
+        confidential = compile_rule('resource', 'confidential', 'eq', False)
+        policy = _policy('open-records', predicates=(confidential,), uses_resource_attrs=True)
+        pinned = _policy('pinned', resource_id='r9')
+        return PolicySnapshot(
+            organization_id='org',
+            version='v1',
+            policies={policy.id: policy, pinned.id: pinned},
+            target_index={('employee', 'view'): frozenset({policy.id, pinned.id})},
+            user_policies={'u1': [(policy.id, None, None), (pinned.id, None, None)]},
+        )
+
+    def test_decisions_follow_resource_attributes(self):
+        from unittest.mock import patch
+        from apps.abac.engine import PolicyEngine
+        with patch('apps.abac.engine.get_snapshot', return_value=self._snapshot()) as snap:
+            decisions = PolicyEngine(self.user, log_decisions=False).evaluate_many(
+                'employee', 'view',
+                [{'confidential': False}, {'confidential': True}, {'confidential': True}],
+                resource_ids=['r1', 'r2', 'r9'],
+            )
+        self.assertEqual([d.allowed for d in decisions], [True, False, True])
+        self.assertEqual([d.resource_id for d in decisions], ['r1', 'r2', 'r9'])
+        self.assertEqual(snap.call_count, 1)
+
+    def test_misaligned_ids_rejected(self):
+        from apps.abac.engine import PolicyEngine
+        with self.assertRaises(ValueError):
+            PolicyEngine(self.user, log_decisions=False).evaluate_many(
+                'employee', 'view', [{}], resource_ids=['a', 'b']
+            )
@@ -0,0 +1,202 @@
+"""
+Attendance Recalculation Tests
+==============================
+Validates:
+  1. A recalculation job re-derives hours, late / early-out minutes and
+     status after a shift change, from punches when a record has them and
+     from its stored times otherwise; regularized records are left alone
+  2. Progress counters cover every chunk and dates locked by payroll are
+     never touched
+  3. The number of queries per chunk does not grow with the number of records
+  4. Overtime requests are created or re-sized while pending; approved or
+     rejected ones keep their decision
+  5. Job progress is served at /recalculations/<id>/progress/
+
+Run:
+    python manage.py test tests.test_attendance_recalculation -v2
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+@override_settings(ATTENDANCE_RECALC_CHUNK_SIZE=2)
+class AttendanceRecalculationTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance.models import Shift
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employees = [
+            EmployeeFactory(organization=self.organization, user=UserFactory(organization=self.organization))
+            for _ in range(3)
+        ]
+        self.shift = Shift.objects.create(
+            organization=self.organization, name='General', code='GEN',
+            start_time=datetime.time(9, 0), end_time=datetime.time(18, 0),
+        )
+        self.day = timezone.localdate() - datetime.timedelta(days=2)
+
+    def _at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.datetime.combine(day or self.day, datetime.time(hour, minute)))
+
+    def _record(self, employee, check_in, check_out, day=None, **extra):
+        from apps.attendance.models import AttendanceRecord
+
+        return AttendanceRecord.objects.create(
+            organization=self.organization, employee=employee, date=day or self.day,
+            check_in=check_in, check_out=check_out, total_hours=Decimal('9.00'),
+            status=AttendanceRecord.STATUS_PRESENT, **extra,
+        )
+
+    def _run(self, start, end=None):
+        from apps.attendance.models import AttendanceRecalculation
+        from apps.attendance.tasks.recalculation_tasks import recalculate_attendance
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job_id = recalculate_attendance.delay(
+                str(self.organization.id), start.isoformat(), (end or start).isoformat(),
+            ).get()
+        return AttendanceRecalculation.objects.get(id=job_id)
+
+    def test_shift_change_is_applied(self):
+        from apps.attendance import recalculation
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+
+        stored = self._record(self.employees[0], self._at(9), self._at(18))
+        punched = self._record(self.employees[1], None, None)
+        for punch_type, at in (('in', self._at(9, 45)), ('out', self._at(17)), ('in', self._at(10))):
+            AttendancePunch.objects.create(
+                organization=self.organization, employee=self.employees[1], attendance=punched,
+                punch_type=punch_type, punch_time=at,
+            )
+        regularized = self._record(self.employees[2], self._at(9), self._at(18), is_regularized=True)
+
+        self.shift.start_time = datetime.time(8, 30)
+        self.shift.end_time = datetime.time(18, 30)
+        self.shift.save()
+        job = self._run(self.day)
+
+        stored.refresh_from_db()
+        self.assertEqual((stored.late_minutes, stored.early_out_minutes), (15, 15))
+        self.assertEqual(stored.status, AttendanceRecord.STATUS_LATE)
+        punched.refresh_from_db()
+        self.assertEqual((punched.check_in, punched.check_out), (self._at(9, 45), self._at(17)))
+        self.assertEqual(punched.total_hours, Decimal('7.25'))
+        self.assertEqual(punched.late_minutes, 60)
+        regularized.refresh_from_db()
+        self.assertEqual(regularized.late_minutes, 0)
+
+        self.assertEqual(recalculation.get_progress(job), {
+            'status': 'completed', 'start_date': self.day, 'end_date': self.day,
+            'chunks_total': 2, 'chunks_completed': 2, 'chunks_failed': 0,
+            'records_updated': 2, 'failed_employees': 0, 'percent': 100.0,
+        })
+
+    def test_payroll_locked_dates_are_skipped(self):
+        from apps.payroll.models import PayrollRun
+
+        locked_day = self.day - datetime.timedelta(days=40)
+        locked = self._record(self.employees[0], self._at(10, day=locked_day), self._at(18, day=locked_day),
+                              day=locked_day)
+        open_record = self._record(self.employees[0], self._at(10), self._at(18))
+        PayrollRun.objects.create(
+            organization=self.organization, name='Locked', month=locked_day.month, year=locked_day.year,
+            pay_date=locked_day, status=PayrollRun.STATUS_LOCKED,
+        )
+
+        job = self._run(locked_day, self.day)
+        self.assertEqual(job.records_updated, 1)
+        locked.refresh_from_db()
+        open_record.refresh_from_db()
+        self.assertEqual((locked.late_minutes, open_record.late_minutes), (0, 45))
+
+    def test_queries_do_not_grow_with_records(self):
+        from apps.attendance import recalculation
+
+        def count(days):
+            start = self.day - datetime.timedelta(days=days - 1)
+            for offset in range(days):
+                day = start + datetime.timedelta(days=offset)
+                for employee in self.employees:
+                    self._record(employee, self._at(9, 30, day), self._at(18, day=day), day=day)
+            with CaptureQueriesContext(connection) as queries:
+                updated = recalculation.recalculate(
+                    self.organization, start, self.day, [employee.id for employee in self.employees],
+                )
+            self.assertEqual(updated, days * 3)
+            return len(queries)
+
+        few = count(1)
+        self.day -= datetime.timedelta(days=1)
+        self.assertEqual(count(10), few)
+
+    def test_decided_overtime_requests_are_kept(self):
+        from apps.attendance import recalculation
+        from apps.attendance.models import OvertimeRequest
+
+        approved = self._record(self.employees[0], self._at(9), self._at(20))
+        pending = self._record(self.employees[1], self._at(9), self._at(20))
+        missing = self._record(self.employees[2], self._at(9), self._at(19))
+        OvertimeRequest.objects.create(
+            organization=self.organization, attendance=approved, employee=self.employees[0],
+            requested_hours=Decimal('2.00'), approved_hours=Decimal('1.50'), status=OvertimeRequest.STATUS_APPROVED,
+        )
+        OvertimeRequest.objects.create(
+            organization=self.organization, attendance=pending, employee=self.employees[1],
+            requested_hours=Decimal('1.00'),
+        )
+
+        recalculation.recalculate(
+            self.organization, self.day, self.day, [employee.id for employee in self.employees],
+        )
+
+        for record in (approved, pending, missing):
+            record.refresh_from_db()
+        # 11h and 10h on the floor against the shift's default 8 working hours
+        self.assertEqual((pending.overtime_hours, missing.overtime_hours), (Decimal('3.00'), Decimal('2.00')))
+        requests = {request.attendance_id: request for request in OvertimeRequest.objects.all()}
+        self.assertEqual(
+            (requests[approved.id].status, requests[approved.id].requested_hours),
+            (OvertimeRequest.STATUS_APPROVED, Decimal('2.00')),
+        )
+        self.assertEqual(
+            (requests[pending.id].status, requests[pending.id].requested_hours),
+            (OvertimeRequest.STATUS_PENDING, Decimal('3.00')),
+        )
+        self.assertEqual(requests[missing.id].requested_hours, Decimal('2.00'))
+
+    def test_progress_endpoint(self):
+        from rest_framework.test import APIClient
+
+        from apps.abac.models import Policy, UserPolicy
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+        from tests.factories import UserFactory
+
+        self._record(self.employees[0], self._at(9, 30), self._at(18))
+        job = self._run(self.day)
+
+        admin = UserFactory(organization=self.organization, is_org_admin=True, is_staff=True, is_superuser=True)
+        policy = Policy.objects.create(
+            organization=self.organization, name='Allow all', code='allow-all', effect=Policy.ALLOW,
+        )
+        UserPolicy.objects.create(organization=self.organization, user=admin, policy=policy)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(admin).access_token}'
+        )
+
+        response = client.get(f'/api/v1/attendance/recalculations/{job.id}/progress/')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        progress = body.get('data', body)
+        self.assertEqual(
+            (progress['status'], progress['chunks_completed'], progress['records_updated'], progress['percent']),
+            ('completed', 1, 1, 100.0),
+        )
@@ -0,0 +1,221 @@
+"""
+Attendance Rollup Tests
+=======================
+Validates:
+  1. AttendanceMonthlySummary follows record inserts, status and hour
+     changes, moves between months, soft and hard deletes; saves that
+     leave the rolled-up fields alone issue no extra query
+  2. Bulk recalculation refreshes the months it touched and
+     build_attendance_rollup repairs missing or drifted months; the
+     migration backfills records that predate the rollup and deleting an
+     employee does not decrement the summaries its cascade removes
+  3. Monthly / annual reports and the payroll summary read the rollup
+
+Run:
+    python manage.py test tests.test_attendance_rollup -v2
+"""
+
+import datetime
+import importlib
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db.models import Count, Q, Sum
+from django.test import TestCase
+from django.utils import timezone
+
+MARCH = datetime.date(2026, 3, 10)
+APRIL = datetime.date(2026, 4, 1)
+
+
+class AttendanceRollupTests(TestCase):
+
+    def setUp(self):
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employees = [
+            EmployeeFactory(organization=self.organization, user=UserFactory(organization=self.organization))
+            for _ in range(2)
+        ]
+
+    def _record(self, employee, day, status, total_hours=None, overtime_hours=None):
+        from apps.attendance.models import AttendanceRecord
+
+        return AttendanceRecord.objects.create(
+            organization=self.organization, employee=employee, date=day, status=status,
+            total_hours=total_hours, overtime_hours=overtime_hours,
+        )
+
+    def _summary(self, employee, day):
+        from apps.attendance.models import AttendanceMonthlySummary
+
+        return AttendanceMonthlySummary.objects.filter(employee=employee, year=day.year, month=day.month).first()
+
+    def _assert_matches_records(self, employee, day):
+        from apps.attendance import monthly_rollup
+        from apps.attendance.models import AttendanceRecord
+
+        expected = AttendanceRecord.objects.filter(
+            employee=employee, date__year=day.year, date__month=day.month,
+        ).aggregate(
+            record_count=Count('id'),
+            total_hours=Sum('total_hours'),
+            overtime_hours=Sum('overtime_hours'),
+            **{field: Count('id', filter=Q(status=status)) for status, field in monthly_rollup.STATUS_FIELDS.items()},
+        )
+        summary = self._summary(employee, day)
+        actual = {field: getattr(summary, field) if summary else 0 for field in monthly_rollup.FIELDS}
+        for field in monthly_rollup.HOUR_FIELDS:
+            expected[field] = expected[field] or Decimal('0')
+        self.assertEqual(actual, expected)
+
+    def test_follows_record_writes(self):
+        from apps.attendance.models import AttendanceRecord
+
+        employee = self.employees[0]
+        first = self._record(employee, MARCH, 'present', Decimal('8.00'))
+        second = self._record(employee, MARCH + datetime.timedelta(days=1), 'late', Decimal('9.50'), Decimal('1.50'))
+        summary = self._summary(employee, MARCH)
+        self.assertEqual((summary.record_count, summary.present_days, summary.late_days), (2, 1, 1))
+        self.assertEqual((summary.total_hours, summary.overtime_hours), (Decimal('17.50'), Decimal('1.50')))
+
+        first.status, first.total_hours = 'half_day', Decimal('4.00')
+        first.save()
+        self._assert_matches_records(employee, MARCH)
+
+        first.device_id = 'phone-1'
+        with self.assertNumQueries(1):
+            first.save(validate=False, update_fields=['device_id', 'updated_at'])
+
+        second.date = APRIL
+        second.save()
+        self._assert_matches_records(employee, MARCH)
+        self._assert_matches_records(employee, APRIL)
+
+        deferred = AttendanceRecord.objects.defer('total_hours').get(id=first.id)
+        deferred.status = 'wfh'
+        deferred.save(validate=False)
+        self.assertEqual(self._summary(employee, MARCH).wfh_days, 1)
+
+        first.refresh_from_db()
+        first.delete()
+        self.assertEqual(self._summary(employee, MARCH).record_count, 0)
+        self._assert_matches_records(employee, MARCH)
+
+        second.delete(hard_delete=True)
+        self._assert_matches_records(employee, APRIL)
+
+    def test_bulk_paths_and_rebuild(self):
+        from apps.attendance import recalculation
+        from apps.attendance.models import AttendanceMonthlySummary, AttendancePunch, Shift
+
+        Shift.objects.create(
+            organization=self.organization, name='General', code='GEN',
+            start_time=datetime.time(9, 0), end_time=datetime.time(18, 0),
+        )
+        employee = self.employees[0]
+        record = self._record(employee, MARCH, 'present', Decimal('9.00'))
+        for punch_type, hour in (('in', 10), ('out', 12)):
+            AttendancePunch.objects.create(
+                organization=self.organization, employee=employee, attendance=record, punch_type=punch_type,
+                punch_time=timezone.make_aware(datetime.datetime.combine(MARCH, datetime.time(hour))),
+            )
+        self.assertEqual(recalculation.recalculate(self.organization, MARCH, MARCH, [employee.id]), 1)
+        self.assertEqual(self._summary(employee, MARCH).present_days, 0)
+        self._assert_matches_records(employee, MARCH)
+
+        self._record(self.employees[1], APRIL, 'wfh', Decimal('8.00'))
+        # Missing month (records from before the rollup) and a drifted one
+        AttendanceMonthlySummary.all_objects.filter(employee=self.employees[1]).delete()
+        AttendanceMonthlySummary.all_objects.filter(employee=employee).update(present_days=5, total_hours=0)
+
+        output = StringIO()
+        call_command('build_attendance_rollup', organization=str(self.organization.id), stdout=output)
+        self.assertIn('2 months recounted', output.getvalue())
+        self._assert_matches_records(employee, MARCH)
+        self._assert_matches_records(self.employees[1], APRIL)
+
+    def test_migration_backfills_existing_records(self):
+        from apps.attendance.models import AttendanceMonthlySummary
+
+        first, second = self.employees
+        self._record(first, MARCH, 'present', Decimal('8.00'))
+        self._record(first, MARCH + datetime.timedelta(days=1), 'late', Decimal('9.00'), Decimal('1.00'))
+        self._record(second, APRIL, 'absent')
+        deleted = self._record(second, APRIL + datetime.timedelta(days=1), 'present', Decimal('8.00'))
+        deleted.delete()
+        AttendanceMonthlySummary.all_objects.all().delete()
+
+        migration = importlib.import_module('apps.attendance.migrations.0011_backfill_attendancemonthlysummary')
+        migration.backfill_monthly_summaries(django_apps, None)
+
+        self._assert_matches_records(first, MARCH)
+        self._assert_matches_records(second, APRIL)
+        self.assertEqual(AttendanceMonthlySummary.objects.count(), 2)
+
+    def test_employee_delete_skips_rollup_updates(self):
+        from apps.attendance import monthly_rollup
+        from apps.attendance.models import AttendanceMonthlySummary
+
+        employee = self.employees[0]
+        for offset in range(3):
+            self._record(employee, MARCH + datetime.timedelta(days=offset), 'present', Decimal('8.00'))
+
+        with patch.object(monthly_rollup, '_increment') as increment:
+            employee.delete(hard_delete=True)
+        increment.assert_not_called()
+        self.assertFalse(AttendanceMonthlySummary.all_objects.filter(employee_id=employee.id).exists())
+
+    def test_consumers_read_rollup(self):
+        from rest_framework.test import APIClient
+
+        from apps.abac.models import Policy, UserPolicy
+        from apps.attendance.services import AttendanceService
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+        from tests.factories import UserFactory
+
+        first, second = self.employees
+        self._record(first, MARCH, 'present', Decimal('8.00'))
+        self._record(first, MARCH + datetime.timedelta(days=1), 'late', Decimal('10.00'), Decimal('2.00'))
+        self._record(second, MARCH, 'absent')
+        self._record(first, APRIL, 'half_day', Decimal('4.00'))
+
+        summary = AttendanceService.get_monthly_summary(self.organization, first.id, 3, 2026)
+        self.assertEqual(
+            (summary['present_days'], summary['late_days'], summary['half_days'], summary['overtime_hours']),
+            (1, 1, 0, Decimal('2.00')),
+        )
+        self.assertEqual(AttendanceService.get_monthly_summary(self.organization, first.id, 5, 2026)['present_days'], 0)
+
+        admin = UserFactory(organization=self.organization, is_org_admin=True, is_staff=True, is_superuser=True)
+        policy = Policy.objects.create(
+            organization=self.organization, name='Allow all', code='allow-all', effect=Policy.ALLOW,
+        )
+        UserPolicy.objects.create(organization=self.organization, user=admin, policy=policy)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {CustomTokenObtainPairSerializer.get_token(admin).access_token}'
+        )
+
+        response = client.get('/api/v1/attendance/records/monthly_report/', {'year': 2026, 'month': 3})
+        self.assertEqual(response.status_code, 200)
+        rows = {row['employee_id']: row for row in response.json()['data']['data']}
+        self.assertEqual(set(rows), {first.employee_id, second.employee_id})
+        self.assertEqual(
+            (rows[first.employee_id]['present_days'], rows[first.employee_id]['late_days'],
+             rows[first.employee_id]['total_hours'], rows[second.employee_id]['absent_days']),
+            (1, 1, '18.00', 1),
+        )
+
+        response = client.get('/api/v1/attendance/records/annual_report/', {'year': 2026})
+        self.assertEqual(response.status_code, 200)
+        months = {row['employee_id']: row['months'] for row in response.json()['data']['data']}
+        self.assertEqual(
+            [(month['present_days'], month['total_hours']) for month in months[first.employee_id][2:4]],
+            [(1, 18.0), (0, 4.0)],
+        )
+        self.assertEqual(months[second.employee_id][2]['absent_days'], 1)
@@ -0,0 +1,64 @@
+"""
+Audit Pipeline Tests
+====================
+Validates:
+  1. Saving an audited model issues no queries beyond the write itself
+  2. AuditLog rows are bulk-written only when the transaction commits
+  3. Rolled-back savepoints discard their audit rows
+
+Run:
+    python manage.py test tests.test_audit_pipeline -v2
+"""
+
+import uuid
+
+from django.db import transaction
+from django.test import TestCase
+
+from apps.core.models import AuditLog, Organization
+
+
+class AuditPipelineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.org = Organization.objects.create(
+            name='Audit Org',
+            email=f'audit-{uuid.uuid4().hex[:6]}@test.com',
+        )
+
+    def _entries(self):
+        return AuditLog.objects.filter(resource_type='Organization', resource_id=str(self.org.pk))
+
+    def test_update_adds_no_extra_queries(self):
+        from apps.core.audit_buffer import audit_table_exists
+        audit_table_exists()  # warm the once-per-process check
+        org = Organization.objects.get(pk=self.org.pk)
+        org.name = 'Renamed Org'
+        with self.assertNumQueries(1):
+            org.save(update_fields=['name'])
+
+    def test_diff_written_on_commit(self):
+        org = Organization.objects.get(pk=self.org.pk)
+        before = self._entries().count()
+        with self.captureOnCommitCallbacks(execute=True):
+            org.name = 'Committed Name'
+            org.save()
+            self.assertEqual(self._entries().count(), before)
+        entry = self._entries().latest('timestamp')
+        self.assertEqual(entry.action, 'update')
+        self.assertEqual(entry.changed_fields, ['name'])
+        self.assertEqual(entry.old_values, {'name': 'Audit Org'})
+
+    def test_rolled_back_savepoint_is_discarded(self):
+        org = Organization.objects.get(pk=self.org.pk)
+        before = self._entries().count()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    org.name = 'Never Committed'
+                    org.save()
+                    raise RuntimeError('rollback')
+            except RuntimeError:
+                pass
+        self.assertEqual(self._entries().count(), before)
@@ -0,0 +1,165 @@
+"""
+Face Index Tests
+================
+Validates:
+  1. Top-k search and 1:1 verification rank embeddings by cosine
+     similarity, for float32, float16 and int8 storage
+  2. The index is memory-mapped from its files and follows FaceEmbedding
+     inserts, updates, soft deletes and hard deletes
+  3. An unchanged index is reused without being rewritten
+  4. Deletes force a rebuild on hosts that still hold older files, and a
+     write keeps the previous generation for concurrent readers
+
+Run:
+    python manage.py test tests.test_face_index -v2
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+DIM = 64
+
+
+class FaceIndexTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance import face_index
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        settings_override = override_settings(FACE_INDEX_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        face_index.clear()
+        self.addCleanup(face_index.clear)
+
+        self.organization = OrganizationFactory()
+        self.employees = [
+            EmployeeFactory(organization=self.organization, user=UserFactory(organization=self.organization))
+            for _ in range(4)
+        ]
+        self.rng = np.random.default_rng(7)
+        self.faces = self.rng.normal(size=(len(self.employees), DIM)).astype(np.float32)
+
+    def _store(self, employee, vector, model='facenet'):
+        from apps.attendance import face_index
+        from apps.attendance.models import FaceEmbedding
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return FaceEmbedding.objects.create(
+                organization=self.organization, employee=employee, embedding_model=model,
+                embedding=face_index.encode(vector),
+            )
+
+    def _probe(self, position, noise=0.1):
+        return self.faces[position] + self.rng.normal(scale=noise, size=DIM).astype(np.float32)
+
+    def _index(self):
+        from apps.attendance import face_index
+
+        face_index.clear()
+        return face_index.get_index(self.organization.id, 'facenet')
+
+    def test_search_and_verify_per_dtype(self):
+        from apps.attendance import face_index
+
+        stored = [self._store(employee, face) for employee, face in zip(self.employees, self.faces)]
+        for dtype in ('float32', 'float16', 'int8'):
+            with self.subTest(dtype=dtype), override_settings(FACE_INDEX_DTYPE=dtype):
+                index = self._index()
+                self.assertEqual(index.vectors.dtype, np.dtype(dtype))
+                self.assertIsInstance(index.vectors, np.memmap)
+
+                matches = face_index.search(self.organization.id, 'facenet', self._probe(2), k=2)
+                self.assertEqual(matches[0].embedding_id, str(stored[2].id))
+                self.assertEqual(matches[0].employee_id, str(self.employees[2].id))
+                self.assertGreater(matches[0].score, 0.95)
+                self.assertGreater(matches[0].score, matches[1].score)
+
+                exact = index.search(self.faces[1], k=1)[0]
+                self.assertAlmostEqual(exact.score, 1.0, places=2)
+
+                self.assertTrue(face_index.verify(self.employees[0], 'facenet', self._probe(0)).verified)
+                rejected = face_index.verify(self.employees[0], 'facenet', self._probe(3))
+                self.assertFalse(rejected.verified)
+                self.assertEqual(rejected.embedding_id, str(stored[0].id))
+
+        with self.assertRaises(ValueError):
+            index.search(np.ones(DIM + 1))
+
+    def test_follows_embedding_writes(self):
+        from apps.attendance import face_index
+
+        first = self._store(self.employees[0], self.faces[0])
+        self.assertEqual(len(self._index()), 1)
+
+        second = self._store(self.employees[1], self.faces[1])
+        first.embedding = face_index.encode(self.faces[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        index = self._index()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(self.faces[2], k=1)[0].embedding_id, str(first.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self._index().ids.tolist(), [str(second.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete(hard_delete=True)
+        self.assertEqual(len(self._index()), 0)
+        self.assertEqual(face_index.search(self.organization.id, 'facenet', self.faces[1]), [])
+
+    def test_unchanged_index_is_reused(self):
+        from apps.attendance import face_index
+
+        self._store(self.employees[0], self.faces[0])
+        self._index()
+        key = (str(self.organization.id), 'facenet')
+        with open(f"{face_index._path(key)}/{face_index.MANIFEST}") as handle:
+            manifest = handle.read()
+
+        cache.delete(face_index.version_key(key))
+        self._index()
+        with open(f"{face_index._path(key)}/{face_index.MANIFEST}") as handle:
+            self.assertEqual(handle.read(), manifest)
+
+    def test_delete_rebuilds_index_files_of_other_hosts(self):
+        from apps.attendance import face_index
+
+        first = self._store(self.employees[0], self.faces[0])
+        self._store(self.employees[1], self.faces[1])
+        self.assertEqual(len(self._index()), 2)
+        key = (str(self.organization.id), 'facenet')
+        path = face_index._path(key)
+        other_host = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other_host, True)
+        shutil.copytree(path, other_host, dirs_exist_ok=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        # Another host still has the old files and syncs by updated_at only
+        shutil.rmtree(path)
+        shutil.copytree(other_host, path)
+        index = self._index()
+        self.assertNotIn(str(first.id), index.ids.tolist())
+        self.assertEqual(index.rebuild, cache.get(face_index.rebuild_key(key)))
+
+    def test_write_keeps_previous_generation(self):
+        from apps.attendance import face_index
+
+        self._store(self.employees[0], self.faces[0])
+        key = (str(self.organization.id), 'facenet')
+        first = face_index._write(key, face_index._build(*key)).ids
+        second = face_index._write(key, face_index._build(*key))
+        generations = {name.split('.', 1)[0] for name in os.listdir(face_index._path(key))}
+        self.assertEqual(len(generations - {'manifest'}), 2)
+        self.assertEqual(first.tolist(), second.ids.tolist())
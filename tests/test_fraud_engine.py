@@ -0,0 +1,121 @@
+"""
+Fraud Engine Tests
+==================
+Validates:
+  1. Batch scores match FraudDetectionService.calculate_fraud_score for
+     device flags, suspicious timing and device mismatch, plus the stored
+     geo-fence outcome and its surcharge
+  2. evaluate_recent_punches logs each suspicious punch once, however often
+     it runs, and flags its attendance record
+  3. Punches flagged by the punch path or by HR stay flagged
+  4. The number of queries does not grow with the number of punches
+
+Run:
+    python manage.py test tests.test_fraud_engine -v2
+"""
+
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+class FraudEngineTests(TestCase):
+
+    def setUp(self):
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employee = EmployeeFactory(
+            organization=self.organization, user=UserFactory(organization=self.organization),
+        )
+        self.day = timezone.localdate() - datetime.timedelta(days=1)
+
+    def _at(self, hour, minute=0):
+        return timezone.make_aware(datetime.datetime.combine(self.day, datetime.time(hour, minute)))
+
+    def _punch(self, employee, at, **fields):
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+
+        record, _ = AttendanceRecord.objects.get_or_create(
+            organization=self.organization, employee=employee, date=self.day,
+        )
+        return AttendancePunch.objects.create(
+            organization=self.organization, employee=employee, attendance=record,
+            punch_type=fields.pop('punch_type', 'in'), punch_time=at, **fields,
+        )
+
+    def _scenario(self, employee):
+        return [
+            self._punch(employee, self._at(8), device_id='phone-a'),
+            self._punch(employee, self._at(8, 2), device_id='phone-a'),
+            self._punch(employee, self._at(12), device_id='phone-b', is_rooted=True),
+            self._punch(employee, self._at(18), punch_type='out', fraud_score=55, fraud_flags=['geo_mismatch']),
+        ]
+
+    def test_scores_match_service(self):
+        from apps.attendance import fraud_engine
+        from apps.attendance.services import FraudDetectionService
+
+        punches = self._scenario(self.employee)
+        batch = fraud_engine.load(self.organization, timezone.now() - datetime.timedelta(hours=1))
+        totals = dict(zip((row[0] for row in batch.rows), fraud_engine.scores(batch, fraud_engine.features(batch))))
+
+        expected = [0.0, 10.0, 30.0, 55.0]
+        self.assertEqual([totals[punch.id] for punch in punches], expected)
+        for index, punch in enumerate(punches[:3]):
+            previous = list(reversed(punches[:index]))
+            score, _ = FraudDetectionService.calculate_fraud_score(
+                self.employee,
+                {'device_id': punch.device_id, 'is_rooted': punch.is_rooted, 'punch_time': punch.punch_time},
+                previous, [p.device_id for p in previous if p.device_id],
+            )
+            self.assertEqual(float(score), expected[index])
+
+    def test_evaluate_recent_punches_is_idempotent(self):
+        from apps.attendance.models import AttendancePunch, AttendanceRecord, FraudLog
+        from apps.attendance.tasks.fraud_tasks import evaluate_recent_punches
+
+        punches = self._scenario(self.employee)
+        result = evaluate_recent_punches.delay(str(self.organization.id)).get()
+        self.assertEqual(result, {'evaluated': 4, 'rescored': 3, 'flagged': 1})
+        evaluate_recent_punches.delay(str(self.organization.id)).get()
+
+        log = FraudLog.objects.get()
+        self.assertEqual((log.punch_id, log.fraud_type, log.severity), (punches[3].id, 'suspicious_pattern', 'high'))
+        self.assertTrue(AttendanceRecord.objects.get(id=punches[3].attendance_id).is_flagged)
+        self.assertTrue(AttendancePunch.objects.get(id=punches[3].id).is_flagged)
+        rooted = AttendancePunch.objects.get(id=punches[2].id)
+        self.assertEqual((float(rooted.fraud_score), rooted.fraud_flags), (30.0, ['rooted_device', 'device_mismatch']))
+
+    def test_existing_flags_are_kept(self):
+        from apps.attendance import fraud_engine
+        from apps.attendance.models import AttendancePunch
+
+        # Low face confidence scores 30, below the review threshold
+        punch = self._punch(
+            self.employee, self._at(9), fraud_score=30, fraud_flags=['low_face_confidence'], is_flagged=True,
+        )
+        fraud_engine.evaluate_window(self.organization, since=timezone.now() - datetime.timedelta(hours=1))
+        punch = AttendancePunch.objects.get(id=punch.id)
+        self.assertTrue(punch.is_flagged)
+        self.assertEqual(float(punch.fraud_score), 30.0)
+
+    def test_queries_do_not_grow_with_punches(self):
+        from apps.attendance import fraud_engine
+        from tests.factories import EmployeeFactory, UserFactory
+
+        def evaluate(count):
+            since = timezone.now()
+            for _ in range(count):
+                self._scenario(EmployeeFactory(
+                    organization=self.organization, user=UserFactory(organization=self.organization),
+                ))
+            with CaptureQueriesContext(connection) as queries:
+                result = fraud_engine.evaluate_window(self.organization, since=since)
+            self.assertEqual(result['evaluated'], count * 4)
+            return len(queries)
+
+        self.assertEqual(evaluate(1), evaluate(10))
@@ -0,0 +1,127 @@
+"""
+Geo-fence Index Tests
+=====================
+Validates:
+  1. Vectorized checks (with and without the grid prefilter) agree with
+     the scalar haversine loop: first fence inside, else the nearest one
+  2. Punch checks read the process index instead of querying GeoFence
+  3. Saving a GeoFence makes the next check see it
+  4. The batch API returns one result per point
+
+Run:
+    python manage.py test tests.test_geofence_index -v2
+"""
+
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+
+def _reference(fences, latitude, longitude, accuracy):
+    from apps.attendance.services import GeoFenceService
+
+    best, nearest = None, float('inf')
+    for i, fence in enumerate(fences):
+        distance = GeoFenceService.haversine_distance(
+            latitude, longitude, float(fence.latitude), float(fence.longitude)
+        )
+        if distance < nearest:
+            best, nearest = i, distance
+        if distance <= fence.radius_meters + accuracy:
+            return True, i, distance
+    return False, best, nearest
+
+
+class GeoFenceIndexTests(SimpleTestCase):
+
+    def _fences(self, rng, count):
+        return [
+            SimpleNamespace(
+                latitude=Decimal(f'{18.5 + rng.uniform(-0.3, 0.3):.8f}'),
+                longitude=Decimal(f'{73.8 + rng.uniform(-0.3, 0.3):.8f}'),
+                radius_meters=rng.choice([100, 200, 500, 2000]),
+            )
+            for _ in range(count)
+        ]
+
+    def test_matches_scalar_loop(self):
+        from apps.attendance import geofence_index
+
+        rng = random.Random(3)
+        fences = self._fences(rng, 300)
+        points = [
+            (18.5 + rng.uniform(-0.35, 0.35), 73.8 + rng.uniform(-0.35, 0.35), rng.choice([0, 20, 800]))
+            for _ in range(400)
+        ]
+        for grid_min in (10_000, 1):
+            with mock.patch.object(geofence_index, 'GRID_MIN_FENCES', grid_min):
+                index = geofence_index.GeoFenceIndex.build(fences)
+            self.assertEqual(index.grid is not None, grid_min == 1)
+
+            matches = index.match(*zip(*points))
+            inside = 0
+            for (latitude, longitude, accuracy), match in zip(points, matches):
+                valid, fence, distance = _reference(fences, latitude, longitude, accuracy)
+                self.assertEqual((match.valid, match.fence), (valid, fence))
+                self.assertAlmostEqual(match.distance, distance, places=3)
+                inside += valid
+            self.assertTrue(0 < inside < len(points))
+
+
+class GeoFenceServiceTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance import geofence_index
+        from apps.employees.models import Location
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        geofence_index.clear()
+        self.addCleanup(geofence_index.clear)
+        self.organization = OrganizationFactory()
+        self.location = Location.objects.create(
+            organization=self.organization, name='Pune', code='PUN', address_line1='1 Main Rd',
+            city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        self.employee = EmployeeFactory(
+            organization=self.organization, location=self.location,
+            user=UserFactory(organization=self.organization),
+        )
+        self._fence('Office', '18.52040000', '73.85670000')
+
+    def _fence(self, name, latitude, longitude):
+        from apps.attendance.models import GeoFence
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return GeoFence.objects.create(
+                organization=self.organization, location=self.location, name=name,
+                latitude=Decimal(latitude), longitude=Decimal(longitude), radius_meters=200,
+            )
+
+    def test_cached_checks_and_invalidation(self):
+        from apps.attendance.services import GeoFenceService
+
+        warehouse = (18.60000000, 73.90000000, None)
+        result = GeoFenceService.validate_location(self.employee, *warehouse)
+        self.assertFalse(result['valid'])
+        self.assertEqual(result['geo_fence'].name, 'Office')
+        with self.assertNumQueries(0):
+            self.assertFalse(GeoFenceService.validate_location(self.employee, *warehouse)['valid'])
+
+        self._fence('Warehouse', '18.60010000', '73.90000000')
+        result = GeoFenceService.validate_location(self.employee, *warehouse)
+        self.assertTrue(result['valid'])
+        self.assertEqual(result['message'], 'Within geo-fence: Warehouse')
+
+    def test_batch_validation(self):
+        from apps.attendance.services import GeoFenceService
+
+        results = GeoFenceService.validate_locations(self.employee, [
+            (18.5204, 73.8567, 10),
+            (18.5300, 73.8567, 0),
+            (18.5300, 73.8567, 1200),
+        ])
+        self.assertEqual([result['valid'] for result in results], [True, False, True])
+        self.assertGreater(results[1]['distance_meters'], 1000)
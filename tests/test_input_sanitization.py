@@ -0,0 +1,88 @@
+"""
+Input Sanitization Middleware Tests
+===================================
+Validates:
+  1. JSON bodies are scanned iteratively and reported with their field path
+  2. The parsed body is cached on the request and reused by DRF's parser
+  3. Oversized and over-nested bodies are rejected
+
+Run:
+    python manage.py test tests.test_input_sanitization -v2
+"""
+
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+
+class InputSanitizationTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _middleware(self):
+        from apps.core.middleware import InputSanitizationMiddleware
+        return InputSanitizationMiddleware(lambda request: None)
+
+    def _post(self, payload):
+        body = payload if isinstance(payload, (bytes, str)) else json.dumps(payload)
+        return self.factory.post('/api/v1/shifts/', data=body, content_type='application/json')
+
+    def test_clean_body_is_cached(self):
+        from apps.core.parsers import get_parsed_json
+        request = self._post({'items': [{'name': 'Morning'}]})
+        self.assertIsNone(self._middleware().process_request(request))
+        self.assertEqual(get_parsed_json(request), {'items': [{'name': 'Morning'}]})
+
+    def test_nested_match_reports_path(self):
+        request = self._post({'items': [{'name': 'ok'}, {'meta': {'note': '<script>x'}}]})
+        with self.assertRaisesMessage(ValidationError, 'items[1].meta.note'):
+            self._middleware().process_request(request)
+
+    def test_strings_inside_lists_are_scanned(self):
+        request = self._post({'tags': ['fine', 'javascript:alert(1)']})
+        with self.assertRaisesMessage(ValidationError, 'tags[1]'):
+            self._middleware().process_request(request)
+
+    def test_malformed_json_left_to_drf(self):
+        from apps.core.parsers import get_parsed_json
+        request = self._post('{"broken": ')
+        self.assertIsNone(self._middleware().process_request(request))
+        self.assertIsNone(get_parsed_json(request))
+
+    @override_settings(INPUT_SANITIZATION_MAX_JSON_BYTES=16)
+    def test_oversized_body_rejected(self):
+        response = self._middleware().process_request(self._post({'name': 'x' * 64}))
+        self.assertEqual(response.status_code, 413)
+
+    @override_settings(INPUT_SANITIZATION_MAX_JSON_DEPTH=3)
+    def test_over_nested_body_rejected(self):
+        middleware = self._middleware()
+        self.assertIsNone(middleware.process_request(self._post({'a': {'b': {'c': 1}}})))
+        response = middleware.process_request(self._post({'a': {'b': {'c': {'d': 1}}}}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_pathological_nesting_does_not_recurse(self):
+        response = self._middleware().process_request(self._post('[' * 100000 + ']' * 100000))
+        self.assertEqual(response.status_code, 400)
+
+
+class CachedJSONParserTests(SimpleTestCase):
+
+    def test_reuses_cached_body(self):
+        from rest_framework.request import Request
+        from apps.core.parsers import CachedJSONParser, cache_parsed_json
+        django_request = RequestFactory().post(
+            '/', data='{"a": 1}', content_type='application/json'
+        )
+        cached = {'a': 1}
+        cache_parsed_json(django_request, cached)
+        request = Request(django_request, parsers=[CachedJSONParser()])
+        self.assertIs(request.data, cached)
+
+    def test_falls_back_to_parsing(self):
+        from apps.core.parsers import CachedJSONParser
+        data = CachedJSONParser().parse(io.BytesIO(b'{"a": [1, 2]}'), parser_context={})
+        self.assertEqual(data, {'a': [1, 2]})
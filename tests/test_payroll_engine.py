@@ -0,0 +1,175 @@
+"""
+Payroll Batch Engine Tests
+==========================
+Validates:
+  1. Integer proration matches Decimal quantize(ROUND_HALF_UP)
+  2. LOP (absent, half day, unpaid leave overlap) and encashment math
+  3. Re-running a payroll updates payslips in place and keeps encashments
+  4. The number of queries does not grow with the number of employees
+  5. process_payroll_run rolls payslips up into the run totals
+
+Run:
+    python manage.py test tests.test_payroll_engine -v2
+"""
+
+import datetime
+import random
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class ProrateTests(SimpleTestCase):
+
+    def test_matches_decimal_rounding(self):
+        import numpy as np
+        from apps.payroll.engine import prorate
+
+        rng = random.Random(7)
+        amounts = [Decimal(rng.randint(0, 10_000_000)) / 100 for _ in range(500)]
+        worked = [rng.randint(0, 62) for _ in range(500)]
+        got = prorate(
+            np.array([int(a * 100) for a in amounts], dtype=np.int64),
+            np.array(worked, dtype=np.int64),
+            31,
+        )
+        for amount, halves, paise in zip(amounts, worked, got):
+            factor = (Decimal(halves) / 2) / Decimal(31)
+            expected = (amount * factor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            self.assertEqual(int(paise), int(expected * 100))
+
+
+class PayrollEngineTests(TestCase):
+
+    def setUp(self):
+        from apps.leave.models import LeaveType
+        from apps.payroll.models import PayrollRun
+        from tests.factories import OrganizationFactory
+
+        self.organization = OrganizationFactory()
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='January 2024', month=1, year=2024,
+            pay_date=datetime.date(2024, 1, 31),
+        )
+        self.unpaid = LeaveType.objects.create(
+            organization=self.organization, name='Unpaid', code='LWP', is_paid=False
+        )
+        self.privilege = LeaveType.objects.create(
+            organization=self.organization, name='Privilege', code='PL', encashment_allowed=True
+        )
+
+    def _employee(self, organization=None, **salary):
+        from apps.payroll.models import EmployeeSalary
+        from tests.factories import EmployeeFactory, UserFactory
+
+        organization = organization or self.organization
+        employee = EmployeeFactory(organization=organization, user=UserFactory(organization=organization))
+        if salary:
+            EmployeeSalary(
+                organization=organization, employee=employee,
+                effective_from=datetime.date(2023, 4, 1), **salary
+            ).save()
+        return employee
+
+    def _absent(self, employee, day, status='absent'):
+        from apps.attendance.models import AttendanceRecord
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(
+            organization=self.organization, employee=employee,
+            date=datetime.date(2024, 1, day), status=status,
+        )])
+
+    def test_lop_and_encashment(self):
+        from apps.leave.models import LeaveEncashment, LeaveRequest
+        from apps.payroll.engine import PayrollBatchEngine
+        from apps.payroll.models import Payslip
+        from tests.factories import OrganizationFactory
+
+        employee = self._employee(
+            basic=Decimal('31000'), hra=Decimal('15500'),
+            pf_employee=Decimal('1800'), professional_tax=Decimal('200'),
+        )
+        self._absent(employee, 3)
+        self._absent(employee, 4, 'half_day')
+        LeaveRequest.objects.bulk_create([LeaveRequest(
+            organization=self.organization, employee=employee, leave_type=self.unpaid,
+            start_date=datetime.date(2024, 1, 30), end_date=datetime.date(2024, 2, 2),
+            total_days=4, reason='Personal', status='approved',
+        )])
+        LeaveEncashment.objects.bulk_create([LeaveEncashment(
+            organization=self.organization, employee=employee, leave_type=self.privilege,
+            year=2024, days_requested=5, days_approved=5, per_day_amount=2000,
+            total_amount=Decimal('10000'), status=LeaveEncashment.STATUS_APPROVED,
+        )])
+        self._employee()  # no salary: skipped
+        self._employee(basic=Decimal('5000'), is_active=False)  # deactivated salary: skipped
+        self._employee(organization=OrganizationFactory(), basic=Decimal('1'))
+
+        result = PayrollBatchEngine(self.run).run()
+
+        self.assertEqual((result.processed, result.created), (1, 1))
+        payslip = Payslip.objects.get(payroll_run=self.run)
+        self.assertEqual(payslip.attendance_snapshot['lop_days'], 3.5)
+        self.assertEqual(payslip.earnings_breakdown, {
+            'BASIC': 27500.0, 'HRA': 13750.0, 'LEAVE_ENCASHMENT': 10000.0,
+        })
+        self.assertEqual(payslip.deductions_breakdown, {
+            'PF_EMPLOYEE': 1596.77, 'ESI_EMPLOYEE': 0.0, 'PROF_TAX': 200.0,
+        })
+        self.assertEqual(payslip.gross_salary, Decimal('51250.00'))
+        self.assertEqual(payslip.net_salary, Decimal('49453.23'))
+        encashment = LeaveEncashment.objects.get(employee=employee)
+        self.assertEqual(encashment.status, LeaveEncashment.STATUS_PROCESSED)
+        self.assertEqual(encashment.paid_in_payroll_id, self.run.id)
+
+    def test_rerun_updates_in_place(self):
+        from apps.leave.models import LeaveEncashment
+        from apps.payroll.engine import PayrollBatchEngine
+        from apps.payroll.models import Payslip
+
+        employee = self._employee(basic=Decimal('31000'))
+        LeaveEncashment.objects.bulk_create([LeaveEncashment(
+            organization=self.organization, employee=employee, leave_type=self.privilege,
+            year=2024, days_requested=1, days_approved=1, per_day_amount=500,
+            total_amount=Decimal('500'), status=LeaveEncashment.STATUS_APPROVED,
+        )])
+        PayrollBatchEngine(self.run).run()
+        self._absent(employee, 10)
+        result = PayrollBatchEngine(self.run).run()
+
+        self.assertEqual((result.created, result.updated), (0, 1))
+        payslip = Payslip.objects.get(payroll_run=self.run)
+        self.assertEqual(payslip.gross_salary, Decimal('30500.00'))
+
+    def test_query_count_is_constant(self):
+        from apps.payroll.engine import PayrollBatchEngine
+
+        def queries():
+            PayrollBatchEngine(self.run).run()  # measure the all-update re-run
+            with CaptureQueriesContext(connection) as captured:
+                PayrollBatchEngine(self.run).run()
+            return len(captured)
+
+        for day in (2, 3):
+            self._absent(self._employee(basic=Decimal('1000')), day)
+        small = queries()
+        for day in range(4, 12):
+            self._absent(self._employee(basic=Decimal('1000')), day)
+        self.assertEqual(queries(), small)
+
+    def test_process_payroll_run_totals(self):
+        from apps.payroll.models import PayrollRun
+        from apps.payroll.services import PayrollCalculationService
+
+        self._employee(basic=Decimal('1000'), professional_tax=Decimal('200'))
+        self._employee(basic=Decimal('2000'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollCalculationService.process_payroll_run(self.run.id)
+        run = PayrollRun.objects.get(id=self.run.id)
+
+        self.assertEqual(run.status, PayrollRun.STATUS_PROCESSED)
+        self.assertEqual(run.total_employees, 2)
+        self.assertEqual(run.total_gross, Decimal('3000.00'))
+        self.assertEqual(run.total_net, Decimal('2800.00'))
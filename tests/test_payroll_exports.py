@@ -0,0 +1,103 @@
+"""
+Payroll Export Tests
+====================
+Validates:
+  1. Exports stream: the header goes out before any query runs
+  2. PF / ESI / PT rows keep their report layouts and filters
+  3. The bank transfer file pays net salary to the primary account
+
+Run:
+    python manage.py test tests.test_payroll_exports -v2
+"""
+
+import csv
+import datetime
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+
+@override_settings(ENCRYPTION_KEY='payroll-export-tests')
+class PayrollExportTests(TestCase):
+
+    def setUp(self):
+        encryption = mock.patch('apps.core.encryption._encryption_instance', None)
+        encryption.start()
+        self.addCleanup(encryption.stop)
+
+        from apps.employees.models import EmployeeBankAccount
+        from apps.payroll.engine import PayrollBatchEngine
+        from apps.payroll.models import EmployeeSalary, PayrollRun, PFContribution, Payslip
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employees = []
+        for code, esi in (('E001', '0'), ('E002', '75')):
+            employee = EmployeeFactory(
+                organization=self.organization, employee_id=code,
+                user=UserFactory(organization=self.organization, first_name=code, last_name='Rao'),
+            )
+            EmployeeSalary(
+                organization=self.organization, employee=employee, effective_from=datetime.date(2024, 1, 1),
+                basic=Decimal('20000'), esi_employee=Decimal(esi), professional_tax=Decimal('200'),
+            ).save()
+            self.employees.append(employee)
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='January 2024', month=1, year=2024,
+            pay_date=datetime.date(2024, 1, 31), status=PayrollRun.STATUS_APPROVED,
+        )
+        PayrollBatchEngine(self.run).run()
+
+        PFContribution.objects.create(
+            organization=self.organization, payslip=Payslip.objects.get(employee=self.employees[0]),
+            uan='100200300400', pf_wages=Decimal('15000'), epf_employee=Decimal('1800'),
+            epf_employer=Decimal('1800'), eps=Decimal('1250'),
+        )
+        for number, primary in (('111', False), ('222', True)):
+            EmployeeBankAccount.objects.create(
+                organization=self.organization, employee=self.employees[0],
+                account_holder_name='E001 Rao', bank_name='SBI', branch_name='Pune',
+                account_number=number, ifsc_code='SBIN0000001', is_primary=primary,
+            )
+
+    def _read(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_header_is_sent_before_querying(self):
+        from apps.payroll.exports import PF_HEADER, export_filename, pf_rows, stream_csv
+
+        response = stream_csv(export_filename('pf_report', self.run), PF_HEADER, pf_rows(self.run))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="pf_report_1_2024.csv"')
+        with self.assertNumQueries(0):
+            header = next(iter(response.streaming_content))
+        self.assertTrue(header.decode().startswith('UAN,Member Name'))
+
+    def test_statutory_rows(self):
+        from apps.payroll import exports
+
+        pf = self._read(exports.stream_csv('pf.csv', exports.PF_HEADER, exports.pf_rows(self.run)))
+        self.assertEqual(pf[1], [
+            '100200300400', 'E001 Rao', '20000.00', '15000.00', '15000.00', '15000.00',
+            '1800.00', '1250.00', '550.00', '0', '0',
+        ])
+        self.assertEqual(len(pf), 2)
+
+        esi = self._read(exports.stream_csv('esi.csv', exports.ESI_HEADER, exports.esi_rows(self.run)))
+        self.assertEqual([row[0] for row in esi[1:]], ['E002'])
+        self.assertEqual(esi[1][4:], ['75.0', '0', '75.0'])
+
+        pt = self._read(exports.stream_csv('pt.csv', exports.PT_HEADER, exports.pt_rows(self.run)))
+        self.assertEqual([row[0] for row in pt[1:]], ['E001', 'E002'])
+        self.assertEqual(pt[1][4:], ['20000.00', '200.0'])
+
+    def test_bank_transfer_uses_primary_account(self):
+        from apps.payroll import exports
+
+        rows = self._read(exports.stream_csv(
+            'bank.csv', exports.BANK_TRANSFER_HEADER, exports.bank_transfer_rows(self.run)
+        ))
+        self.assertEqual(rows[1], ['E001', 'E001 Rao', 'SBI', '222', 'SBIN0000001', '19800.00', 'Salary 1/2024'])
+        self.assertEqual(rows[2][:5], ['E002', '', '', '', ''])
@@ -0,0 +1,103 @@
+"""
+Payroll Fan-out Tests
+=====================
+Validates:
+  1. A run is split into PAYROLL_CHUNK_SIZE chunks finalized by a chord
+  2. Only the run's organization is processed
+  3. Chunk progress is counted on the PayrollRun row
+  4. A failing chunk is isolated, recorded and can be retried on its own
+
+Run:
+    python manage.py test tests.test_payroll_fanout -v2
+"""
+
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+
+@override_settings(PAYROLL_CHUNK_SIZE=2)
+class PayrollFanoutTests(TestCase):
+
+    def setUp(self):
+        from apps.payroll.models import PayrollRun
+        from tests.factories import OrganizationFactory
+
+        self.organization = OrganizationFactory()
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='March 2024', month=3, year=2024,
+            pay_date=datetime.date(2024, 3, 31),
+        )
+        self.employees = [self._employee(self.organization) for _ in range(5)]
+
+    def _employee(self, organization):
+        from apps.payroll.models import EmployeeSalary
+        from tests.factories import EmployeeFactory, UserFactory
+
+        employee = EmployeeFactory(organization=organization, user=UserFactory(organization=organization))
+        EmployeeSalary(
+            organization=organization, employee=employee,
+            effective_from=datetime.date(2024, 1, 1), basic=Decimal('1000'),
+        ).save()
+        return employee
+
+    def _process(self, **kwargs):
+        from apps.payroll.services import PayrollCalculationService
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollCalculationService.process_payroll_run(self.run.id, **kwargs)
+        self.run.refresh_from_db()
+
+    def test_chunks_are_finalized_by_chord(self):
+        from apps.payroll import tasks
+        from apps.payroll.models import PayrollRun, Payslip
+        from tests.factories import OrganizationFactory
+
+        self._employee(OrganizationFactory())
+        with mock.patch.object(
+            tasks.calculate_payroll_chunk, 'run', wraps=tasks.calculate_payroll_chunk.run
+        ) as chunk:
+            self._process()
+
+        self.assertEqual(chunk.call_count, 3)
+        self.assertEqual(Payslip.objects.filter(payroll_run=self.run).count(), 5)
+        self.assertEqual(self.run.status, PayrollRun.STATUS_PROCESSED)
+        self.assertEqual(self.run.total_gross, Decimal('5000.00'))
+        self.assertEqual(
+            (self.run.chunks_total, self.run.chunks_completed, self.run.employees_processed), (3, 3, 5)
+        )
+
+    def test_failed_chunk_is_isolated_and_retryable(self):
+        from apps.payroll import tasks
+        from apps.payroll.engine import PayrollBatchEngine
+        from apps.payroll.models import PayrollRun, Payslip
+        from apps.payroll.services import PayrollCalculationService
+
+        broken = str(self.employees[0].id)
+        real_run = PayrollBatchEngine.run
+
+        def run(engine, employee_ids=None):
+            if broken in employee_ids:
+                raise RuntimeError('boom')
+            return real_run(engine, employee_ids)
+
+        # Eager tasks cannot be re-queued: exercise the retries-exhausted path.
+        with mock.patch.object(PayrollBatchEngine, 'run', run), \
+                mock.patch.object(tasks.calculate_payroll_chunk, 'max_retries', 0):
+            self._process()
+
+        self.assertEqual(self.run.status, PayrollRun.STATUS_PROCESSING)
+        self.assertEqual((self.run.chunks_completed, self.run.chunks_failed), (3, 1))
+        self.assertIn(broken, self.run.failed_employee_ids)
+        self.assertEqual(len(self.run.failed_employee_ids), 2)
+        self.assertEqual(Payslip.objects.filter(payroll_run=self.run).count(), 3)
+        self.assertEqual(PayrollCalculationService.get_progress(self.run)['failed_employees'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollCalculationService.retry_failed_chunks(self.run.id)
+        self.run.refresh_from_db()
+        self.assertEqual(self.run.status, PayrollRun.STATUS_PROCESSED)
+        self.assertEqual(self.run.failed_employee_ids, [])
+        self.assertEqual(self.run.total_employees, 5)
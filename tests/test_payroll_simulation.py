@@ -0,0 +1,105 @@
+"""
+Payroll Simulation Tests
+========================
+Validates:
+  1. An unchanged scenario reproduces the last processed run
+  2. Component and LOP policy changes show up as aggregate and per-employee deltas
+  3. Simulation never writes
+  4. Scenario validation rejects unknown components and partial half days
+
+Run:
+    python manage.py test tests.test_payroll_simulation -v2
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class ScenarioValidationTests(SimpleTestCase):
+
+    def test_rejects_invalid_scenarios(self):
+        from apps.payroll.serializers import PayrollSimulationSerializer
+
+        for data in (
+            {'component_factors': {'bonus': 2}},
+            {'percent_of_basic': {'basic': 50}},
+            {'half_day_lop_days': '0.3'},
+        ):
+            self.assertFalse(PayrollSimulationSerializer(data=data).is_valid(), data)
+        self.assertTrue(PayrollSimulationSerializer(data={'percent_of_basic': {'hra': 40}}).is_valid())
+
+
+class PayrollSimulationTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance.models import AttendanceRecord
+        from apps.payroll.models import EmployeeSalary, PayrollRun
+        from apps.payroll.services import PayrollCalculationService
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employees = []
+        for basic in ('31000', '62000'):
+            employee = EmployeeFactory(
+                organization=self.organization, user=UserFactory(organization=self.organization)
+            )
+            EmployeeSalary(
+                organization=self.organization, employee=employee, effective_from=datetime.date(2024, 1, 1),
+                basic=Decimal(basic), hra=Decimal(basic) / 2, professional_tax=Decimal('200'),
+            ).save()
+            self.employees.append(employee)
+        AttendanceRecord.objects.bulk_create([AttendanceRecord(
+            organization=self.organization, employee=self.employees[0],
+            date=datetime.date(2024, 1, 5), status=AttendanceRecord.STATUS_HALF_DAY,
+        )])
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='January 2024', month=1, year=2024,
+            pay_date=datetime.date(2024, 1, 31),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollCalculationService.process_payroll_run(self.run.id)
+        self.run.refresh_from_db()
+
+    def _simulate(self, **scenario):
+        from apps.payroll.serializers import PayrollSimulationSerializer
+        from apps.payroll.services import PayrollCalculationService
+
+        serializer = PayrollSimulationSerializer(data=scenario)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        return PayrollCalculationService.simulate(self.run, data, limit=data.pop('limit'))
+
+    def test_unchanged_scenario_matches_baseline(self):
+        report = self._simulate()
+
+        self.assertEqual(report['baseline_run'], str(self.run.id))
+        self.assertEqual(report['employees'], 2)
+        self.assertEqual(report['baseline']['net'], str(self.run.total_net))
+        self.assertEqual(report['delta'], {'gross': '0.00', 'deductions': '0.00', 'net': '0.00'})
+        self.assertEqual(report['diffs'], [])
+
+    def test_component_and_lop_changes(self):
+        from apps.payroll.models import Payslip
+
+        before = list(Payslip.objects.values_list('id', 'updated_at', 'net_salary').order_by('id'))
+        with CaptureQueriesContext(connection) as captured:
+            report = self._simulate(percent_of_basic={'hra': 40}, half_day_lop_days='1')
+        self.assertFalse([
+            q['sql'] for q in captured if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ])
+        self.assertEqual(list(Payslip.objects.values_list('id', 'updated_at', 'net_salary').order_by('id')), before)
+
+        # HRA 50% -> 40% of basic; the half day now costs a full day
+        first, second = (str(employee.id) for employee in self.employees)
+        diffs = {diff['employee_id']: diff for diff in report['diffs']}
+        self.assertEqual([diff['employee_id'] for diff in report['diffs']], [second, first])
+        self.assertEqual(diffs[second]['delta']['gross'], '-6200.00')
+        self.assertEqual(diffs[first]['simulated']['gross'], '42000.00')
+        self.assertEqual(diffs[first]['delta']['gross'], '-3750.00')
+        self.assertEqual(diffs[first]['lop_days'], 1.0)
+        self.assertEqual(report['delta']['net'], '-9950.00')
+        self.assertEqual(report['components']['HRA'], '36800.00')
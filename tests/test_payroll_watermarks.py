@@ -0,0 +1,143 @@
+"""
+Payroll Input Watermark Tests
+=============================
+Validates:
+  1. Attendance, unpaid leave and salary edits stamp the affected periods
+  2. Incremental recalculation only recomputes employees with newer inputs
+  3. The report lists the payslips whose amounts actually changed
+  4. Staleness is judged by computed_at, not by later payslip writes
+
+Run:
+    python manage.py test tests.test_payroll_watermarks -v2
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+
+class PayrollWatermarkTests(TestCase):
+
+    def setUp(self):
+        from apps.payroll.models import PayrollRun
+        from tests.factories import OrganizationFactory
+
+        self.organization = OrganizationFactory()
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='January 2024', month=1, year=2024,
+            pay_date=datetime.date(2024, 1, 31),
+        )
+        self.employees = [self._employee() for _ in range(3)]
+
+    def _employee(self):
+        from apps.payroll.models import EmployeeSalary
+        from tests.factories import EmployeeFactory, UserFactory
+
+        employee = EmployeeFactory(organization=self.organization, user=UserFactory(organization=self.organization))
+        EmployeeSalary(
+            organization=self.organization, employee=employee,
+            effective_from=datetime.date(2024, 1, 1), basic=Decimal('31000'),
+        ).save()
+        return employee
+
+    def _periods(self, employee, source=None):
+        from apps.payroll.models import PayrollInputWatermark
+
+        watermarks = PayrollInputWatermark.objects.filter(employee=employee)
+        if source:
+            watermarks = watermarks.filter(source=source)
+        return set(watermarks.values_list('year', 'month'))
+
+    def _process(self):
+        from apps.payroll.services import PayrollCalculationService
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollCalculationService.process_payroll_run(self.run.id)
+
+    def test_input_changes_stamp_periods(self):
+        from apps.attendance.models import AttendanceRecord
+        from apps.leave.models import LeaveRequest, LeaveType
+        from apps.payroll.models import PayrollInputWatermark
+
+        first, second, third = self.employees
+        self.assertIn((2024, 1), self._periods(first, PayrollInputWatermark.SOURCE_SALARY))
+
+        record = AttendanceRecord.objects.create(
+            organization=self.organization, employee=first,
+            date=datetime.date(2024, 2, 5), status=AttendanceRecord.STATUS_PRESENT,
+        )
+        self.assertNotIn((2024, 2), self._periods(first, PayrollInputWatermark.SOURCE_ATTENDANCE))
+        record.status = AttendanceRecord.STATUS_ABSENT
+        record.save()
+        self.assertEqual(self._periods(first, PayrollInputWatermark.SOURCE_ATTENDANCE), {(2024, 2)})
+
+        unpaid = LeaveType.objects.create(
+            organization=self.organization, name='Unpaid', code='LWP', is_paid=False
+        )
+        LeaveRequest.objects.bulk_create([LeaveRequest(
+            organization=self.organization, employee=second, leave_type=unpaid,
+            start_date=datetime.date(2024, 3, 30), end_date=datetime.date(2024, 4, 2),
+            total_days=4, reason='Personal', status=LeaveRequest.STATUS_APPROVED,
+        )])
+        self.assertFalse(self._periods(second, PayrollInputWatermark.SOURCE_LEAVE))
+        leave = LeaveRequest.objects.get(employee=second)
+        leave.delete(hard_delete=True)
+        self.assertEqual(self._periods(second, PayrollInputWatermark.SOURCE_LEAVE), {(2024, 3), (2024, 4)})
+
+        salary = third.salary_structures.get()
+        salary.basic = Decimal('40000')
+        salary.save()
+        self.assertEqual(
+            PayrollInputWatermark.objects.filter(employee=third, year=2024, month=1).count(), 1
+        )
+
+    def test_incremental_recalculation(self):
+        from apps.attendance.models import AttendanceRecord
+        from apps.payroll.models import PayrollRun, Payslip
+        from apps.payroll.services import PayrollCalculationService
+
+        self._process()
+        unchanged = PayrollCalculationService.recalculate_incremental(self.run.id)
+        self.assertEqual(unchanged['recomputed'], 0)
+        self.assertEqual(unchanged['changed_employee_ids'], [])
+
+        first, second, _ = self.employees
+        AttendanceRecord.objects.create(
+            organization=self.organization, employee=first,
+            date=datetime.date(2024, 1, 10), status=AttendanceRecord.STATUS_ABSENT,
+        )
+        salary = second.salary_structures.get()
+        salary.save()  # touched, same amounts
+        untouched = Payslip.objects.get(payroll_run=self.run, employee=self.employees[2]).updated_at
+
+        report = PayrollCalculationService.recalculate_incremental(self.run.id)
+
+        self.assertEqual(report['recomputed'], 2)
+        self.assertEqual(report['changed_employee_ids'], [str(first.id)])
+        self.assertEqual(
+            Payslip.objects.get(payroll_run=self.run, employee=first).gross_salary, Decimal('30000.00')
+        )
+        self.assertEqual(
+            Payslip.objects.get(payroll_run=self.run, employee=self.employees[2]).updated_at, untouched
+        )
+        run = PayrollRun.objects.get(id=self.run.id)
+        self.assertEqual(run.total_gross, Decimal('92000.00'))
+        self.assertEqual(PayrollCalculationService.recalculate_incremental(self.run.id)['recomputed'], 0)
+
+    def test_payslip_writes_do_not_hide_new_inputs(self):
+        from django.utils import timezone
+        from apps.attendance.models import AttendanceRecord
+        from apps.payroll.models import Payslip
+        from apps.payroll.services import PayrollCalculationService
+
+        self._process()
+        first = self.employees[0]
+        AttendanceRecord.objects.create(
+            organization=self.organization, employee=first,
+            date=datetime.date(2024, 1, 10), status=AttendanceRecord.STATUS_ABSENT,
+        )
+        # e.g. PDF storage after the input changed
+        Payslip.objects.filter(payroll_run=self.run).update(updated_at=timezone.now())
+
+        self.assertEqual(PayrollCalculationService.stale_employee_ids(self.run), {first.id})
@@ -0,0 +1,106 @@
+"""
+Payslip Delivery Tests
+======================
+Validates:
+  1. Payslips are sharded into PAYSLIP_DELIVERY_CHUNK_SIZE chunks
+  2. Each chunk stores its PDFs and mails over a single connection
+  3. Channel preferences still apply to payslip emails
+  4. Rendering writes one PDF per row, in row order
+
+Run:
+    python manage.py test tests.test_payslip_delivery -v2
+"""
+
+import datetime
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core import mail
+from django.test import SimpleTestCase, TestCase, override_settings
+
+ROW = {
+    'employee_name': 'Asha Rao', 'employee_code': 'EMP00001',
+    'earnings': {'BASIC': 1000.0}, 'deductions': {'PROF_TAX': 200.0},
+    'gross': '1000.00', 'total_deductions': '200.00', 'net': '800.00',
+}
+
+
+class RenderTests(SimpleTestCase):
+
+    def test_renders_every_row(self):
+        from apps.payroll.payslip_pdf import PayslipLayout, render_files
+
+        layout = PayslipLayout('Acme', '3/2024', 'Pune')
+        rows = [{**ROW, 'filename': f'p{i}.pdf'} for i in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            paths = render_files(layout, rows, directory)
+            self.assertEqual([os.path.basename(p) for p in paths], ['p0.pdf', 'p1.pdf', 'p2.pdf'])
+            for path in paths:
+                with open(path, 'rb') as handle:
+                    self.assertEqual(handle.read(4), b'%PDF')
+
+
+class PayslipDeliveryTests(TestCase):
+
+    def setUp(self):
+        from apps.payroll.models import PayrollRun, Payslip
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, PAYSLIP_DELIVERY_CHUNK_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.organization = OrganizationFactory()
+        self.run = PayrollRun.objects.create(
+            organization=self.organization, name='March 2024', month=3, year=2024,
+            pay_date=datetime.date(2024, 3, 31), status=PayrollRun.STATUS_LOCKED,
+        )
+        self.employees = [
+            EmployeeFactory(organization=self.organization, user=UserFactory(organization=self.organization))
+            for _ in range(3)
+        ]
+        Payslip.objects.bulk_create([
+            Payslip(
+                organization=self.organization, payroll_run=self.run, employee=employee,
+                gross_salary=Decimal('1000'), total_deductions=Decimal('200'), net_salary=Decimal('800'),
+                earnings_breakdown={'BASIC': 1000.0}, deductions_breakdown={'PROF_TAX': 200.0},
+            )
+            for employee in self.employees
+        ])
+
+    def _deliver(self):
+        from django.core.mail import get_connection
+        from apps.payroll.tasks import generate_payslip_pdfs_and_notify
+
+        with mock.patch('django.core.mail.get_connection', wraps=get_connection) as connections:
+            generate_payslip_pdfs_and_notify.delay(str(self.organization.id), str(self.run.id))
+        return connections.call_count
+
+    def test_chunks_store_pdfs_and_share_connection(self):
+        from apps.notifications.models import Notification
+        from apps.payroll.models import Payslip
+
+        self.assertEqual(self._deliver(), 2)
+        self.assertEqual(len(mail.outbox), 3)
+        for payslip in Payslip.objects.filter(payroll_run=self.run):
+            with payslip.pdf_file.open('rb') as handle:
+                self.assertEqual(handle.read(4), b'%PDF')
+        self.assertEqual(
+            Notification.objects.filter(entity_type='payslip', status='sent', channel='email').count(), 3
+        )
+
+    def test_email_preference_is_respected(self):
+        from apps.notifications.models import Notification, NotificationPreference
+
+        user = self.employees[0].user
+        NotificationPreference.objects.create(
+            organization=self.organization, user=user, email_enabled=False
+        )
+        self._deliver()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertNotIn(user.email, [message.to[0] for message in mail.outbox])
+        self.assertEqual(Notification.objects.get(recipient=self.employees[0]).channel, 'in_app')
@@ -0,0 +1,131 @@
+"""
+Punch Context Tests
+===================
+Validates:
+  1. A warm punch runs only the attendance read/write and the punch insert
+  2. Devices seen by earlier punches come from the context (mismatch check)
+  3. Shift assignment writes re-resolve the cached shift
+  4. Punches written elsewhere drop the context; locking payroll is seen
+     by the next punch
+  5. A first punch-in that loses the insert race re-reads the record
+
+Run:
+    python manage.py test tests.test_punch_context -v2
+"""
+
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+
+class PunchContextTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance.models import Shift
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.organization = OrganizationFactory()
+        self.employee = EmployeeFactory(
+            organization=self.organization, user=UserFactory(organization=self.organization),
+        )
+        self.general = Shift.objects.create(
+            organization=self.organization, name='General', code='GEN',
+            start_time=datetime.time(0, 0), end_time=datetime.time(23, 59),
+        )
+        self.now = timezone.now()
+
+    def _punch(self, direction, device_id='phone-1', at=None):
+        from apps.attendance.services import AttendanceService
+
+        punch_data = {
+            'latitude': None, 'longitude': None, 'accuracy': None, 'device_id': device_id,
+            'face_verified': True, 'liveness_verified': True,
+        }
+        with mock.patch('django.utils.timezone.now', return_value=at or self.now):
+            with self.captureOnCommitCallbacks(execute=True):
+                return getattr(AttendanceService, direction)(self.employee, punch_data, self.organization)
+
+    def test_warm_punches(self):
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+
+        self.assertTrue(self._punch('punch_in')['success'])
+        self.assertTrue(self._punch('punch_out', at=self.now + datetime.timedelta(hours=9))['success'])
+
+        # Attendance read + update, punch insert
+        with self.assertNumQueries(3):
+            result = self._punch('punch_in', at=self.now + datetime.timedelta(hours=10))
+        self.assertTrue(result['success'])
+        self.assertEqual(AttendanceRecord.objects.get(employee=self.employee).check_in, result['punch'].punch_time)
+        self.assertEqual(AttendancePunch.objects.filter(employee=self.employee).count(), 3)
+
+        result = self._punch('punch_in', device_id='phone-2', at=self.now + datetime.timedelta(hours=11))
+        self.assertEqual(result['message'], 'Device mismatch detected. Please use the registered device to punch.')
+
+    def test_concurrent_first_punch_in(self):
+        from django.db.models.query import QuerySet
+
+        from apps.attendance.models import AttendanceRecord
+
+        # Another request inserted today's record after this one looked for it
+        AttendanceRecord.objects.create(
+            organization=self.organization, employee=self.employee, date=timezone.localdate(),
+            check_in=self.now, status=AttendanceRecord.STATUS_PRESENT,
+        )
+        first = QuerySet.first
+
+        def miss_attendance(queryset):
+            return None if queryset.model is AttendanceRecord else first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=miss_attendance):
+            result = self._punch('punch_in')
+        self.assertFalse(result['success'])
+        self.assertEqual(result['message'], 'Already punched in. Please punch out first.')
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.employee).count(), 1)
+
+    def test_shift_changes_are_picked_up(self):
+        from apps.attendance import punch_context
+        from apps.attendance.models import Shift, ShiftAssignment
+
+        today = timezone.localdate()
+        self.assertEqual(punch_context.load(self.employee, today).shift, self.general)
+
+        night = Shift.objects.create(
+            organization=self.organization, name='Night', code='NGT',
+            start_time=datetime.time(22, 0), end_time=datetime.time(6, 0),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            ShiftAssignment.objects.create(
+                organization=self.organization, employee=self.employee, shift=night, effective_from=today,
+            )
+        self.assertEqual(punch_context.load(self.employee, today).shift, night)
+
+    def test_invalidation(self):
+        from apps.attendance import punch_context
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+        from apps.payroll.models import PayrollRun
+
+        self.assertTrue(self._punch('punch_in')['success'])
+        record = AttendanceRecord.objects.get(employee=self.employee)
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendancePunch.objects.create(
+                organization=self.organization, employee=self.employee, attendance=record,
+                punch_type=AttendancePunch.PUNCH_OUT, punch_time=self.now + datetime.timedelta(hours=1),
+                device_id='kiosk-7',
+            )
+        self.assertIsNone(cache.get(punch_context.context_key(self.employee.id)))
+        context = punch_context.load(self.employee, timezone.localdate())
+        self.assertEqual(context.device_ids, ['kiosk-7', 'phone-1'])
+
+        next_month = timezone.localdate().replace(day=28) + datetime.timedelta(days=4)
+        with self.captureOnCommitCallbacks(execute=True):
+            PayrollRun.objects.create(
+                organization=self.organization, name='Next', month=next_month.month, year=next_month.year,
+                pay_date=next_month, status=PayrollRun.STATUS_LOCKED,
+            )
+        result = self._punch('punch_out', device_id='kiosk-7')
+        self.assertEqual(result['message'], 'Attendance is locked because payroll has been processed.')
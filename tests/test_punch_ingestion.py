@@ -0,0 +1,182 @@
+"""
+Bulk Punch Ingestion Tests
+==========================
+Validates:
+  1. Check-in / check-out are derived from all stored punches, whatever
+     the arrival order; repeated idempotency keys are answered as duplicates
+  2. Unknown employees, unsafe devices, failed face / liveness checks,
+     future and payroll-locked punches are rejected without writing anything
+  3. Geo-fence misses are scored and logged like the punch path
+  4. The number of queries does not grow with the number of punches
+
+Run:
+    python manage.py test tests.test_punch_ingestion -v2
+"""
+
+import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+class PunchIngestionTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance import geofence_index
+        from apps.attendance.models import Shift
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        cache.clear()
+        geofence_index.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(geofence_index.clear)
+        self.organization = OrganizationFactory()
+        self.employee = EmployeeFactory(
+            organization=self.organization, employee_id='T001', user=UserFactory(organization=self.organization),
+        )
+        Shift.objects.create(
+            organization=self.organization, name='General', code='GEN',
+            start_time=datetime.time(9, 0), end_time=datetime.time(18, 0),
+        )
+        self.day = timezone.localdate() - datetime.timedelta(days=1)
+
+    def _at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.datetime.combine(day or self.day, datetime.time(hour, minute)))
+
+    def _punch(self, key, punch_type, at, **extra):
+        data = {'idempotency_key': key, 'employee_code': 'T001', 'punch_type': punch_type, 'punch_time': at}
+        data.update(extra)
+        return data
+
+    def _ingest(self, punches):
+        from apps.attendance.ingestion import ingest_punches
+        from apps.attendance.serializers import BulkPunchSerializer
+
+        serializer = BulkPunchSerializer(data={'punches': punches})
+        serializer.is_valid(raise_exception=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return ingest_punches(self.organization, serializer.validated_data['punches'])
+
+    def test_out_of_order_and_duplicates(self):
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+
+        result = self._ingest([
+            self._punch('k-out', 'out', self._at(18, 30)),
+            self._punch('k-out', 'out', self._at(18, 30)),
+        ])
+        self.assertEqual([r['status'] for r in result['results']], ['created', 'duplicate'])
+        record = AttendanceRecord.objects.get(employee=self.employee, date=self.day)
+        self.assertIsNone(record.check_in)
+        self.assertEqual(record.check_out, self._at(18, 30))
+
+        result = self._ingest([
+            self._punch('k-in-late', 'in', self._at(9, 40)),
+            self._punch('k-in', 'in', self._at(9, 5), device_id='gate-1'),
+            self._punch('k-out', 'out', self._at(18, 30)),
+        ])
+        self.assertEqual((result['created'], result['duplicates']), (2, 1))
+        self.assertEqual(result['results'][2]['punch_id'], str(AttendancePunch.objects.get(idempotency_key='k-out').id))
+
+        record.refresh_from_db()
+        self.assertEqual((record.check_in, record.check_out), (self._at(9, 5), self._at(18, 30)))
+        self.assertEqual(record.total_hours, Decimal('9.42'))
+        self.assertEqual(record.status, AttendanceRecord.STATUS_PRESENT)
+        self.assertEqual(record.device_id, 'gate-1')
+        self.assertEqual(AttendancePunch.objects.filter(attendance=record).count(), 3)
+
+    def test_rejections(self):
+        from apps.attendance.models import AttendancePunch, AttendanceRecord
+        from apps.payroll.models import PayrollRun
+
+        locked = self.day - datetime.timedelta(days=40)
+        PayrollRun.objects.create(
+            organization=self.organization, name='Locked', month=locked.month, year=locked.year,
+            pay_date=locked, status=PayrollRun.STATUS_LOCKED,
+        )
+        result = self._ingest([
+            self._punch('a', 'in', self._at(9), employee_code='NOPE'),
+            self._punch('b', 'in', self._at(9), is_rooted=True),
+            self._punch('c', 'in', timezone.now() + datetime.timedelta(hours=1)),
+            self._punch('d', 'in', self._at(9, day=locked)),
+        ])
+        self.assertEqual([r['message'] for r in result['results']], [
+            'Employee not found in this organization.',
+            'Rooted or jailbroken devices are not allowed.',
+            'Punch time is in the future.',
+            'Attendance is locked because payroll has been processed.',
+        ])
+        self.assertEqual(result['rejected'], 4)
+        self.assertFalse(AttendancePunch.objects.exists())
+        self.assertFalse(AttendanceRecord.objects.exists())
+
+    def test_failed_verification_is_rejected(self):
+        from apps.attendance.models import AttendancePunch
+
+        result = self._ingest([
+            self._punch('face', 'in', self._at(9), face_verified=False, liveness_verified=True),
+            self._punch('live', 'in', self._at(9), face_verified=True, liveness_verified=False),
+            self._punch('finger', 'in', self._at(9, 5), face_verified=None, liveness_verified=None),
+        ])
+        self.assertEqual([(r['status'], r['message']) for r in result['results']], [
+            ('rejected', 'Face verification failed. Please retry.'),
+            ('rejected', 'Liveness detection failed. Punch rejected.'),
+            ('created', ''),
+        ])
+        self.assertEqual(list(AttendancePunch.objects.values_list('idempotency_key', flat=True)), ['finger'])
+
+    def test_geo_mismatch_is_logged(self):
+        from apps.attendance.models import FraudLog, GeoFence
+        from apps.employees.models import Location
+
+        location = Location.objects.create(
+            organization=self.organization, name='Pune', code='PUN', address_line1='1 Main Rd',
+            city='Pune', state='Maharashtra', postal_code='411001',
+        )
+        self.employee.location = location
+        self.employee.save()
+        GeoFence.objects.create(
+            organization=self.organization, location=location, name='Office',
+            latitude=Decimal('18.52040000'), longitude=Decimal('73.85670000'), radius_meters=200,
+        )
+        result = self._ingest([
+            self._punch('near', 'in', self._at(9), latitude='18.52040000', longitude='73.85670000'),
+            self._punch('far', 'out', self._at(18), latitude='18.60000000', longitude='73.90000000'),
+        ])
+        self.assertEqual([r['fraud_score'] for r in result['results']], [0.0, 55.0])
+        self.assertEqual(
+            set(FraudLog.objects.values_list('fraud_type', flat=True)), {'geo_mismatch'},
+        )
+
+    def test_queries_do_not_grow_with_batch(self):
+        from tests.factories import EmployeeFactory, UserFactory
+
+        employees = [
+            EmployeeFactory(
+                organization=self.organization, employee_id=f'B{n:03d}',
+                user=UserFactory(organization=self.organization),
+            )
+            for n in range(15)
+        ]
+
+        def batch(prefix, count):
+            punches = []
+            for employee in employees[:count]:
+                for punch_type, hour in (('in', 9), ('out', 19)):
+                    punches.append({
+                        'idempotency_key': f'{prefix}-{employee.employee_id}-{punch_type}',
+                        'employee_code': employee.employee_id, 'punch_type': punch_type,
+                        'punch_time': self._at(hour),
+                    })
+            return punches
+
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self._ingest(batch('s', 3))['created'], 6)
+        self.day -= datetime.timedelta(days=1)
+        # Kept under SQLite's bulk_create batch size so both fit one INSERT
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self._ingest(batch('l', 15))['created'], 30)
+        self.assertEqual(len(large), len(small))
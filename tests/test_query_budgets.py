@@ -0,0 +1,130 @@
+"""
+Endpoint Query Budget Tests
+===========================
+Validates:
+  1. No GET operation in hrms_openapi.yaml issues more queries with 200
+     rows than with 10 (N+1 regression gate)
+  2. No GET operation exceeds its budget in tests/query_budgets.yaml
+  3. Every operation answers 2xx unless listed under ``unmeasured``
+
+Regenerate budgets after an intentional change:
+    QUERY_BUDGET_RECORD=1 python manage.py test tests.test_query_budgets
+
+Run:
+    python manage.py test tests.test_query_budgets -v2
+"""
+
+import datetime
+import random
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from tests.factories import (
+    DepartmentFactory,
+    DesignationFactory,
+    EmployeeFactory,
+    OrganizationFactory,
+    UserFactory,
+)
+from tests.query_budget import QueryBudgetHarness, recording
+
+SMALL_ROWS = 10
+LARGE_ROWS = 200
+
+
+def seed_rows(organization, count, rng):
+    """
+    Add ``count`` employees with their own departments and designations,
+    each with an attendance record, a punch and a payslip.
+    """
+
+    from apps.attendance.models import AttendancePunch, AttendanceRecord
+    from apps.employees.models import Employee
+    from apps.payroll.models import PayrollRun, Payslip
+
+    yesterday = timezone.localdate() - datetime.timedelta(days=1)
+    payroll_run, _ = PayrollRun.objects.get_or_create(
+        organization=organization, month=yesterday.month, year=yesterday.year,
+        defaults={'name': f'{yesterday:%B %Y}', 'pay_date': yesterday},
+    )
+    managers = list(Employee.objects.filter(organization=organization)[:20])
+    for _ in range(count):
+        department = DepartmentFactory(organization=organization)
+        designation = DesignationFactory(organization=organization)
+        employee = EmployeeFactory(
+            organization=organization,
+            user=UserFactory(organization=organization),
+            department=department,
+            designation=designation,
+            reporting_manager=rng.choice(managers) if managers else None,
+        )
+        if len(managers) < 20:
+            managers.append(employee)
+
+        check_in = timezone.make_aware(datetime.datetime.combine(
+            yesterday, datetime.time(9, rng.randrange(60))
+        ))
+        record = AttendanceRecord.objects.create(
+            organization=organization, employee=employee, date=yesterday,
+            status=AttendanceRecord.STATUS_PRESENT, check_in=check_in,
+        )
+        AttendancePunch.objects.create(
+            organization=organization, employee=employee, attendance=record,
+            punch_type=AttendancePunch.PUNCH_IN, punch_time=check_in,
+        )
+        Payslip.objects.create(
+            organization=organization, payroll_run=payroll_run, employee=employee,
+            gross_salary=Decimal('1000'), total_deductions=Decimal('200'), net_salary=Decimal('800'),
+            earnings_breakdown={'BASIC': 1000.0}, deductions_breakdown={'PROF_TAX': 200.0},
+        )
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from apps.abac.models import Policy, UserPolicy
+        from apps.authentication.serializers import CustomTokenObtainPairSerializer
+
+        cls.organization = OrganizationFactory()
+        cls.admin = UserFactory(
+            organization=cls.organization, is_org_admin=True, is_staff=True
+        )
+        # Grant everything through ABAC so list endpoints return full pages
+        # and the permission path is exercised like in production.
+        policy = Policy.objects.create(
+            organization=cls.organization, name='Allow all', code='allow-all',
+            effect=Policy.ALLOW,
+        )
+        UserPolicy.objects.create(
+            organization=cls.organization, user=cls.admin, policy=policy
+        )
+        cls.token = str(CustomTokenObtainPairSerializer.get_token(cls.admin).access_token)
+
+    def _measure(self, harness):
+        # The first pass warms per-process caches (ABAC snapshots, permission
+        # decisions); only the second pass is compared.
+        harness.measure()
+        return harness.measure()
+
+    def test_query_counts_do_not_grow_with_rows(self):
+        rng = random.Random(0)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        harness = QueryBudgetHarness(client)
+
+        seed_rows(self.organization, SMALL_ROWS, rng)
+        small = self._measure(harness)
+        seed_rows(self.organization, LARGE_ROWS - SMALL_ROWS, rng)
+        large = self._measure(harness)
+
+        if recording():
+            harness.record(small, large)
+            return
+        problems = harness.violations(small, large)
+        self.assertEqual(problems, [], '\n' + '\n'.join(problems))
+        covered = sum(m.ok for m in large.values())
+        self.assertGreaterEqual(covered, len(harness.budgets.operations), 'Fewer operations measured than budgeted')
@@ -0,0 +1,123 @@
+"""
+Rate Limiting Tests
+===================
+Validates:
+  1. Token bucket and sliding-window limits admit exactly ``limit`` requests
+  2. Several limits are decided all-or-nothing (a rejection drains nothing)
+  3. All atomic throttles of a view are decided in one limiter call
+  4. The per-organization tier follows the subscription plan
+
+Run:
+    python manage.py test tests.test_rate_limiting -v2
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+
+class AtomicRateLimiterTests(SimpleTestCase):
+
+    def setUp(self):
+        from apps.core.rate_limiting import AtomicRateLimiter
+        self.limiter = AtomicRateLimiter()
+
+    def test_token_bucket(self):
+        from apps.core.rate_limiting import RateLimit
+        limits = [RateLimit('tb', 3, 60)]
+        decisions = [self.limiter.check(limits)[0] for _ in range(4)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, True, False])
+        self.assertEqual(decisions[0].remaining, 2)
+        self.assertAlmostEqual(decisions[3].retry_after, 20, delta=1)
+
+    def test_sliding_window(self):
+        from apps.core.rate_limiting import SLIDING_WINDOW, RateLimit
+        limits = [RateLimit('sw', 2, 60, SLIDING_WINDOW)]
+        decisions = [self.limiter.check(limits)[0] for _ in range(3)]
+        self.assertEqual([d.allowed for d in decisions], [True, True, False])
+        self.assertGreater(decisions[2].retry_after, 59)
+
+    def test_rejection_does_not_consume_other_limits(self):
+        from apps.core.rate_limiting import RateLimit
+        minute, hour = RateLimit('m', 1, 60), RateLimit('h', 10, 3600)
+        self.limiter.check([minute, hour])
+        self.assertFalse(all(d.allowed for d in self.limiter.check([minute, hour])))
+        self.assertEqual(self.limiter.peek([hour])[0].remaining, 8)
+
+    def test_peek_does_not_consume(self):
+        from apps.core.rate_limiting import RateLimit
+        limits = [RateLimit('peek', 1, 60)]
+        self.limiter.peek(limits)
+        self.assertTrue(self.limiter.check(limits)[0].allowed)
+
+
+class AtomicThrottleTests(SimpleTestCase):
+
+    def _view(self, *throttle_classes):
+        return SimpleNamespace(get_throttles=lambda: [cls() for cls in throttle_classes])
+
+    def _request(self):
+        from rest_framework.request import Request
+        request = Request(RequestFactory().get('/api/v1/things/', REMOTE_ADDR='10.9.8.7'))
+        request.user = SimpleNamespace(is_authenticated=False)
+        return request
+
+    def test_view_throttles_share_one_check(self):
+        from apps.core import throttling
+        from apps.core.throttling import BurstRateThrottle, SustainedRateThrottle
+
+        view = self._view(BurstRateThrottle, SustainedRateThrottle)
+        request = self._request()
+        with mock.patch.object(
+            throttling.rate_limiter, 'check', wraps=throttling.rate_limiter.check
+        ) as check:
+            for throttle in view.get_throttles():
+                self.assertTrue(throttle.allow_request(request, view))
+        self.assertEqual(check.call_count, 1)
+        self.assertEqual(len(check.call_args.args[0]), 2)
+
+    def test_wait_reports_retry_after(self):
+        from apps.core.rate_limiting import rate_limiter
+        from apps.core.throttling import BurstRateThrottle
+
+        class TwoPerMinute(BurstRateThrottle):
+            rate = '2/minute'
+
+        rate_limiter.reset_local()
+        view = self._view(TwoPerMinute)
+        results = []
+        for _ in range(3):
+            throttle = TwoPerMinute()
+            results.append(throttle.allow_request(self._request(), view))
+        self.assertEqual(results, [True, True, False])
+        self.assertAlmostEqual(throttle.wait(), 30, delta=1)
+
+
+class OrganizationTierTests(TestCase):
+
+    def test_tier_follows_plan(self):
+        from apps.billing.models import OrganizationSubscription, Plan
+        from apps.core.rate_limiting import organization_tier
+        from tests.factories import OrganizationFactory
+
+        # Committed data only: the tenant cache skips rows it saw written
+        # by the still-open transaction.
+        with self.captureOnCommitCallbacks(execute=True):
+            Plan.objects.create(
+                name='Starter', code='starter', monthly_price=Decimal('10'), yearly_price=Decimal('100')
+            )
+            enterprise = Plan.objects.create(
+                name='Enterprise', code='enterprise', monthly_price=Decimal('99'), yearly_price=Decimal('990')
+            )
+            organization = OrganizationFactory()
+        self.assertEqual(organization_tier(organization), 'starter')
+
+        subscription = OrganizationSubscription.objects.get(organization=organization, is_active=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.plan = enterprise
+            subscription.save()
+        self.assertEqual(organization_tier(organization), 'enterprise')
+        with self.assertNumQueries(0):
+            organization_tier(organization)
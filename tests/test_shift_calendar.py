@@ -0,0 +1,151 @@
+"""
+Shift Calendar Tests
+====================
+Validates:
+  1. Calendar reads agree with the assignment / 'GEN' resolution rules,
+     never write, and a range read of the built window is a single query
+  2. Assignment writes, 'GEN' shift changes and shift deactivation are
+     reflected in the calendar
+  3. Rotating shift schedules run in a constant number of queries
+  4. The beat task builds the window for every active organization
+
+Run:
+    python manage.py test tests.test_shift_calendar -v2
+"""
+
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+class ShiftCalendarTests(TestCase):
+
+    def setUp(self):
+        from apps.attendance.models import Shift
+        from tests.factories import EmployeeFactory, OrganizationFactory, UserFactory
+
+        self.organization = OrganizationFactory()
+        self.employee = EmployeeFactory(
+            organization=self.organization, user=UserFactory(organization=self.organization),
+        )
+        self.general = Shift.objects.create(
+            organization=self.organization, name='General', code='GEN',
+            start_time=datetime.time(9, 0), end_time=datetime.time(18, 0),
+        )
+        self.night = Shift.objects.create(
+            organization=self.organization, name='Night', code='NGT',
+            start_time=datetime.time(22, 0), end_time=datetime.time(6, 0),
+        )
+        self.today = timezone.localdate()
+
+    def _assign(self, shift, start, end=None):
+        from apps.attendance.models import ShiftAssignment
+
+        return ShiftAssignment.objects.create(
+            organization=self.organization, employee=self.employee, shift=shift,
+            effective_from=start, effective_to=end,
+        )
+
+    def _shifts(self, start, end):
+        from apps.attendance import shift_calendar
+
+        shifts = shift_calendar.shifts_between(self.organization.id, [self.employee.id], start, end)
+        return [shifts[(self.employee.id, day)] for day in shift_calendar.days_between(start, end)]
+
+    def test_reads_follow_assignments(self):
+        from apps.attendance import shift_calendar
+        from apps.attendance.models import EmployeeShiftDay
+        from apps.attendance.services import AttendanceService
+
+        start = self.today + datetime.timedelta(days=3)
+        self._assign(self.night, start, start + datetime.timedelta(days=2))
+
+        days = self._shifts(self.today, self.today + datetime.timedelta(days=6))
+        self.assertEqual(days, [self.general] * 3 + [self.night] * 3 + [self.general])
+        self.assertEqual(AttendanceService._get_employee_shift(self.employee, start), self.night)
+
+        # Dates outside the window are resolved without being stored
+        far = self.today + datetime.timedelta(days=400)
+        self.assertEqual(AttendanceService._get_employee_shift(self.employee, far), self.general)
+        self.assertFalse(EmployeeShiftDay.objects.filter(date=far).exists())
+
+        shift_calendar.build(self.organization.id)
+        with CaptureQueriesContext(connection) as queries:
+            self._shifts(self.today, self.today + datetime.timedelta(days=6))
+        self.assertEqual(len(queries), 1)
+
+    def test_writes_refresh_calendar(self):
+        from apps.attendance.models import Shift
+
+        start = self.today + datetime.timedelta(days=1)
+        end = self.today + datetime.timedelta(days=3)
+        assignment = self._assign(self.night, start)
+        self.assertEqual(self._shifts(start, end), [self.night] * 3)
+
+        # Moving the assignment later re-exposes the default shift
+        assignment.effective_from = end
+        assignment.save()
+        self.assertEqual(self._shifts(start, end), [self.general, self.general, self.night])
+
+        # Inactive assigned shift falls back to 'GEN'; reactivation restores it
+        self.night.is_active = False
+        self.night.save()
+        self.assertEqual(self._shifts(end, end), [self.general])
+        self.night.is_active = True
+        self.night.save()
+        self.assertEqual(self._shifts(end, end), [self.night])
+
+        # A new 'GEN' shift takes over every default day
+        self.general.delete()
+        replacement = Shift.objects.create(
+            organization=self.organization, name='General 2', code='GEN',
+            start_time=datetime.time(10, 0), end_time=datetime.time(19, 0),
+        )
+        self.assertEqual(self._shifts(start, end), [replacement, replacement, self.night])
+
+        assignment.delete()
+        self.assertEqual(self._shifts(end, end), [replacement])
+
+    def test_rotating_schedule_constant_queries(self):
+        from apps.attendance.services import ShiftManagementService
+
+        self._assign(self.night, self.today + datetime.timedelta(days=10))
+
+        def schedule(days):
+            with CaptureQueriesContext(connection) as queries:
+                result = ShiftManagementService.get_rotating_shift_schedule(
+                    self.employee, self.today, self.today + datetime.timedelta(days=days - 1),
+                )
+            self.assertEqual(len(result), days)
+            return result, len(queries)
+
+        week, week_queries = schedule(7)
+        quarter, quarter_queries = schedule(90)
+        self.assertEqual(week_queries, quarter_queries)
+        self.assertEqual(quarter[9]['shift_name'], 'General')
+        self.assertEqual(quarter[10]['shift_name'], 'Night')
+
+    def test_beat_task_builds_window(self):
+        from unittest import mock
+        from django.conf import settings
+        from apps.attendance import shift_calendar
+        from apps.attendance.models import EmployeeShiftDay
+        from apps.attendance.tasks import build_shift_calendar
+
+        entry = settings.CELERY_BEAT_SCHEDULE['attendance.shift_calendar.build']
+        self.assertEqual(entry['task'], build_shift_calendar.name)
+
+        with mock.patch.object(build_shift_calendar, 'delay') as queued:
+            build_shift_calendar.apply()
+        queued.assert_any_call(str(self.organization.id))
+
+        EmployeeShiftDay.objects.all().delete()
+        build_shift_calendar.apply(args=(str(self.organization.id),))
+        start, end = shift_calendar.window()
+        self.assertEqual(
+            EmployeeShiftDay.objects.filter(employee=self.employee, date__gte=start, date__lte=end).count(),
+            (end - start).days + 1,
+        )
@@ -0,0 +1,124 @@
+"""
+Subscription Access Tests
+=========================
+Validates:
+  1. access_state() reports today's state and the date it next changes
+  2. SubscriptionMiddleware is query- and write-free for a warm tenant
+  3. The cached tenant state expires at the next transition
+  4. The hourly sweep applies transitions the middleware no longer writes
+
+Run:
+    python manage.py test tests.test_subscription_access -v2
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+
+
+class AccessStateTests(SimpleTestCase):
+
+    def _subscription(self, **kwargs):
+        from apps.billing.models import OrganizationSubscription
+        fields = dict(
+            start_date=date(2026, 1, 1), expiry_date=date(2026, 1, 31),
+            trial_end_date=None, is_trial=False, grace_period_days=3, is_active=True,
+        )
+        fields.update(kwargs)
+        return OrganizationSubscription(**fields)
+
+    def test_paid_lifecycle(self):
+        from apps.billing.models import OrganizationSubscription as S
+        subscription = self._subscription()
+        self.assertEqual(subscription.access_state(date(2026, 1, 31)), (S.ACCESS_OK, date(2026, 2, 1)))
+        self.assertEqual(subscription.access_state(date(2026, 2, 1)), (S.ACCESS_GRACE, date(2026, 2, 4)))
+        self.assertEqual(subscription.access_state(date(2026, 2, 4)), (S.ACCESS_GRACE_LAPSED, None))
+
+    def test_trial_ends_before_expiry(self):
+        from apps.billing.models import OrganizationSubscription as S
+        subscription = self._subscription(is_trial=True, trial_end_date=date(2026, 1, 14))
+        self.assertEqual(subscription.access_state(date(2026, 1, 10)), (S.ACCESS_OK, date(2026, 1, 15)))
+        self.assertEqual(
+            subscription.access_state(date(2026, 1, 15)), (S.ACCESS_TRIAL_ENDED, date(2026, 2, 1))
+        )
+
+
+class SubscriptionAccessTests(TestCase):
+
+    def setUp(self):
+        from apps.billing.models import OrganizationSubscription, Plan
+        from apps.core.context import clear_context
+        from apps.core.tenant_cache import clear_local
+        from tests.factories import OrganizationFactory, UserFactory
+
+        clear_context()
+        self.addCleanup(clear_context)
+        clear_local()
+        with self.captureOnCommitCallbacks(execute=True):
+            Plan.objects.create(
+                name='Starter', code='starter', monthly_price=Decimal('10'), yearly_price=Decimal('100')
+            )
+            self.organization = OrganizationFactory()
+            self.user = UserFactory(organization=self.organization)
+            self.subscription = OrganizationSubscription.objects.get(
+                organization=self.organization, is_active=True
+            )
+
+    def _set_dates(self, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(self.subscription, name, value)
+            self.subscription.save()
+
+    def _request(self):
+        from apps.billing.middleware import SubscriptionMiddleware
+
+        request = RequestFactory().get('/api/v1/employees/')
+        request.user = self.user
+        request.organization = self.organization
+        middleware = SubscriptionMiddleware(lambda r: HttpResponse())
+        return request, middleware.process_request(request)
+
+    def test_grace_is_read_only(self):
+        today = timezone.now().date()
+        self._set_dates(is_trial=False, trial_end_date=None, expiry_date=today - timedelta(days=1))
+        self._request()
+        with self.assertNumQueries(0):
+            request, response = self._request()
+        self.assertIsNone(response)
+        self.assertTrue(request._subscription_grace_warning)
+
+    def test_lapsed_grace_blocks_without_deactivating(self):
+        today = timezone.now().date()
+        self._set_dates(is_trial=False, trial_end_date=None, expiry_date=today - timedelta(days=10))
+        _, response = self._request()
+        self.assertEqual(response.status_code, 402)
+        self.subscription.refresh_from_db()
+        self.assertTrue(self.subscription.is_active)
+
+    def test_cached_state_expires_at_transition(self):
+        today = timezone.now().date()
+        self._set_dates(expiry_date=today + timedelta(days=5), trial_end_date=today)
+        self.assertIsNone(self._request()[1])
+
+        from apps.core.tenant_cache import clear_local
+        clear_local()  # simulate another worker reading the shared entry
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            _, response = self._request()
+        self.assertEqual(response.status_code, 402)
+
+    def test_transition_sweep(self):
+        from apps.billing.tasks import subscription_expiry_task
+
+        today = timezone.now().date()
+        self._set_dates(is_trial=False, trial_end_date=None, expiry_date=today - timedelta(days=10))
+        with mock.patch('apps.billing.services.renewal_service.RenewalService._enqueue_email_task'):
+            stats = subscription_expiry_task.apply(kwargs={'transitions_only': True}).get()
+        self.assertEqual(stats['processed'], 1)
+        self.subscription.refresh_from_db()
+        self.assertFalse(self.subscription.is_active)
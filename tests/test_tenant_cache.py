@@ -0,0 +1,185 @@
+"""
+Tenant Context Cache Tests
+==========================
+Validates:
+  1. Warm organization and host lookups issue no queries
+  2. Callers get copies, never the cached instances
+  3. Organization, subscription and domain writes invalidate their entries
+  4. Uncommitted writes are never cached
+  5. Organization + subscription middleware resolve a warm tenant with zero queries
+
+Run:
+    python manage.py test tests.test_tenant_cache -v2
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+
+class TenantTestCase(TestCase):
+    """Creates the tenant as committed data: the cache ignores uncommitted rows."""
+
+    def setUp(self):
+        from apps.billing.models import Plan
+        from apps.core.context import clear_context
+        from apps.core.tenant_cache import clear_local
+        from tests.factories import OrganizationFactory, UserFactory
+
+        # The middleware under test sets the audit context; never leak it.
+        clear_context()
+        self.addCleanup(clear_context)
+        clear_local()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan = Plan.objects.create(
+                name='Starter', code='starter', monthly_price=Decimal('10'), yearly_price=Decimal('100')
+            )
+            self.organization = OrganizationFactory()
+            self.user = UserFactory(organization=self.organization)
+
+
+class TenantCacheTests(TenantTestCase):
+
+    def test_warm_state_is_query_free(self):
+        from apps.core.tenant_cache import get_tenant_state
+        get_tenant_state(self.organization.id)
+        with self.assertNumQueries(0):
+            state = get_tenant_state(self.organization.id)
+        self.assertEqual(state.organization.pk, self.organization.pk)
+        self.assertEqual(state.plan.code, 'starter')
+        self.assertEqual(state.subscription.organization, state.organization)
+
+    def test_user_organization_uses_cache(self):
+        self.user.organization
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user.organization.pk, self.organization.pk)
+
+    def test_returns_copies(self):
+        from apps.core.tenant_cache import get_organization
+        get_organization(self.organization.id).name = 'Changed'
+        self.assertNotEqual(get_organization(self.organization.id).name, 'Changed')
+
+    def test_organization_save_invalidates(self):
+        from apps.core.tenant_cache import get_organization
+        get_organization(self.organization.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization.is_active = False
+            self.organization.save()
+        self.assertFalse(get_organization(self.organization.id).is_active)
+
+    def test_uncommitted_write_is_not_cached(self):
+        from django.core.cache import cache
+        from apps.core.tenant_cache import get_organization, org_key
+
+        get_organization(self.organization.id)
+        self.organization.name = 'Pending'
+        self.organization.save()
+        self.assertEqual(get_organization(self.organization.id).name, 'Pending')
+        self.assertIsNone(cache.get(org_key(self.organization.id)))
+
+    def test_subscription_change_invalidates(self):
+        from apps.billing.models import Plan
+        from apps.billing.services import SubscriptionService
+        from apps.core.tenant_cache import get_tenant_state
+
+        get_tenant_state(self.organization.id)
+        pro = Plan.objects.create(
+            name='Pro', code='professional', monthly_price=Decimal('50'), yearly_price=Decimal('500')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            SubscriptionService.activate_paid_subscription(self.organization, pro)
+        self.assertEqual(get_tenant_state(self.organization.id).plan.code, 'professional')
+
+    def test_plan_flag_change_invalidates(self):
+        from apps.core.tenant_cache import get_tenant_state
+        get_tenant_state(self.organization.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.payroll_enabled = False
+            self.plan.save()
+        self.assertFalse(get_tenant_state(self.organization.id).plan.payroll_enabled)
+
+    def test_unknown_host_is_negatively_cached(self):
+        from apps.core.tenant_cache import get_host_organization_id
+        self.assertIsNone(get_host_organization_id('plain.example.com'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_host_organization_id('plain.example.com'))
+
+    def test_domain_writes_invalidate_hosts(self):
+        from apps.core.models import OrganizationDomain
+        from apps.core.tenant_cache import get_host_organization_id
+
+        self.assertIsNone(get_host_organization_id('hr.acme.test'))
+        with self.captureOnCommitCallbacks(execute=True):
+            domain = OrganizationDomain.objects.create(
+                organization=self.organization, domain_name='hr.acme.test'
+            )
+        self.assertEqual(get_host_organization_id('hr.acme.test'), str(self.organization.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            domain.domain_name = 'people.acme.test'
+            domain.save()
+        self.assertIsNone(get_host_organization_id('hr.acme.test'))
+        self.assertEqual(get_host_organization_id('people.acme.test'), str(self.organization.id))
+
+
+class TenantMiddlewareTests(TenantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # `manage.py test` puts "test" in argv, which the middleware skips
+        command = patch('apps.core.middleware_organization.is_management_command', return_value=False)
+        command.start()
+        self.addCleanup(command.stop)
+
+    def _run(self):
+        from apps.billing.middleware import SubscriptionMiddleware
+        from apps.core.middleware_organization import OrganizationMiddleware
+
+        request = RequestFactory().get('/api/v1/employees/')
+        request.user = self.user
+        response = HttpResponse()
+        self.assertIsNone(OrganizationMiddleware(lambda r: response).process_request(request))
+        self.assertIsNone(SubscriptionMiddleware(lambda r: response).process_request(request))
+        return request
+
+    def test_warm_tenant_resolution_is_query_free(self):
+        self._run()
+        with self.assertNumQueries(0):
+            request = self._run()
+        self.assertEqual(request.organization.pk, self.organization.pk)
+
+    def test_deactivated_organization_is_blocked(self):
+        from apps.core.middleware_organization import OrganizationMiddleware
+
+        self._run()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.organization.is_active = False
+            self.organization.save()
+        request = RequestFactory().get('/api/v1/employees/')
+        request.user = self.user
+        response = OrganizationMiddleware(lambda r: HttpResponse()).process_request(request)
+        self.assertEqual(response.status_code, 403)
+
+    def test_expired_trial_is_payment_required(self):
+        from apps.billing.middleware import SubscriptionMiddleware
+        from apps.billing.models import OrganizationSubscription
+
+        subscription = OrganizationSubscription.objects.get(organization=self.organization, is_active=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.trial_end_date = timezone.now().date() - timedelta(days=1)
+            subscription.save()
+        request = self._run_until_subscription()
+        response = SubscriptionMiddleware(lambda r: HttpResponse()).process_request(request)
+        self.assertEqual(response.status_code, 402)
+
+    def _run_until_subscription(self):
+        from apps.core.middleware_organization import OrganizationMiddleware
+
+        request = RequestFactory().get('/api/v1/employees/')
+        request.user = self.user
+        OrganizationMiddleware(lambda r: HttpResponse()).process_request(request)
+        return request